@@ -20,7 +20,8 @@ from collections import defaultdict
 # 添加src到路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from src.utils import setup_logger, safe_read_csv
+from src.utils import setup_logger, safe_read_csv, load_stock_data
+from src.data_store import find_stock_file, list_stock_files, stock_code_from_path
 from src.monster_stock_analyzer import MonsterStockAnalyzer
 from src.data_downloader import DataDownloader
 
@@ -86,9 +87,8 @@ class MonsterStockBacktest:
 
         # 如果没有股票列表，扫描数据目录
         codes = []
-        for f in os.listdir(self.data_dir):
-            if f.endswith('.csv'):
-                codes.append(f.replace('.csv', ''))
+        for f in list_stock_files(self.data_dir):
+            codes.append(stock_code_from_path(f))
         return pd.DataFrame({'code': codes})
 
     def load_stock_data(self, stock_code: str,
@@ -100,31 +100,15 @@ class MonsterStockBacktest:
         if cache_key in self._data_cache:
             return self._data_cache[cache_key]
 
-        file_path = os.path.join(self.data_dir, f"{stock_code}.csv")
+        file_path = find_stock_file(self.data_dir, stock_code)
 
-        if not os.path.exists(file_path):
+        if file_path is None:
             return None
 
-        df = safe_read_csv(file_path)
+        df = load_stock_data(file_path, start_date=start_date, end_date=end_date)
         if df is None or df.empty:
             return None
 
-        # 转换日期
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date').reset_index(drop=True)
-
-        # 确保数值列
-        numeric_cols = ['open', 'high', 'low', 'close', 'volume', 'amount']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-
-        # 过滤日期范围
-        if start_date:
-            df = df[df['date'] >= pd.to_datetime(start_date)]
-        if end_date:
-            df = df[df['date'] <= pd.to_datetime(end_date)]
-
         if len(df) < self.lookback_days:
             return None
 
@@ -270,16 +254,12 @@ class MonsterStockBacktest:
             # 获取历史数据用于分析
             lookback_df = df.iloc[idx - self.lookback_days:idx + 1].copy()
 
-            # 需要保存到临时文件（因为analyzer使用文件路径）
-            temp_file = f'/tmp/monster_analysis_{stock_code}_{idx}.csv'
-            lookback_df.to_csv(temp_file, index=False)
-
             try:
-                # 使用妖股分析器检测信号
-                score_data = self.analyzer.analyze_single(temp_file, stock_code)
+                # 使用妖股分析器检测信号（直接分析内存中的数据，无需临时文件）
+                score_data = self.analyzer.analyze_frame(lookback_df, stock_code)
 
-                if score_data is not None and score_data.get('score', 0) >= self.min_score:
-                    score = score_data['score']
+                if score_data is not None and score_data.get('total_score', 0) >= self.min_score:
+                    score = score_data['total_score']
                     signal_date = current_date
 
                     # 寻找买入点
@@ -335,11 +315,6 @@ class MonsterStockBacktest:
             except Exception as e:
                 self.logger.error(f"分析 {stock_code} {current_date.strftime('%Y-%m-%d')} 异常: {e}")
 
-            finally:
-                # 清理临时文件
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-
         return results
 
     def run_backtest(self, start_date: str = '2020-01-01',
@@ -367,9 +342,8 @@ class MonsterStockBacktest:
             stock_codes = sample_stocks
         else:
             stock_codes = []
-            for f in os.listdir(self.data_dir):
-                if f.endswith('.csv'):
-                    stock_codes.append(f.replace('.csv', ''))
+            for f in list_stock_files(self.data_dir):
+                stock_codes.append(stock_code_from_path(f))
 
         self.logger.info(f"共 {len(stock_codes)} 只股票待分析")
 
@@ -19,7 +19,6 @@
 
 import os
 import sys
-import glob
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -27,7 +26,9 @@ from typing import Dict, List, Tuple, Optional
 import re
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from src.utils import setup_logger, safe_read_csv
+from src.utils import setup_logger, safe_read_csv, load_stock_data
+from src.data_store import find_stock_file
+from src.results_db import ResultsDB, STRATEGY_MONSTER
 
 
 class StrategyBacktest:
@@ -92,20 +93,15 @@ class StrategyBacktest:
             (买入日期, 买入价格, 买入原因)
         买入原因: '正常买入', '秒板延后', '数据不足'
         """
-        file_path = os.path.join(self.daily_dir, f'{stock_code}.csv')
-        df = safe_read_csv(file_path)
+        file_path = find_stock_file(self.daily_dir, stock_code)
+        df = load_stock_data(file_path) if file_path else None
 
         if df is None or df.empty:
             return None, None, '数据不足'
 
-        # 确保日期格式正确
-        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-
-        # 找到选股日期后的第一个交易日
-        select_date_fmt = datetime.strptime(select_date, '%Y%m%d').strftime('%Y-%m-%d')
-
-        # 从选股日期的下一天开始查找
-        future_data = df[df['date'] > select_date_fmt].sort_values('date')
+        # 从选股日期的下一天开始查找（load_stock_data 已按日期升序）
+        select_ts = pd.Timestamp(datetime.strptime(select_date, '%Y%m%d'))
+        future_data = df[df['date'] > select_ts]
 
         if future_data.empty:
             return None, None, '数据不足'
@@ -132,7 +128,7 @@ class StrategyBacktest:
                 continue
 
             # 非秒板，可以买入
-            return current_date, open_price, '正常买入' if idx == 0 else f'秒板延后{idx}天'
+            return current_date.strftime('%Y-%m-%d'), open_price, '正常买入' if idx == 0 else f'秒板延后{idx}天'
 
         # 所有未来交易日都是秒板，无法买入
         return None, None, '连续秒板无法买入'
@@ -144,17 +140,14 @@ class StrategyBacktest:
         Returns:
             {持有天数: 收益率%, ...}
         """
-        file_path = os.path.join(self.daily_dir, f'{stock_code}.csv')
-        df = safe_read_csv(file_path)
+        file_path = find_stock_file(self.daily_dir, stock_code)
+        df = load_stock_data(file_path) if file_path else None
 
         if df is None or df.empty:
             return {days: None for days in self.HOLD_DAYS}
 
-        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-        df = df.sort_values('date').reset_index(drop=True)
-
         # 找到买入日期索引
-        buy_idx = df[df['date'] == buy_date].index
+        buy_idx = df[df['date'] == pd.Timestamp(buy_date)].index
         if len(buy_idx) == 0:
             return {days: None for days in self.HOLD_DAYS}
 
@@ -191,6 +184,19 @@ class StrategyBacktest:
             self.logger.warning(f"无法读取结果文件: {result_file}")
             return []
 
+        return self.backtest_signals(select_date, df)
+
+    def backtest_signals(self, select_date: str, df: pd.DataFrame) -> List[Dict]:
+        """
+        回测某个选股日的入选股票
+
+        Args:
+            select_date: 选股日期 YYYYMMDD
+            df: 选股结果（导出 CSV 的列或结果库记录）
+
+        Returns:
+            每笔交易的回测结果列表
+        """
         results = []
         code_col = '股票代码' if '股票代码' in df.columns else 'stock_code'
 
@@ -243,19 +249,19 @@ class StrategyBacktest:
         Returns:
             回测结果DataFrame
         """
-        # 获取历史结果文件
-        result_files = glob.glob(os.path.join(self.results_dir, 'monster_stock_*.csv'))
-        result_files.sort(reverse=True)  # 最新的在前
-
-        # 选择最近N天的结果
-        selected_files = result_files[:days] if len(result_files) > days else result_files
+        # 从结果库取最近N个选股日（最新的在前）
+        db = ResultsDB.get(self.results_dir)
+        runs = db.recent_runs(STRATEGY_MONSTER, limit=days)
 
-        self.logger.info(f"回测文件数: {len(selected_files)}")
+        self.logger.info(f"回测选股日数: {len(runs)}")
 
         all_results = []
-        for result_file in selected_files:
-            self.logger.info(f"回测文件: {os.path.basename(result_file)}")
-            results = self.backtest_single_result(result_file)
+        for run in runs:
+            self.logger.info(f"回测选股日: {run['signal_date']} ({run['count']} 只)")
+            df = db.signals(STRATEGY_MONSTER, run['signal_date'])
+            if df.empty:
+                continue
+            results = self.backtest_signals(run['signal_date'].replace('-', ''), df)
             all_results.extend(results)
 
         if not all_results:
@@ -26,7 +26,8 @@ from concurrent.futures import ProcessPoolExecutor, as_completed
 import multiprocessing
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from src.utils import setup_logger, safe_read_csv
+from src.utils import setup_logger, safe_read_csv, load_stock_data
+from src.data_store import find_stock_file, list_stock_files, stock_code_from_path
 
 
 @dataclass
@@ -72,22 +73,14 @@ class VolumeBreakoutStrategy:
                        start_date: Optional[str] = None,
                        end_date: Optional[str] = None) -> Optional[pd.DataFrame]:
         """加载股票数据"""
-        file_path = os.path.join(self.data_dir, f"{stock_code}.csv")
-        if not os.path.exists(file_path):
+        file_path = find_stock_file(self.data_dir, stock_code)
+        if file_path is None:
             return None
 
-        df = safe_read_csv(file_path)
+        df = load_stock_data(file_path)
         if df is None or df.empty:
             return None
 
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date').reset_index(drop=True)
-
-        numeric_cols = ['open', 'high', 'low', 'close', 'volume', 'amount']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-
         df = df.dropna(subset=['close', 'volume'])
         if len(df) < 30:
             return None
@@ -244,9 +237,8 @@ class VolumeBreakoutBacktest:
                 return df
 
         codes = []
-        for f in os.listdir(self.data_dir):
-            if f.endswith('.csv'):
-                codes.append(f.replace('.csv', ''))
+        for f in list_stock_files(self.data_dir):
+            codes.append(stock_code_from_path(f))
         return pd.DataFrame({'code': codes, 'name': [''] * len(codes)})
 
     def run_backtest(self, start_date: str = '2020-01-01',
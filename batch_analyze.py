@@ -15,7 +15,6 @@ TradeAnalytics 批量分析CLI入口
 import argparse
 import sys
 import os
-import glob
 from datetime import datetime, timedelta
 import pandas as pd
 
@@ -33,7 +32,10 @@ from src.utils import (
     get_latest_signal_date,
 )
 from src.data_downloader import DataDownloader
+from src.data_store import list_stock_files
+from src.data_manifest import DataManifest
 from src.monster_stock_analyzer import MonsterStockAnalyzer
+from src.results_db import ResultsDB, STRATEGY_MONSTER
 from src.volume_analyzer import analyze_volume_surge
 from src.notification import NotificationService
 from src.email_sender import EmailSender
@@ -127,21 +129,14 @@ def download_historical_data(config_file: str, logger, start_year: int = 2020) -
 
         # 检查本地数据情况
         daily_dir = Config(config_file).get('Paths', 'daily_dir', fallback='./data/daily')
-        csv_files = glob.glob(os.path.join(daily_dir, '*.csv'))
+        csv_files = list_stock_files(daily_dir)
 
         if csv_files:
             logger.info(f"本地已有 {len(csv_files)} 只股票数据，检查数据完整性...")
-            # 检查数据最早日期
-            earliest_date = None
-            for csv_file in csv_files[:50]:  # 检查前50个文件
-                try:
-                    df = pd.read_csv(csv_file, nrows=1)  # 只读第一行（最早日期）
-                    if 'date' in df.columns:
-                        file_earliest = pd.to_datetime(df['date'].iloc[0])
-                        if earliest_date is None or file_earliest < earliest_date:
-                            earliest_date = file_earliest
-                except:
-                    continue
+            # 从数据目录清单读取最早日期（覆盖全部文件）
+            manifest = DataManifest.get(daily_dir)
+            manifest.sync()
+            earliest_date = manifest.earliest_date()
 
             if earliest_date:
                 logger.info(f"本地数据最早日期: {earliest_date.strftime('%Y-%m-%d')}")
@@ -189,42 +184,17 @@ def check_data_freshness(config_file: str, logger, stale_days: int = 7, referenc
     config = Config(config_file)
     daily_dir = config.get('Paths', 'daily_dir', fallback='./data/daily')
 
-    csv_files = glob.glob(os.path.join(daily_dir, '*.csv'))
-    if not csv_files:
+    if not list_stock_files(daily_dir):
         return False, "本地无数据文件", -1
 
-    # 检查所有CSV文件中的最新日期
-    latest_date = None
-    checked_files = 0
-    sample_size = min(100, len(csv_files))  # 最多检查100个文件
-
-    for csv_file in csv_files[:sample_size]:
-        try:
-            df = pd.read_csv(csv_file, usecols=['date'])
-            if df.empty:
-                continue
-            file_latest = pd.to_datetime(df['date'], errors='coerce').max()
-            if pd.notna(file_latest) and (latest_date is None or file_latest > latest_date):
-                latest_date = file_latest
-            checked_files += 1
-        except (ValueError, KeyError):
-            try:
-                df = pd.read_csv(csv_file)
-                if 'date' not in df.columns or df.empty:
-                    continue
-                file_latest = pd.to_datetime(df['date'], errors='coerce').max()
-                if pd.notna(file_latest) and (latest_date is None or file_latest > latest_date):
-                    latest_date = file_latest
-                checked_files += 1
-            except Exception as e:
-                logger.debug(f"检查文件 {csv_file} 失败: {e}")
-                continue
-        except Exception as e:
-            logger.debug(f"检查文件 {csv_file} 失败: {e}")
-            continue
+    # 从数据目录清单读取所有股票的最新日期
+    manifest = DataManifest.get(daily_dir)
+    manifest.sync()
+    latest_date = manifest.latest_date()
 
     if latest_date is None:
-        return False, f"无法从 {checked_files} 个文件中提取日期", -1
+        return False, f"无法从 {len(manifest)} 个文件中提取日期", -1
+    latest_date = latest_date.to_pydatetime()
 
     days_diff = (reference_date - latest_date).days
 
@@ -270,7 +240,7 @@ def clear_stale_data(config_file: str, logger, stale_days: int = 7, reference_da
         logger.warning(f"清理目录: {daily_dir}")
 
         try:
-            csv_files = glob.glob(os.path.join(daily_dir, '*.csv'))
+            csv_files = list_stock_files(daily_dir)
             if csv_files:
                 for csv_file in csv_files:
                     try:
@@ -293,7 +263,7 @@ def clear_stale_data(config_file: str, logger, stale_days: int = 7, reference_da
 def mark_new_stocks(current_df: pd.DataFrame, results_dir: str, logger) -> pd.DataFrame:
     """
     标记新增的股票
-    对比前一天的结果文件，标记出当天新增的股票
+    对比结果库中前一个信号日的入选股票，标记出当天新增的股票
 
     Args:
         current_df: 当前分析结果DataFrame
@@ -311,50 +281,36 @@ def mark_new_stocks(current_df: pd.DataFrame, results_dir: str, logger) -> pd.Da
         logger.debug("当前结果无stock_code列，无法标记新增股票")
         return current_df
 
-    # 查找前一天的结果文件
-    yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
-    yesterday_files = glob.glob(os.path.join(results_dir, f'monster_stock_{yesterday}_*.csv'))
-
-    # 如果找不到昨天文件，尝试找最近的文件
-    if not yesterday_files:
-        all_files = glob.glob(os.path.join(results_dir, 'monster_stock_*.csv'))
-        if all_files:
-            # 按修改时间排序，取最近的一个（排除今天）
-            today_str = datetime.now().strftime('%Y%m%d')
-            recent_files = [f for f in all_files if not os.path.basename(f).startswith(f'monster_stock_{today_str}')]
-            if recent_files:
-                recent_files.sort(key=os.path.getmtime, reverse=True)
-                yesterday_files = [recent_files[0]]
-
-    if not yesterday_files:
-        logger.info("未找到前一天的结果文件，所有股票标记为新增")
+    # 查询结果库中今天之前最近一个信号日的入选股票
+    try:
+        db = ResultsDB.get(results_dir)
+        prev_date = db.previous_date(STRATEGY_MONSTER, datetime.now())
+    except Exception as e:
+        logger.warning(f"查询前一次结果失败: {e}")
+        prev_date = None
+
+    if not prev_date:
+        logger.info("未找到前一天的结果，所有股票标记为新增")
         current_df['is_new'] = True
         current_df['标记'] = '【新】'
         return current_df
 
     try:
-        # 读取前一天的结果
-        prev_df = pd.read_csv(yesterday_files[0], dtype={'stock_code': str})
-        if prev_df is None or prev_df.empty or 'stock_code' not in prev_df.columns:
-            logger.warning("前一天结果文件为空或格式错误")
-            current_df['is_new'] = True
-            current_df['标记'] = '【新】'
-            return current_df
-
-        prev_codes = set(prev_df['stock_code'].astype(str).tolist())
-        current_df['is_new'] = ~current_df['stock_code'].astype(str).isin(prev_codes)
+        prev_codes = db.codes_on(STRATEGY_MONSTER, prev_date)
+        codes = current_df['stock_code'].astype(str).str.zfill(6)
+        current_df['is_new'] = ~codes.isin(prev_codes)
 
         # 添加标记列用于显示
         current_df['标记'] = current_df['is_new'].apply(lambda x: '【新】' if x else '')
 
         new_count = current_df['is_new'].sum()
         total_count = len(current_df)
-        logger.info(f"对比前一天结果: 共 {total_count} 只，新增 {new_count} 只，持续 {total_count - new_count} 只")
+        logger.info(f"对比 {prev_date} 结果: 共 {total_count} 只，新增 {new_count} 只，持续 {total_count - new_count} 只")
 
         return current_df
 
     except Exception as e:
-        logger.warning(f"读取前一天结果文件失败: {e}")
+        logger.warning(f"读取前一次结果失败: {e}")
         current_df['is_new'] = True
         current_df['标记'] = '【新】'
         return current_df
@@ -393,7 +349,7 @@ def run_volume_analysis(config_file: str, logger, signal_date: datetime = None):
         signal_date = get_latest_signal_date()
     signal_date_str = signal_date.strftime('%Y-%m-%d')
 
-    csv_files = glob.glob(os.path.join(daily_dir, '*.csv'))
+    csv_files = list_stock_files(daily_dir)
     if not csv_files:
         logger.warning("未找到股票数据文件")
         return None, None, signal_date_str
@@ -429,6 +385,7 @@ def run_volume_analysis(config_file: str, logger, signal_date: datetime = None):
     ts = datetime.now().strftime('%Y%m%d_%H%M%S')
     output_file = os.path.join(results_dir, f'volume_surge_{ts}.csv')
     results_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+    ResultsDB.get(results_dir).record_result_file(output_file, results_df)
     logger.info(f"成交量分析完成: {len(results_df)} 只, 保存 {output_file}")
     return results_df, output_file, signal_date_str
 
@@ -528,7 +485,7 @@ def main():
     # 步骤1: 检查并确保数据最新（数据截止到最近交易日）
     if not args.skip_download:
         daily_dir = Config(args.config).get('Paths', 'daily_dir', fallback='./data/daily')
-        csv_count = len(glob.glob(os.path.join(daily_dir, '*.csv')))
+        csv_count = len(list_stock_files(daily_dir))
 
         if csv_count == 0:
             logger.info("本地无数据，需要先下载")
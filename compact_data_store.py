@@ -0,0 +1,58 @@
+"""
+日线数据冷热分层压实
+将 data/daily 热层文件中早于热层起始日期的数据封存到 data/daily/_cold 年度分区
+
+用法:
+  python compact_data_store.py
+  python compact_data_store.py --hot-years 2
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.utils import setup_logger, Config
+from src.data_store import PARQUET_AVAILABLE
+from src.data_manifest import DataManifest
+from src.market_panel import build_panel, get_panel_dir
+from src.tiered_store import compact_daily_dir, get_hot_years
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='日线数据冷热分层压实')
+    parser.add_argument('--config', type=str, default='config/config.ini',
+                        help='配置文件路径 (默认: config/config.ini)')
+    parser.add_argument('--data-dir', type=str, default=None,
+                        help='日线数据目录 (默认读取配置 [Paths] daily_dir)')
+    parser.add_argument('--hot-years', type=int, default=None,
+                        help='热层保留当前年之外的完整年数 (默认读取配置 [Download] hot_years)')
+    parser.add_argument('--no-panel', action='store_true',
+                        help='压实后不重建行情面板')
+
+    args = parser.parse_args()
+    logger = setup_logger('CompactDataStore')
+
+    if not PARQUET_AVAILABLE:
+        logger.error("冷层存储需要 pyarrow，请安装: pip install pyarrow")
+        return 1
+
+    config = Config(args.config)
+    daily_dir = args.data_dir or config.get('Paths', 'daily_dir', fallback='./data/daily')
+    if not os.path.isdir(daily_dir):
+        logger.error(f"数据目录不存在: {daily_dir}")
+        return 1
+
+    hot_years = args.hot_years if args.hot_years is not None else get_hot_years(config)
+    stats = compact_daily_dir(daily_dir, hot_years,
+                              manifest=DataManifest.get(daily_dir), logger=logger)
+
+    if stats['stocks'] and not args.no_panel:
+        build_panel(daily_dir, get_panel_dir(config), logger)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,30 +19,27 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from src.data_downloader import DataDownloader
-from src.utils import setup_logger, safe_read_csv, safe_write_csv, ensure_dir
+from src.utils import setup_logger, ensure_dir
+from src.data_store import find_stock_file, stock_file_path
+from src.data_manifest import DataManifest
+from src.download_journal import DownloadJournal
 
 
 def get_data_date_range(file_path: str) -> tuple:
     """
-    获取本地数据文件的日期范围
+    获取本地数据文件的日期范围（读取数据目录清单，不打开数据文件）
 
     Returns:
         (最早日期, 最新日期) 或 (None, None)
     """
-    try:
-        df = safe_read_csv(file_path)
-        if df is None or df.empty:
-            return None, None
-
-        dates = pd.to_datetime(df['date'])
-        return dates.min().strftime('%Y-%m-%d'), dates.max().strftime('%Y-%m-%d')
-    except:
+    earliest, latest = DataManifest.get(os.path.dirname(file_path)).date_range(file_path)
+    if earliest is None or latest is None:
         return None, None
+    return earliest, latest
 
 
 def download_stock_incremental(downloader: DataDownloader, stock_code: str,
-                               start_date: str, end_date: str,
-                               rate_limiter=None) -> bool:
+                               start_date: str, end_date: str) -> bool:
     """
     增量下载单只股票数据
 
@@ -51,19 +48,13 @@ def download_stock_incremental(downloader: DataDownloader, stock_code: str,
         stock_code: 股票代码
         start_date: 数据起始日期 'YYYY-MM-DD'（首次下载用2020-01-01）
         end_date: 数据结束日期 'YYYY-MM-DD'
-        rate_limiter: 限流控制器（用于多线程下载时控制频率）
 
     Returns:
         是否成功
     """
-    # AkShare限流 - 每只股票下载前等待
-    if downloader.data_source == 'akshare' and rate_limiter is not None:
-        import time
-        with rate_limiter:
-            time.sleep(0.5)  # 每只间隔0.5秒
-
     logger = setup_logger('IncrementalDownload')
-    file_path = os.path.join(downloader.daily_dir, f"{stock_code}.csv")
+    file_path = (find_stock_file(downloader.daily_dir, stock_code)
+                 or stock_file_path(downloader.daily_dir, stock_code, downloader.storage_format))
 
     # 检查本地数据
     if os.path.exists(file_path):
@@ -80,12 +71,8 @@ def download_stock_incremental(downloader: DataDownloader, stock_code: str,
                 )
 
                 if hist_df is not None and not hist_df.empty:
-                    # 合并数据
-                    local_df = safe_read_csv(file_path)
-                    combined = pd.concat([hist_df, local_df], ignore_index=True)
-                    combined.drop_duplicates(subset=['date'], keep='last', inplace=True)
-                    combined.sort_values('date', inplace=True)
-                    safe_write_csv(combined, file_path)
+                    # 补历史需要合并重写
+                    downloader.append_stock_data(stock_code, hist_df)
                     logger.debug(f"{stock_code}: 补充 {len(hist_df)} 条历史数据")
 
             # 更新最新数据
@@ -96,16 +83,15 @@ def download_stock_incremental(downloader: DataDownloader, stock_code: str,
                     stock_code, start_date=next_date, end_date=end_date.replace('-', '')
                 )
 
-                if new_df is not None and not new_df.empty:
-                    local_df = safe_read_csv(file_path)
-                    combined = pd.concat([local_df, new_df], ignore_index=True)
-                    combined.drop_duplicates(subset=['date'], keep='last', inplace=True)
-                    combined.sort_values('date', inplace=True)
-                    safe_write_csv(combined, file_path)
-                    return True
-                else:
-                    # 无新数据，但本地数据有效
-                    return True
+                if new_df is None:
+                    # 下载失败
+                    return False
+                if not new_df.empty:
+                    # 新数据晚于本地最新日期，直接追加到文件末尾
+                    return downloader.append_stock_data(
+                        stock_code, new_df, last_date=pd.to_datetime(latest))
+                # 无新数据，但本地数据有效
+                return True
             else:
                 # 数据已最新
                 return True
@@ -123,8 +109,7 @@ def download_stock_incremental(downloader: DataDownloader, stock_code: str,
     )
 
     if df is not None and not df.empty:
-        safe_write_csv(df, file_path)
-        return True
+        return downloader.save_stock_data(stock_code, df)
 
     return False
 
@@ -132,15 +117,22 @@ def download_stock_incremental(downloader: DataDownloader, stock_code: str,
 def download_all_incremental(start_year: int = 2020, max_workers: int = 5,
                             data_source: str = 'tushare',
                             tushare_token: str = None,
-                            force: bool = False) -> dict:
+                            force: bool = False,
+                            date_major: Optional[bool] = None,
+                            retry_failed: bool = False) -> dict:
     """
     增量下载所有A股历史数据
+    进度记录在任务日志中，中断后再次运行从中断处继续（跳过上次失败的股票）
 
     Args:
         start_year: 起始年份，默认2020
         max_workers: 并发下载数
         data_source: 数据源 'tushare'/'akshare'/'baostock'
         tushare_token: Tushare Pro Token
+        force: 跳过本地数据检查，逐只下载所有股票
+        date_major: Tushare 数据源先按交易日同步全市场截面，只有剩余股票逐只下载
+                    （None 时按配置 [Download] date_major_sync）
+        retry_failed: 只重新尝试上次失败的股票
 
     Returns:
         统计信息字典
@@ -160,6 +152,8 @@ def download_all_incremental(start_year: int = 2020, max_workers: int = 5,
 
     # 初始化下载器
     downloader = DataDownloader()
+    # 最近一个已收盘的交易日（本地数据已包含该日的股票不再请求）
+    target_date = downloader.planner.target_date().strftime('%Y-%m-%d')
     
     # 强制使用命令行指定的 source，覆盖 DataDownloader 内部从 config.ini 读取的逻辑
     downloader.data_source = data_source
@@ -192,6 +186,12 @@ def download_all_incremental(start_year: int = 2020, max_workers: int = 5,
         logger.error("无法获取股票列表")
         return {'success': 0, 'failed': 0, 'skipped': 0}
 
+    stock_list['code'] = stock_list['code'].astype(str)
+    journal = DownloadJournal.open(downloader.daily_dir, 'incremental', stock_list['code'],
+                                   target_date, retry_failed, logger)
+    if journal.resumed:
+        stock_list = stock_list[stock_list['code'].isin(journal.to_process())].reset_index(drop=True)
+
     total = len(stock_list)
     logger.info(f"共 {total} 只股票需要处理")
 
@@ -205,6 +205,18 @@ def download_all_incremental(start_year: int = 2020, max_workers: int = 5,
         'already_latest': 0
     }
 
+    # Tushare: 按交易日获取全市场截面分发到各股票，每个交易日只需两次调用
+    if date_major is None:
+        date_major = downloader.date_major_sync
+    if date_major and not force and downloader.data_source == 'tushare' and downloader.tushare_source:
+        remaining, done = downloader.sync_date_major(stock_list, start_date=start_date.replace('-', ''))
+        for code in set(stock_list['code']) - set(remaining['code'].astype(str)):
+            journal.record_success(code)
+        stock_list = remaining
+        stats['success'] += done
+        stats['updated'] += done
+        logger.info(f"按交易日同步完成 {done} 只，剩余 {len(stock_list)} 只逐只下载")
+
     # AkShare限流提示
     if data_source == 'akshare':
         logger.info("AkShare数据源: 东方财富接口有频率限制")
@@ -221,32 +233,23 @@ def download_all_incremental(start_year: int = 2020, max_workers: int = 5,
                        f"成功:{stats['success']} 失败:{stats['failed']} "
                        f"新下载:{stats['new_download']} 更新:{stats['updated']} 已最新:{stats['already_latest']}")
 
-    # 下载计数器（用于AkShare限流）
-    download_count = [0]
-
     def download_one(row):
         stock_code = str(row['code'])
         try:
-            file_path = os.path.join(downloader.daily_dir, f"{stock_code}.csv")
+            file_path = (find_stock_file(downloader.daily_dir, stock_code)
+                         or stock_file_path(downloader.daily_dir, stock_code, downloader.storage_format))
 
-            # 检查本地数据是否已经包含今天的数据 (force模式跳过此检查)
+            # 检查本地数据是否已经包含最近一个已收盘交易日的数据 (force模式跳过此检查)
             if not force and os.path.exists(file_path):
                 earliest, latest = get_data_date_range(file_path)
                 if earliest and latest:
-                    # 只有当数据已经包含今天(end_date)才跳过
-                    if latest >= end_date:
+                    # 周末、节假日和收盘前不再请求已有上一交易日数据的股票
+                    if latest >= target_date:
                         stats['already_latest'] += 1
+                        journal.record_success(stock_code)
                         show_progress()
                         return True
 
-            # AkShare限流 - 每10只休息1秒
-            if data_source == 'akshare' and max_workers <= 1:
-                import time
-                download_count[0] += 1
-                if download_count[0] % 10 == 0:
-                    time.sleep(1)
-                    logger.debug(f"AkShare限流: 已下载 {download_count[0]} 只，休息1秒")
-
             # 记录下载前的状态
             had_data_before = os.path.exists(file_path)
             old_latest = None
@@ -267,41 +270,51 @@ def download_all_incremental(start_year: int = 2020, max_workers: int = 5,
                 else:
                     stats['new_download'] += 1
 
+                journal.record_success(stock_code)
                 show_progress()
                 return True
             else:
                 stats['failed'] += 1
+                journal.record_failure(stock_code, downloader._errors.pop(stock_code, 'NoData'))
                 show_progress()
                 return False
 
         except Exception as e:
             logger.error(f"下载 {stock_code} 异常: {e}")
             stats['failed'] += 1
+            journal.record_failure(stock_code, e)
             show_progress()
             return False
 
-    # 下载模式选择
-    if data_source == 'akshare' or max_workers == 1:
-        # 单线程顺序下载（适合AkShare限流）
-        logger.info("使用单线程顺序下载模式...")
-        for idx, row in stock_list.iterrows():
-            download_one(row)
-            if (idx + 1) % 500 == 0:
-                logger.info(f"已处理 {idx+1}/{total} 只股票，短暂休息...")
-                import time
-                time.sleep(2)  # 每500只休息2秒
-    else:
-        # 多线程并发下载（Tushare/BaoStock）
-        logger.info(f"使用多线程并发下载（并发数: {max_workers}）...")
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(download_one, row): row['code']
-                      for _, row in stock_list.iterrows()}
-
-            for future in as_completed(futures):
-                try:
-                    future.result(timeout=60)
-                except Exception as e:
-                    logger.error(f"任务异常: {e}")
+    # 下载模式选择（请求间隔由下载器的自适应限速器控制，被限流时自动降速）
+    try:
+        if data_source == 'akshare' or max_workers == 1:
+            # 单线程顺序下载（适合AkShare限流）
+            logger.info("使用单线程顺序下载模式...")
+            for _, row in stock_list.iterrows():
+                download_one(row)
+        else:
+            # 多线程并发下载（Tushare/BaoStock），中断时取消尚未开始的任务
+            logger.info(f"使用多线程并发下载（并发数: {max_workers}）...")
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            try:
+                futures = {executor.submit(download_one, row): row['code']
+                          for _, row in stock_list.iterrows()}
+
+                for future in as_completed(futures):
+                    try:
+                        future.result(timeout=60)
+                    except Exception as e:
+                        logger.error(f"任务异常: {e}")
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        # 中断时保存进度，再次运行从中断处继续
+        journal.checkpoint()
+        logger.info(f"任务日志: {journal.summary()}")
+
+    downloader.manifest.save()
+    downloader.save_rate_limits()
 
     # 最终统计
     logger.info("=" * 60)
@@ -333,6 +346,12 @@ def main():
                        help='Tushare Pro Token (也可设置环境变量TUSHARE_TOKEN)')
     parser.add_argument('--force', action='store_true',
                        help='强制模式: 跳过本地数据检查，尝试下载所有股票')
+    parser.add_argument('--date-major', action='store_true',
+                       help='Tushare 数据源按交易日同步全市场截面 (默认按配置 date_major_sync)')
+    parser.add_argument('--no-date-major', action='store_true',
+                       help='Tushare 数据源不按交易日同步，逐只下载')
+    parser.add_argument('--retry-failed', action='store_true',
+                       help='只重新尝试上次失败的股票（失败记录见任务日志）')
 
     args = parser.parse_args()
 
@@ -346,7 +365,9 @@ def main():
         max_workers=args.workers,
         data_source=args.source,
         tushare_token=args.token,
-        force=args.force
+        force=args.force,
+        date_major=False if args.no_date_major else (True if args.date_major else None),
+        retry_failed=args.retry_failed
     )
 
     return 0 if stats['failed'] < stats['success'] else 1
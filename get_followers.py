@@ -4,14 +4,14 @@
 
 import sys
 import os
-import requests
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.utils import Config, setup_logger
+from src.http_transport import get_transport
 
 
-def get_access_token(appid, secret):
+def get_access_token(appid, secret, transport=None):
     """获取AccessToken"""
     try:
         url = "https://api.weixin.qq.com/cgi-bin/token"
@@ -21,7 +21,7 @@ def get_access_token(appid, secret):
             'secret': secret
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        response = (transport or get_transport()).get(url, params=params, timeout=10)
         result = response.json()
         
         if 'access_token' in result:
@@ -35,7 +35,7 @@ def get_access_token(appid, secret):
         return None
 
 
-def get_user_list(access_token, next_openid=''):
+def get_user_list(access_token, next_openid='', transport=None):
     """获取用户列表"""
     try:
         url = f"https://api.weixin.qq.com/cgi-bin/user/get"
@@ -44,7 +44,7 @@ def get_user_list(access_token, next_openid=''):
             'next_openid': next_openid
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        response = (transport or get_transport()).get(url, params=params, timeout=10)
         result = response.json()
         
         if result.get('errcode') == 0 or 'data' in result:
@@ -58,7 +58,7 @@ def get_user_list(access_token, next_openid=''):
         return None
 
 
-def get_user_info(access_token, openid):
+def get_user_info(access_token, openid, transport=None):
     """获取用户信息"""
     try:
         url = f"https://api.weixin.qq.com/cgi-bin/user/info"
@@ -68,7 +68,7 @@ def get_user_info(access_token, openid):
             'lang': 'zh_CN'
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        response = (transport or get_transport()).get(url, params=params, timeout=10)
         result = response.json()
         
         if 'nickname' in result:
@@ -87,6 +87,8 @@ def main():
     
     # 读取配置
     config = Config('config/config.ini')
+    # 所有请求复用同一个到微信接口的连接
+    transport = get_transport(config)
     appid = config.get('Notification', 'wechat_appid', fallback='')
     secret = config.get('Notification', 'wechat_secret', fallback='')
     
@@ -101,7 +103,7 @@ def main():
     print("正在获取AccessToken...")
     
     # 获取AccessToken
-    access_token = get_access_token(appid, secret)
+    access_token = get_access_token(appid, secret, transport)
     if not access_token:
         print("\n[失败] 无法获取AccessToken，请检查AppID和Secret是否正确")
         return
@@ -115,7 +117,7 @@ def main():
     next_openid = ''
     
     while True:
-        result = get_user_list(access_token, next_openid)
+        result = get_user_list(access_token, next_openid, transport)
         
         if not result:
             break
@@ -146,7 +148,7 @@ def main():
     
     # 显示用户信息
     for i, openid in enumerate(all_users, 1):
-        user_info = get_user_info(access_token, openid)
+        user_info = get_user_info(access_token, openid, transport)
         
         if user_info:
             nickname = user_info.get('nickname', '未知')
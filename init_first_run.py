@@ -113,7 +113,7 @@ def main():
         
     except KeyboardInterrupt:
         print("\n\n下载被用户中断")
-        print("已下载的数据已保存，可稍后继续")
+        print("已下载的数据和下载进度已保存，再次运行将从中断处继续")
         return 130
     except Exception as e:
         print(f"\n错误: {e}")
@@ -0,0 +1,55 @@
+"""
+日线数据存储格式迁移
+将 data/daily 下已有数据一次性转换为目标格式（csv / parquet）
+
+用法:
+  python migrate_data_store.py --to parquet
+  python migrate_data_store.py --to csv --keep-source
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.utils import setup_logger, Config
+from src.data_store import migrate_daily_dir, STORAGE_FORMATS, PARQUET_AVAILABLE
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='迁移日线数据存储格式')
+    parser.add_argument('--to', type=str, required=True,
+                        choices=sorted(STORAGE_FORMATS.keys()),
+                        help='目标存储格式')
+    parser.add_argument('--config', type=str, default='config/config.ini',
+                        help='配置文件路径 (默认: config/config.ini)')
+    parser.add_argument('--data-dir', type=str, default=None,
+                        help='日线数据目录 (默认读取配置 [Paths] daily_dir)')
+    parser.add_argument('--keep-source', action='store_true',
+                        help='保留原格式文件')
+
+    args = parser.parse_args()
+    logger = setup_logger('MigrateDataStore')
+
+    if args.to == 'parquet' and not PARQUET_AVAILABLE:
+        logger.error("Parquet 存储需要 pyarrow，请安装: pip install pyarrow")
+        return 1
+
+    daily_dir = args.data_dir or Config(args.config).get(
+        'Paths', 'daily_dir', fallback='./data/daily')
+    if not os.path.isdir(daily_dir):
+        logger.error(f"数据目录不存在: {daily_dir}")
+        return 1
+
+    converted, failed = migrate_daily_dir(
+        daily_dir, args.to, remove_source=not args.keep_source, logger=logger)
+
+    if converted and args.to != 'csv':
+        logger.info(f"请在配置文件 [Paths] 中设置 storage_format = {args.to}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+BaoStock 多进程下载模块
+baostock 在每个进程中只有一个全局会话，同一进程内的多线程只能排队使用。
+这里启动多个工作进程，每个进程各自 bs.login() 并独立发起请求，
+结果回到主进程（由主进程的写入队列落盘），并行度随进程数增加，直到服务器的限制
+"""
+
+import os
+import sys
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, List, Tuple, Dict, Callable
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# 每个进程的会话最长使用时间（秒），超过后重新登录
+SESSION_TIMEOUT = 300
+# 每个进程排队的任务数（提交过多会让 should_stop 反应变慢）
+TASKS_PER_WORKER = 2
+
+_session = {'logged_in': False, 'login_time': 0.0}
+
+
+def _login() -> bool:
+    import baostock as bs
+    lg = bs.login()
+    _session['logged_in'] = lg.error_code == '0'
+    _session['login_time'] = time.time()
+    return _session['logged_in']
+
+
+def init_worker():
+    """工作进程初始化：登录本进程的 baostock 会话，进程退出时登出"""
+    import atexit
+    import baostock as bs
+    _login()
+    atexit.register(bs.logout)
+
+
+def fetch_history(stock_code: str, start_date: str, end_date: str):
+    """
+    在工作进程中获取单只股票的前复权日线，会话失效时重新登录重试一次
+
+    Returns:
+        (股票代码, DataFrame 或 None, 错误类型 或 None)
+    """
+    from src.data_source_baostock_threadsafe import query_history
+    try:
+        if not _session['logged_in'] or time.time() - _session['login_time'] > SESSION_TIMEOUT:
+            if not _login():
+                return stock_code, None, 'LoginError'
+        df, error = query_history(stock_code, start_date, end_date)
+        if error is not None and _login():
+            df, error = query_history(stock_code, start_date, end_date)
+        return stock_code, df, ('QueryError' if error is not None else None)
+    except Exception as e:
+        return stock_code, None, type(e).__name__
+
+
+class BaoStockProcessPool:
+    """多进程 BaoStock 下载（每个进程一个会话）"""
+
+    def __init__(self, processes: int = 4, initializer: Callable = init_worker,
+                 worker: Callable = fetch_history, logger: logging.Logger = None,
+                 on_error: Callable[[str, str], None] = None):
+        """
+        Args:
+            processes: 工作进程数
+            initializer: 工作进程初始化函数（默认登录 baostock）
+            worker: 工作进程中执行的函数 worker(股票代码, 开始日期, 结束日期)
+                    -> (股票代码, DataFrame 或 None, 错误类型 或 None)
+            logger: 日志记录器
+            on_error: 获取失败时在 on_result 之前回调 (股票代码, 错误类型)
+        """
+        self.processes = max(int(processes), 1)
+        self.initializer = initializer
+        self.worker = worker
+        self.logger = logger or logging.getLogger('BaoStockPool')
+        self.on_error = on_error
+
+    def fetch_histories(self, tasks: List[Tuple[str, str, str]],
+                        on_result: Callable[[str, Optional[pd.DataFrame]], None],
+                        should_stop: Callable[[], bool] = None) -> Dict[str, None]:
+        """
+        多进程批量获取多只股票的历史数据（接口与 TencentDataSource.fetch_histories 一致）
+
+        Args:
+            tasks: [(股票代码, 开始日期, 结束日期), ...]，日期格式 YYYY-MM-DD
+            on_result: 每只股票完成时在主进程中回调 (股票代码, DataFrame 或 None)；
+                       工作进程崩溃、结果无法序列化等异常也以 None 回调，原因先经 on_error 回调
+            should_stop: 提交每只股票前调用，返回 True 时不再提交新的股票
+
+        Returns:
+            {已完成的股票代码: None}
+        """
+        finished: Dict[str, None] = {}
+        if not tasks:
+            return finished
+        processes = min(self.processes, len(tasks))
+        # 使用 spawn：主进程中有写入线程和日志锁，fork 出的子进程可能继承被占用的锁
+        context = multiprocessing.get_context('spawn')
+        queue = list(reversed(tasks))
+        pending: Dict = {}
+        start = time.monotonic()
+
+        def report(stock_code: str, df: Optional[pd.DataFrame], error: Optional[str]):
+            if error is not None and self.on_error is not None:
+                self.on_error(stock_code, error)
+            on_result(stock_code, df)
+            finished[stock_code] = None
+
+        executor = ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                       initializer=self.initializer)
+        try:
+            while queue or pending:
+                while queue and len(pending) < processes * TASKS_PER_WORKER:
+                    if should_stop is not None and should_stop():
+                        queue.clear()
+                        break
+                    task = queue.pop()
+                    try:
+                        pending[executor.submit(self.worker, *task)] = task[0]
+                    except BrokenProcessPool as e:
+                        # 进程池已不可用：尚未提交的股票全部记为失败
+                        self.logger.error(f"BaoStock 进程池不可用，{len(queue) + 1} 只股票未下载: {e}")
+                        for stock_code in [task[0]] + [t[0] for t in reversed(queue)]:
+                            report(stock_code, None, type(e).__name__)
+                        queue.clear()
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stock_code = pending.pop(future)
+                    try:
+                        stock_code, df, error = future.result()
+                    except Exception as e:
+                        # 工作进程崩溃 (BrokenProcessPool)、参数或结果无法序列化等
+                        self.logger.error(f"BaoStock 工作进程获取 {stock_code} 失败: {e!r}")
+                        df, error = None, type(e).__name__
+                    report(stock_code, df, error)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        elapsed = time.monotonic() - start
+        self.logger.info(f"BaoStock {processes} 进程下载 {len(finished)} 只股票，"
+                         f"耗时 {elapsed:.1f} 秒（{len(finished) / max(elapsed, 1e-6):.1f} 只/秒）")
+        return finished
@@ -12,7 +12,7 @@ from typing import Optional, Tuple, Dict
 # 添加父目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.utils import setup_logger, safe_read_csv
+from src.utils import setup_logger, load_stock_data
 
 
 class DataAnalyzer:
@@ -234,23 +234,40 @@ class DataAnalyzer:
             (是否符合条件, 详细信息字典)
         """
         try:
-            # 读取数据
-            df = safe_read_csv(file_path)
-            if df is None or df.empty:
-                return False, None
-            
-            # 分析数据
-            df = self.analyze_stock(df, ma_period=ma_period)
-            if df is None:
-                return False, None
-            
-            # 检查条件
-            return self.check_filter_conditions(df, volume_ratio_threshold, ma_period)
+            # 只读取计算 MA 与前一日量比所需的最近数据
+            window = (ma_period or self.ma_period) + 1
+            df = load_stock_data(file_path, last_n_rows=window)
+            return self.analyze_from_frame(df, volume_ratio_threshold, ma_period)
             
         except Exception as e:
             self.logger.error(f"从文件分析失败 {file_path}: {e}")
             return False, None
     
+    def analyze_from_frame(self, df: pd.DataFrame,
+                           volume_ratio_threshold: float = 5.0,
+                           ma_period: int = None) -> Tuple[bool, Optional[Dict]]:
+        """
+        分析已加载的日线数据（来自日线文件或行情面板）
+        
+        Args:
+            df: 股票数据DataFrame
+            volume_ratio_threshold: 成交量倍数阈值
+            ma_period: MA周期
+        
+        Returns:
+            (是否符合条件, 详细信息字典)
+        """
+        if df is None or df.empty:
+            return False, None
+        
+        # 分析数据
+        df = self.analyze_stock(df, ma_period=ma_period)
+        if df is None:
+            return False, None
+        
+        # 检查条件
+        return self.check_filter_conditions(df, volume_ratio_threshold, ma_period)
+    
     def get_stock_summary(self, df: pd.DataFrame) -> Optional[Dict]:
         """
         获取股票数据摘要
@@ -6,15 +6,35 @@
 import pandas as pd
 import time
 import os
+import threading
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict
 import sys
 
 # 添加父目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.utils import setup_logger, Config, safe_read_csv, safe_write_csv, ensure_dir
+from src.utils import (
+    setup_logger, Config, safe_read_csv, safe_write_csv, ensure_dir,
+    is_trading_day, get_last_trading_day,
+)
+from src.data_store import (
+    get_storage_format, stock_file_path, find_stock_file, list_stock_files,
+    read_last_date, read_stock_data, append_stock_data, BatchWriteLog,
+)
+from src.market_panel import build_panel, get_panel_dir
+from src.data_manifest import DataManifest
+from src.tiered_store import ColdStore, compact_daily_dir, get_hot_years
+from src.write_queue import WriteBehindQueue
+from src.rate_limiter import AdaptiveRateLimiter, backoff_delay
+from src.download_planner import DownloadPlanner
+from src.download_journal import DownloadJournal
+from src.source_router import SourceRouter
+from src.baostock_pool import BaoStockProcessPool
+from src.http_transport import get_transport
+from src.http_replay import RecordingTransport, ResponseStore
+from src.download_meter import DownloadMeter, frame_bytes
 
 # 根据配置动态导入数据源
 try:
@@ -30,7 +50,7 @@ except ImportError:
     BAOSTOCK_AVAILABLE = False
 
 try:
-    from src.data_source_tushare import TushareDataSource
+    from src.data_source_tushare import TushareDataSource, PRICE_COLUMNS as TUSHARE_PRICE_COLUMNS
     TUSHARE_AVAILABLE = True
 except ImportError:
     TUSHARE_AVAILABLE = False
@@ -41,6 +61,19 @@ try:
 except ImportError:
     TENCENT_AVAILABLE = False
 
+# 按交易日同步时每累积多少个交易日的截面分发写入一次
+DATE_MAJOR_FLUSH_DAYS = 20
+
+# 各数据源的初始速率和速率范围（每秒请求数），腾讯的初始速率和上限读取配置
+RATE_LIMIT_DEFAULTS = {
+    'akshare': {'rate': 2.0, 'min_rate': 0.2, 'max_rate': 8.0},
+    'tushare': {'rate': 20.0, 'min_rate': 0.5, 'max_rate': 20.0},
+}
+DATA_SOURCES = ('tencent', 'akshare', 'baostock', 'tushare')
+
+# 核对前复权基准时重叠K线收盘价允许的相对误差（超过视为复权基准变化）
+ADJUSTMENT_TOLERANCE = 1e-4
+
 
 class DataDownloader:
     """数据下载器"""
@@ -59,20 +92,68 @@ class DataDownloader:
         self.data_dir = self.config.get('Paths', 'data_dir', fallback='./data')
         self.daily_dir = self.config.get('Paths', 'daily_dir', fallback='./data/daily')
         self.stocks_dir = self.config.get('Paths', 'stocks_dir', fallback='./data/stocks')
+        self.storage_format = get_storage_format(self.config)
         self.max_workers = self.config.getint('Download', 'max_workers', fallback=10)
         self.retry_times = self.config.getint('Download', 'retry_times', fallback=3)
         self.retry_delay = self.config.getint('Download', 'retry_delay', fallback=5)
         self.min_history_days = self.config.getint('Analysis', 'min_history_days', fallback=150)
         self.daily_download_limit_mb = self.config.getint('Download', 'daily_download_limit_mb', fallback=100)
+        self.panel_dir = get_panel_dir(self.config)
+        self.build_panel = self.config.getboolean('Download', 'build_panel', fallback=False)
+        self.hot_years = get_hot_years(self.config)
+        self.auto_compact = self.config.getboolean('Download', 'auto_compact', fallback=False)
+        self.write_queue_size = self.config.getint('Download', 'write_queue_size', fallback=64)
+        self.async_fetch = self.config.getboolean('Download', 'async_fetch', fallback=False)
+        self.request_rate = self.config.getfloat('Download', 'request_rate', fallback=3.0)
+        self.max_in_flight = self.config.getint('Download', 'max_in_flight', fallback=8)
+        self.request_timeout = self.config.getfloat('Download', 'request_timeout', fallback=30)
+        self.snapshot_update = self.config.getboolean('Download', 'snapshot_update', fallback=False)
+        self.snapshot_batch_size = self.config.getint('Download', 'snapshot_batch_size', fallback=300)
+        self.date_major_sync = self.config.getboolean('Download', 'date_major_sync', fallback=False)
+        self.check_adjustment = self.config.getboolean('Download', 'check_adjustment', fallback=False)
+        self.baostock_processes = self.config.getint('Download', 'baostock_processes', fallback=1)
+        # 未配置时不超过初始速率（只减速，不自动加速）
+        self.max_request_rate = self.config.getfloat('Download', 'max_request_rate',
+                                                     fallback=self.request_rate)
+        # 共享的 HTTP 连接池（按主机保持长连接）
+        self.transport = get_transport(self.config)
+        # 录制模式：腾讯数据源的原始响应保存到 record_dir，供本地模拟服务器回放
+        record_dir = self.config.get('Network', 'record_dir', fallback='')
+        if record_dir:
+            self.transport = RecordingTransport(self.transport, ResponseStore(record_dir, 'tencent'),
+                                                self.logger)
+            self.logger.info(f"录制模式: 腾讯数据源的响应保存到 {record_dir}")
+        if self.transport.pool_size < self.max_in_flight:
+            self.logger.warning(f"[Network] pool_size={self.transport.pool_size} 小于 max_in_flight="
+                                f"{self.max_in_flight}，超出的请求不能复用连接")
+        # 各数据源学到的安全速率，下次运行从该速率开始
+        self.rate_state_file = os.path.join(self.data_dir, 'rate_limits.json')
+        # 最近一次获取的 AkShare 全市场行情 (获取时间, DataFrame)
+        self._spot_board = None
+        # 批量下载期间的后台写入队列（None 时同步写入）
+        self._write_queue: Optional[WriteBehindQueue] = None
+        # 后台写入每批的回滚记录：批次未确认就中断时，下次批量下载前撤销其中的原地追加
+        self.write_log = BatchWriteLog(os.path.join(self.daily_dir, '_write_batch.json'), self.logger)
+        # 最近一次下载失败的原因（股票代码 -> 错误类型），供任务日志登记
+        self._errors: Dict[str, str] = {}
+        # 最近一次下载结果来自的数据源（股票代码 -> 数据源，无数据时为 None），供复权基准核对
+        self._sources: Dict[str, Optional[str]] = {}
         
-        # 下载统计
-        self.downloaded_bytes = 0
+        # 下载统计：按数据源计量当日的请求数、字节数、行数和耗时，重新运行时从当日累计继续
+        self.meter = DownloadMeter(os.path.join(self.data_dir, 'download_meter.json'), self.logger)
         self.download_limit_bytes = self.daily_download_limit_mb * 1024 * 1024
         
         # 确保目录存在
         ensure_dir(self.daily_dir)
         ensure_dir(self.stocks_dir)
         
+        # 数据目录清单（每次写入后更新）
+        self.manifest = DataManifest.get(self.daily_dir)
+        # 交易日历缓存（随股票列表更新），批量下载前据此和清单生成下载计划
+        self.trade_calendar_file = os.path.join(self.stocks_dir, 'trade_calendar.csv')
+        self.planner = DownloadPlanner(self.daily_dir, self.manifest,
+                                       self._load_trade_calendar(), self.logger)
+        
         # 初始化数据源
         self.data_source = self.config.get('DataSource', 'source', fallback='akshare').lower()
         self.baostock_source = None
@@ -87,7 +168,8 @@ class DataDownloader:
             else:
                 try:
                     tushare_token = self.config.get('DataSource', 'tushare_token', fallback=None)
-                    self.tushare_source = TushareDataSource(token=tushare_token)
+                    self.tushare_source = TushareDataSource(
+                        token=tushare_token, limiter=self._rate_limiter('tushare'))
                     self.logger.info("使用Tushare Pro数据源")
                 except Exception as e:
                     self.logger.error(f"Tushare初始化失败: {e}")
@@ -121,7 +203,8 @@ class DataDownloader:
                     self.data_source = 'tushare'
                     try:
                         tushare_token = self.config.get('DataSource', 'tushare_token', fallback=None)
-                        self.tushare_source = TushareDataSource(token=tushare_token)
+                        self.tushare_source = TushareDataSource(
+                        token=tushare_token, limiter=self._rate_limiter('tushare'))
                     except Exception as e:
                         self.logger.error(f"Tushare初始化失败: {e}")
             else:
@@ -133,10 +216,91 @@ class DataDownloader:
                 self.logger.info("自动切换到AkShare")
                 self.data_source = 'akshare'
             else:
-                self.tencent_source = TencentDataSource()
+                self.tencent_source = self._create_tencent_source()
                 self.logger.info("使用腾讯财经数据源")
 
-        self.logger.info(f"数据下载器初始化完成（数据源: {self.data_source}, 每日下载限制: {self.daily_download_limit_mb}MB）")
+        # 备用数据源：主数据源出错或无数据时按股票改用（首次使用时初始化）
+        fallbacks = [s.strip().lower() for s in
+                     self.config.get('DataSource', 'fallback_sources', fallback='').split(',') if s.strip()]
+        for source in fallbacks:
+            if source not in DATA_SOURCES:
+                self.logger.warning(f"未知的备用数据源: {source}")
+        self._source_lock = threading.Lock()
+        self._unavailable_sources = set()
+        self.router = SourceRouter(
+            [s for s in fallbacks if s in DATA_SOURCES],
+            hedge=self.config.getboolean('DataSource', 'hedge_requests', fallback=False),
+            hedge_percentile=self.config.getfloat('DataSource', 'hedge_percentile', fallback=95),
+            hedge_workers=self.max_workers * 2, logger=self.logger)
+
+        self.logger.info(f"数据下载器初始化完成（数据源: {self.data_source}, 存储格式: {self.storage_format}, "
+                         f"每日下载限制: {self.daily_download_limit_mb}MB）")
+    
+    def _create_tencent_source(self) -> 'TencentDataSource':
+        """按配置创建腾讯数据源（接口地址可指向本地模拟服务器）"""
+        return TencentDataSource(
+            request_rate=self.request_rate, max_in_flight=self.max_in_flight,
+            timeout=self.request_timeout, retry_times=self.retry_times,
+            retry_delay=self.retry_delay, limiter=self._rate_limiter('tencent'),
+            trade_dates=self.planner.trade_dates, transport=self.transport, meter=self.meter,
+            kline_url=self.config.get('DataSource', 'tencent_kline_url', fallback='') or None,
+            quote_url=self.config.get('DataSource', 'tencent_quote_url', fallback='') or None)
+    
+    def _ensure_source(self, source: str) -> bool:
+        """确保数据源可用（备用数据源首次使用时初始化），不可用时返回 False"""
+        if source == 'akshare':
+            return AKSHARE_AVAILABLE
+        attr = f'{source}_source'
+        if getattr(self, attr, None) is not None:
+            return True
+        with self._source_lock:
+            if getattr(self, attr, None) is not None:
+                return True
+            if source in self._unavailable_sources:
+                return False
+            try:
+                if source == 'tencent' and TENCENT_AVAILABLE:
+                    self.tencent_source = self._create_tencent_source()
+                elif source == 'baostock' and BAOSTOCK_AVAILABLE:
+                    self.baostock_source = BaoStockDataSource()
+                elif source == 'tushare' and TUSHARE_AVAILABLE:
+                    self.tushare_source = TushareDataSource(
+                        token=self.config.get('DataSource', 'tushare_token', fallback=None),
+                        limiter=self._rate_limiter('tushare'))
+            except Exception as e:
+                self.logger.error(f"备用数据源 {source} 初始化失败: {e}")
+            if getattr(self, attr, None) is None:
+                self.logger.warning(f"备用数据源 {source} 不可用")
+                self._unavailable_sources.add(source)
+                return False
+            self.logger.info(f"已启用备用数据源 {source}")
+            return True
+    
+    def _rate_limiter(self, source: str) -> AdaptiveRateLimiter:
+        """获取数据源共享的自适应限速器（学到的速率保存在数据目录）"""
+        if source == 'tencent':
+            params = {'rate': self.request_rate, 'max_rate': self.max_request_rate,
+                      'max_concurrency': self.max_in_flight}
+        else:
+            params = dict(RATE_LIMIT_DEFAULTS[source], max_concurrency=self.max_workers)
+        return AdaptiveRateLimiter.get(source, self.rate_state_file, logger=self.logger, **params)
+    
+    def save_rate_limits(self):
+        """保存当前数据源学到的速率并输出限速统计"""
+        if self.data_source not in ('tencent', 'akshare', 'tushare'):
+            return
+        limiter = self._rate_limiter(self.data_source)
+        stats = limiter.stats()
+        latency = f"{stats['latency_ms']:.0f}ms" if stats['latency_ms'] is not None else '-'
+        self.logger.info(f"限速统计 [{self.data_source}]: {stats['rate']:g} 次/秒，并发 {stats['concurrency']}，"
+                         f"平均延迟 {latency}，成功 {stats['ok']}，空数据 {stats['empty']}，"
+                         f"限流 {stats['throttled']}，其他失败 {stats['error']}")
+        limiter.save()
+        if self.router.fallbacks:
+            for source, info in self.router.stats().items():
+                self.logger.info(f"数据源统计 [{source}]: 成功 {info['served']}，"
+                                 f"P50 {info['p50_ms']}ms，P95 {info['p95_ms']}ms"
+                                 f"{'，熔断中' if info['open'] else ''}")
     
     def download_stock_list(self, force_update: bool = False) -> Optional[pd.DataFrame]:
         """
@@ -174,8 +338,9 @@ class DataDownloader:
                 stock_list = self.baostock_source.get_stock_list()
 
             elif self.data_source == 'akshare':
-                # 使用AkShare
+                # 使用AkShare（行情保留给当日行情快照复用）
                 stock_list = ak.stock_zh_a_spot_em()
+                self._spot_board = (datetime.now(), stock_list)
 
                 if stock_list is not None and not stock_list.empty:
                     # 选择需要的列并重命名
@@ -223,6 +388,8 @@ class DataDownloader:
                 self.logger.error("股票列表保存失败")
                 return None
             
+            self._update_trade_calendar()
+            
             return stock_list
             
         except Exception as e:
@@ -234,6 +401,37 @@ class DataDownloader:
                 return safe_read_csv(stock_list_file, dtype={'code': str})
             return None
     
+    def _load_trade_calendar(self) -> Optional[List[pd.Timestamp]]:
+        """读取本地缓存的交易日历（不存在时返回 None，按工作日近似）"""
+        if not os.path.exists(self.trade_calendar_file):
+            return None
+        df = safe_read_csv(self.trade_calendar_file, dtype={'date': str})
+        if df is None or df.empty or 'date' not in df.columns:
+            return None
+        dates = pd.to_datetime(df['date'], errors='coerce').dropna()
+        return list(dates) if not dates.empty else None
+    
+    def _update_trade_calendar(self):
+        """从数据源更新交易日历缓存（Tushare / AkShare，其他数据源不更新）"""
+        dates = None
+        try:
+            if self.data_source == 'tushare' and self.tushare_source:
+                end = (datetime.now() + timedelta(days=366)).strftime('%Y%m%d')
+                dates = pd.to_datetime(self.tushare_source.get_trade_dates('20200101', end), format='%Y%m%d')
+            elif self.data_source == 'akshare' and AKSHARE_AVAILABLE:
+                dates = pd.to_datetime(ak.tool_trade_date_hist_sina()['trade_date'])
+        except Exception as e:
+            self.logger.warning(f"更新交易日历失败: {e}")
+            return
+        if dates is None or len(dates) == 0:
+            return
+        calendar = pd.DataFrame({'date': pd.DatetimeIndex(dates).strftime('%Y-%m-%d')})
+        if safe_write_csv(calendar, self.trade_calendar_file):
+            self.planner = DownloadPlanner(self.daily_dir, self.manifest, list(pd.DatetimeIndex(dates)),
+                                           self.logger)
+            if self.tencent_source is not None:
+                self.tencent_source.trade_dates = self.planner.trade_dates
+    
     def _get_market(self, code: str) -> str:
         """
         根据股票代码判断市场
@@ -255,9 +453,10 @@ class DataDownloader:
     
     def download_stock_history(self, stock_code: str, period: str = "daily",
                                start_date: str = None, end_date: str = None,
-                               adjust: str = "qfq") -> Optional[pd.DataFrame]:
+                               adjust: str = "qfq", exclude_sources=()) -> Optional[pd.DataFrame]:
         """
         下载单只股票的历史数据
+        （配置了备用数据源时，主数据源出错或无数据时改用备用数据源，结果转换为主数据源的格式）
         
         Args:
             stock_code: 股票代码
@@ -265,132 +464,247 @@ class DataDownloader:
             start_date: 开始日期 (YYYYMMDD)
             end_date: 结束日期 (YYYYMMDD)
             adjust: 复权类型 (qfq=前复权, hfq=后复权, None=不复权)
+            exclude_sources: 本次不使用的数据源
         
         Returns:
-            历史数据DataFrame
+            历史数据DataFrame；区间内无数据时为空 DataFrame，获取失败时为 None
         """
         # 设置默认日期范围
         if end_date is None:
             end_date = datetime.now().strftime('%Y%m%d')
         if start_date is None:
             start_date = (datetime.now() - timedelta(days=self.min_history_days)).strftime('%Y%m%d')
-        
-        # 格式化日期
-        # Tushare和BaoStock使用 YYYY-MM-DD 格式
-        start_date_fmt_std = f"{start_date[:4]}-{start_date[4:6]}-{start_date[6:]}"
-        end_date_fmt_std = f"{end_date[:4]}-{end_date[4:6]}-{end_date[6:]}"
-        # AkShare使用 YYYYMMDD 格式
-        start_date_fmt_ak = start_date
-        end_date_fmt_ak = end_date
 
+        def fetch(source: str) -> Optional[pd.DataFrame]:
+            return self._fetch_from_source(source, stock_code, period, start_date, end_date, adjust)
+
+        self._errors.pop(stock_code, None)
+        self._sources.pop(stock_code, None)
         # 重试机制
         for attempt in range(self.retry_times):
             try:
-                df = None
-
-                if self.data_source == 'tushare' and self.tushare_source:
-                    # 使用Tushare Pro
-                    df = self.tushare_source.get_stock_history(
-                        stock_code=stock_code,
-                        start_date=start_date_fmt_std,
-                        end_date=end_date_fmt_std,
-                        adjust=adjust
-                    )
-
-                elif self.data_source == 'baostock' and self.baostock_source:
-                    # 使用BaoStock（线程安全版本会自动处理登录）
-                    df = self.baostock_source.get_stock_history(
-                        stock_code=stock_code,
-                        start_date=start_date_fmt_std,
-                        end_date=end_date_fmt_std
-                    )
-
-                elif self.data_source == 'akshare':
-                    # 使用AkShare下载数据 - 使用YYYYMMDD格式
-                    self.logger.debug(f"AkShare请求: {stock_code}, 日期: {start_date_fmt_ak} - {end_date_fmt_ak}")
-                    try:
-                        df = ak.stock_zh_a_hist(
-                            symbol=stock_code,
-                            period=period,
-                            start_date=start_date_fmt_ak,
-                            end_date=end_date_fmt_ak,
-                            adjust=adjust
-                        )
-                    except Exception as ak_err:
-                        self.logger.debug(f"AkShare异常 {stock_code}: {ak_err}")
-                        df = None
-
-                    if df is not None and not df.empty:
-                        # 标准化列名
-                        columns_map = {
-                            '日期': 'date',
-                            '开盘': 'open',
-                            '收盘': 'close',
-                            '最高': 'high',
-                            '最低': 'low',
-                            '成交量': 'volume',
-                            '成交额': 'amount',
-                            '振幅': 'amplitude',
-                            '涨跌幅': 'change_pct',
-                            '涨跌额': 'change',
-                            '换手率': 'turnover'
-                        }
-
-                        # 只保留存在的列
-                        available_columns = {k: v for k, v in columns_map.items() if k in df.columns}
-                        df = df[list(available_columns.keys())].copy()
-                        df.rename(columns=available_columns, inplace=True)
-
-                        # 转换日期格式
-                        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-                    else:
-                        self.logger.debug(f"AkShare返回空数据 {stock_code}: df={df is None}")
-
-                elif self.data_source == 'tencent' and self.tencent_source:
-                    # 使用腾讯财经数据源
-                    self.logger.debug(f"腾讯数据源请求: {stock_code}, 日期: {start_date_fmt_std} - {end_date_fmt_std}")
-                    df = self.tencent_source.get_stock_history(
-                        stock_code=stock_code,
-                        start_date=start_date_fmt_std,
-                        end_date=end_date_fmt_std
-                    )
-                    if df is None:
-                        self.logger.debug(f"腾讯数据源返回空数据 {stock_code}")
+                if self.router.fallbacks:
+                    df, source = self.router.fetch(fetch, self.data_source, exclude_sources)
+                else:
+                    df, source = fetch(self.data_source), self.data_source
+                self._sources[stock_code] = source
 
                 if df is None or df.empty:
                     if attempt == self.retry_times - 1:  # 只在最后一次重试时输出警告
                         self.logger.debug(f"股票 {stock_code} 数据为空 (已重试{self.retry_times}次)")
-                    return None
-                
-                # 统计下载数据量（在成功下载后）
-                if df is not None and not df.empty:
-                    # 估算CSV文件大小（每行约100字节）
-                    estimated_size = len(df) * 100
-                    self.downloaded_bytes += estimated_size
+                    # 空 DataFrame 表示请求成功但区间内无数据，None 表示获取失败
+                    return df
                 
+                self.meter.record(source, rows=len(df))
                 return df
                 
             except Exception as e:
                 self.logger.warning(f"下载股票 {stock_code} 数据失败 (尝试 {attempt + 1}/{self.retry_times}): {e}")
                 if attempt < self.retry_times - 1:
-                    time.sleep(self.retry_delay)
+                    time.sleep(backoff_delay(self.retry_delay, attempt))
                 else:
                     self.logger.error(f"股票 {stock_code} 下载失败，已达最大重试次数")
+                    self._errors[stock_code] = type(e).__name__
                     return None
     
+    def _fetch_from_source(self, source: str, stock_code: str, period: str,
+                           start_date: str, end_date: str, adjust: str) -> Optional[pd.DataFrame]:
+        """
+        从指定数据源请求单只股票的历史数据（一次请求，不重试）
+        
+        Args:
+            source: 数据源 (tencent/akshare/baostock/tushare)
+            stock_code: 股票代码
+            period: 周期 (daily/weekly/monthly)
+            start_date: 开始日期 (YYYYMMDD)
+            end_date: 结束日期 (YYYYMMDD)
+            adjust: 复权类型
+        
+        Returns:
+            历史数据DataFrame，数据源不可用或无数据时返回 None
+        """
+        if not self._ensure_source(source):
+            return None
+        started = time.monotonic()
+        # Tushare和BaoStock使用 YYYY-MM-DD 格式
+        start_date_fmt_std = f"{start_date[:4]}-{start_date[4:6]}-{start_date[6:]}"
+        end_date_fmt_std = f"{end_date[:4]}-{end_date[4:6]}-{end_date[6:]}"
+        # AkShare使用 YYYYMMDD 格式
+        start_date_fmt_ak = start_date
+        end_date_fmt_ak = end_date
+        df = None
+
+        if source == 'tushare':
+            # 使用Tushare Pro
+            df = self.tushare_source.get_stock_history(
+                stock_code=stock_code,
+                start_date=start_date_fmt_std,
+                end_date=end_date_fmt_std,
+                adjust=adjust
+            )
+
+        elif source == 'baostock':
+            # 使用BaoStock（线程安全版本会自动处理登录）
+            df = self.baostock_source.get_stock_history(
+                stock_code=stock_code,
+                start_date=start_date_fmt_std,
+                end_date=end_date_fmt_std
+            )
+
+        elif source == 'akshare':
+            # 使用AkShare下载数据 - 使用YYYYMMDD格式
+            self.logger.debug(f"AkShare请求: {stock_code}, 日期: {start_date_fmt_ak} - {end_date_fmt_ak}")
+            try:
+                # 东方财富接口被限流时常表现为连续返回空数据
+                with self._rate_limiter('akshare').request() as outcome:
+                    df = ak.stock_zh_a_hist(
+                        symbol=stock_code,
+                        period=period,
+                        start_date=start_date_fmt_ak,
+                        end_date=end_date_fmt_ak,
+                        adjust=adjust
+                    )
+                    if df is None or df.empty:
+                        outcome.empty()
+            except Exception as ak_err:
+                self.logger.debug(f"AkShare异常 {stock_code}: {ak_err}")
+                self._errors[stock_code] = type(ak_err).__name__
+                df = None
+
+            if df is not None and not df.empty:
+                # 标准化列名
+                columns_map = {
+                    '日期': 'date',
+                    '开盘': 'open',
+                    '收盘': 'close',
+                    '最高': 'high',
+                    '最低': 'low',
+                    '成交量': 'volume',
+                    '成交额': 'amount',
+                    '振幅': 'amplitude',
+                    '涨跌幅': 'change_pct',
+                    '涨跌额': 'change',
+                    '换手率': 'turnover'
+                }
+
+                # 只保留存在的列
+                available_columns = {k: v for k, v in columns_map.items() if k in df.columns}
+                df = df[list(available_columns.keys())].copy()
+                df.rename(columns=available_columns, inplace=True)
+
+                # 转换日期格式
+                df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+            else:
+                self.logger.debug(f"AkShare返回空数据 {stock_code}: df={df is None}")
+
+        elif source == 'tencent':
+            # 使用腾讯财经数据源
+            self.logger.debug(f"腾讯数据源请求: {stock_code}, 日期: {start_date_fmt_std} - {end_date_fmt_std}")
+            df = self.tencent_source.get_stock_history(
+                stock_code=stock_code,
+                start_date=start_date_fmt_std,
+                end_date=end_date_fmt_std
+            )
+            if df is None:
+                self.logger.debug(f"腾讯数据源返回空数据 {stock_code}")
+
+        if source != 'tencent':
+            # 腾讯数据源按响应登记传输字节数；其他数据源看不到原始响应，按返回的数据计量
+            self.meter.record(source, requests=1, nbytes=frame_bytes(df), latency=time.monotonic() - started)
+        return df
+    
     def save_stock_data(self, stock_code: str, df: pd.DataFrame) -> bool:
         """
-        保存股票数据到本地
+        保存股票数据到本地（批量下载期间交给后台写入队列）
         
         Args:
             stock_code: 股票代码
             df: 数据DataFrame
         
         Returns:
-            是否成功
+            是否成功（进入写入队列即返回 True，写入结果由写线程在落盘后登记）
         """
-        file_path = os.path.join(self.daily_dir, f"{stock_code}.csv")
-        return safe_write_csv(df, file_path)
+        if self._write_queue is not None:
+            return self._write_queue.submit(stock_code, self._save_stock_data, stock_code, df, True)
+        return self._save_stock_data(stock_code, df)
+    
+    def _save_stock_data(self, stock_code: str, df: pd.DataFrame, sync: bool = False) -> bool:
+        """写入股票数据文件（临时文件 + 替换，sync 时替换前 fsync）并登记数据清单"""
+        file_path = stock_file_path(self.daily_dir, stock_code, self.storage_format)
+        old_path = find_stock_file(self.daily_dir, stock_code)
+        if not safe_write_csv(df, file_path, sync=sync):
+            return False
+        self.manifest.record_write(file_path, df)
+        # 切换存储格式后删除旧格式文件，保证每只股票只有一份数据
+        if old_path and old_path != file_path and os.path.exists(old_path):
+            try:
+                os.remove(old_path)
+            except OSError as e:
+                self.logger.warning(f"删除旧格式文件失败 {old_path}: {e}")
+        return True
+    
+    def append_stock_data(self, stock_code: str, new_df: pd.DataFrame,
+                          last_date: pd.Timestamp = None) -> bool:
+        """
+        将新下载的数据并入本地文件（批量下载期间交给后台写入队列）
+        新数据全部晚于本地最新日期时直接追加到文件末尾；
+        补历史、日期重叠或需要转换存储格式时读取全部数据合并后重写
+        
+        Args:
+            stock_code: 股票代码
+            new_df: 新下载的数据
+            last_date: 本地最新日期（None 时从文件末尾读取）
+        
+        Returns:
+            是否成功（进入写入队列即返回 True，写入结果由写线程在落盘后登记）
+        """
+        if new_df is None or new_df.empty:
+            return True
+        if self._write_queue is not None:
+            return self._write_queue.submit(stock_code, self._append_stock_data,
+                                            stock_code, new_df, last_date, True)
+        return self._append_stock_data(stock_code, new_df, last_date)
+    
+    def _append_stock_data(self, stock_code: str, new_df: pd.DataFrame,
+                           last_date: pd.Timestamp = None, sync: bool = False) -> bool:
+        """并入新数据（追加或合并重写，sync 时返回前 fsync）并登记数据清单"""
+        new_df = new_df.copy()
+        new_df['date'] = pd.to_datetime(new_df['date'])
+        new_df = new_df.drop_duplicates(subset=['date'], keep='last').sort_values('date')
+        
+        file_path = find_stock_file(self.daily_dir, stock_code)
+        if file_path is None:
+            return self._save_stock_data(stock_code, new_df, sync)
+        
+        if last_date is None:
+            last_date = read_last_date(file_path)
+        
+        # 快速路径：只追加新行，磁盘写入量与新增条数成正比
+        same_format = file_path == stock_file_path(self.daily_dir, stock_code, self.storage_format)
+        if same_format and last_date is not None and new_df['date'].min() > last_date:
+            size_before = os.path.getsize(file_path)
+            if append_stock_data(new_df, file_path, sync=sync):
+                self.manifest.record_append(file_path, new_df, size_before)
+                return True
+        
+        # 回退：读取全部数据合并后重写
+        local_df = safe_read_csv(file_path)
+        if local_df is None or local_df.empty:
+            return self._save_stock_data(stock_code, new_df, sync)
+        local_df['date'] = pd.to_datetime(local_df['date'])
+        combined_df = pd.concat([local_df, new_df], ignore_index=True)
+        combined_df.drop_duplicates(subset=['date'], keep='last', inplace=True)
+        combined_df.sort_values('date', inplace=True)
+        return self._save_stock_data(stock_code, combined_df, sync)
+    
+    @property
+    def downloaded_bytes(self) -> int:
+        """今日已下载字节数（含今日之前运行的累计）"""
+        return self.meter.total_bytes
+    
+    @downloaded_bytes.setter
+    def downloaded_bytes(self, value: int):
+        self.meter.total_bytes = value
     
     def check_download_limit(self) -> bool:
         """
@@ -414,18 +728,26 @@ class DataDownloader:
         获取下载统计信息
         
         Returns:
-            统计信息字典
+            统计信息字典：当日下载量与限制、请求数、行数，本次下载的速率 (rows_per_sec / mb_per_sec)，
+            以及各数据源的明细 (sources: 请求数、字节数、行数、平均延迟)
         """
-        downloaded_mb = self.downloaded_bytes / 1024 / 1024
+        meter = self.meter.stats()
+        downloaded_bytes = meter['bytes']
+        downloaded_mb = downloaded_bytes / 1024 / 1024
         limit_mb = self.download_limit_bytes / 1024 / 1024
-        percentage = (self.downloaded_bytes / self.download_limit_bytes * 100) if self.download_limit_bytes > 0 else 0
+        percentage = (downloaded_bytes / self.download_limit_bytes * 100) if self.download_limit_bytes > 0 else 0
         
         return {
-            'downloaded_bytes': self.downloaded_bytes,
+            'downloaded_bytes': downloaded_bytes,
             'downloaded_mb': downloaded_mb,
             'limit_mb': limit_mb,
             'percentage': percentage,
-            'remaining_mb': limit_mb - downloaded_mb
+            'remaining_mb': limit_mb - downloaded_mb,
+            'requests': meter['requests'],
+            'rows': meter['rows'],
+            'rows_per_sec': meter['rows_per_sec'],
+            'mb_per_sec': meter['mb_per_sec'],
+            'sources': meter['sources'],
         }
     
     def update_stock_data(self, stock_code: str) -> bool:
@@ -435,54 +757,144 @@ class DataDownloader:
         Args:
             stock_code: 股票代码
         
+        Returns:
+            是否成功
+        """
+        latest_date, start_date = self._plan_update(stock_code)
+        if start_date is None:
+            self.logger.debug(f"股票 {stock_code} 数据已是最新")
+            return True
+        return self._fetch_planned(stock_code, latest_date, start_date, self.planner.target_date())
+    
+    def _fetch_planned(self, stock_code: str, latest_date: Optional[pd.Timestamp],
+                       start_date: str, target_date: pd.Timestamp) -> bool:
+        """
+        按计划下载单只股票并并入本地数据
+        
+        Args:
+            stock_code: 股票代码
+            latest_date: 本地最新日期（None 表示本地无数据）
+            start_date: 下载起始日期 YYYYMMDD
+            target_date: 计划的目标日期（登记无新数据的次数）
+        
         Returns:
             是否成功
         """
         # 检查下载限制
         if not self.check_download_limit():
             self.logger.info(f"下载限制已达到，跳过股票 {stock_code}")
+            self._errors[stock_code] = 'DownloadLimit'
             return False
         
-        file_path = os.path.join(self.daily_dir, f"{stock_code}.csv")
+        if latest_date is None:
+            self.logger.info(f"股票 {stock_code} 本地无数据，下载完整历史数据（从 {start_date} 开始）...")
+        end_date = datetime.now().strftime('%Y%m%d')
+        df = self.download_stock_history(stock_code, start_date=self._request_start(latest_date, start_date),
+                                         end_date=end_date)
+        if latest_date is not None:
+            df, rebased = self._trim_overlap(stock_code, df, latest_date,
+                                             self._sources.pop(stock_code, None))
+            # 只登记请求成功的结果，下载失败不算作无新数据
+            if df is not None and stock_code not in self._errors:
+                self.planner.record_result(stock_code, target_date, rebased or not df.empty)
+            if rebased:
+                return self.refresh_stock_history(stock_code)
+        return self._apply_update(stock_code, df, latest_date)
+    
+    def _request_start(self, latest_date: Optional[pd.Timestamp], start_date: str) -> str:
+        """
+        增量更新的请求起始日期：从本地最新日期开始，多取一根重叠的K线用于核对前复权基准
+        （check_adjustment = false 或本地无数据时为计划的起始日期）
+        """
+        if latest_date is None or not self.check_adjustment:
+            return start_date
+        return min(start_date, latest_date.strftime('%Y%m%d'))
+    
+    def _trim_overlap(self, stock_code: str, df: Optional[pd.DataFrame],
+                      latest_date: pd.Timestamp,
+                      source: Optional[str]) -> Tuple[Optional[pd.DataFrame], bool]:
+        """
+        去掉下载结果中不晚于本地最新日期的K线，并用重叠的那一根核对前复权基准：
+        除权除息后数据源按新基准重算全部历史价格，重叠K线的收盘价与本地的相对误差超过
+        ADJUSTMENT_TOLERANCE。只核对来自主数据源的K线：备用数据源的复权价格与本地数据
+        本来就可能有舍入或口径差异，不能据此判断
         
-        # 检查本地数据
-        local_df = safe_read_csv(file_path)
+        Args:
+            stock_code: 股票代码
+            df: 下载的数据
+            latest_date: 本地最新日期
+            source: 下载结果来自的数据源
         
-        if local_df is not None and not local_df.empty:
-            # 获取最新日期
-            latest_date = pd.to_datetime(local_df['date']).max()
-            start_date = (latest_date + timedelta(days=1)).strftime('%Y%m%d')
-            
-            # 检查是否需要更新
-            # 注意：start_date == 今天时需要继续尝试下载当天数据。
-            # 腾讯/AkShare 等数据源在收盘后即可返回当日 K 线，若用 >= 会跳过当天。
-            if start_date > datetime.now().strftime('%Y%m%d'):
-                self.logger.debug(f"股票 {stock_code} 数据已是最新")
-                return True
-            
-            # 下载增量数据
-            new_df = self.download_stock_history(stock_code, start_date=start_date)
-            
-            if new_df is not None and not new_df.empty:
-                # 合并数据
-                combined_df = pd.concat([local_df, new_df], ignore_index=True)
-                combined_df.drop_duplicates(subset=['date'], keep='last', inplace=True)
-                combined_df.sort_values('date', inplace=True)
-                
-                return self.save_stock_data(stock_code, combined_df)
-            else:
-                # 没有新数据或下载失败
-                return True
-        else:
+        Returns:
+            (晚于本地最新日期的数据, 复权基准是否变化)
+        """
+        if df is None or df.empty:
+            return df, False
+        dates = pd.to_datetime(df['date'])
+        overlap = df.loc[dates == latest_date, 'close']
+        rebased = False
+        if not overlap.empty and source == self.data_source:
+            last_close = self._last_close(stock_code)
+            rebased = (bool(last_close)
+                       and abs(float(overlap.iloc[-1]) / last_close - 1) > ADJUSTMENT_TOLERANCE)
+        return df[dates > latest_date], rebased
+    
+    def _plan_update(self, stock_code: str) -> Tuple[Optional[pd.Timestamp], Optional[str]]:
+        """
+        根据本地数据确定需要下载的起始日期
+        
+        Returns:
+            (本地最新日期, 下载起始日期 YYYYMMDD)；本地无数据时从2020年开始，
+            起始日期为 None 表示数据已是最新
+        """
+        file_path = find_stock_file(self.daily_dir, stock_code)
+        
+        # 检查本地数据（只读取文件末尾的最新日期）
+        latest_date = read_last_date(file_path) if file_path else None
+        if file_path and latest_date is None:
+            # 文件末尾无法解析（如乱序或损坏），读取全部数据确认
+            local_df = safe_read_csv(file_path)
+            if local_df is not None and not local_df.empty and 'date' in local_df.columns:
+                latest_date = pd.to_datetime(local_df['date'], errors='coerce').max()
+                if pd.isna(latest_date):
+                    latest_date = None
+        if file_path and latest_date is None:
+            # 热层为空（数据已全部封存到冷层，如长期停牌）
+            latest_date = ColdStore.get(self.daily_dir).date_range(stock_code)[1]
+        
+        if latest_date is None:
             # 本地无数据，下载完整历史数据（从2020年开始）
-            self.logger.info(f"股票 {stock_code} 本地无数据，下载完整历史数据（从2020年开始）...")
-
-            # 设置起始日期为2020-01-01
-            start_date = "20200101"
-            end_date = datetime.now().strftime('%Y%m%d')
-
-            df = self.download_stock_history(stock_code, start_date=start_date, end_date=end_date)
-
+            return None, "20200101"
+        
+        start_date = (latest_date + timedelta(days=1)).strftime('%Y%m%d')
+        # 注意：start_date == 今天时需要继续尝试下载当天数据。
+        # 腾讯/AkShare 等数据源在收盘后即可返回当日 K 线，若用 >= 会跳过当天。
+        if start_date > datetime.now().strftime('%Y%m%d'):
+            return latest_date, None
+        return latest_date, start_date
+    
+    def _apply_update(self, stock_code: str, df: Optional[pd.DataFrame],
+                      latest_date: Optional[pd.Timestamp]) -> bool:
+        """
+        将下载结果并入本地数据
+        
+        Args:
+            stock_code: 股票代码
+            df: 下载的数据（None 表示下载失败）
+            latest_date: 本地最新日期（None 表示本地无数据）
+        
+        Returns:
+            是否成功
+        """
+        if latest_date is not None:
+            if df is None:
+                self.logger.error(f"股票 {stock_code} 增量更新下载失败")
+                return False
+            if not df.empty:
+                return self.append_stock_data(stock_code, df, latest_date)
+            # 没有新数据
+            return True
+        else:
             if df is not None and not df.empty:
                 self.logger.info(f"股票 {stock_code} 下载完成: {len(df)} 条数据 ({df['date'].min()} 至 {df['date'].max()})")
                 return self.save_stock_data(stock_code, df)
@@ -494,13 +906,15 @@ class DataDownloader:
                 return False
     
     def download_all_stocks(self, stock_list: pd.DataFrame = None,
-                           callback=None) -> Tuple[int, int]:
+                           callback=None, retry_failed: bool = False) -> Tuple[int, int]:
         """
         批量下载所有股票数据
+        进度记录在任务日志中，中断后再次运行从中断处继续（跳过上次失败的股票）
         
         Args:
             stock_list: 股票列表，如果为None则自动获取
             callback: 进度回调函数 (current, total, stock_code, success)
+            retry_failed: 只重新尝试上次失败的股票
         
         Returns:
             (成功数量, 失败数量)
@@ -515,52 +929,616 @@ class DataDownloader:
         if 'code' in stock_list.columns:
             stock_list['code'] = stock_list['code'].astype(str)
         
+        # 上次后台写入在批次确认前中断：撤销该批的原地追加（这些股票未登记完成，本次重新处理）
+        rolled_back = self.write_log.recover()
+        if rolled_back:
+            self.logger.warning(f"上次批量写入未完成，已撤销 {len(rolled_back)} 个文件中未确认的追加")
+        
+        journal = DownloadJournal.open(self.daily_dir, 'download_all', stock_list['code'],
+                                       self.planner.target_date(), retry_failed, self.logger)
+        self.meter.start_session()
+        if journal.resumed:
+            stock_list = stock_list[stock_list['code'].isin(journal.to_process())]
+        
         total = len(stock_list)
         success_count = 0
         fail_count = 0
         
         self.logger.info(f"开始下载 {total} 只股票数据...")
         
-        def download_single(index: int, row: pd.Series) -> Tuple[str, bool]:
+        user_callback = callback
+        
+        def callback(current: int, total_: int, stock_code: str, success: bool):
+            """登记到任务日志后转给调用方的回调"""
+            error = self._errors.pop(stock_code, None)
+            # 数据交给写入队列的股票由写线程在该批落盘后登记（on_written）；
+            # 因下载限制未发起的股票留给下次运行
+            queued = success and self._write_queue is not None and self._write_queue.submitted(stock_code)
+            if error != 'DownloadLimit' and not queued:
+                journal.record(stock_code, success, error or 'NoData')
+            if user_callback:
+                user_callback(current, total_, stock_code, success)
+        
+        # 下载前只根据本地元数据生成计划：已是最新、未上市、已退市和长期停牌的股票不发起请求
+        self.manifest.sync()
+        plan = self.planner.plan(stock_list)
+        for code in plan.up_to_date + list(plan.skipped):
+            success_count += 1
+            callback(success_count, total, code, True)
+        positions = {code: i for i, code in enumerate(stock_list['code'])}
+        stock_list = stock_list[stock_list['code'].isin(plan.fetch_codes)]
+        
+        def download_single(task: Tuple[str, Optional[pd.Timestamp], str]) -> Tuple[str, bool]:
             """下载单只股票"""
-            stock_code = str(row['code'])  # 确保是字符串
+            stock_code, latest_date, start_date = task
+            index = positions[stock_code]
             try:
-                result = self.update_stock_data(stock_code)
-                if callback:
-                    callback(index + 1, total, stock_code, result)
+                result = self._fetch_planned(stock_code, latest_date, start_date, plan.target_date)
+                callback(index + 1, total, stock_code, result)
                 return stock_code, result
             except Exception as e:
                 self.logger.error(f"下载股票 {stock_code} 异常: {e}")
-                if callback:
-                    callback(index + 1, total, stock_code, False)
+                self._errors[stock_code] = type(e).__name__
+                callback(index + 1, total, stock_code, False)
                 return stock_code, False
         
-        # 使用线程池并发下载
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = {
-                executor.submit(download_single, idx, row): row['code']
-                for idx, row in stock_list.iterrows()
-            }
+        # 下载线程只负责网络请求，下载好的数据交给单个写线程成批落盘：
+        # 每批先登记回滚记录，各文件写入并 fsync 后刷新目录、删除记录，再把本批登记到任务日志
+        def before_batch(codes: List[str]):
+            self.write_log.begin(filter(None, (find_stock_file(self.daily_dir, code) for code in codes)))
+        
+        def after_batch(codes: List[str]):
+            self.write_log.commit([self.daily_dir])
+        
+        def on_written(stock_code: str, ok: bool):
+            if ok:
+                journal.record_success(stock_code)
+            else:
+                journal.record_failure(stock_code, 'WriteError')
+        
+        if self.write_queue_size > 0:
+            self._write_queue = WriteBehindQueue(self.write_queue_size, self.logger,
+                                                 before_batch=before_batch, after_batch=after_batch,
+                                                 on_done=on_written)
+        
+        try:
+            done = 0
+            pending = not stock_list.empty
+            if pending and self.snapshot_update and self.data_source in ('tencent', 'akshare'):
+                # 全市场行情快照批量补当日K线，只有缺数据的股票继续逐只下载
+                stock_list, done = self._update_from_snapshot(stock_list, callback)
+            elif pending and self.date_major_sync and self.data_source == 'tushare' and self.tushare_source:
+                # 按交易日获取全市场截面，只有少数无数据的股票逐只下载
+                stock_list, done = self.sync_date_major(stock_list, callback=callback)
+            success_count += done
+            remaining = set(stock_list['code'])
+            tasks = [task for task in plan.tasks if task[0] in remaining]
             
-            for future in as_completed(futures):
-                stock_code, success = future.result()
-                if success:
-                    success_count += 1
-                else:
-                    fail_count += 1
-                
-                # 每下载100只股票输出一次进度
-                if (success_count + fail_count) % 100 == 0:
-                    self.logger.info(f"进度: {success_count + fail_count}/{total}, "
-                                   f"成功: {success_count}, 失败: {fail_count}")
+            if tasks and self.async_fetch and self.data_source == 'tencent' and self.tencent_source:
+                # 异步抓取：请求速率和并发数由自适应限速器控制
+                success, fail_count = self._download_all_async(tasks, plan.target_date, callback)
+                success_count += success
+            elif tasks and self.data_source == 'baostock' and self.baostock_processes > 1:
+                # 多进程下载：每个进程一个 baostock 会话，结果回到本进程落盘
+                pool = BaoStockProcessPool(self.baostock_processes, logger=self.logger,
+                                           on_error=self._errors.__setitem__)
+                success, fail_count = self._download_all_async(tasks, plan.target_date, callback,
+                                                               source='baostock', fetcher=pool)
+                success_count += success
+            elif tasks:
+                # 使用线程池并发下载（中断时取消尚未开始的任务）
+                executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                try:
+                    futures = {executor.submit(download_single, task): task[0] for task in tasks}
+                    
+                    for future in as_completed(futures):
+                        stock_code, ok = future.result()
+                        if ok:
+                            success_count += 1
+                        else:
+                            fail_count += 1
+                        
+                        # 每下载100只股票输出一次进度
+                        if (success_count + fail_count) % 100 == 0:
+                            self.logger.info(f"进度: {success_count + fail_count}/{total}, "
+                                           f"成功: {success_count}, 失败: {fail_count}")
+                finally:
+                    executor.shutdown(wait=True, cancel_futures=True)
+        finally:
+            # 等待写入队列清空，之后的清单保存、封存和面板重建都基于完整落盘的数据
+            if self._write_queue is not None:
+                write_failed = self._write_queue.close()
+                self._write_queue = None
+                if write_failed:
+                    self.logger.error(f"{len(write_failed)} 只股票写入失败: {', '.join(write_failed[:20])}")
+                    success_count -= len(write_failed)
+                    fail_count += len(write_failed)
+            journal.checkpoint()
         
         # 输出下载统计
         stats = self.get_download_stats()
         self.logger.info(f"下载完成！成功: {success_count}, 失败: {fail_count}")
-        self.logger.info(f"下载数据量: {stats['downloaded_mb']:.2f}MB / {stats['limit_mb']:.0f}MB ({stats['percentage']:.1f}%)")
+        self.logger.info(f"任务日志: {journal.summary()}")
+        if journal.failed:
+            self.logger.info("失败的股票可使用 retry_failed=True（命令行 --retry-failed）重新尝试")
+        self.logger.info(f"下载数据量: {stats['downloaded_mb']:.2f}MB / {stats['limit_mb']:.0f}MB ({stats['percentage']:.1f}%)，"
+                         f"{stats['rows_per_sec']:.0f} 行/秒，{stats['mb_per_sec']:.2f}MB/秒")
+        for source, info in stats['sources'].items():
+            latency = f"{info['avg_latency_ms']:.0f}ms" if info['avg_latency_ms'] is not None else '-'
+            self.logger.info(f"下载计量 [{source}]: 请求 {info['requests']}，{info['bytes'] / 1024 / 1024:.2f}MB，"
+                             f"{info['rows']} 行，平均延迟 {latency}")
+        
+        self.manifest.save()
+        self.planner.save()
+        self.meter.save()
+        self.save_rate_limits()
+        
+        # 将热层中过期的年份封存到冷层（只在有文件早于热层起始日期时才会读写）
+        if self.auto_compact and success_count > 0:
+            compact_daily_dir(self.daily_dir, self.hot_years,
+                              manifest=self.manifest, logger=self.logger)
+        
+        # 重建行情面板，供分析程序以内存映射方式读取
+        if self.build_panel and success_count > 0:
+            build_panel(self.daily_dir, self.panel_dir, self.logger)
         
         return success_count, fail_count
     
+    def _update_from_snapshot(self, stock_list: pd.DataFrame,
+                              callback=None) -> Tuple[pd.DataFrame, int]:
+        """
+        用全市场行情快照（腾讯行情接口 / AkShare 实时行情）批量更新当日K线
+        本地最新日期为上一交易日、且快照昨收等于本地最新收盘价的股票直接追加快照中的当日K线；
+        已是最新的股票跳过；本地无数据、缺多日数据、当日除权（昨收与本地收盘价不一致）
+        或快照中没有的股票留给逐只下载
+        
+        上一交易日取本地各股票最新日期中早于快照日期的最大值。
+        多数股票昨收对不上时（如节假日拿到的是上一交易日的行情）整份快照不使用
+        
+        Args:
+            stock_list: 股票列表
+            callback: 进度回调函数 (current, total, stock_code, success)
+        
+        Returns:
+            (需要逐只下载的股票列表, 已完成数量)
+        """
+        codes = stock_list['code'].astype(str).tolist()
+        if self.data_source == 'tencent' and self.tencent_source:
+            snapshot = self.tencent_source.get_daily_snapshot(codes, self.snapshot_batch_size)
+        elif self.data_source == 'akshare':
+            snapshot = self._get_akshare_snapshot()
+        else:
+            snapshot = None
+        if snapshot is None or snapshot.empty:
+            self.logger.warning("行情快照不可用，改为逐只下载")
+            return stock_list, 0
+        
+        snapshot['date'] = pd.to_datetime(snapshot['date'])
+        snapshot = snapshot.drop_duplicates(subset=['code'], keep='last').set_index('code')
+        snapshot_date = snapshot['date'].max()
+        latest_dates = {code: self._plan_update(code)[0] for code in codes}
+        previous_dates = [d for d in latest_dates.values() if d is not None and d < snapshot_date]
+        previous_date = max(previous_dates) if previous_dates else None
+        
+        # 快照与本地数据衔接的股票
+        candidates = [code for code in codes
+                      if latest_dates[code] is not None and latest_dates[code] == previous_date
+                      and code in snapshot.index and snapshot.at[code, 'date'] == snapshot_date]
+        if 'pre_close' in snapshot.columns:
+            continuous = [code for code in candidates
+                          if self._matches_last_close(code, snapshot.at[code, 'pre_close'])]
+            if len(continuous) * 2 < len(candidates):
+                self.logger.warning(f"行情快照与本地数据不衔接（昨收一致 {len(continuous)}/{len(candidates)}），"
+                                    f"改为逐只下载")
+                return stock_list, 0
+            candidates = continuous
+            snapshot = snapshot.drop(columns=['pre_close'])
+        candidates = set(candidates)
+        
+        done = 0
+        remaining = []
+        for code in codes:
+            latest_date = latest_dates[code]
+            if latest_date is not None and latest_date >= snapshot_date:
+                ok = True
+            elif code in candidates:
+                bar = snapshot.loc[[code]].reset_index(drop=True)
+                self.meter.record(self.data_source, rows=len(bar))
+                ok = self.append_stock_data(code, bar, latest_date)
+            else:
+                remaining.append(code)
+                continue
+            done += 1
+            if callback:
+                callback(done, len(codes), code, ok)
+        
+        self.logger.info(f"行情快照更新 {done} 只股票（{snapshot_date.strftime('%Y-%m-%d')}），"
+                         f"{len(remaining)} 只需要逐只下载")
+        return stock_list[stock_list['code'].astype(str).isin(remaining)], done
+    
+    def sync_date_major(self, stock_list: pd.DataFrame, start_date: str = '20200101',
+                        callback=None) -> Tuple[pd.DataFrame, int]:
+        """
+        按交易日批量同步（Tushare）：每个缺失的交易日用 daily + adj_factor 两次调用获取全市场截面，
+        换算为前复权价格后按股票分发追加到各自的数据文件
+        
+        - 前复权以区间最后一个交易日的复权因子为基准，区间内除权的股票新数据也是连续的
+        - 本地数据的复权基准（本地最新日期的复权因子）与新基准不同的股票重新下载完整历史
+        - 本地无数据的股票：逐只下载调用更少时留给逐只下载，否则一起从 start_date 回补
+        
+        Args:
+            stock_list: 股票列表
+            start_date: 无本地数据时的起始日期 (YYYYMMDD)
+            callback: 进度回调函数 (current, total, stock_code, success)
+        
+        Returns:
+            (需要逐只下载的股票列表, 已完成数量)
+        """
+        source = self.tushare_source
+        codes = stock_list['code'].astype(str).tolist()
+        trade_dates = source.get_trade_dates(start_date, datetime.now().strftime('%Y%m%d'))
+        if not trade_dates:
+            self.logger.warning("获取交易日历失败，改为逐只下载")
+            return stock_list, 0
+        
+        latest_dates = {code: self._plan_update(code)[0] for code in codes}
+        existing = {code: d for code, d in latest_dates.items() if d is not None}
+        new_codes = [code for code in codes if latest_dates[code] is None]
+        first_missing = min((d + timedelta(days=1) for d in existing.values()), default=None)
+        days = [d for d in trade_dates
+                if first_missing is not None and d >= first_missing.strftime('%Y%m%d')]
+        
+        # 每个交易日 2 次调用；逐只下载每只股票约 2 次调用
+        include_new = bool(new_codes) and len(new_codes) > len(trade_dates) - len(days)
+        if include_new:
+            days = trade_dates
+        remaining = set() if include_new else set(new_codes)
+        
+        # 以最后一个已发布数据的交易日的复权因子为前复权基准
+        adj_cache = {}
+        while days:
+            adj_latest = source.get_adj_factors(days[-1])
+            if adj_latest is None:
+                self.logger.warning("获取复权因子失败，改为逐只下载")
+                return stock_list, 0
+            if not adj_latest.empty:
+                adj_cache[days[-1]] = adj_latest
+                break
+            days.pop()  # 当天数据尚未发布
+        
+        members = set(existing) | (set(new_codes) if include_new else set())
+        rebase = []
+        if days:
+            # 本地数据的复权基准与新基准不同（期间有除权）的股票需要重新下载完整历史
+            for last_date in sorted({d for d in existing.values() if d.strftime('%Y%m%d') < days[-1]}):
+                key = last_date.strftime('%Y%m%d')
+                adj_local = adj_cache.get(key)
+                if adj_local is None:
+                    adj_local = source.get_adj_factors(key)
+                if adj_local is None:
+                    continue
+                for code in [c for c, d in existing.items() if d == last_date]:
+                    old, new = adj_local.get(code), adj_latest.get(code)
+                    if pd.notna(old) and pd.notna(new) and abs(old / new - 1) > 1e-6:
+                        rebase.append(code)
+            members -= set(rebase)
+            self.logger.info(f"按交易日同步: {len(days)} 个交易日 ({days[0]} 至 {days[-1]})，"
+                             f"{len(members)} 只股票，{len(rebase)} 只复权基准变化需重新下载，"
+                             f"{len(remaining)} 只逐只下载")
+        
+        last = {code: latest_dates[code] for code in members}
+        failed = set()
+        pending = []
+        
+        def flush():
+            if not pending:
+                return
+            block = pd.concat(pending, ignore_index=True)
+            pending.clear()
+            block['date'] = pd.to_datetime(block['date'])
+            for code, rows in block.groupby('code', sort=False):
+                latest_date = last[code]
+                if latest_date is not None:
+                    rows = rows[rows['date'] > latest_date]
+                if rows.empty:
+                    continue
+                rows = rows.drop(columns=['code', 'adj_factor']).sort_values('date')
+                if latest_date is None:
+                    ok = self.save_stock_data(code, rows)
+                else:
+                    ok = self.append_stock_data(code, rows, latest_date)
+                if not ok:
+                    failed.add(code)
+                last[code] = rows['date'].max()
+        
+        interrupted = None
+        for i, day in enumerate(days):
+            cross = source.get_daily_cross_section(day, adj_cache.get(day))
+            if cross is None:
+                interrupted = day
+                break
+            self.meter.record('tushare', requests=1, nbytes=frame_bytes(cross))
+            if not cross.empty:
+                cross = cross[cross['code'].isin(members)].copy()
+                factor = cross['adj_factor'] / cross['code'].map(adj_latest)
+                missing = factor.isna()
+                remaining.update(cross.loc[missing, 'code'])
+                cross, factor = cross[~missing].copy(), factor[~missing]
+                for column in TUSHARE_PRICE_COLUMNS:
+                    if column in cross.columns:
+                        cross[column] = (cross[column] * factor).round(2)
+                self.meter.record('tushare', rows=len(cross))
+                pending.append(cross)
+            if len(pending) >= DATE_MAJOR_FLUSH_DAYS:
+                flush()
+        flush()
+        
+        if interrupted is not None:
+            # 已写入的部分是连续的，未完成的股票交给逐只下载补齐
+            self.logger.error(f"按交易日同步在 {interrupted} 中断，剩余股票改为逐只下载")
+            remaining.update(members)
+        remaining -= failed
+        
+        done = 0
+        for code in codes:
+            if code in remaining:
+                continue
+            if code in rebase:
+                ok = self.refresh_stock_history(code)
+            else:
+                ok = code not in failed
+            done += 1
+            if callback:
+                callback(done, len(codes), code, ok)
+        
+        return stock_list[stock_list['code'].astype(str).isin(remaining)], done
+    
+    def refresh_stock_history(self, stock_code: str) -> bool:
+        """
+        重新下载股票从本地最早日期（无数据时从2020年）至今的完整历史并替换本地数据
+        用于前复权基准变化（除权除息）后刷新历史价格
+        
+        Args:
+            stock_code: 股票代码
+        
+        Returns:
+            是否成功
+        """
+        file_path = find_stock_file(self.daily_dir, stock_code)
+        earliest = self.manifest.date_range(file_path)[0] if file_path else None
+        start_date = pd.Timestamp(earliest).strftime('%Y%m%d') if earliest else '20200101'
+        df = self.download_stock_history(stock_code, start_date=start_date,
+                                         end_date=datetime.now().strftime('%Y%m%d'))
+        if df is None or df.empty:
+            self.logger.warning(f"股票 {stock_code} 重新下载历史数据失败")
+            return False
+        self.logger.info(f"股票 {stock_code} 复权基准变化，已重新下载 {len(df)} 条历史数据")
+        return self.save_stock_data(stock_code, df)
+    
+    def _matches_last_close(self, stock_code: str, pre_close: float) -> bool:
+        """快照中的昨收是否等于本地最新收盘价"""
+        if pd.isna(pre_close):
+            return False
+        last_close = self._last_close(stock_code)
+        return last_close is not None and abs(last_close - float(pre_close)) < 0.006
+    
+    def _last_close(self, stock_code: str) -> Optional[float]:
+        """本地最新收盘价（只读取文件最后一行），无法读取时返回 None"""
+        file_path = find_stock_file(self.daily_dir, stock_code)
+        if file_path is None:
+            return None
+        try:
+            last = read_stock_data(file_path, columns=['close'], last_n_rows=1)
+        except Exception:
+            return None
+        if last.empty or pd.isna(last['close'].iloc[-1]):
+            return None
+        return float(last['close'].iloc[-1])
+    
+    def _get_akshare_snapshot(self) -> Optional[pd.DataFrame]:
+        """
+        将 AkShare 全市场实时行情 (stock_zh_a_spot_em) 转换为当日K线
+        行情中没有日期：交易日收盘（15:00）后记为当天，非交易日记为最近交易日，交易时段内不使用
+        
+        Returns:
+            DataFrame，列与 stock_zh_a_hist 下载的数据一致，另附 code、pre_close 列
+        """
+        now = datetime.now()
+        if is_trading_day(now):
+            if now.strftime('%H:%M') < '15:00':
+                self.logger.info("尚未收盘，不使用全市场行情快照")
+                return None
+            snapshot_date = now
+        else:
+            snapshot_date = get_last_trading_day(now)
+        
+        # 本次运行中下载股票列表时已获取过收盘后的行情则直接复用
+        spot = None
+        if self._spot_board is not None:
+            fetched_at, board = self._spot_board
+            if fetched_at.date() == now.date() and (fetched_at.strftime('%H:%M') >= '15:00'
+                                                   or not is_trading_day(now)):
+                spot = board
+        if spot is None:
+            try:
+                started = time.monotonic()
+                spot = ak.stock_zh_a_spot_em()
+                self.meter.record('akshare', requests=1, nbytes=frame_bytes(spot),
+                                  latency=time.monotonic() - started)
+            except Exception as e:
+                self.logger.warning(f"获取全市场行情失败: {e}")
+                return None
+        if spot is None or spot.empty:
+            return None
+        return self._spot_to_daily(spot, snapshot_date)
+    
+    @staticmethod
+    def _spot_to_daily(spot: pd.DataFrame, snapshot_date: datetime) -> pd.DataFrame:
+        """将 stock_zh_a_spot_em 的行情表转换为指定日期的K线（跳过停牌、无成交的股票）"""
+        columns_map = {
+            '代码': 'code',
+            '今开': 'open',
+            '最新价': 'close',
+            '最高': 'high',
+            '最低': 'low',
+            '成交量': 'volume',
+            '成交额': 'amount',
+            '振幅': 'amplitude',
+            '涨跌幅': 'change_pct',
+            '涨跌额': 'change',
+            '换手率': 'turnover',
+            '昨收': 'pre_close',
+        }
+        available_columns = {k: v for k, v in columns_map.items() if k in spot.columns}
+        df = spot[list(available_columns.keys())].rename(columns=available_columns)
+        df['code'] = df['code'].astype(str).str.zfill(6)
+        for column in df.columns.drop('code'):
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+        # 停牌、无成交的股票没有当日K线
+        df = df[(df['volume'] > 0) & (df['open'] > 0)].copy()
+        df.insert(1, 'date', snapshot_date.strftime('%Y-%m-%d'))
+        return df.reset_index(drop=True)
+    
+    def _download_all_async(self, plan_tasks: List[Tuple[str, Optional[pd.Timestamp], str]],
+                            target_date: pd.Timestamp, callback=None, source: str = 'tencent',
+                            fetcher=None) -> Tuple[int, int]:
+        """
+        使用批量抓取接口更新（腾讯数据源的异步抓取，或 BaoStock 的多进程下载）
+        按下载计划的区间并发请求，
+        每只股票完成时并入本地数据（启用写入队列时在后台线程落盘）
+        
+        Args:
+            plan_tasks: 下载计划中的 [(股票代码, 本地最新日期, 起始日期 YYYYMMDD), ...]
+            target_date: 计划的目标日期
+            callback: 进度回调函数 (current, total, stock_code, success)
+            source: 抓取使用的数据源
+            fetcher: 提供 fetch_histories(tasks, on_result, should_stop) 的对象，默认腾讯数据源
+        
+        Returns:
+            (成功数量, 失败数量)
+        """
+        total = len(plan_tasks)
+        end_date = datetime.now().strftime('%Y-%m-%d')
+        counts = {'done': 0, 'success': 0, 'fail': 0}
+        
+        def finish(stock_code: str, success: bool):
+            counts['done'] += 1
+            counts['success' if success else 'fail'] += 1
+            if callback:
+                callback(counts['done'], total, stock_code, success)
+            if counts['done'] % 100 == 0:
+                self.logger.info(f"进度: {counts['done']}/{total}, "
+                                 f"成功: {counts['success']}, 失败: {counts['fail']}")
+        
+        plan_tasks = [(stock_code, latest_date, self._request_start(latest_date, start_date))
+                      for stock_code, latest_date, start_date in plan_tasks]
+        plans = {}
+        tasks = []
+        for stock_code, latest_date, start_date in plan_tasks:
+            plans[stock_code] = latest_date
+            tasks.append((stock_code, f"{start_date[:4]}-{start_date[4:6]}-{start_date[6:]}", end_date))
+        
+        if fetcher is None:
+            fetcher = self.tencent_source
+            self.logger.info(f"需要更新 {len(tasks)} 只股票（异步抓取，限速 {self.request_rate:g} 次/秒，"
+                             f"最多 {self.max_in_flight} 个在途请求）")
+        else:
+            self.logger.info(f"需要更新 {len(tasks)} 只股票（{source}）")
+        
+        failover = [s for s in self.router.fallbacks if s != source]
+        retry = []
+        # 前复权基准变化的股票：抓取结束后重新下载完整历史
+        rebase = []
+        
+        def apply(stock_code: str, df: Optional[pd.DataFrame], df_source: Optional[str]):
+            if plans[stock_code] is not None:
+                df, rebased = self._trim_overlap(stock_code, df, plans[stock_code], df_source)
+                if df is not None and stock_code not in self._errors:
+                    self.planner.record_result(stock_code, target_date, rebased or not df.empty)
+                if rebased:
+                    rebase.append(stock_code)
+                    return
+            try:
+                success = self._apply_update(stock_code, df, plans[stock_code])
+            except Exception as e:
+                self.logger.error(f"保存股票 {stock_code} 数据异常: {e}")
+                success = False
+            finish(stock_code, success)
+        
+        # 腾讯数据源按响应登记传输字节数；其他数据源（多进程 BaoStock）看不到原始响应，按返回的数据计量
+        metered = fetcher is self.tencent_source
+        
+        def on_result(stock_code: str, df: Optional[pd.DataFrame]):
+            if not metered:
+                self.meter.record(source, requests=1, nbytes=frame_bytes(df))
+            if df is not None and not df.empty:
+                self.meter.record(source, rows=len(df))
+            elif failover:
+                # 没有返回数据，抓取结束后改用备用数据源
+                retry.append(stock_code)
+                return
+            apply(stock_code, df, source)
+        
+        finished = fetcher.fetch_histories(
+            tasks, on_result, should_stop=lambda: not self.check_download_limit())
+        
+        if retry:
+            self.logger.info(f"{len(retry)} 只股票改用备用数据源 {', '.join(failover)}")
+            starts = {stock_code: start_date for stock_code, _, start_date in plan_tasks}
+            
+            def download_fallback(stock_code: str) -> Optional[pd.DataFrame]:
+                if not self.check_download_limit():
+                    self._errors[stock_code] = 'DownloadLimit'
+                    return None
+                return self.download_stock_history(stock_code, start_date=starts[stock_code],
+                                                   end_date=end_date.replace('-', ''),
+                                                   exclude_sources=(source,))
+            
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(download_fallback, code): code for code in retry}
+                for future in as_completed(futures):
+                    stock_code = futures[future]
+                    try:
+                        df = future.result()
+                    except Exception as e:
+                        self.logger.error(f"备用数据源下载股票 {stock_code} 异常: {e}")
+                        self._errors[stock_code] = type(e).__name__
+                        finish(stock_code, False)
+                        continue
+                    if self._errors.get(stock_code) == 'DownloadLimit':
+                        self.logger.info(f"下载限制已达到，跳过股票 {stock_code}")
+                        finish(stock_code, False)
+                    else:
+                        apply(stock_code, df, self._sources.pop(stock_code, None))
+        
+        if rebase:
+            self.logger.info(f"{len(rebase)} 只股票复权基准变化，重新下载完整历史: {', '.join(rebase[:20])}")
+            
+            def refresh(stock_code: str) -> bool:
+                if not self.check_download_limit():
+                    self._errors[stock_code] = 'DownloadLimit'
+                    return False
+                return self.refresh_stock_history(stock_code)
+            
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(refresh, code): code for code in rebase}
+                for future in as_completed(futures):
+                    try:
+                        success = future.result()
+                    except Exception as e:
+                        self.logger.error(f"重新下载股票 {futures[future]} 异常: {e}")
+                        success = False
+                    finish(futures[future], success)
+        
+        # 达到下载限制后未发起的股票记为失败
+        for stock_code, _, _ in tasks:
+            if stock_code not in finished:
+                self.logger.info(f"下载限制已达到，跳过股票 {stock_code}")
+                self._errors[stock_code] = 'DownloadLimit'
+                finish(stock_code, False)
+        
+        return counts['success'], counts['fail']
+    
     def get_latest_data_date(self) -> Optional[str]:
         """
         获取本地数据的最新日期
@@ -569,19 +1547,8 @@ class DataDownloader:
             最新日期字符串 (YYYY-MM-DD)
         """
         try:
-            latest_date = None
-            for filename in os.listdir(self.daily_dir):
-                if not filename.endswith('.csv'):
-                    continue
-                
-                file_path = os.path.join(self.daily_dir, filename)
-                df = safe_read_csv(file_path)
-                
-                if df is not None and not df.empty and 'date' in df.columns:
-                    file_latest = pd.to_datetime(df['date']).max()
-                    if latest_date is None or file_latest > latest_date:
-                        latest_date = file_latest
-            
+            self.manifest.sync()
+            latest_date = self.manifest.latest_date()
             return latest_date.strftime('%Y-%m-%d') if latest_date else None
         except Exception as e:
             self.logger.error(f"获取最新数据日期失败: {e}")
@@ -0,0 +1,312 @@
+"""
+日线数据目录清单模块
+在 data/daily/_manifest.json 中记录每只股票数据文件的首末日期、行数、修改时间与内容哈希，
+新鲜度和日期范围查询直接读取清单，不再逐个打开数据文件
+
+清单由 DataDownloader 在每次写入后更新；其他程序写入的文件在 sync() 时按
+(mtime, size) 发现变化并重新登记，因此清单始终覆盖目录中的全部文件
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Optional, Dict, Tuple
+
+import pandas as pd
+
+from src.data_store import list_stock_files, read_date_range, stock_code_from_path, is_parquet_path
+from src.tiered_store import ColdStore
+
+
+MANIFEST_FILE = '_manifest.json'
+MANIFEST_VERSION = 1
+
+# 每登记多少次变更自动落盘一次
+AUTO_SAVE_INTERVAL = 200
+
+_instances: Dict[str, 'DataManifest'] = {}
+_instances_lock = threading.Lock()
+
+
+def _file_hash(path: str) -> str:
+    """计算文件内容 SHA1"""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _count_rows(path: str) -> int:
+    """统计数据行数（CSV 按换行计数，Parquet 读元数据）"""
+    if is_parquet_path(path):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    with open(path, 'rb') as f:
+        data = f.read()
+    lines = data.count(b'\n')
+    if data and not data.endswith(b'\n'):
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def _fmt_date(value) -> Optional[str]:
+    if value is None or pd.isna(value):
+        return None
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+class DataManifest:
+    """日线数据目录清单（进程内按目录共享，线程安全）"""
+
+    def __init__(self, daily_dir: str):
+        self.daily_dir = daily_dir
+        self.path = os.path.join(daily_dir, MANIFEST_FILE)
+        self.logger = logging.getLogger('DataManifest')
+        self.entries: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+        self._pending = 0
+        self.load()
+
+    @classmethod
+    def get(cls, daily_dir: str) -> 'DataManifest':
+        """获取目录对应的共享清单实例"""
+        key = os.path.abspath(daily_dir)
+        with _instances_lock:
+            manifest = _instances.get(key)
+            if manifest is None:
+                manifest = cls(daily_dir)
+                _instances[key] = manifest
+            return manifest
+
+    # ------------------------------------------------------------------
+    # 读写
+    # ------------------------------------------------------------------
+
+    def load(self):
+        """从磁盘加载清单，文件不存在或损坏时为空"""
+        with self._lock:
+            self.entries = {}
+            if not os.path.exists(self.path):
+                return
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    self.entries = data.get('stocks', {})
+            except Exception as e:
+                self.logger.warning(f"读取数据清单失败，将重新生成: {e}")
+
+    def save(self):
+        """原子写入清单文件"""
+        with self._lock:
+            if not os.path.isdir(self.daily_dir):
+                return
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'version': MANIFEST_VERSION, 'stocks': self.entries},
+                              f, ensure_ascii=False, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+                self._pending = 0
+            except Exception as e:
+                self.logger.warning(f"保存数据清单失败: {e}")
+
+    def _mark_dirty(self):
+        self._pending += 1
+        if self._pending >= AUTO_SAVE_INTERVAL:
+            self.save()
+
+    # ------------------------------------------------------------------
+    # 登记变更
+    # ------------------------------------------------------------------
+
+    def _scan_entry(self, path: str) -> Optional[Dict]:
+        """从数据文件本身生成清单条目"""
+        try:
+            st = os.stat(path)
+            first, last = read_date_range(path)
+            return {
+                'file': os.path.basename(path),
+                'first_date': _fmt_date(first),
+                'last_date': _fmt_date(last),
+                'rows': _count_rows(path),
+                'mtime': st.st_mtime,
+                'size': st.st_size,
+                'hash': _file_hash(path),
+            }
+        except Exception as e:
+            self.logger.debug(f"登记数据文件失败 {path}: {e}")
+            return None
+
+    def record_write(self, path: str, df: pd.DataFrame = None):
+        """
+        登记一次完整写入
+
+        Args:
+            path: 数据文件路径
+            df: 写入的数据（提供时直接取首末日期与行数）
+        """
+        code = stock_code_from_path(path)
+        if df is None or df.empty or 'date' not in df.columns:
+            entry = self._scan_entry(path)
+        else:
+            dates = pd.to_datetime(df['date'], errors='coerce')
+            st = os.stat(path)
+            entry = {
+                'file': os.path.basename(path),
+                'first_date': _fmt_date(dates.min()),
+                'last_date': _fmt_date(dates.max()),
+                'rows': len(df),
+                'mtime': st.st_mtime,
+                'size': st.st_size,
+                'hash': _file_hash(path),
+            }
+        with self._lock:
+            if entry is None:
+                self.entries.pop(code, None)
+            else:
+                self.entries[code] = entry
+            self._mark_dirty()
+
+    def record_append(self, path: str, new_df: pd.DataFrame, appended_from: int):
+        """
+        登记一次追加写入，只读取新增的字节计算哈希链: sha1(旧哈希 + 新增内容)
+
+        Args:
+            path: 数据文件路径
+            new_df: 追加的数据
+            appended_from: 追加前的文件大小（新增内容的起始偏移）
+        """
+        code = stock_code_from_path(path)
+        with self._lock:
+            old = self.entries.get(code)
+        if old is None or old.get('size') != appended_from:
+            self.record_write(path)
+            return
+
+        st = os.stat(path)
+        h = hashlib.sha1(old['hash'].encode('ascii'))
+        with open(path, 'rb') as f:
+            f.seek(appended_from)
+            h.update(f.read())
+        dates = pd.to_datetime(new_df['date'], errors='coerce')
+        entry = dict(old)
+        entry.update({
+            'last_date': _fmt_date(dates.max()),
+            'rows': old['rows'] + len(new_df),
+            'mtime': st.st_mtime,
+            'size': st.st_size,
+            'hash': h.hexdigest(),
+        })
+        with self._lock:
+            self.entries[code] = entry
+            self._mark_dirty()
+
+    def record_remove(self, path: str):
+        """登记文件删除（仅当清单条目指向该文件时）"""
+        code = stock_code_from_path(path)
+        with self._lock:
+            entry = self.entries.get(code)
+            if entry and entry.get('file') == os.path.basename(path):
+                del self.entries[code]
+                self._mark_dirty()
+
+    def sync(self) -> int:
+        """
+        与目录中的实际文件对账：登记新增/外部修改的文件，移除已删除的文件
+
+        Returns:
+            更新的条目数
+        """
+        files = {stock_code_from_path(p): p for p in list_stock_files(self.daily_dir)}
+        changed = 0
+        with self._lock:
+            for code in list(self.entries):
+                if code not in files:
+                    del self.entries[code]
+                    changed += 1
+
+            for code, path in files.items():
+                entry = self.entries.get(code)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if (entry is not None and entry.get('file') == os.path.basename(path)
+                        and entry.get('mtime') == st.st_mtime and entry.get('size') == st.st_size):
+                    continue
+                new_entry = self._scan_entry(path)
+                if new_entry is not None:
+                    self.entries[code] = new_entry
+                else:
+                    self.entries.pop(code, None)
+                changed += 1
+
+            if changed:
+                self.save()
+        return changed
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def get_entry(self, stock_code: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self.entries.get(stock_code)
+            return dict(entry) if entry else None
+
+    def hot_date_range(self, path: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        查询单个数据文件（热层）的 (最早日期, 最新日期)，条目过期时重新登记
+
+        Returns:
+            ('YYYY-MM-DD', 'YYYY-MM-DD')，无数据时为 (None, None)
+        """
+        code = stock_code_from_path(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None, None
+        entry = self.get_entry(code)
+        if (entry is None or entry.get('file') != os.path.basename(path)
+                or entry.get('mtime') != st.st_mtime or entry.get('size') != st.st_size):
+            self.record_write(path)
+            entry = self.get_entry(code)
+            if entry is None:
+                return None, None
+        return entry.get('first_date'), entry.get('last_date')
+
+    def date_range(self, path: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        查询单只股票的 (最早日期, 最新日期)，包含已封存到冷层的数据
+
+        Returns:
+            ('YYYY-MM-DD', 'YYYY-MM-DD')，无数据时为 (None, None)
+        """
+        first, last = self.hot_date_range(path)
+        cold_first, cold_last = ColdStore.get(self.daily_dir).date_range(stock_code_from_path(path))
+        if cold_first is not None:
+            first = min(filter(None, [first, _fmt_date(cold_first)]))
+            last = max(filter(None, [last, _fmt_date(cold_last)]))
+        return first, last
+
+    def latest_date(self) -> Optional[pd.Timestamp]:
+        """全部股票中的最新数据日期"""
+        with self._lock:
+            dates = [e['last_date'] for e in self.entries.values() if e.get('last_date')]
+        return pd.Timestamp(max(dates)) if dates else None
+
+    def earliest_date(self) -> Optional[pd.Timestamp]:
+        """全部股票中的最早数据日期（包含冷层）"""
+        cold_first = ColdStore.get(self.daily_dir).earliest_date()
+        if cold_first is not None:
+            return cold_first
+        with self._lock:
+            dates = [e['first_date'] for e in self.entries.values() if e.get('first_date')]
+        return pd.Timestamp(min(dates)) if dates else None
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -1,6 +1,7 @@
 """
 线程安全的BaoStock数据源
 使用锁串行化baostock的全局操作，实现真正的多线程安全
+（baostock 每个进程只有一个会话，批量下载需要并行时使用 baostock_pool 的多进程版本）
 """
 
 import baostock as bs
@@ -17,11 +18,54 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.utils import setup_logger, format_date
 
 
+def to_bs_code(stock_code: str) -> str:
+    """添加市场前缀（sh.600000 / sz.000001）"""
+    return f'sh.{stock_code}' if stock_code.startswith('6') else f'sz.{stock_code}'
+
+
+def query_history(stock_code: str, start_date: str, end_date: str):
+    """
+    在当前进程的 baostock 会话中查询前复权日线（调用前需已登录）
+
+    Returns:
+        (DataFrame 或 None, 错误信息 或 None)；区间内无数据时为空 DataFrame
+    """
+    rs = bs.query_history_k_data_plus(
+        to_bs_code(stock_code),
+        "date,open,high,low,close,volume,amount",
+        start_date=start_date,
+        end_date=end_date,
+        frequency="d",
+        adjustflag="2"  # 前复权
+    )
+
+    if rs.error_code != '0':
+        return None, rs.error_msg
+
+    data_list = []
+    while rs.next():
+        data_list.append(rs.get_row_data())
+
+    if not data_list:
+        return pd.DataFrame(columns=rs.fields), None
+
+    df = pd.DataFrame(data_list, columns=rs.fields)
+
+    # 转换数据类型
+    for col in ['open', 'high', 'low', 'close']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df['volume'] = pd.to_numeric(df['volume'], errors='coerce').fillna(0).astype('int64')
+    df['amount'] = pd.to_numeric(df['amount'], errors='coerce').fillna(0).astype('int64')
+
+    return df, None
+
+
 class ThreadSafeBaoStockDataSource:
     """线程安全的BaoStock数据源 - 使用全局锁实现多线程安全"""
 
     # 全局锁，用于串行化所有baostock操作
-    _global_lock = threading.Lock()
+    # （可重入：_execute_with_lock 持有锁时还要在 _ensure_login 中再次获取）
+    _global_lock = threading.RLock()
     _global_logged_in = False
     _global_login_time = None
     _login_timeout = 300  # 登录超时5分钟
@@ -98,7 +142,7 @@ class ThreadSafeBaoStockDataSource:
 
             return pd.DataFrame(data_list, columns=rs.fields), None
 
-        result, error = self._execute_with_lock(_query)
+        result, error = self._execute_with_lock(_query) or (None, 'BaoStock未登录')
 
         if error:
             self.logger.error(f"获取股票列表失败: {error}")
@@ -121,7 +165,7 @@ class ThreadSafeBaoStockDataSource:
                         data_list.append(rs.get_row_data())
                     return pd.DataFrame(data_list, columns=rs.fields), None
 
-                result, error = self._execute_with_lock(_retry_query)
+                result, error = self._execute_with_lock(_retry_query) or (None, 'BaoStock未登录')
                 if result is not None and not result.empty:
                     break
 
@@ -166,43 +210,8 @@ class ThreadSafeBaoStockDataSource:
         """
         获取股票历史数据（线程安全）
         """
-        def _query():
-            # 添加市场前缀
-            if stock_code.startswith('6'):
-                bs_code = f'sh.{stock_code}'
-            else:
-                bs_code = f'sz.{stock_code}'
-
-            rs = bs.query_history_k_data_plus(
-                bs_code,
-                "date,open,high,low,close,volume,amount",
-                start_date=start_date,
-                end_date=end_date,
-                frequency="d",
-                adjustflag="2"  # 前复权
-            )
-
-            if rs.error_code != '0':
-                return None, rs.error_msg
-
-            data_list = []
-            while rs.next():
-                data_list.append(rs.get_row_data())
-
-            if not data_list:
-                return None, None
-
-            df = pd.DataFrame(data_list, columns=rs.fields)
-
-            # 转换数据类型
-            for col in ['open', 'high', 'low', 'close']:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            df['volume'] = pd.to_numeric(df['volume'], errors='coerce').fillna(0).astype('int64')
-            df['amount'] = pd.to_numeric(df['amount'], errors='coerce').fillna(0).astype('int64')
-
-            return df, None
-
-        result, error = self._execute_with_lock(_query)
+        result, error = (self._execute_with_lock(query_history, stock_code, start_date, end_date)
+                         or (None, 'BaoStock未登录'))
 
         if error:
             self.logger.warning(f"股票 {stock_code} 数据获取失败: {error}")
@@ -1,40 +1,110 @@
 """
 腾讯财经数据源
 使用腾讯财经API获取股票数据，作为AkShare/BaoStock的替代方案
+
+批量下载可使用异步抓取 (fetch_histories)：所有在途请求共享一个自适应限速器，
+速率和并发数按服务器反馈增减（见 rate_limiter），吞吐只受服务器允许的请求速率限制。
+安装 aiohttp 时使用 aiohttp 客户端，否则在线程池中执行 requests 请求
+
+日常更新可使用行情快照 (get_daily_snapshot)：行情接口一次请求可查询数百只股票，
+收盘后全市场当日 K 线只需十几次请求
 """
 
+import re
+import json
+import time
+import asyncio
+import itertools
 import requests
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional, List, Tuple, Dict, Callable
 import sys
 import os
-import time
-import threading
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.utils import setup_logger, safe_read_csv
+from src.rate_limiter import AdaptiveRateLimiter, TokenBucket, backoff_delay
+from src.http_transport import HttpTransport, get_transport
+from src.http_replay import RecordingTransport
+from src.download_meter import DownloadMeter, response_bytes
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+
+KLINE_URL = "http://web.ifzq.gtimg.cn/appstock/app/fqkline/get"
+QUOTE_URL = "http://qt.gtimg.cn/q="
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# 默认初始限速：每秒 3 个请求（与原先 0.3 秒最小间隔相当），运行中按服务器反馈调整
+DEFAULT_REQUEST_RATE = 3.0
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_TIMEOUT = 30
+# 行情快照每次请求的股票数
+DEFAULT_SNAPSHOT_BATCH_SIZE = 300
+# K线接口每次最多返回的条数（每段请求不超过该数量的交易日）
+MAX_KLINE_ROWS = 500
+
+# 行情接口返回: v_sh600000="1~名称~代码~现价~昨收~今开~成交量(手)~...";
+_QUOTE_RE = re.compile(r'v_(\w+)="([^"]*)"')
+# 行情字段位置（以 ~ 分隔）
+_Q_CODE, _Q_PRICE, _Q_PRE_CLOSE, _Q_OPEN, _Q_VOLUME = 2, 3, 4, 5, 6
+_Q_TIME, _Q_HIGH, _Q_LOW, _Q_AMOUNT = 30, 33, 34, 37
+# K线字段: [日期, 开盘, 收盘, 最低, 最高, 成交量(手)]，除权日之后还可能附带分红送转信息
+KLINE_FIELDS = 6
+# 标准日线列（请求成功但区间内无数据时返回这些列的空 DataFrame）
+HISTORY_COLUMNS = ['date', 'open', 'close', 'low', 'high', 'volume', 'amount']
 
 
 class TencentDataSource:
     """腾讯财经数据源 - 使用腾讯财经API获取股票数据"""
 
-    def __init__(self):
+    def __init__(self, request_rate: float = DEFAULT_REQUEST_RATE,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 retry_times: int = 3, retry_delay: float = 5,
+                 limiter: AdaptiveRateLimiter = None, trade_dates=None,
+                 transport: HttpTransport = None, kline_url: str = None, quote_url: str = None,
+                 meter: DownloadMeter = None):
+        """
+        Args:
+            request_rate: 初始每秒请求数（所有线程和协程共享）
+            max_in_flight: 同时在途的请求数上限
+            timeout: 单个请求超时（秒）
+            retry_times: 异步抓取时单个请求的尝试次数
+            retry_delay: 异步抓取首次重试等待（秒），之后按指数退避
+            limiter: 共享的自适应限速器（None 时按 request_rate 新建，不保存学到的速率）
+            trade_dates: 交易日历，用于按交易日数切分请求区间（None 时按工作日近似）
+            transport: 共享的 HTTP 连接池（None 时使用进程内共享的默认连接池）
+            kline_url: K线接口地址（None 时为腾讯接口，可指向本地模拟服务器）
+            quote_url: 行情接口地址（None 时为腾讯接口）
+            meter: 下载计量（登记每个响应的传输字节数和耗时，None 时不计量）
+        """
         self.logger = setup_logger('Tencent')
-        # 限流控制 - 每秒最多3个请求
-        self._last_request_time = 0
-        self._request_lock = threading.Lock()
-        self._min_interval = 0.3  # 最少间隔0.3秒
+        self.limiter = limiter or AdaptiveRateLimiter(
+            'tencent', request_rate, max_concurrency=max_in_flight, logger=self.logger)
+        self.max_in_flight = max(int(max_in_flight), 1)
+        self.timeout = timeout
+        self.retry_times = max(int(retry_times), 1)
+        self.retry_delay = retry_delay
+        self.trade_dates = pd.DatetimeIndex(sorted(trade_dates)) if trade_dates is not None else None
+        self.transport = transport or get_transport()
+        self.kline_url = kline_url or KLINE_URL
+        self.quote_url = quote_url or QUOTE_URL
+        self.meter = meter
 
     def _rate_limit(self):
         """请求限流控制"""
-        with self._request_lock:
-            elapsed = time.time() - self._last_request_time
-            if elapsed < self._min_interval:
-                sleep_time = self._min_interval - elapsed
-                time.sleep(sleep_time)
-            self._last_request_time = time.time()
+        self.limiter.acquire()
 
     def _get_tencent_code(self, stock_code: str) -> str:
         """
@@ -101,67 +171,38 @@ class TencentDataSource:
                                    end_date: str) -> Optional[pd.DataFrame]:
         """
         分段获取股票历史数据（处理腾讯API 500条限制）
+        按交易日历切分为每段不超过500个交易日，各段并发请求（受共享限速器约束）后合并
         """
         tencent_code = self._get_tencent_code(stock_code)
-        all_data = []
-
-        # 计算需要分段获取的次数（每段约2年，500个交易日）
-        from datetime import datetime as dt
-        start_dt = dt.strptime(start_date, '%Y-%m-%d')
-        end_dt = dt.strptime(end_date, '%Y-%m-%d')
-
-        # 分段获取数据（每段约2年）
-        current_start = start_dt
-        max_chunks = 10  # 最多获取10段（约20年，足够覆盖2020年至今）
-        chunk_count = 0
-
-        while current_start <= end_dt and chunk_count < max_chunks:
-            chunk_count += 1
-
-            # 计算当前段的结束日期（约2年后）
-            from dateutil.relativedelta import relativedelta
-            current_end = min(current_start + relativedelta(years=2), end_dt)
-
-            chunk_start = current_start.strftime('%Y-%m-%d')
-            chunk_end = current_end.strftime('%Y-%m-%d')
-
-            self.logger.debug(f"股票 {stock_code} 获取第 {chunk_count} 段数据: {chunk_start} 至 {chunk_end}")
-
-            # 获取当前段数据
-            chunk_df = self._get_stock_history_single(tencent_code, chunk_start, chunk_end)
-
-            if chunk_df is not None and not chunk_df.empty:
-                all_data.append(chunk_df)
-                self.logger.debug(f"股票 {stock_code} 第 {chunk_count} 段获取 {len(chunk_df)} 条数据")
-
-                # 如果获取的数据少于400条，说明已经到末尾，不需要继续
-                if len(chunk_df) < 400:
-                    break
-            else:
-                # 当前段无数据，尝试下一段
-                self.logger.debug(f"股票 {stock_code} 第 {chunk_count} 段无数据")
-
-            # 移动到下一段（从当前段最后一天的下一天开始）
-            current_start = current_end + timedelta(days=1)
-
-            # 限流：段与段之间也做限流
-            if current_start <= end_dt:
-                time.sleep(0.3)
-
-        if not all_data:
-            return None
-
-        # 合并所有数据
-        combined_df = pd.concat(all_data, ignore_index=True)
+        ranges = self._chunk_ranges(start_date, end_date, self.trade_dates)
+        if len(ranges) == 1:
+            chunks = [self._get_stock_history_single(tencent_code, *ranges[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(ranges), self.max_in_flight),
+                                    thread_name_prefix='TencentChunk') as executor:
+                chunks = list(executor.map(lambda r: self._get_stock_history_single(tencent_code, *r),
+                                           ranges))
+
+        combined_df = self._combine_chunks(chunks)
+        if combined_df is not None:
+            self.logger.debug(f"股票 {stock_code} 总计获取 {len(combined_df)} 条数据（分段获取 {len(ranges)} 次）")
+        return combined_df
 
-        # 去重（可能有重叠的日期）
+    @staticmethod
+    def _combine_chunks(chunks: List[Optional[pd.DataFrame]]) -> Optional[pd.DataFrame]:
+        """
+        合并各段数据：去重（段边界可能重叠）并按日期排序
+        都没有数据时：有请求失败的段返回 None，否则返回空 DataFrame（区间内确实无数据）
+        """
+        frames = [df for df in chunks if df is not None and not df.empty]
+        if not frames:
+            if any(df is None for df in chunks):
+                return None
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        combined_df = pd.concat(frames, ignore_index=True)
         combined_df.drop_duplicates(subset=['date'], keep='first', inplace=True)
-
-        # 按日期排序
         combined_df.sort_values('date', inplace=True)
         combined_df.reset_index(drop=True, inplace=True)
-
-        self.logger.debug(f"股票 {stock_code} 总计获取 {len(combined_df)} 条数据（分段获取 {chunk_count} 次）")
         return combined_df
 
     def _get_stock_history_single(self, tencent_code: str,
@@ -170,78 +211,289 @@ class TencentDataSource:
         """
         单次获取股票历史数据（最多500条）
         """
-        self._rate_limit()  # 限流控制
+        try:
+            with self.limiter.request() as outcome:
+                data = self._get_json(self._kline_url(tencent_code, start_date, end_date))
+                if data.get('code') != 0:
+                    outcome.empty()
+            return self._parse_kline(tencent_code, data, start_date, end_date)
+
+        except requests.exceptions.Timeout:
+            self.logger.warning(f"股票 {tencent_code} 请求超时")
+            return None
+        except requests.exceptions.RequestException as e:
+            self.logger.warning(f"股票 {tencent_code} 网络错误: {e}")
+            return None
+        except Exception as e:
+            self.logger.error(f"股票 {tencent_code} 数据处理异常: {e}")
+            return None
 
-        # 构建API URL
-        # 腾讯K线API: param=代码,day,开始日期,结束日期,数量,复权类型
-        url = (
-            f"http://web.ifzq.gtimg.cn/appstock/app/fqkline/get"
-            f"?param={tencent_code},day,{start_date},{end_date},500,qfq"
-        )
+    def _kline_url(self, tencent_code: str, start_date: str, end_date: str) -> str:
+        """腾讯K线API: param=代码,day,开始日期,结束日期,数量,复权类型"""
+        return f"{self.kline_url}?param={tencent_code},day,{start_date},{end_date},500,qfq"
+
+    def _get_json(self, url: str) -> dict:
+        """同步请求并解析 JSON（异常向上抛出）"""
+        started = time.monotonic()
+        response = self.transport.get(url, headers=HEADERS, timeout=self.timeout, allow_redirects=True)
+        self._record(response_bytes(response), started)
+        response.raise_for_status()
+        return response.json()
+
+    def _record(self, nbytes: int, started: float):
+        """登记一个响应的传输字节数和耗时"""
+        if self.meter is not None:
+            self.meter.record('tencent', requests=1, nbytes=nbytes, latency=time.monotonic() - started)
+
+    def _parse_kline(self, tencent_code: str, data: dict,
+                     start_date: str, end_date: str) -> Optional[pd.DataFrame]:
+        """将K线接口返回的 JSON 转换为标准日线 DataFrame（无数据时为空 DataFrame，失败时为 None）"""
+        # 检查返回数据
+        if data.get('code') != 0:
+            self.logger.warning(f"股票 {tencent_code} 数据获取失败: {data.get('msg', '未知错误')}")
+            return None
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+        # 提取K线数据
+        stock_data = data.get('data', {}).get(tencent_code, {})
+        kline_data = stock_data.get('qfqday', [])  # 前复权日线数据
 
-        try:
-            response = requests.get(url, headers=headers, timeout=30, allow_redirects=True)
-            response.raise_for_status()
-            data = response.json()
+        if not kline_data:
+            self.logger.debug(f"股票 {tencent_code} 无历史数据 ({start_date} 至 {end_date})")
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
 
-            # 检查返回数据
-            if data.get('code') != 0:
-                self.logger.warning(f"股票 {tencent_code} 数据获取失败: {data.get('msg', '未知错误')}")
-                return None
+        return self._decode_klines(kline_data)
 
-            # 提取K线数据
-            stock_data = data.get('data', {}).get(tencent_code, {})
-            kline_data = stock_data.get('qfqday', [])  # 前复权日线数据
+    @staticmethod
+    def _decode_klines(kline_data: list) -> Optional[pd.DataFrame]:
+        """
+        将K线数组直接解码为按列的 NumPy 数组（不逐行构造 dict / float 对象）
 
+        各行展平为一个对象矩阵，数值列一次转为 float64，日期转为天数序号排序，
+        输出标准日线格式: date, open, close, low, high, volume（股）, amount（估算，元）
+        """
+        lengths = np.fromiter(map(len, kline_data), dtype=np.int64, count=len(kline_data))
+        if (lengths != KLINE_FIELDS).any():
+            # 丢弃不完整的行，截掉附带的分红送转信息
+            kline_data = [item[:KLINE_FIELDS] for item, n in zip(kline_data, lengths) if n >= KLINE_FIELDS]
             if not kline_data:
-                self.logger.debug(f"股票 {tencent_code} 无历史数据 ({start_date} 至 {end_date})")
                 return None
+        table = np.array(list(itertools.chain.from_iterable(kline_data)), dtype=object).reshape(-1, KLINE_FIELDS)
+
+        days = table[:, 0].astype('datetime64[D]')
+        values = table[:, 1:].astype(np.float64)  # open, close, low, high, volume
+        day_numbers = days.astype(np.int64)
+        if (np.diff(day_numbers) < 0).any():
+            order = np.argsort(day_numbers, kind='stable')
+            days, values = days[order], values[order]
+
+        open_, close = values[:, 0], values[:, 1]
+        # 成交量（手 -> 股，与 BaoStock 单位一致）
+        volume = values[:, 4].astype(np.int64) * 100
+        return pd.DataFrame({
+            'date': np.datetime_as_string(days, unit='D'),
+            'open': open_,
+            'close': close,
+            'low': values[:, 2],
+            'high': values[:, 3],
+            'volume': volume,
+            # volume 已换算为股数，成交额 = 股数 * 均价
+            'amount': (volume * (open_ + close) / 2).astype(np.int64),
+        })
 
-            # 转换为DataFrame
-            # 腾讯数据格式: [date, open, close, low, high, volume]
-            df_data = []
-            for item in kline_data:
-                if len(item) >= 6:
-                    df_data.append({
-                        'date': item[0],
-                        'open': float(item[1]),
-                        'close': float(item[2]),
-                        'low': float(item[3]),
-                        'high': float(item[4]),
-                        'volume': int(float(item[5])) * 100  # 成交量（手 -> 股，与 BaoStock 单位一致）
-                    })
-
-            if not df_data:
-                return None
+    # ------------------------------------------------------------------
+    # 行情快照
+    # ------------------------------------------------------------------
 
-            df = pd.DataFrame(df_data)
+    def get_daily_snapshot(self, stock_codes: List[str],
+                           batch_size: int = DEFAULT_SNAPSHOT_BATCH_SIZE) -> Optional[pd.DataFrame]:
+        """
+        批量获取股票当日（最近交易日）的 K 线快照，每次请求查询 batch_size 只股票
+        只返回收盘后（行情时间不早于 15:00）且有成交的股票
 
-            # 计算成交额（估算）
-            # volume 已换算为股数，成交额 = 股数 * 均价
-            df['amount'] = (df['volume'] * (df['open'] + df['close']) / 2).astype(int)
+        Args:
+            stock_codes: 股票代码列表（6位数字）
+            batch_size: 每次请求的股票数
 
-            # 转换日期格式
-            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        Returns:
+            DataFrame，包含列: code, date, open, close, low, high, volume, amount, pre_close（昨收）；
+            全部请求失败时返回 None
+        """
+        records = []
+        failed_batches = 0
+        batch_size = max(int(batch_size), 1)
+        batches = [stock_codes[i:i + batch_size] for i in range(0, len(stock_codes), batch_size)]
+        for batch in batches:
+            url = self.quote_url + ','.join(self._get_tencent_code(str(code)) for code in batch)
+            try:
+                with self.limiter.request():
+                    started = time.monotonic()
+                    response = self.transport.get(url, headers=HEADERS, timeout=self.timeout)
+                    self._record(response_bytes(response), started)
+                    response.raise_for_status()
+                records.extend(self._parse_snapshot(response.content.decode('gbk', errors='ignore')))
+            except Exception as e:
+                failed_batches += 1
+                self.logger.warning(f"行情快照请求失败（{len(batch)} 只）: {e}")
+
+        if batches and failed_batches == len(batches):
+            return None
+        self.logger.info(f"行情快照: 请求 {len(batches)} 次，获取 {len(records)} 只股票当日数据")
+        return pd.DataFrame(records, columns=['code', 'date', 'open', 'close', 'low', 'high',
+                                              'volume', 'amount', 'pre_close'])
+
+    @staticmethod
+    def _parse_snapshot(text: str) -> List[Dict]:
+        """解析行情接口返回的文本，跳过停牌、无成交和尚未收盘的股票"""
+        records = []
+        for _, body in _QUOTE_RE.findall(text):
+            fields = body.split('~')
+            if len(fields) <= _Q_AMOUNT:
+                continue
+            try:
+                quote_time = fields[_Q_TIME]
+                volume = int(float(fields[_Q_VOLUME]))
+                record = {
+                    'code': fields[_Q_CODE],
+                    'date': f"{quote_time[:4]}-{quote_time[4:6]}-{quote_time[6:8]}",
+                    'open': float(fields[_Q_OPEN]),
+                    'close': float(fields[_Q_PRICE]),
+                    'low': float(fields[_Q_LOW]),
+                    'high': float(fields[_Q_HIGH]),
+                    'volume': volume * 100,  # 手 -> 股，与K线数据一致
+                    'amount': int(float(fields[_Q_AMOUNT]) * 10000),  # 万元 -> 元
+                    'pre_close': float(fields[_Q_PRE_CLOSE]),
+                }
+            except (ValueError, IndexError):
+                continue
+            if volume <= 0 or record['open'] <= 0 or len(quote_time) < 14 or quote_time[8:14] < '150000':
+                continue
+            records.append(record)
+        return records
+
+    # ------------------------------------------------------------------
+    # 异步批量抓取
+    # ------------------------------------------------------------------
+
+    def fetch_histories(self, tasks: List[Tuple[str, str, str]],
+                        on_result: Callable[[str, Optional[pd.DataFrame]], None] = None,
+                        should_stop: Callable[[], bool] = None) -> Dict[str, Optional[pd.DataFrame]]:
+        """
+        异步批量获取多只股票的历史数据（同步接口，内部运行事件循环）
 
-            # 按日期排序
-            df.sort_values('date', inplace=True)
-            df.reset_index(drop=True, inplace=True)
+        Args:
+            tasks: [(股票代码, 开始日期, 结束日期), ...]，日期格式 YYYY-MM-DD
+            on_result: 每只股票完成时在事件循环线程中回调 (股票代码, DataFrame 或 None)；
+                       提供回调时结果不在内存中保留
+            should_stop: 每只股票开始前调用，返回 True 时不再发起新的股票请求
 
-            return df
+        Returns:
+            {股票代码: DataFrame 或 None}（提供 on_result 时只包含已完成的代码，值为 None）
+        """
+        return asyncio.run(self._fetch_histories(tasks, on_result, should_stop))
+
+    async def _fetch_histories(self, tasks, on_result, should_stop):
+        results: Dict[str, Optional[pd.DataFrame]] = {}
+        pending: asyncio.Queue = asyncio.Queue()
+        for task in tasks:
+            pending.put_nowait(task)
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        session = None
+        executor = None
+        # 录制模式下请求必须经过 transport（RecordingTransport）才能保存响应
+        if AIOHTTP_AVAILABLE and not isinstance(self.transport, RecordingTransport):
+            session = aiohttp.ClientSession(
+                headers=HEADERS,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.max_in_flight))
+        else:
+            executor = ThreadPoolExecutor(max_workers=self.max_in_flight,
+                                          thread_name_prefix='TencentFetch')
+
+        async def worker():
+            while not pending.empty():
+                if should_stop is not None and should_stop():
+                    return
+                stock_code, start_date, end_date = pending.get_nowait()
+                try:
+                    df = await self._get_stock_history_async(
+                        session, executor, semaphore, stock_code, start_date, end_date)
+                except Exception as e:
+                    self.logger.error(f"股票 {stock_code} 异步获取异常: {e}")
+                    df = None
+                if on_result is not None:
+                    on_result(stock_code, df)
+                    results[stock_code] = None
+                else:
+                    results[stock_code] = df
 
-        except requests.exceptions.Timeout:
-            self.logger.warning(f"股票 {tencent_code} 请求超时")
-            return None
-        except requests.exceptions.RequestException as e:
-            self.logger.warning(f"股票 {tencent_code} 网络错误: {e}")
-            return None
-        except Exception as e:
-            self.logger.error(f"股票 {tencent_code} 数据处理异常: {e}")
-            return None
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.max_in_flight, len(tasks)))))
+        finally:
+            if session is not None:
+                await session.close()
+            if executor is not None:
+                executor.shutdown(wait=False)
+        return results
+
+    async def _get_stock_history_async(self, session, executor, semaphore,
+                                       stock_code: str, start_date: str,
+                                       end_date: str) -> Optional[pd.DataFrame]:
+        """异步获取单只股票的历史数据：各段并发请求后合并"""
+        tencent_code = self._get_tencent_code(stock_code)
+        chunks = await asyncio.gather(*(
+            self._get_chunk_async(session, executor, semaphore, tencent_code, chunk_start, chunk_end)
+            for chunk_start, chunk_end in self._chunk_ranges(start_date, end_date, self.trade_dates)))
+        return self._combine_chunks(chunks)
+
+    async def _get_chunk_async(self, session, executor, semaphore, tencent_code: str,
+                               start_date: str, end_date: str) -> Optional[pd.DataFrame]:
+        """异步获取一段数据（最多500条），受在途请求上限和自适应限速约束，失败时退避重试"""
+        url = self._kline_url(tencent_code, start_date, end_date)
+        for attempt in range(self.retry_times):
+            try:
+                async with semaphore, self.limiter.request_async() as outcome:
+                    if session is not None:
+                        started = time.monotonic()
+                        async with session.get(url) as response:
+                            body = await response.read()
+                            self._record(response.content_length or len(body), started)
+                            response.raise_for_status()
+                            data = json.loads(body)
+                    else:
+                        loop = asyncio.get_running_loop()
+                        data = await loop.run_in_executor(executor, self._get_json, url)
+                    if data.get('code') != 0:
+                        outcome.empty()
+                return self._parse_kline(tencent_code, data, start_date, end_date)
+            except Exception as e:
+                self.logger.warning(f"股票 {tencent_code} 请求失败 (尝试 {attempt + 1}/{self.retry_times}): {e}")
+                if attempt < self.retry_times - 1:
+                    await asyncio.sleep(backoff_delay(self.retry_delay, attempt))
+        return None
+
+    @staticmethod
+    def _chunk_ranges(start_date: str, end_date: str,
+                      trade_dates: pd.DatetimeIndex = None) -> List[Tuple[str, str]]:
+        """
+        将日期区间切分为首尾相接的若干段，每段不超过500个交易日
+        交易日取自交易日历，日历未覆盖的部分按工作日计（工作日不少于交易日，切分偏保守）
+        """
+        start_dt = pd.Timestamp(start_date)
+        end_dt = pd.Timestamp(end_date)
+        if start_dt > end_dt:
+            return []
+        days = pd.bdate_range(start_dt, end_dt)
+        if trade_dates is not None and len(trade_dates) > 0:
+            covered = (days >= trade_dates[0]) & (days <= trade_dates[-1])
+            days = days[~covered].union(trade_dates[(trade_dates >= start_dt) & (trade_dates <= end_dt)])
+        ranges = []
+        chunk_start = start_dt
+        for i in range(MAX_KLINE_ROWS - 1, len(days) - 1, MAX_KLINE_ROWS):
+            ranges.append((chunk_start.strftime('%Y-%m-%d'), days[i].strftime('%Y-%m-%d')))
+            chunk_start = days[i] + timedelta(days=1)
+        ranges.append((chunk_start.strftime('%Y-%m-%d'), end_dt.strftime('%Y-%m-%d')))
+        return ranges
 
     def test_connection(self) -> bool:
         """测试数据源连接"""
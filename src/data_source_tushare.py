@@ -1,24 +1,53 @@
 """
 Tushare Pro 数据源模块
-支持股票历史数据下载，自动处理限频
+支持股票历史数据下载，自动处理限频（自适应限速，触发接口频率限制时自动降速）
+
+除按股票下载外，还支持按交易日获取全市场截面 (get_daily_cross_section)：
+daily + adj_factor 两次调用返回当天所有股票的日线和复权因子
 """
 
 import pandas as pd
-import time
 import os
+import sys
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rate_limiter import AdaptiveRateLimiter
+
+
+# 前复权调整的价格列（与 pro_bar 一致）
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'pre_close']
+
+# 默认初始限速：每秒 20 次调用（也是速率上限），触发频率限制后按反馈降速
+DEFAULT_REQUEST_RATE = 20.0
+
+# Tushare 日线字段 -> 本地列名
+DAILY_COLUMN_MAP = {
+    'trade_date': 'date',
+    'open': 'open',
+    'high': 'high',
+    'low': 'low',
+    'close': 'close',
+    'vol': 'volume',
+    'amount': 'amount',
+    'pre_close': 'pre_close',
+    'change': 'change',
+    'pct_chg': 'change_pct',
+}
 
 
 class TushareDataSource:
     """Tushare Pro 数据源"""
 
-    def __init__(self, token: str = None):
+    def __init__(self, token: str = None, limiter: AdaptiveRateLimiter = None):
         """
         初始化Tushare数据源
 
         Args:
             token: Tushare Pro API Token，如果不提供则从环境变量获取
+            limiter: 共享的自适应限速器（None 时新建，不保存学到的速率）
         """
         self.token = token or os.environ.get('TUSHARE_TOKEN')
         self.pro = None
@@ -37,15 +66,14 @@ class TushareDataSource:
             raise ImportError("请安装tushare: pip install tushare")
 
         # 限频控制
-        self.last_call_time = 0
-        self.min_interval = 0.05  # 每秒最多20次调用
+        self.limiter = limiter or AdaptiveRateLimiter(
+            'tushare', DEFAULT_REQUEST_RATE, min_rate=0.5, max_rate=DEFAULT_REQUEST_RATE,
+            logger=self.logger)
 
-    def _rate_limit(self):
-        """限频控制"""
-        elapsed = time.time() - self.last_call_time
-        if elapsed < self.min_interval:
-            time.sleep(self.min_interval - elapsed)
-        self.last_call_time = time.time()
+    def _call(self, api, **kwargs):
+        """经限速器调用 Tushare 接口（频率限制报错会使限速器降速，异常向上抛出）"""
+        with self.limiter.request():
+            return api(**kwargs)
 
     def get_stock_list(self) -> Optional[pd.DataFrame]:
         """
@@ -55,11 +83,9 @@ class TushareDataSource:
             股票列表DataFrame
         """
         try:
-            self._rate_limit()
-
             # 获取上市股票列表
-            df = self.pro.stock_basic(exchange='', list_status='L',
-                                     fields='ts_code,symbol,name,area,industry,list_date')
+            df = self._call(self.pro.stock_basic, exchange='', list_status='L',
+                            fields='ts_code,symbol,name,area,industry,list_date')
 
             if df is None or df.empty:
                 return None
@@ -137,59 +163,120 @@ class TushareDataSource:
             elif adjust == 'hfq':
                 adj_flag = '2'  # 后复权
 
-            self._rate_limit()
-
             # 调用Tushare API
             if adj_flag:
                 # 使用复权接口
-                df = self.pro.pro_bar(ts_code=ts_code, adj=adj_flag,
-                                     start_date=start_date, end_date=end_date,
-                                     freq='D')
+                df = self._call(self.pro.pro_bar, ts_code=ts_code, adj=adj_flag,
+                                start_date=start_date, end_date=end_date,
+                                freq='D')
             else:
                 # 使用不复权接口
-                df = self.pro.daily(ts_code=ts_code,
-                                  start_date=start_date, end_date=end_date)
+                df = self._call(self.pro.daily, ts_code=ts_code,
+                                start_date=start_date, end_date=end_date)
 
             if df is None or df.empty:
                 return None
 
-            # 标准化列名
-            column_map = {
-                'trade_date': 'date',
-                'open': 'open',
-                'high': 'high',
-                'low': 'low',
-                'close': 'close',
-                'vol': 'volume',
-                'amount': 'amount',
-                'pre_close': 'pre_close',
-                'change': 'change',
-                'pct_chg': 'change_pct',
-            }
-
-            # 重命名存在的列
-            available_cols = {k: v for k, v in column_map.items() if k in df.columns}
-            df = df.rename(columns=available_cols)
+            return self._standardize_daily(df)
 
-            # 转换日期格式
-            df['date'] = pd.to_datetime(df['date'], format='%Y%m%d')
-            df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"获取 {stock_code} 历史数据失败: {e}")
+            return None
 
-            # 按日期排序
-            df = df.sort_values('date').reset_index(drop=True)
+    @staticmethod
+    def _standardize_daily(df: pd.DataFrame) -> pd.DataFrame:
+        """标准化 daily / pro_bar 返回的日线：列名、日期格式、排序和数值类型"""
+        # 重命名存在的列
+        available_cols = {k: v for k, v in DAILY_COLUMN_MAP.items() if k in df.columns}
+        df = df.rename(columns=available_cols)
 
-            # 确保数值列正确
-            numeric_cols = ['open', 'high', 'low', 'close', 'volume', 'amount', 'change_pct']
-            for col in numeric_cols:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
+        # 转换日期格式
+        df['date'] = pd.to_datetime(df['date'], format='%Y%m%d')
+        df['date'] = df['date'].dt.strftime('%Y-%m-%d')
 
-            return df
+        # 按日期排序
+        df = df.sort_values('date').reset_index(drop=True)
+
+        # 确保数值列正确
+        numeric_cols = ['open', 'high', 'low', 'close', 'volume', 'amount', 'change_pct']
+        for col in numeric_cols:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+
+        return df
+
+    def get_trade_dates(self, start_date: str, end_date: str) -> Optional[List[str]]:
+        """
+        获取区间内的交易日
+
+        Args:
+            start_date: 开始日期 'YYYYMMDD'
+            end_date: 结束日期 'YYYYMMDD'
+
+        Returns:
+            交易日列表 ['YYYYMMDD', ...]（升序），失败时返回 None
+        """
+        df = self.get_trade_calendar(start_date, end_date)
+        if df is None or df.empty:
+            return None
+        if 'is_open' in df.columns:
+            df = df[df['is_open'].astype(int) == 1]
+        return sorted(df['cal_date'].astype(str).tolist())
 
+    def get_adj_factors(self, trade_date: str) -> Optional[pd.Series]:
+        """
+        获取某交易日全市场的复权因子
+
+        Args:
+            trade_date: 交易日期 'YYYYMMDD'
+
+        Returns:
+            以股票代码（6位）为索引的复权因子，失败时返回 None
+        """
+        try:
+            df = self._call(self.pro.adj_factor, trade_date=trade_date)
+            if df is None:
+                return None
+            codes = df['ts_code'].astype(str).str.split('.').str[0]
+            return pd.Series(pd.to_numeric(df['adj_factor'], errors='coerce').values, index=codes)
         except Exception as e:
             if self.logger:
-                self.logger.error(f"获取 {stock_code} 历史数据失败: {e}")
+                self.logger.error(f"获取 {trade_date} 复权因子失败: {e}")
+            return None
+
+    def get_daily_cross_section(self, trade_date: str,
+                                adj_factors: Optional[pd.Series] = None) -> Optional[pd.DataFrame]:
+        """
+        获取某交易日全市场的日线（不复权价格）及复权因子
+
+        Args:
+            trade_date: 交易日期 'YYYYMMDD'
+            adj_factors: 已获取的当日复权因子（None 时调用 adj_factor 接口）
+
+        Returns:
+            DataFrame，列与 get_stock_history 一致，另附 code、adj_factor 列；
+            当日无数据时返回空 DataFrame，请求失败时返回 None
+        """
+        try:
+            df = self._call(self.pro.daily, trade_date=trade_date)
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"获取 {trade_date} 全市场日线失败: {e}")
+            return None
+        if df is None:
             return None
+        if df.empty:
+            return pd.DataFrame()
+
+        if adj_factors is None:
+            adj_factors = self.get_adj_factors(trade_date)
+            if adj_factors is None:
+                return None
+        df = self._standardize_daily(df)
+        df['code'] = df['ts_code'].astype(str).str.split('.').str[0]
+        df['adj_factor'] = df['code'].map(adj_factors)
+        return df
 
     def get_daily_basic(self, stock_code: str, trade_date: str = None) -> Optional[pd.DataFrame]:
         """
@@ -206,13 +293,11 @@ class TushareDataSource:
             market = self._get_market(stock_code)
             ts_code = f"{stock_code}.{market}"
 
-            self._rate_limit()
-
             if trade_date:
-                df = self.pro.daily_basic(ts_code=ts_code, trade_date=trade_date)
+                df = self._call(self.pro.daily_basic, ts_code=ts_code, trade_date=trade_date)
             else:
                 # 获取最近一天
-                df = self.pro.daily_basic(ts_code=ts_code)
+                df = self._call(self.pro.daily_basic, ts_code=ts_code)
 
             return df
 
@@ -233,9 +318,7 @@ class TushareDataSource:
             交易日历DataFrame
         """
         try:
-            self._rate_limit()
-
-            df = self.pro.trade_cal(exchange='SSE', start_date=start_date, end_date=end_date)
+            df = self._call(self.pro.trade_cal, exchange='SSE', start_date=start_date, end_date=end_date)
             return df
 
         except Exception as e:
@@ -254,9 +337,7 @@ class TushareDataSource:
             涨停股票DataFrame
         """
         try:
-            self._rate_limit()
-
-            df = self.pro.limit_list(trade_date=trade_date)
+            df = self._call(self.pro.limit_list, trade_date=trade_date)
             return df
 
         except Exception as e:
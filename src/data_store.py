@@ -0,0 +1,545 @@
+"""
+日线数据存储模块
+统一管理 data/daily 下单只股票日线文件的读写，支持 CSV 与列式 Parquet 两种格式
+
+存储格式由 config.ini 的 [Paths] storage_format 选择:
+  csv     -- 默认，每只股票一个 UTF-8-BOM CSV（兼容旧数据）
+  parquet -- 每只股票一个 Parquet 文件，列类型固定、zstd 压缩，读取无需解析文本
+"""
+
+import io
+import os
+import csv
+import json
+import logging
+from typing import Optional, List, Tuple, Dict, Iterable
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+# 支持的存储格式 -> 文件扩展名
+STORAGE_FORMATS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+}
+DEFAULT_STORAGE_FORMAT = 'csv'
+
+# 日线数据列的固定类型（列式存储按此类型写入）
+DAILY_FLOAT_COLUMNS = ['open', 'high', 'low', 'close', 'amount',
+                       'amplitude', 'change_pct', 'change', 'turnover', 'turn',
+                       'pre_close']
+DAILY_INT_COLUMNS = ['volume']
+
+# Parquet 行组大小（约一年交易日），读取最近 N 行时只需解码末尾行组
+PARQUET_ROW_GROUP_SIZE = 250
+
+
+def normalize_storage_format(storage_format: Optional[str]) -> str:
+    """
+    校验存储格式，不可用时回退为 CSV
+
+    Args:
+        storage_format: 配置中的存储格式
+
+    Returns:
+        实际使用的存储格式
+    """
+    fmt = (storage_format or DEFAULT_STORAGE_FORMAT).strip().lower()
+    if fmt not in STORAGE_FORMATS:
+        logging.warning(f"不支持的存储格式: {storage_format}，使用 {DEFAULT_STORAGE_FORMAT}")
+        return DEFAULT_STORAGE_FORMAT
+    if fmt == 'parquet' and not PARQUET_AVAILABLE:
+        logging.warning("Parquet 存储需要 pyarrow，请安装: pip install pyarrow，暂时使用 CSV")
+        return DEFAULT_STORAGE_FORMAT
+    return fmt
+
+
+def get_storage_format(config) -> str:
+    """从 Config 对象读取 [Paths] storage_format"""
+    return normalize_storage_format(
+        config.get('Paths', 'storage_format', fallback=DEFAULT_STORAGE_FORMAT))
+
+
+def is_stock_data_file(path: str) -> bool:
+    """判断路径是否为支持的日线数据文件"""
+    return os.path.splitext(path)[1].lower() in STORAGE_FORMATS.values()
+
+
+def stock_code_from_path(path: str) -> str:
+    """从数据文件路径提取股票代码"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def stock_file_path(daily_dir: str, stock_code: str,
+                    storage_format: str = DEFAULT_STORAGE_FORMAT) -> str:
+    """
+    获取指定格式下的股票数据文件路径
+
+    Args:
+        daily_dir: 日线数据目录
+        stock_code: 股票代码
+        storage_format: 存储格式
+
+    Returns:
+        文件路径
+    """
+    ext = STORAGE_FORMATS.get(storage_format, STORAGE_FORMATS[DEFAULT_STORAGE_FORMAT])
+    return os.path.join(daily_dir, f"{stock_code}{ext}")
+
+
+def list_stock_files(daily_dir: str) -> List[str]:
+    """
+    列出目录下所有股票数据文件（各格式混合时每只股票只保留最新修改的文件）
+
+    Args:
+        daily_dir: 日线数据目录
+
+    Returns:
+        文件路径列表
+    """
+    if not os.path.isdir(daily_dir):
+        return []
+
+    latest: Dict[str, Tuple[float, str]] = {}
+    with os.scandir(daily_dir) as it:
+        for entry in it:
+            if not entry.is_file() or not is_stock_data_file(entry.name):
+                continue
+            code = stock_code_from_path(entry.name)
+            mtime = entry.stat().st_mtime
+            if code not in latest or mtime > latest[code][0]:
+                latest[code] = (mtime, entry.path)
+
+    return [latest[code][1] for code in sorted(latest)]
+
+
+def find_stock_file(daily_dir: str, stock_code: str) -> Optional[str]:
+    """
+    查找股票已有的数据文件（任意格式，多个时取最新修改的）
+
+    Returns:
+        文件路径，不存在时返回 None
+    """
+    found = None
+    found_mtime = None
+    for ext in STORAGE_FORMATS.values():
+        path = os.path.join(daily_dir, f"{stock_code}{ext}")
+        if os.path.exists(path):
+            mtime = os.path.getmtime(path)
+            if found is None or mtime > found_mtime:
+                found, found_mtime = path, mtime
+    return found
+
+
+def is_parquet_path(path: str) -> bool:
+    return path.lower().endswith(STORAGE_FORMATS['parquet'])
+
+
+def _read_csv_tail_text(path: str, n: int, block_size: int = 65536) -> Tuple[str, str]:
+    """
+    从文件末尾向前按块读取，返回 (表头行, 最后 n 个数据行文本)
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        header_end = f.tell()
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b''
+        while pos > header_end:
+            size = min(block_size, pos - header_end)
+            pos -= size
+            f.seek(pos)
+            data = f.read(size) + data
+            # 多取一行，保证块首的半行被丢弃后仍有 n 个完整行
+            if data.count(b'\n') > n:
+                break
+    lines = data.rstrip(b'\r\n').split(b'\n')
+    if pos > header_end:
+        lines = lines[1:]
+    lines = [line for line in lines[-n:] if line.strip()]
+    return header.decode('utf-8-sig'), b'\n'.join(lines).decode('utf-8')
+
+
+def _read_parquet_tail(path: str, n: int, columns: Optional[List[str]]) -> pd.DataFrame:
+    """只读取覆盖最后 n 行所需的末尾行组"""
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    groups = []
+    rows = 0
+    for i in range(pf.metadata.num_row_groups - 1, -1, -1):
+        groups.insert(0, i)
+        rows += pf.metadata.row_group(i).num_rows
+        if rows >= n:
+            break
+    if not groups:
+        return pd.read_parquet(path, columns=columns)
+    table = pf.read_row_groups(groups, columns=columns)
+    return table.to_pandas().tail(n).reset_index(drop=True)
+
+
+def read_stock_data(path: str, columns: Optional[List[str]] = None,
+                    last_n_rows: Optional[int] = None,
+                    **csv_kwargs) -> pd.DataFrame:
+    """
+    读取单只股票数据文件（按扩展名选择格式，异常向上抛出）
+
+    Args:
+        path: 文件路径
+        columns: 只读取的列（None 表示全部）
+        last_n_rows: 只读取最后 N 行（CSV 从文件末尾向前读取，Parquet 只读末尾行组）
+        **csv_kwargs: CSV 格式时传给 pandas.read_csv 的参数
+
+    Returns:
+        DataFrame
+    """
+    if is_parquet_path(path):
+        if columns is None and 'usecols' in csv_kwargs:
+            columns = list(csv_kwargs['usecols'])
+        if last_n_rows:
+            return _read_parquet_tail(path, last_n_rows, columns)
+        return pd.read_parquet(path, columns=columns)
+
+    if columns is not None:
+        csv_kwargs['usecols'] = columns
+    csv_kwargs.setdefault('dtype', {'code': str})
+    if last_n_rows:
+        header, body = _read_csv_tail_text(path, last_n_rows)
+        return pd.read_csv(io.StringIO(header + body), **csv_kwargs)
+    return pd.read_csv(path, **csv_kwargs)
+
+
+def _read_csv_header(path: str) -> List[str]:
+    """读取 CSV 表头列名"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f), [])
+
+
+def _read_csv_last_line(path: str, block_size: int = 4096) -> Optional[str]:
+    """
+    从文件末尾向前读取最后一个非空数据行，只有表头时返回 None
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b''
+        while pos > 0:
+            size = min(block_size, pos)
+            pos -= size
+            f.seek(pos)
+            data = f.read(size) + data
+            lines = data.rstrip(b'\r\n').split(b'\n')
+            if len(lines) > 1:
+                return lines[-1].decode('utf-8-sig').rstrip('\r')
+        return None
+
+
+def _parquet_date_range(path: str) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    """优先使用 Parquet 行组统计信息获取日期范围，无统计信息时读取 date 列"""
+    import pyarrow.parquet as pq
+
+    meta = pq.ParquetFile(path).metadata
+    col_idx = meta.schema.names.index('date')
+    first = last = None
+    for i in range(meta.num_row_groups):
+        stats = meta.row_group(i).column(col_idx).statistics
+        if stats is None or not stats.has_min_max:
+            dates = pd.to_datetime(pd.read_parquet(path, columns=['date'])['date'])
+            return (dates.min(), dates.max()) if len(dates) else (None, None)
+        lo, hi = pd.Timestamp(stats.min), pd.Timestamp(stats.max)
+        first = lo if first is None else min(first, lo)
+        last = hi if last is None else max(last, hi)
+    return first, last
+
+
+def read_date_range(path: str) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    """
+    读取数据文件的 (最早日期, 最新日期)，不加载全部数据
+    CSV 只读表头、第一行与文件末尾；Parquet 只读元数据
+
+    Returns:
+        (最早日期, 最新日期)，无数据或无法解析时对应位置为 None
+    """
+    try:
+        if is_parquet_path(path):
+            return _parquet_date_range(path)
+
+        header = _read_csv_header(path)
+        if 'date' not in header:
+            return None, None
+        idx = header.index('date')
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            first_row = next(reader, None)
+        last_line = _read_csv_last_line(path)
+        if not first_row or last_line is None:
+            return None, None
+        last_row = next(csv.reader([last_line]))
+        first = pd.to_datetime(first_row[idx], errors='coerce')
+        last = pd.to_datetime(last_row[idx], errors='coerce')
+        return (None if pd.isna(first) else first), (None if pd.isna(last) else last)
+    except Exception:
+        return None, None
+
+
+def read_last_date(path: str) -> Optional[pd.Timestamp]:
+    """读取数据文件的最新日期（只读文件末尾/元数据）"""
+    return read_date_range(path)[1]
+
+
+def append_stock_data(df: pd.DataFrame, path: str, sync: bool = False) -> bool:
+    """
+    将新数据行追加到已有 CSV 文件末尾（不读取、不重写历史数据）
+    调用方需保证 df 中的日期均晚于文件最新日期
+
+    Parquet 文件不支持原地追加，列不一致时也不追加，均返回 False 由调用方改为整体重写
+    原地追加不是原子操作：进程在写入中途退出可能留下半行，需要时由 BatchWriteLog 回滚
+
+    Args:
+        df: 新增数据
+        path: 已有数据文件路径
+        sync: 返回前 fsync，保证追加的数据已落盘
+
+    Returns:
+        是否已追加
+    """
+    if is_parquet_path(path) or not os.path.exists(path):
+        return False
+
+    header = _read_csv_header(path)
+    if not header or set(header) != set(df.columns):
+        return False
+
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        needs_newline = False
+        if size > 0:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) not in (b'\n', b'\r')
+
+    out = df[header].copy()
+    if 'date' in out.columns:
+        out['date'] = pd.to_datetime(out['date']).dt.strftime('%Y-%m-%d')
+
+    # 先拼好全部新增行再一次写入；写入出错时截断回原长度，不留下半行
+    text = out.to_csv(header=False, index=False, lineterminator=os.linesep)
+    if needs_newline:
+        text = os.linesep + text
+    with open(path, 'ab') as f:
+        try:
+            f.write(text.encode('utf-8'))
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+        except Exception:
+            f.truncate(size)
+            raise
+    return True
+
+
+def fsync_file(path: str):
+    """把文件内容刷到磁盘"""
+    with open(path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+
+def fsync_dir(path: str):
+    """把目录项（新建、替换的文件名）刷到磁盘；Windows 不支持打开目录，跳过"""
+    if os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class BatchWriteLog:
+    """
+    批量写入的回滚记录，使一批写入在进程中断后要么全部保留、要么原地追加全部撤销
+
+    写入前登记本批涉及的已有文件的长度和 inode 并落盘；全部写入 fsync 后删除记录。
+    进程在两者之间中断时，下次 recover() 把 inode 未变（原地追加过）且变长的文件
+    截断回登记的长度；已被临时文件整体替换的文件（inode 已变）是完整的新版本，保留不动
+    """
+
+    def __init__(self, path: str, logger: logging.Logger = None):
+        """
+        Args:
+            path: 记录文件路径
+            logger: 日志记录器
+        """
+        self.path = path
+        self.logger = logger or logging.getLogger('DataStore')
+
+    def begin(self, paths: Iterable[str]):
+        """登记本批将要写入的文件（不存在的文件不需要回滚），记录落盘后返回"""
+        entries = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries[os.path.abspath(path)] = {'size': stat.st_size, 'ino': stat.st_ino}
+        if not entries:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        fsync_dir(os.path.dirname(os.path.abspath(self.path)))
+
+    def commit(self, directories: Iterable[str] = ()):
+        """本批写入已各自 fsync：刷新目录项后删除记录"""
+        for directory in directories:
+            fsync_dir(directory)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def recover(self) -> List[str]:
+        """
+        撤销上次中断的批次中未确认的原地追加
+
+        Returns:
+            截断回原长度的文件列表
+        """
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"读取写入回滚记录失败 {self.path}: {e}")
+            entries = {}
+        rolled_back = []
+        for path, entry in entries.items():
+            try:
+                stat = os.stat(path)
+                if stat.st_ino != entry['ino'] or stat.st_size <= entry['size']:
+                    continue
+                with open(path, 'rb+') as f:
+                    f.truncate(entry['size'])
+                    os.fsync(f.fileno())
+                rolled_back.append(path)
+            except (OSError, KeyError, TypeError) as e:
+                self.logger.warning(f"回滚未完成的追加失败 {path}: {e}")
+        os.remove(self.path)
+        return rolled_back
+
+
+def normalize_daily_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    按固定 schema 转换日线数据：date 为 datetime64，code 为 6 位字符串，
+    价格/金额类为 float64，volume 为 int64（有缺失值时为 float64）；
+    去掉无效日期并按日期升序去重
+
+    Args:
+        df: 原始日线数据
+
+    Returns:
+        新的 DataFrame
+    """
+    df = df.copy()
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        df = df.dropna(subset=['date'])
+        if not df['date'].is_monotonic_increasing or df['date'].duplicated().any():
+            df = df.drop_duplicates(subset=['date'], keep='last').sort_values('date')
+    if 'code' in df.columns:
+        df['code'] = df['code'].astype(str).str.zfill(6)
+    for col in DAILY_FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    for col in DAILY_INT_COLUMNS:
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce')
+            # 存在缺失值时保留浮点类型，避免强制转换失败
+            df[col] = values.astype('int64') if values.notna().all() else values.astype('float64')
+    return df.reset_index(drop=True)
+
+
+def write_stock_data(df: pd.DataFrame, path: str, sync: bool = False, **csv_kwargs) -> None:
+    """
+    写入单只股票数据文件（按扩展名选择格式，异常向上抛出）
+    先写入同目录下的临时文件再替换，中途失败或进程退出不会留下写了一半的文件
+
+    Args:
+        df: 数据
+        path: 文件路径
+        sync: 替换前 fsync 临时文件（目录项由调用方 fsync_dir 落盘）
+        **csv_kwargs: CSV 格式时传给 DataFrame.to_csv 的参数
+    """
+    dir_name = os.path.dirname(path)
+    if dir_name:
+        os.makedirs(dir_name, exist_ok=True)
+
+    tmp_path = path + '.tmp'
+    try:
+        if is_parquet_path(path):
+            normalize_daily_frame(df).to_parquet(tmp_path, index=False, compression='zstd',
+                                                 row_group_size=PARQUET_ROW_GROUP_SIZE)
+        else:
+            df.to_csv(tmp_path, index=False, encoding='utf-8-sig', **csv_kwargs)
+        if sync:
+            fsync_file(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def migrate_daily_dir(daily_dir: str, target_format: str,
+                      remove_source: bool = True,
+                      logger: logging.Logger = None) -> Tuple[int, int]:
+    """
+    将日线目录下所有数据文件一次性转换为目标格式
+
+    Args:
+        daily_dir: 日线数据目录
+        target_format: 目标格式 (csv/parquet)
+        remove_source: 转换成功后是否删除原文件
+        logger: 日志记录器
+
+    Returns:
+        (转换数量, 失败数量)
+    """
+    logger = logger or logging.getLogger('DataStore')
+    target_format = normalize_storage_format(target_format)
+    target_ext = STORAGE_FORMATS[target_format]
+
+    converted = 0
+    failed = 0
+    files = list_stock_files(daily_dir)
+    logger.info(f"开始迁移 {len(files)} 个数据文件 -> {target_format}")
+
+    for i, src_path in enumerate(files):
+        if src_path.endswith(target_ext):
+            continue
+        code = stock_code_from_path(src_path)
+        dst_path = stock_file_path(daily_dir, code, target_format)
+        try:
+            df = read_stock_data(src_path)
+            write_stock_data(df, dst_path)
+            if remove_source:
+                os.remove(src_path)
+            converted += 1
+        except Exception as e:
+            logger.error(f"迁移 {code} 失败: {e}")
+            failed += 1
+
+        if (i + 1) % 500 == 0:
+            logger.info(f"迁移进度: {i + 1}/{len(files)}")
+
+    logger.info(f"迁移完成: 转换 {converted}, 失败 {failed}")
+    return converted, failed
@@ -0,0 +1,236 @@
+"""
+下载任务日志模块
+长时间的批量下载把计划、已完成和失败的股票（错误类型与尝试次数）记录在
+daily_dir/_journal_<任务名>.json 中，运行过程中定期保存检查点：
+
+- 中断（断网、达到下载限制、Ctrl-C）后重新运行同一任务时，跳过上次失败的股票继续执行；
+  已登记完成的股票只按本地元数据复核（后台写入可能晚于登记），不会重新请求
+- --retry-failed 只重新尝试上次失败的股票
+- 日志随目标交易日更新：目标日期变化或上次任务已全部处理时开始新任务
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, List, Dict, Iterable
+
+import pandas as pd
+
+
+JOURNAL_VERSION = 1
+# 每登记多少只股票保存一次检查点
+CHECKPOINT_INTERVAL = 50
+# 距上次保存超过多少秒时保存检查点
+CHECKPOINT_SECONDS = 10.0
+
+
+def journal_path(daily_dir: str, job: str) -> str:
+    """任务日志文件路径"""
+    return os.path.join(daily_dir, f'_journal_{job}.json')
+
+
+def error_class(error) -> str:
+    """失败原因的类别：异常取类名，字符串原样返回"""
+    if error is None:
+        return 'DownloadError'
+    if isinstance(error, BaseException):
+        return type(error).__name__
+    return str(error)
+
+
+class DownloadJournal:
+    """批量下载任务日志（线程安全）"""
+
+    def __init__(self, path: str, job: str, logger: logging.Logger = None):
+        """
+        Args:
+            path: 日志文件路径
+            job: 任务名
+            logger: 日志记录器
+        """
+        self.path = path
+        self.job = job
+        self.logger = logger or logging.getLogger('DownloadJournal')
+        self.target_date: Optional[str] = None
+        self.started_at: Optional[str] = None
+        self.plan: List[str] = []
+        self.completed: Dict[str, str] = {}
+        # 股票代码 -> {'error': 错误类型, 'attempts': 尝试次数, 'last_attempt': 时间}
+        self.failed: Dict[str, Dict] = {}
+        self.resumed = False
+        # 股票代码 -> 累计失败次数（重试时沿用）
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending_writes = 0
+        self._last_save = time.monotonic()
+
+    # ------------------------------------------------------------------
+    # 打开任务
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def open(cls, daily_dir: str, job: str, codes: Iterable[str], target_date,
+             retry_failed: bool = False, logger: logging.Logger = None) -> 'DownloadJournal':
+        """
+        打开任务日志：同一目标日期的未完成任务继续执行，否则按 codes 开始新任务
+
+        Args:
+            daily_dir: 日线数据目录
+            job: 任务名
+            codes: 本次计划处理的股票代码
+            target_date: 目标交易日
+            retry_failed: 只重新尝试上次失败的股票（不要求目标日期相同）
+            logger: 日志记录器
+
+        Returns:
+            DownloadJournal（to_process() 为本次需要处理的股票）
+        """
+        journal = cls(journal_path(daily_dir, job), job, logger)
+        target = pd.Timestamp(target_date).strftime('%Y-%m-%d')
+        previous = journal._load()
+
+        if retry_failed:
+            if previous is None or not journal.failed:
+                journal.logger.info(f"任务 {job} 没有失败记录，无需重试")
+                journal.plan = []
+            else:
+                journal.plan = list(journal.failed)
+                journal.resumed = True
+                journal.logger.info(f"任务 {job} 重试上次失败的 {len(journal.plan)} 只股票")
+            journal.completed = {}
+            journal.failed = {}
+            journal.target_date = target
+            journal.started_at = datetime.now().isoformat(timespec='seconds')
+            journal.checkpoint()
+            return journal
+
+        if previous is not None and journal.target_date == target and journal.pending():
+            journal.resumed = True
+            journal.logger.info(f"继续上次中断的任务 {job}（{journal.started_at} 开始）: "
+                                f"已完成 {len(journal.completed)}，失败 {len(journal.failed)}，"
+                                f"剩余 {len(journal.pending())}")
+            return journal
+
+        journal.target_date = target
+        journal.started_at = datetime.now().isoformat(timespec='seconds')
+        journal.plan = [str(code) for code in codes]
+        journal.completed = {}
+        journal.failed = {}
+        journal._attempts = {}
+        journal.checkpoint()
+        return journal
+
+    def _load(self) -> Optional[Dict]:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"读取任务日志失败，将开始新任务: {e}")
+            return None
+        if data.get('version') != JOURNAL_VERSION:
+            return None
+        self.target_date = data.get('target_date')
+        self.started_at = data.get('started_at')
+        self.plan = data.get('plan', [])
+        self.completed = data.get('completed', {})
+        self.failed = data.get('failed', {})
+        self._attempts = {code: record.get('attempts', 0) for code, record in self.failed.items()}
+        return data
+
+    # ------------------------------------------------------------------
+    # 登记结果
+    # ------------------------------------------------------------------
+
+    def pending(self) -> List[str]:
+        """计划中尚未处理（既未完成也未失败）的股票，保持计划顺序"""
+        with self._lock:
+            return [code for code in self.plan if code not in self.completed and code not in self.failed]
+
+    def to_process(self) -> List[str]:
+        """本次需要处理的股票：计划中除已失败外的全部股票"""
+        with self._lock:
+            return [code for code in self.plan if code not in self.failed]
+
+    def record_success(self, stock_code: str):
+        with self._lock:
+            self.failed.pop(stock_code, None)
+            self.completed[stock_code] = datetime.now().isoformat(timespec='seconds')
+        self._maybe_checkpoint()
+
+    def record_failure(self, stock_code: str, error=None):
+        """
+        登记失败（累计尝试次数）
+
+        Args:
+            stock_code: 股票代码
+            error: 异常或错误类型名
+        """
+        with self._lock:
+            self.completed.pop(stock_code, None)
+            self._attempts[stock_code] = self._attempts.get(stock_code, 0) + 1
+            self.failed[stock_code] = {
+                'error': error_class(error),
+                'attempts': self._attempts[stock_code],
+                'last_attempt': datetime.now().isoformat(timespec='seconds'),
+            }
+        self._maybe_checkpoint()
+
+    def record(self, stock_code: str, success: bool, error=None):
+        if success:
+            self.record_success(stock_code)
+        else:
+            self.record_failure(stock_code, error)
+
+    def summary(self) -> str:
+        with self._lock:
+            errors: Dict[str, int] = {}
+            for record in self.failed.values():
+                errors[record['error']] = errors.get(record['error'], 0) + 1
+        text = f"已完成 {len(self.completed)}，失败 {len(self.failed)}，剩余 {len(self.pending())}"
+        if errors:
+            text += '（' + '，'.join(f"{name} {count}" for name, count in errors.items()) + '）'
+        return text
+
+    # ------------------------------------------------------------------
+    # 检查点
+    # ------------------------------------------------------------------
+
+    def _maybe_checkpoint(self):
+        with self._lock:
+            self._pending_writes += 1
+            due = (self._pending_writes >= CHECKPOINT_INTERVAL
+                   or time.monotonic() - self._last_save >= CHECKPOINT_SECONDS)
+        if due:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """原子写入任务日志"""
+        with self._lock:
+            data = {
+                'version': JOURNAL_VERSION,
+                'job': self.job,
+                'target_date': self.target_date,
+                'started_at': self.started_at,
+                'plan': list(self.plan),
+                'completed': dict(self.completed),
+                'failed': {code: dict(record) for code, record in self.failed.items()},
+            }
+            self._pending_writes = 0
+            self._last_save = time.monotonic()
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            return
+        tmp_path = self.path + '.tmp'
+        with self._write_lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                self.logger.warning(f"保存任务日志失败: {e}")
@@ -0,0 +1,211 @@
+"""
+下载计量模块
+按数据源统计每日的请求数、传输字节数、数据行数和请求耗时，作为每日下载限制
+（[Download] daily_download_limit_mb）的依据：
+
+- 腾讯数据源按每个 HTTP 响应实际传输的字节数计量（有 Content-Length 时取压缩后的大小）
+- AkShare / BaoStock / Tushare 经各自的客户端库请求，看不到原始响应，
+  按返回数据的 CSV 文本大小计量
+- 计数器线程安全，同步线程、异步抓取和多进程下载的结果回调共用
+- 当日累计按日期保存到状态文件（data/download_meter.json），重新运行时从当日累计继续，
+  每日限制不会因重启而清零；保留最近 KEEP_DAYS 天
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+import pandas as pd
+
+
+# 状态文件保留的天数
+KEEP_DAYS = 30
+# 距上次保存超过多少秒时自动保存
+SAVE_SECONDS = 10.0
+
+_COUNTERS = ('requests', 'bytes', 'rows', 'timed', 'latency_s')
+
+
+def response_bytes(response) -> int:
+    """HTTP 响应实际传输的字节数（requests 的 Response）"""
+    length = response.headers.get('Content-Length')
+    if length and length.isdigit():
+        return int(length)
+    return len(response.content)
+
+
+def frame_bytes(df: Optional[pd.DataFrame]) -> int:
+    """数据按 CSV 文本计的字节数（看不到原始响应的数据源用）"""
+    if df is None or df.empty:
+        return 0
+    return len(df.to_csv(index=False).encode('utf-8'))
+
+
+class DownloadMeter:
+    """每日下载计量（线程安全）"""
+
+    def __init__(self, state_file: str = None, logger: logging.Logger = None):
+        """
+        Args:
+            state_file: 状态文件路径（None 时不保存）
+            logger: 日志记录器
+        """
+        self.state_file = state_file
+        self.logger = logger or logging.getLogger('DownloadMeter')
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._day = datetime.now().strftime('%Y-%m-%d')
+        self._history: Dict[str, Dict] = {}
+        # 当日累计（含之前运行的部分）：total_bytes 为每日限制的依据，sources 为各数据源明细
+        self._total_bytes = 0
+        self._sources: Dict[str, Dict[str, float]] = {}
+        # 本次统计区间的计数，用于计算速率
+        self._session: Dict[str, float] = dict.fromkeys(_COUNTERS, 0)
+        self._session_started = time.monotonic()
+        self._last_save = time.monotonic()
+        self._load()
+
+    # ------------------------------------------------------------------
+    # 计数
+    # ------------------------------------------------------------------
+
+    def record(self, source: str, requests: int = 0, nbytes: int = 0, rows: int = 0,
+               latency: float = None):
+        """
+        登记一次计量
+
+        Args:
+            source: 数据源
+            requests: 请求数
+            nbytes: 传输字节数
+            rows: 数据行数
+            latency: 请求耗时（秒），None 表示未计时
+        """
+        with self._lock:
+            self._roll()
+            counts = self._sources.setdefault(source, dict.fromkeys(_COUNTERS, 0))
+            delta = {'requests': requests, 'bytes': nbytes, 'rows': rows,
+                     'timed': 1 if latency is not None else 0, 'latency_s': latency or 0.0}
+            for key, value in delta.items():
+                counts[key] += value
+                self._session[key] += value
+            self._total_bytes += nbytes
+            due = self.state_file and time.monotonic() - self._last_save >= SAVE_SECONDS
+            if due:
+                self._last_save = time.monotonic()
+        if due:
+            self.save()
+
+    @property
+    def total_bytes(self) -> int:
+        """当日已下载字节数"""
+        with self._lock:
+            self._roll()
+            return self._total_bytes
+
+    @total_bytes.setter
+    def total_bytes(self, value: int):
+        # 手动调整当日累计（各数据源明细不变）
+        with self._lock:
+            self._roll()
+            self._session['bytes'] += value - self._total_bytes
+            self._total_bytes = value
+
+    def start_session(self):
+        """开始新的统计区间（速率从此刻起计算）"""
+        with self._lock:
+            self._session = dict.fromkeys(_COUNTERS, 0)
+            self._session_started = time.monotonic()
+
+    def _roll(self):
+        """跨日时把当日累计归档并清零（调用方持有锁）"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        if today != self._day:
+            self._history[self._day] = self._snapshot()
+            self._day = today
+            self._total_bytes = 0
+            self._sources = {}
+
+    def _snapshot(self) -> Dict:
+        return {'bytes': self._total_bytes,
+                'sources': {name: dict(counts) for name, counts in self._sources.items()}}
+
+    def stats(self) -> Dict:
+        """
+        当日累计与本次统计区间的速率
+
+        Returns:
+            {'date', 'bytes', 'requests', 'rows', 'elapsed_s', 'rows_per_sec', 'mb_per_sec',
+             'sources': {数据源: {'requests', 'bytes', 'rows', 'avg_latency_ms'}}}
+        """
+        with self._lock:
+            self._roll()
+            elapsed = max(time.monotonic() - self._session_started, 1e-9)
+            sources = {}
+            for name, counts in self._sources.items():
+                sources[name] = {
+                    'requests': int(counts['requests']),
+                    'bytes': int(counts['bytes']),
+                    'rows': int(counts['rows']),
+                    'avg_latency_ms': (round(counts['latency_s'] / counts['timed'] * 1000, 1)
+                                       if counts['timed'] else None),
+                }
+            return {
+                'date': self._day,
+                'bytes': self._total_bytes,
+                'requests': sum(s['requests'] for s in sources.values()),
+                'rows': sum(s['rows'] for s in sources.values()),
+                'elapsed_s': round(elapsed, 3),
+                'rows_per_sec': self._session['rows'] / elapsed,
+                'mb_per_sec': self._session['bytes'] / 1024 / 1024 / elapsed,
+                'sources': sources,
+            }
+
+    # ------------------------------------------------------------------
+    # 状态文件
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"读取下载计量失败 {self.state_file}: {e}")
+            return
+        if not isinstance(state, dict):
+            return
+        self._history = {day: entry for day, entry in state.items()
+                         if isinstance(entry, dict) and day != self._day}
+        today = state.get(self._day)
+        if isinstance(today, dict):
+            self._total_bytes = int(today.get('bytes', 0))
+            for name, counts in (today.get('sources') or {}).items():
+                self._sources[name] = {key: counts.get(key, 0) for key in _COUNTERS}
+
+    def save(self) -> bool:
+        """把当日累计写入状态文件（保留最近 KEEP_DAYS 天）"""
+        if not self.state_file:
+            return False
+        with self._save_lock:
+            with self._lock:
+                self._roll()
+                self._last_save = time.monotonic()
+                state = dict(self._history)
+                state[self._day] = self._snapshot()
+            state = {day: state[day] for day in sorted(state)[-KEEP_DAYS:]}
+            tmp_path = self.state_file + '.tmp'
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.state_file)
+                return True
+            except OSError as e:
+                self.logger.warning(f"保存下载计量失败 {self.state_file}: {e}")
+                return False
@@ -0,0 +1,238 @@
+"""
+下载计划模块
+批量下载前只根据本地元数据确定每只股票需要请求的日期区间，不需要下载的股票不发起任何网络请求：
+
+- 已是最新：本地最新日期不早于目标日期（最近一个已收盘的交易日）
+- 未上市：股票列表中的上市日期晚于目标日期
+- 已退市：股票列表标记为退市，且本地数据已覆盖到退市日期
+- 长期停牌：本地数据落后、且最近连续多个目标日期请求都没有新数据的股票，
+  每隔若干交易日才重新检查一次
+
+本地最新日期取自数据清单（不读取数据文件），交易日历优先使用本地缓存的交易日历，
+没有缓存时按工作日近似。停牌记录保存在 daily_dir/_plan_state.json
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple
+
+import pandas as pd
+
+from src.tiered_store import ColdStore
+
+
+PLAN_STATE_FILE = '_plan_state.json'
+# 本地无数据时的下载起始日期
+DEFAULT_START_DATE = '20200101'
+# 收盘后多久可以取到当日K线（时, 分）
+DATA_READY_TIME = (15, 0)
+# 连续多少个目标日期请求无新数据后视为长期停牌
+SUSPEND_MISSES = 3
+# 长期停牌股票每隔多少个交易日重新检查一次
+SUSPEND_RECHECK_DAYS = 5
+
+
+class DownloadPlan:
+    """一次批量下载的计划"""
+
+    def __init__(self, target_date: pd.Timestamp):
+        self.target_date = target_date
+        # (股票代码, 本地最新日期 或 None, 下载起始日期 YYYYMMDD)
+        self.tasks: List[Tuple[str, Optional[pd.Timestamp], str]] = []
+        self.up_to_date: List[str] = []
+        # 股票代码 -> 跳过原因
+        self.skipped: Dict[str, str] = {}
+
+    @property
+    def fetch_codes(self) -> List[str]:
+        return [code for code, _, _ in self.tasks]
+
+    def summary(self) -> str:
+        """计划摘要，如 "4800 只已是最新，150 只需要下载，50 只跳过（停牌 45，未上市 5）" """
+        text = f"{len(self.up_to_date)} 只已是最新，{len(self.tasks)} 只需要下载，{len(self.skipped)} 只跳过"
+        if self.skipped:
+            reasons: Dict[str, int] = {}
+            for reason in self.skipped.values():
+                reasons[reason] = reasons.get(reason, 0) + 1
+            text += '（' + '，'.join(f"{reason} {count}" for reason, count in reasons.items()) + '）'
+        return text
+
+
+class DownloadPlanner:
+    """根据数据清单、停牌记录、上市信息和交易日历生成下载计划（线程安全）"""
+
+    def __init__(self, daily_dir: str, manifest, trade_dates: List[pd.Timestamp] = None,
+                 logger: logging.Logger = None):
+        """
+        Args:
+            daily_dir: 日线数据目录
+            manifest: 数据清单 (DataManifest)
+            trade_dates: 交易日历（None 时按工作日近似）
+            logger: 日志记录器
+        """
+        self.daily_dir = daily_dir
+        self.manifest = manifest
+        self.trade_dates = pd.DatetimeIndex(sorted(trade_dates)) if trade_dates else None
+        self.logger = logger or logging.getLogger('DownloadPlanner')
+        self.state_path = os.path.join(daily_dir, PLAN_STATE_FILE)
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict] = self._load_state()
+
+    # ------------------------------------------------------------------
+    # 交易日历
+    # ------------------------------------------------------------------
+
+    def is_trading_day(self, date: pd.Timestamp) -> bool:
+        date = pd.Timestamp(date).normalize()
+        if self.trade_dates is not None and self.trade_dates[0] <= date <= self.trade_dates[-1]:
+            return date in self.trade_dates
+        return date.weekday() < 5
+
+    def target_date(self, now: datetime = None) -> pd.Timestamp:
+        """最近一个已收盘（可以取到当日K线）的交易日"""
+        now = pd.Timestamp(now or datetime.now())
+        date = now.normalize()
+        if (now.hour, now.minute) < DATA_READY_TIME:
+            date -= pd.Timedelta(days=1)
+        for _ in range(30):
+            if self.is_trading_day(date):
+                return date
+            date -= pd.Timedelta(days=1)
+        return date
+
+    def trading_days_between(self, start: pd.Timestamp, end: pd.Timestamp) -> int:
+        """(start, end] 区间内的交易日数"""
+        start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+        if end <= start:
+            return 0
+        if self.trade_dates is not None and self.trade_dates[0] <= start and end <= self.trade_dates[-1]:
+            return int(((self.trade_dates > start) & (self.trade_dates <= end)).sum())
+        return len(pd.bdate_range(start + pd.Timedelta(days=1), end))
+
+    # ------------------------------------------------------------------
+    # 计划
+    # ------------------------------------------------------------------
+
+    def latest_date(self, stock_code: str) -> Optional[pd.Timestamp]:
+        """本地最新日期（取自数据清单；热层为空时取冷层）"""
+        entry = self.manifest.get_entry(stock_code)
+        if entry is None:
+            return None
+        if entry.get('last_date'):
+            return pd.Timestamp(entry['last_date'])
+        return ColdStore.get(self.daily_dir).date_range(stock_code)[1]
+
+    def plan(self, stock_list: pd.DataFrame, start_date: str = DEFAULT_START_DATE,
+             now: datetime = None) -> DownloadPlan:
+        """
+        生成下载计划（调用前应先 manifest.sync() 使清单与目录一致）
+
+        Args:
+            stock_list: 股票列表（可选列 list_date / delist_date / list_status）
+            start_date: 本地无数据时的下载起始日期 (YYYYMMDD)
+            now: 当前时间（测试用）
+
+        Returns:
+            DownloadPlan
+        """
+        target = self.target_date(now)
+        plan = DownloadPlan(target)
+        list_dates = self._date_column(stock_list, 'list_date')
+        delist_dates = self._date_column(stock_list, 'delist_date')
+        statuses = (stock_list['list_status'].astype(str).tolist()
+                    if 'list_status' in stock_list.columns else [None] * len(stock_list))
+
+        for i, code in enumerate(stock_list['code'].astype(str)):
+            latest = self.latest_date(code)
+            list_date, delist_date = list_dates[i], delist_dates[i]
+
+            if latest is not None and latest >= target:
+                plan.up_to_date.append(code)
+                continue
+            if list_date is not None and list_date > target:
+                plan.skipped[code] = '未上市'
+                continue
+            if statuses[i] == 'D' or delist_date is not None:
+                # 退市日期当天已不交易，本地数据到退市前最后一个交易日即为完整
+                if latest is not None and (delist_date is None or self.trading_days_between(
+                        latest, delist_date - pd.Timedelta(days=1)) == 0):
+                    plan.skipped[code] = '已退市'
+                    continue
+            if latest is not None and self._is_suspended(code, target):
+                plan.skipped[code] = '停牌'
+                continue
+
+            if latest is None:
+                start = start_date
+                if list_date is not None:
+                    start = max(start, list_date.strftime('%Y%m%d'))
+            else:
+                start = (latest + pd.Timedelta(days=1)).strftime('%Y%m%d')
+            plan.tasks.append((code, latest, start))
+
+        self.logger.info(f"下载计划（目标日期 {target.strftime('%Y-%m-%d')}）: {plan.summary()}")
+        return plan
+
+    @staticmethod
+    def _date_column(stock_list: pd.DataFrame, column: str) -> List[Optional[pd.Timestamp]]:
+        if column not in stock_list.columns:
+            return [None] * len(stock_list)
+        # 兼容 '2024-01-02' / '20240102' / 20240102.0（CSV 读为浮点）
+        values = stock_list[column].astype(str).str.replace('-', '', regex=False).str.replace(
+            r'\.0$', '', regex=True)
+        dates = pd.to_datetime(values, format='%Y%m%d', errors='coerce')
+        return [None if pd.isna(d) else d for d in dates]
+
+    # ------------------------------------------------------------------
+    # 停牌记录
+    # ------------------------------------------------------------------
+
+    def _is_suspended(self, stock_code: str, target: pd.Timestamp) -> bool:
+        with self._lock:
+            record = self._state.get(stock_code)
+        if not record or record.get('misses', 0) < SUSPEND_MISSES:
+            return False
+        return self.trading_days_between(pd.Timestamp(record['target']), target) < SUSPEND_RECHECK_DAYS
+
+    def record_result(self, stock_code: str, target: pd.Timestamp, got_data: bool):
+        """
+        登记一次请求结果：有新数据时清除停牌记录；无新数据时按目标日期累计次数
+        （同一目标日期多次请求只计一次）
+        """
+        target_str = pd.Timestamp(target).strftime('%Y-%m-%d')
+        with self._lock:
+            if got_data:
+                self._state.pop(stock_code, None)
+                return
+            record = self._state.setdefault(stock_code, {'misses': 0, 'target': None})
+            if record['target'] != target_str:
+                record['misses'] += 1
+                record['target'] = target_str
+
+    def _load_state(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"读取停牌记录失败，将重新生成: {e}")
+            return {}
+
+    def save(self):
+        """原子写入停牌记录"""
+        with self._lock:
+            state = dict(self._state)
+        if not os.path.isdir(self.daily_dir):
+            return
+        tmp_path = self.state_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            self.logger.warning(f"保存停牌记录失败: {e}")
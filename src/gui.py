@@ -8,7 +8,7 @@ from tkinter import ttk, messagebox, scrolledtext, filedialog
 import threading
 import os
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 import pandas as pd
 import glob
@@ -21,12 +21,14 @@ import matplotlib.pyplot as plt
 # 添加父目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.utils import Config, safe_read_csv, format_number
+from src.utils import Config, safe_read_csv, format_number, load_stock_data
+from src.data_store import list_stock_files, find_stock_file
 from src.scheduler import TaskScheduler
 from src.data_downloader import DataDownloader
 from src.stock_filter import StockFilter
 from src.volume_analyzer import analyze_volume_surge
 from src.monster_stock_analyzer import MonsterStockAnalyzer
+from src.results_db import ResultsDB, STRATEGY_FILTERED
 
 
 class StockAnalyzerGUI:
@@ -451,24 +453,20 @@ class StockAnalyzerGUI:
     def refresh_overview(self):
         """刷新数据概览"""
         try:
-            # 统计本地股票数量
-            if os.path.exists(self.downloader.daily_dir):
-                stock_files = [f for f in os.listdir(self.downloader.daily_dir) 
-                              if f.endswith('.csv')]
-                stock_count = len(stock_files)
-                self.stock_count_label.config(text=str(stock_count))
-            
-            # 获取最新数据日期
+            # 获取最新数据日期（同时与数据目录清单对账）
             latest_date = self.downloader.get_latest_data_date()
             if latest_date:
                 self.latest_date_label.config(text=latest_date)
             
-            # 读取最新结果文件
-            history_files = self.filter.get_history_results(days=1)
-            if history_files:
-                df = safe_read_csv(history_files[0])
-                if df is not None:
-                    self.matched_count_label.config(text=str(len(df)))
+            # 统计本地股票数量
+            stock_count = len(self.downloader.manifest)
+            self.stock_count_label.config(text=str(stock_count))
+            
+            # 最近一次筛选的股票数量（查询结果库）
+            since = datetime.now() - timedelta(days=1)
+            runs = ResultsDB.get(self.filter.results_dir).recent_runs(STRATEGY_FILTERED, limit=1, since=since)
+            if runs:
+                self.matched_count_label.config(text=str(runs[0]['count']))
                     
         except Exception as e:
             self.log(f"刷新概览失败: {e}")
@@ -644,13 +642,13 @@ class StockAnalyzerGUI:
     def show_stock_detail(self, stock_code: str, stock_name: str):
         """显示股票详细数据"""
         # 读取股票数据
-        file_path = os.path.join(self.downloader.daily_dir, f"{stock_code}.csv")
+        file_path = find_stock_file(self.downloader.daily_dir, stock_code)
         
-        if not os.path.exists(file_path):
+        if file_path is None:
             messagebox.showwarning("提示", f"未找到股票 {stock_code} 的数据文件")
             return
         
-        df = safe_read_csv(file_path)
+        df = load_stock_data(file_path)
         if df is None or df.empty:
             messagebox.showwarning("提示", f"无法读取股票 {stock_code} 的数据")
             return
@@ -677,9 +675,9 @@ class StockAnalyzerGUI:
 股票代码: {stock_code}
 股票名称: {stock_name}
 数据天数: {len(df)}天
-日期范围: {df['date'].min()} ~ {df['date'].max()}
+日期范围: {df['date'].min():%Y-%m-%d} ~ {df['date'].max():%Y-%m-%d}
 
-最新数据 ({df['date'].iloc[-1]}):
+最新数据 ({df['date'].iloc[-1]:%Y-%m-%d}):
   收盘价: {latest['close']:.2f}
   开盘价: {latest['open']:.2f} 
   最高价: {latest['high']:.2f}
@@ -722,7 +720,7 @@ class StockAnalyzerGUI:
         display_df = df.tail(100)
         for _, row in display_df.iterrows():
             values = (
-                row['date'],
+                row['date'].strftime('%Y-%m-%d'),
                 f"{row['open']:.2f}",
                 f"{row['close']:.2f}",
                 f"{row['high']:.2f}",
@@ -781,7 +779,7 @@ class StockAnalyzerGUI:
         def analysis_thread():
             try:
                 # 获取所有CSV文件
-                csv_files = glob.glob(os.path.join(self.downloader.daily_dir, '*.csv'))
+                csv_files = list_stock_files(self.downloader.daily_dir)
                 
                 if not csv_files:
                     self.log("错误: 没有找到股票数据文件")
@@ -804,6 +802,7 @@ class StockAnalyzerGUI:
                 output_file = os.path.join(self.filter.results_dir, 
                                           f'volume_surge_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv')
                 results_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+                ResultsDB.get(self.filter.results_dir).record_result_file(output_file, results_df)
                 
                 # 显示结果
                 self.root.after(0, lambda: self.load_volume_results(results_df))
@@ -870,22 +869,18 @@ class StockAnalyzerGUI:
         """显示股票量价图"""
         try:
             # 读取股票数据
-            csv_file = os.path.join(self.downloader.daily_dir, f'{stock_code}.csv')
+            csv_file = find_stock_file(self.downloader.daily_dir, stock_code)
             
-            if not os.path.exists(csv_file):
+            if csv_file is None:
                 messagebox.showerror("错误", f"未找到股票 {stock_code} 的数据文件")
                 return
             
-            df = pd.read_csv(csv_file)
+            df = load_stock_data(csv_file)
             
-            if len(df) < 10:
+            if df is None or len(df) < 10:
                 messagebox.showerror("错误", "数据不足，无法绘制图表")
                 return
             
-            # 确保日期排序
-            df['date'] = pd.to_datetime(df['date'])
-            df = df.sort_values('date')
-            
             # 获取最近60天数据
             recent_df = df.tail(60)
             
@@ -1006,7 +1001,7 @@ class StockAnalyzerGUI:
         
         def analysis_thread():
             try:
-                csv_files = glob.glob(os.path.join(self.downloader.daily_dir, '*.csv'))
+                csv_files = list_stock_files(self.downloader.daily_dir)
                 
                 if not csv_files:
                     self.log("错误: 没有找到股票数据文件")
@@ -1031,6 +1026,7 @@ class StockAnalyzerGUI:
                 output_file = os.path.join(self.filter.results_dir, 
                                           f'volume_surge_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv')
                 results_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+                ResultsDB.get(self.filter.results_dir).record_result_file(output_file, results_df)
                 
                 self.root.after(0, lambda: self.load_volume_results(results_df))
                 self.log(f"结果已保存: {output_file}")
@@ -1083,21 +1079,18 @@ class StockAnalyzerGUI:
                 self.chart_window.destroy()
             
             # 读取股票数据
-            csv_file = os.path.join(self.downloader.daily_dir, f'{stock_code}.csv')
+            csv_file = find_stock_file(self.downloader.daily_dir, stock_code)
             
-            if not os.path.exists(csv_file):
+            if csv_file is None:
                 messagebox.showerror("错误", f"未找到股票 {stock_code} 的数据文件")
                 return
             
-            df = pd.read_csv(csv_file)
+            df = load_stock_data(csv_file)
             
-            if len(df) < 10:
+            if df is None or len(df) < 10:
                 messagebox.showerror("错误", "数据不足，无法绘制图表")
                 return
             
-            df['date'] = pd.to_datetime(df['date'])
-            df = df.sort_values('date')
-            
             # 计算均线
             if len(df) >= 120:
                 df['ma'] = df['close'].rolling(window=120).mean()
@@ -1291,7 +1284,7 @@ class StockAnalyzerGUI:
                 daily_dir = self.config.get('Paths', 'daily_dir', fallback='./data/daily')
                 results_dir = self.config.get('Paths', 'results_dir', fallback='./data/results')
 
-                csv_files = glob.glob(os.path.join(daily_dir, '*.csv'))
+                csv_files = list_stock_files(daily_dir)
                 if not csv_files:
                     self.log("错误: 没有找到股票数据文件")
                     self.root.after(0, lambda: messagebox.showerror("错误", "没有找到股票数据"))
@@ -0,0 +1,146 @@
+"""
+入选历史日志模块
+历史记录以 CSV 日志只追加写入（stock_code, date, first_seen），
+另存一个紧凑的成员索引 (<日志名>.idx.npz: 已入选代码的有序数组 + 索引覆盖到的日志字节数)
+
+每次运行只加载一次索引；日志在索引之后被追加过时只解析新增的字节。
+判断是否首次入选为对缓存代码数组的向量化 isin，写入只追加新代码，开销与新增行数成正比
+"""
+
+import io
+import os
+import logging
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+LOG_COLUMNS = ['stock_code', 'date', 'first_seen']
+
+
+class StockHistoryLog:
+    """只追加的入选历史日志及其成员索引"""
+
+    def __init__(self, log_file: str):
+        self.log_file = log_file
+        self.index_file = os.path.splitext(log_file)[0] + '.idx.npz'
+        self.logger = logging.getLogger('StockHistoryLog')
+        self.codes = np.array([], dtype='U6')
+        self._log_size = 0
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    # ------------------------------------------------------------------
+    # 加载
+    # ------------------------------------------------------------------
+
+    def load(self):
+        """加载成员索引，索引缺失或落后于日志时从日志补齐"""
+        log_size = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+        codes, covered = self._read_index()
+        if codes is None or covered > log_size:
+            # 无索引或日志被替换过：完整解析一次日志
+            codes, covered = np.array([], dtype='U6'), 0
+
+        if log_size > covered:
+            new_codes = self._read_log_codes(covered)
+            codes = np.union1d(codes, new_codes)
+            self.codes, self._log_size = codes, log_size
+            self._write_index()
+        else:
+            self.codes, self._log_size = codes, log_size
+
+    def _read_index(self):
+        if not os.path.exists(self.index_file):
+            return None, 0
+        try:
+            with np.load(self.index_file) as data:
+                return data['codes'], int(data['log_size'])
+        except Exception as e:
+            self.logger.warning(f"读取历史索引失败，将从日志重建: {e}")
+            return None, 0
+
+    def _read_log_codes(self, offset: int) -> np.ndarray:
+        """解析日志中 offset 之后的行，返回股票代码"""
+        try:
+            with open(self.log_file, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+            if offset == 0:
+                df = pd.read_csv(io.BytesIO(data), dtype=str, encoding='utf-8-sig')
+            else:
+                df = pd.read_csv(io.BytesIO(data), header=None, names=LOG_COLUMNS, dtype=str)
+        except Exception as e:
+            self.logger.warning(f"读取历史记录失败: {e}")
+            return np.array([], dtype='U6')
+        if 'stock_code' not in df.columns:
+            return np.array([], dtype='U6')
+        return df['stock_code'].dropna().astype(str).str.zfill(6).to_numpy(dtype='U6')
+
+    def _write_index(self):
+        """原子写入成员索引"""
+        tmp_path = self.index_file + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, codes=self.codes, log_size=np.int64(self._log_size))
+            os.replace(tmp_path, self.index_file)
+        except Exception as e:
+            self.logger.warning(f"保存历史索引失败: {e}")
+
+    # ------------------------------------------------------------------
+    # 查询与追加
+    # ------------------------------------------------------------------
+
+    def is_new(self, stock_codes: pd.Series) -> np.ndarray:
+        """
+        判断股票是否首次入选（向量化）
+
+        Args:
+            stock_codes: 股票代码序列
+
+        Returns:
+            布尔数组，True 表示不在历史记录中
+        """
+        codes = stock_codes.astype(str).str.zfill(6).to_numpy(dtype='U6')
+        return ~np.isin(codes, self.codes, assume_unique=False)
+
+    def append(self, df: pd.DataFrame, first_seen: Optional[str] = None) -> int:
+        """
+        将首次入选的股票追加到日志末尾（已在历史中的代码会被忽略）
+
+        Args:
+            df: 含 stock_code、date 列的结果表
+            first_seen: 首次入选日期（默认今天）
+
+        Returns:
+            追加的行数
+        """
+        if df is None or df.empty:
+            return 0
+        records = df[['stock_code', 'date']].copy()
+        records['stock_code'] = records['stock_code'].astype(str).str.zfill(6)
+        records = records[self.is_new(records['stock_code'])]
+        records = records.drop_duplicates(subset=['stock_code'], keep='first')
+        if records.empty:
+            return 0
+        records['first_seen'] = first_seen or datetime.now().strftime('%Y-%m-%d')
+
+        os.makedirs(os.path.dirname(self.log_file) or '.', exist_ok=True)
+        exists = os.path.exists(self.log_file) and os.path.getsize(self.log_file) > 0
+        if exists:
+            with open(self.log_file, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) not in (b'\n', b'\r')
+        with open(self.log_file, 'a', encoding='utf-8' if exists else 'utf-8-sig', newline='') as f:
+            if exists and needs_newline:
+                f.write('\n')
+            records[LOG_COLUMNS].to_csv(f, index=False, header=not exists, lineterminator='\n')
+
+        self.codes = np.union1d(self.codes, records['stock_code'].to_numpy(dtype='U6'))
+        self._log_size = os.path.getsize(self.log_file)
+        self._write_index()
+        return len(records)
@@ -0,0 +1,131 @@
+"""
+HTTP 录制模块
+录制模式下数据源的原始响应按 (数据源, 股票代码, 日期区间) 保存到本地目录，
+供本地模拟服务器 (mock_tencent_server) 回放，在无网络的机器上重复进行下载吞吐测试
+
+目录结构:
+    <record_dir>/<数据源>/<股票代码>/<开始日期>_<结束日期>.json   K线
+    <record_dir>/<数据源>/_quote/<请求摘要>.json                    行情快照等其他请求
+每个文件: {"url": 请求地址, "status": 状态码, "encoding": 编码, "body": 响应文本}
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Optional, Dict, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+import requests
+
+from src.http_transport import HttpTransport
+
+
+def parse_kline_param(url: str) -> Optional[Tuple[str, str, str]]:
+    """从腾讯K线请求中取出 (腾讯代码, 开始日期, 结束日期)，不是K线请求时返回 None"""
+    param = parse_qs(urlsplit(url).query).get('param')
+    if not param:
+        return None
+    parts = param[0].split(',')
+    if len(parts) < 4:
+        return None
+    return parts[0], parts[2], parts[3]
+
+
+class ResponseStore:
+    """按 (数据源, 股票代码, 日期区间) 保存的原始响应"""
+
+    def __init__(self, directory: str, source: str = 'tencent'):
+        """
+        Args:
+            directory: 录制目录
+            source: 数据源名（子目录）
+        """
+        self.directory = directory
+        self.source = source
+        self._lock = threading.Lock()
+
+    def path_for(self, url: str) -> str:
+        kline = parse_kline_param(url)
+        if kline is not None:
+            code, start, end = kline
+            return os.path.join(self.directory, self.source, code, f'{start}_{end}.json')
+        # 只按路径和参数计算摘要，回放时与模拟服务器的地址无关
+        parts = urlsplit(url)
+        key = parts.path + (f'?{parts.query}' if parts.query else '')
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, self.source, '_quote', f'{digest}.json')
+
+    def save(self, url: str, status: int, body: str, encoding: str = 'utf-8'):
+        """原子写入一条响应"""
+        path = self.path_for(url)
+        record = {'url': url, 'status': status, 'encoding': encoding, 'body': body}
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self, url: str) -> Optional[Dict]:
+        """读取请求（完整地址或路径）对应的录制响应，没有录制时返回 None"""
+        path = self.path_for(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load_kline(self, code: str, start: str, end: str) -> Optional[Dict]:
+        """读取K线录制：优先取区间完全相同的录制，否则取覆盖该区间的录制"""
+        directory = os.path.join(self.directory, self.source, code)
+        exact = os.path.join(directory, f'{start}_{end}.json')
+        candidates = [exact] if os.path.exists(exact) else []
+        if not candidates and os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith('.json'):
+                    continue
+                rec_start, _, rec_end = name[:-5].partition('_')
+                if rec_start <= start and end <= rec_end:
+                    candidates.append(os.path.join(directory, name))
+        for path in candidates:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                continue
+        return None
+
+
+class RecordingTransport:
+    """包装 HttpTransport：请求照常发出，成功的响应同时保存到 ResponseStore"""
+
+    def __init__(self, transport: HttpTransport, store: ResponseStore,
+                 logger: logging.Logger = None):
+        self.transport = transport
+        self.store = store
+        self.logger = logger or logging.getLogger('HttpRecorder')
+
+    def __getattr__(self, name):
+        # pool_size / close 等属性转给被包装的连接池
+        return getattr(self.transport, name)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        response = self.transport.request(method, url, **kwargs)
+        if method.upper() == 'GET' and response.status_code == 200:
+            encoding = response.encoding or 'utf-8'
+            try:
+                self.store.save(url, response.status_code,
+                                response.content.decode(encoding, errors='replace'), encoding)
+            except OSError as e:
+                self.logger.warning(f"保存录制响应失败: {e}")
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
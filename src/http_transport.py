@@ -0,0 +1,137 @@
+"""
+HTTP 连接池模块
+各数据源和推送渠道共用的 HTTP 传输层：按主机保持长连接的 requests.Session 连接池，
+统一连接/读取超时和重试退避策略。数千次K线请求复用少数几个连接，
+不再每次请求重新建立 TCP（和 TLS）连接
+
+配置 ([Network] 节):
+    pool_size        每个主机的连接数上限
+    connect_timeout  连接超时（秒）
+    read_timeout     读取超时（秒）
+    retries          连接失败、超时和 5xx 响应的重试次数（只重试 GET 等幂等请求，推送的 POST 不重试）
+    retry_backoff    重试退避系数（秒），第 n 次重试前等待 backoff * 2^(n-1)
+"""
+
+import threading
+from typing import Dict, Tuple, Union, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_POOL_SIZE = 16
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 0.5
+RETRY_STATUS = (500, 502, 503, 504)
+
+_shared: Optional['HttpTransport'] = None
+_shared_lock = threading.Lock()
+
+
+class HttpTransport:
+    """按主机复用连接的 HTTP 客户端（线程安全）"""
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 retries: int = DEFAULT_RETRIES,
+                 retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+                 headers: Dict[str, str] = None):
+        """
+        Args:
+            pool_size: 每个主机的连接数上限（应不小于该主机的并发请求数）
+            connect_timeout: 连接超时（秒）
+            read_timeout: 读取超时（秒）
+            retries: 连接失败、超时和 5xx 响应的重试次数
+            retry_backoff: 重试退避系数（秒）
+            headers: 所有请求附带的请求头
+        """
+        self.pool_size = max(int(pool_size), 1)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = max(int(retries), 0)
+        self.retry_backoff = retry_backoff
+        self.headers = dict(headers or {})
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> 'HttpTransport':
+        """按 Config 对象的 [Network] 节创建"""
+        return cls(
+            pool_size=config.getint('Network', 'pool_size', fallback=DEFAULT_POOL_SIZE),
+            connect_timeout=config.getfloat('Network', 'connect_timeout', fallback=DEFAULT_CONNECT_TIMEOUT),
+            read_timeout=config.getfloat('Network', 'read_timeout', fallback=DEFAULT_READ_TIMEOUT),
+            retries=config.getint('Network', 'retries', fallback=DEFAULT_RETRIES),
+            retry_backoff=config.getfloat('Network', 'retry_backoff', fallback=DEFAULT_RETRY_BACKOFF))
+
+    def session(self, url: str) -> requests.Session:
+        """URL 所在主机的长连接 Session（首次使用时创建）"""
+        parts = urlsplit(url)
+        key = f'{parts.scheme}://{parts.netloc}'
+        session = self._sessions.get(key)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                session.headers.update(self.headers)
+                # 重试到次数用完时返回最后的响应（不抛 RetryError），由调用方 raise_for_status，
+                # 限速器据此按状态码识别限流
+                retry = Retry(total=self.retries, connect=self.retries, read=self.retries,
+                              status=self.retries, backoff_factor=self.retry_backoff,
+                              status_forcelist=RETRY_STATUS, raise_on_status=False)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+                session.mount(key + '/', adapter)
+                self._sessions[key] = session
+            return session
+
+    def request(self, method: str, url: str,
+                timeout: Union[float, Tuple[float, float], None] = None, **kwargs) -> requests.Response:
+        """
+        发送请求
+
+        Args:
+            method: GET / POST 等
+            url: 请求地址
+            timeout: 读取超时（秒）或 (连接超时, 读取超时)；None 时使用默认值
+            **kwargs: 传给 requests 的其他参数（params / json / data / headers 等）
+        """
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+        elif not isinstance(timeout, tuple):
+            timeout = (min(self.connect_timeout, timeout), timeout)
+        return self.session(url).request(method, url, timeout=timeout, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        """关闭所有连接"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+def get_transport(config=None) -> HttpTransport:
+    """
+    获取进程内共享的连接池（首次调用时按 config 的 [Network] 节创建，之后的 config 被忽略）
+
+    Args:
+        config: Config 对象（None 时使用默认参数）
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpTransport.from_config(config) if config is not None else HttpTransport()
+        return _shared
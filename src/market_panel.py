@@ -0,0 +1,295 @@
+"""
+行情面板模块
+将 data/daily 下的逐股日线数据整理为稠密的二维面板（股票 × 交易日），
+每个字段一个 NumPy 数组并以 .npy 保存，分析时以内存映射方式只读打开，几乎无加载开销
+
+目录结构 ([Paths] panel_dir，默认 ./data/panel):
+  meta.json      -- 构建时间、字段、股票数、交易日数
+  codes.npy      -- 股票代码 (n_codes,)
+  dates.npy      -- 交易日 datetime64[D] (n_dates,)
+  <field>.npy    -- float64 (n_codes, n_dates)，停牌/未上市为 NaN
+"""
+
+import os
+import sys
+import json
+import shutil
+import logging
+from datetime import datetime
+from typing import Optional, List, Dict, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_store import list_stock_files, stock_code_from_path
+from src.utils import load_stock_data
+
+
+# 面板字段（turn 为换手率，妖股评分使用，数据源无此列时为 NaN）
+PANEL_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'amount', 'turn']
+DEFAULT_PANEL_DIR = './data/panel'
+META_FILE = 'meta.json'
+
+
+def get_panel_dir(config) -> str:
+    """从 Config 对象读取 [Paths] panel_dir"""
+    return config.get('Paths', 'panel_dir', fallback=DEFAULT_PANEL_DIR)
+
+
+def _load_stock_arrays(file_path: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    读取单只股票，返回 (交易日数组, 字段矩阵 len(PANEL_FIELDS) × n)
+    """
+    # 构建面板只读一次，不占用进程内缓存
+    df = load_stock_data(file_path, use_cache=False)
+    if df is None or df.empty or 'date' not in df.columns:
+        return None
+
+    values = np.full((len(PANEL_FIELDS), len(df)), np.nan)
+    for i, field in enumerate(PANEL_FIELDS):
+        if field in df.columns:
+            values[i] = df[field].to_numpy(dtype='float64')
+
+    return df['date'].to_numpy(dtype='datetime64[D]'), values
+
+
+def build_panel(daily_dir: str, panel_dir: str = DEFAULT_PANEL_DIR,
+                logger: logging.Logger = None) -> bool:
+    """
+    由日线数据目录重建行情面板（先写入临时目录，完成后整体替换）
+
+    Args:
+        daily_dir: 日线数据目录
+        panel_dir: 面板输出目录
+        logger: 日志记录器
+
+    Returns:
+        是否成功
+    """
+    logger = logger or logging.getLogger('MarketPanel')
+    files = list_stock_files(daily_dir)
+    if not files:
+        logger.warning(f"未找到股票数据文件，跳过面板构建: {daily_dir}")
+        return False
+
+    started = datetime.now()
+    codes: List[str] = []
+    stocks: List[Tuple[np.ndarray, np.ndarray]] = []
+    source_mtime = 0.0
+    for file_path in files:
+        try:
+            source_mtime = max(source_mtime, os.path.getmtime(file_path))
+            loaded = _load_stock_arrays(file_path)
+        except Exception as e:
+            logger.debug(f"读取 {file_path} 失败: {e}")
+            continue
+        if loaded is not None:
+            codes.append(stock_code_from_path(file_path))
+            stocks.append(loaded)
+
+    if not stocks:
+        logger.warning("没有可用的日线数据，跳过面板构建")
+        return False
+
+    all_dates = np.unique(np.concatenate([d for d, _ in stocks]))
+    n_codes, n_dates = len(codes), len(all_dates)
+
+    build_dir = panel_dir.rstrip('/\\') + '.building'
+    if os.path.exists(build_dir):
+        shutil.rmtree(build_dir)
+    os.makedirs(build_dir)
+
+    try:
+        arrays = {
+            field: np.lib.format.open_memmap(
+                os.path.join(build_dir, f'{field}.npy'), mode='w+',
+                dtype='float64', shape=(n_codes, n_dates))
+            for field in PANEL_FIELDS
+        }
+        for arr in arrays.values():
+            arr[:] = np.nan
+
+        for row, (dates, values) in enumerate(stocks):
+            cols = np.searchsorted(all_dates, dates)
+            for i, field in enumerate(PANEL_FIELDS):
+                arrays[field][row, cols] = values[i]
+
+        for arr in arrays.values():
+            arr.flush()
+        del arrays
+
+        np.save(os.path.join(build_dir, 'codes.npy'), np.array(codes))
+        np.save(os.path.join(build_dir, 'dates.npy'), all_dates)
+        meta = {
+            'built_at': datetime.now().isoformat(timespec='seconds'),
+            'source_mtime': source_mtime,
+            'source_dir': os.path.abspath(daily_dir),
+            'fields': PANEL_FIELDS,
+            'n_codes': n_codes,
+            'n_dates': n_dates,
+            'first_date': str(all_dates[0]),
+            'last_date': str(all_dates[-1]),
+        }
+        with open(os.path.join(build_dir, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        # 整体替换旧面板（已打开的内存映射仍指向旧文件，不受影响）
+        old_dir = panel_dir.rstrip('/\\') + '.old'
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+        if os.path.exists(panel_dir):
+            os.rename(panel_dir, old_dir)
+        os.rename(build_dir, panel_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    except Exception as e:
+        logger.error(f"行情面板构建失败: {e}")
+        shutil.rmtree(build_dir, ignore_errors=True)
+        return False
+
+    elapsed = (datetime.now() - started).total_seconds()
+    logger.info(f"行情面板已更新: {n_codes} 只股票 × {n_dates} 个交易日 "
+                f"({meta['first_date']} ~ {meta['last_date']})，耗时 {elapsed:.1f}s")
+    return True
+
+
+class MarketPanel:
+    """只读行情面板（内存映射）"""
+
+    def __init__(self, panel_dir: str, meta: Dict, codes: np.ndarray,
+                 dates: np.ndarray, fields: Dict[str, np.ndarray]):
+        self.panel_dir = panel_dir
+        self.meta = meta
+        self.codes = codes
+        self.dates = dates
+        self.fields = fields
+        self._index = {str(code): i for i, code in enumerate(codes)}
+
+    @classmethod
+    def open(cls, panel_dir: str = DEFAULT_PANEL_DIR) -> Optional['MarketPanel']:
+        """
+        打开已构建的面板，不存在或损坏时返回 None
+        """
+        meta_file = os.path.join(panel_dir, META_FILE)
+        if not os.path.exists(meta_file):
+            return None
+        try:
+            with open(meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            codes = np.load(os.path.join(panel_dir, 'codes.npy'))
+            dates = np.load(os.path.join(panel_dir, 'dates.npy'))
+            fields = {
+                field: np.load(os.path.join(panel_dir, f'{field}.npy'), mmap_mode='r')
+                for field in meta.get('fields', PANEL_FIELDS)
+            }
+        except Exception as e:
+            logging.getLogger('MarketPanel').warning(f"打开行情面板失败: {e}")
+            return None
+        return cls(panel_dir, meta, codes, dates, fields)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, stock_code: str) -> bool:
+        return stock_code in self._index
+
+    @property
+    def last_date(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self.dates[-1]) if len(self.dates) else None
+
+    def is_stale(self, daily_dir: str) -> bool:
+        """日线目录中存在构建之后修改过的文件时视为过期"""
+        source_mtime = self.meta.get('source_mtime', 0.0)
+        for file_path in list_stock_files(daily_dir):
+            if os.path.getmtime(file_path) > source_mtime:
+                return True
+        return False
+
+    def stock_frame(self, stock_code: str,
+                    last_n_rows: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """
+        取出单只股票的日线数据（去掉停牌日），列与日线文件一致
+
+        Args:
+            stock_code: 股票代码
+            last_n_rows: 只取最后 N 个交易日
+
+        Returns:
+            DataFrame，股票不在面板中时返回 None
+        """
+        row = self._index.get(stock_code)
+        if row is None:
+            return None
+
+        close = np.asarray(self.fields['close'][row])
+        idx = np.flatnonzero(~np.isnan(close))
+        if last_n_rows:
+            idx = idx[-last_n_rows:]
+        data = {'date': pd.DatetimeIndex(self.dates[idx]), 'code': stock_code}
+        for field, arr in self.fields.items():
+            values = np.asarray(arr[row])[idx]
+            if field == 'turn' and np.isnan(values).all():
+                continue
+            if field == 'volume' and not np.isnan(values).any():
+                values = values.astype('int64')
+            data[field] = values
+        return pd.DataFrame(data)
+
+    def iter_frames(self, codes: List[str] = None,
+                    last_n_rows: Optional[int] = None) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """按股票依次产出 (股票代码, 日线DataFrame)"""
+        for code in (codes if codes is not None else self.codes):
+            df = self.stock_frame(str(code), last_n_rows)
+            if df is not None and not df.empty:
+                yield str(code), df
+
+
+def open_panel(config, daily_dir: str, logger: logging.Logger = None) -> Optional[MarketPanel]:
+    """
+    按配置打开行情面板供分析使用（[Analysis] use_panel），过期或不存在时返回 None
+
+    Args:
+        config: Config 对象
+        daily_dir: 日线数据目录（用于判断面板是否过期）
+        logger: 日志记录器
+    """
+    if not config.getboolean('Analysis', 'use_panel', fallback=False):
+        return None
+    logger = logger or logging.getLogger('MarketPanel')
+    panel = MarketPanel.open(get_panel_dir(config))
+    if panel is None:
+        logger.info("行情面板不存在，按日线文件分析")
+        return None
+    if panel.is_stale(daily_dir):
+        logger.info("行情面板已过期，按日线文件分析")
+        return None
+    return panel
+
+
+def iter_stock_frames(files: List[str] = None,
+                      panel: MarketPanel = None,
+                      last_n_rows: Optional[int] = None,
+                      start_date=None, end_date=None) -> Iterator[Tuple[str, Optional[pd.DataFrame]]]:
+    """
+    统一的逐股数据来源：优先使用行情面板，否则逐个读取日线文件
+    读取失败的文件产出 (股票代码, None)
+
+    Args:
+        files: 日线文件列表
+        panel: 行情面板
+        last_n_rows: 每只股票只取最后 N 行（None 表示全部历史）
+        start_date: 起始日期（含），按文件读取时只打开有重叠的冷层分区
+        end_date: 结束日期（含）
+    """
+    if panel is not None:
+        for code, df in panel.iter_frames(last_n_rows=last_n_rows):
+            if start_date is not None:
+                df = df[df['date'] >= pd.to_datetime(start_date)]
+            if end_date is not None:
+                df = df[df['date'] <= pd.to_datetime(end_date)]
+            yield code, df.reset_index(drop=True)
+        return
+    for file_path in files or []:
+        yield stock_code_from_path(file_path), load_stock_data(
+            file_path, last_n_rows=last_n_rows, start_date=start_date, end_date=end_date)
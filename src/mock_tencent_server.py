@@ -0,0 +1,269 @@
+"""
+本地模拟腾讯行情服务器
+在本机提供与腾讯K线接口 (/appstock/app/fqkline/get) 和行情接口 (/q=) 相同格式的响应，
+用于在无网络的机器上测试和调优批量下载的并发、限速和写入：
+
+- 回放：有录制响应（见 http_replay）时原样返回，否则按股票代码生成确定的模拟K线
+- 延迟：每个请求等待 latency 秒（加 0~jitter 秒随机抖动）
+- 限流：每秒请求超过 rate_limit 时返回 429
+- 错误注入：按 error_rate 的概率返回 503
+
+将 [DataSource] tencent_kline_url / tencent_quote_url 指向 server.kline_url / server.quote_url 即可。
+命令行: python -m src.mock_tencent_server --port 8765 --latency 0.05 --rate-limit 50 --error-rate 0.01
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import zlib
+import logging
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, List
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.http_replay import ResponseStore
+from src.rate_limiter import TokenBucket
+
+
+KLINE_PATH = '/appstock/app/fqkline/get'
+QUOTE_PATH = '/q='
+STATS_PATH = '/__stats'
+# K线接口每次最多返回的条数
+MAX_KLINE_ROWS = 500
+
+
+def synthetic_klines(tencent_code: str, start: str, end: str,
+                     list_date: str = '2015-01-05') -> List[List[str]]:
+    """
+    生成确定的模拟前复权日线（同一股票同一日期每次结果相同）
+
+    Returns:
+        [[日期, 开盘, 收盘, 最低, 最高, 成交量(手)], ...]，最多 MAX_KLINE_ROWS 条
+    """
+    dates = pd.bdate_range(max(pd.Timestamp(start), pd.Timestamp(list_date)), end)
+    if len(dates) == 0:
+        return []
+    # 以上市日起的交易日序号为随机游走的步数，保证不同区间请求的价格一致
+    offset = len(pd.bdate_range(list_date, dates[0])) - 1
+    steps = np.random.default_rng(zlib.crc32(tencent_code.encode())).normal(0, 0.02, offset + len(dates))
+    closes = 10 * np.exp(np.cumsum(steps))[offset:]
+    opens = closes * (1 - steps[offset:] / 2)
+    highs = np.maximum(opens, closes) * 1.01
+    lows = np.minimum(opens, closes) * 0.99
+    volumes = (1000 + (np.abs(steps[offset:]) * 1e6)).astype(int)
+    rows = [[d.strftime('%Y-%m-%d'), f'{o:.2f}', f'{c:.2f}', f'{lo:.2f}', f'{h:.2f}', str(v)]
+            for d, o, c, lo, h, v in zip(dates, opens, closes, lows, highs, volumes)]
+    return rows[:MAX_KLINE_ROWS]
+
+
+def synthetic_quote(tencent_code: str, now: datetime) -> str:
+    """生成收盘后的模拟行情行（v_sh600000="...";）"""
+    today = now.strftime('%Y-%m-%d')
+    klines = synthetic_klines(tencent_code, today, today)
+    if not klines:
+        return f'v_{tencent_code}="";'
+    _, open_, close, low, high, volume = klines[0]
+    fields = [''] * 50
+    fields[:8] = ['1', tencent_code, tencent_code[2:], close, open_, open_, volume, '0']
+    fields[30] = now.strftime('%Y%m%d') + '150003'
+    fields[33], fields[34] = high, low
+    fields[37] = f'{float(close) * int(volume) / 100:.1f}'  # 万元
+    return f'v_{tencent_code}="{"~".join(fields)}";'
+
+
+class MockTencentServer:
+    """本地模拟腾讯行情服务器（在后台线程中运行）"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, replay_dir: str = None,
+                 latency: float = 0.0, jitter: float = 0.0, rate_limit: float = None,
+                 error_rate: float = 0.0, seed: int = None, logger: logging.Logger = None):
+        """
+        Args:
+            host: 监听地址
+            port: 端口（0 表示自动分配）
+            replay_dir: 录制目录（http_replay 的 record_dir），None 时只生成模拟数据
+            latency: 每个请求的固定延迟（秒）
+            jitter: 额外随机延迟上限（秒）
+            rate_limit: 每秒请求上限，超过时返回 429（None 表示不限）
+            error_rate: 返回 503 的概率
+            seed: 延迟抖动和错误注入的随机种子
+            logger: 日志记录器
+        """
+        self.store = ResponseStore(replay_dir, 'tencent') if replay_dir else None
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(rate_limit, capacity=max(rate_limit, 1)) if rate_limit else None
+        self.random = random.Random(seed)
+        self.logger = logger or logging.getLogger('MockTencentServer')
+        self.stats: Dict[str, int] = {'requests': 0, 'kline': 0, 'quote': 0, 'replayed': 0,
+                                      'throttled': 0, 'errors': 0, 'in_flight': 0, 'max_in_flight': 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def kline_url(self) -> str:
+        return self.url + KLINE_PATH
+
+    @property
+    def quote_url(self) -> str:
+        return self.url + QUOTE_PATH
+
+    def start(self) -> 'MockTencentServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        name='MockTencentServer')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, key: str, delta: int = 1):
+        with self._lock:
+            self.stats[key] += delta
+            if key == 'in_flight':
+                self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    # ------------------------------------------------------------------
+    # 请求处理
+    # ------------------------------------------------------------------
+
+    def _respond(self, path: str):
+        """返回 (状态码, 响应字节, Content-Type)"""
+        if path.startswith(STATS_PATH):
+            with self._lock:
+                return 200, json.dumps(self.stats).encode(), 'application/json'
+        self._count('requests')
+        if self.bucket is not None and not self.bucket.try_acquire():
+            self._count('throttled')
+            return 429, b'Too Many Requests', 'text/plain'
+        with self._lock:
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+            fail = self.error_rate > 0 and self.random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            self._count('errors')
+            return 503, b'Service Unavailable', 'text/plain'
+
+        if path.startswith(KLINE_PATH):
+            self._count('kline')
+            return self._kline(path)
+        if path.startswith(QUOTE_PATH):
+            self._count('quote')
+            return self._quote(path)
+        return 404, b'Not Found', 'text/plain'
+
+    def _kline(self, path: str):
+        param = parse_qs(urlsplit(path).query).get('param', [''])[0].split(',')
+        if len(param) < 4:
+            return 200, json.dumps({'code': -1, 'msg': 'param error'}).encode(), 'application/json'
+        code, _, start, end = param[:4]
+        if self.store is not None:
+            record = self.store.load_kline(code, start, end)
+            if record is not None:
+                self._count('replayed')
+                body = self._slice_replay(record['body'], code, start, end)
+                return record.get('status', 200), body.encode('utf-8'), 'application/json'
+        payload = {'code': 0, 'msg': '', 'data': {code: {'qfqday': synthetic_klines(code, start, end)}}}
+        return 200, json.dumps(payload).encode('utf-8'), 'application/json'
+
+    @staticmethod
+    def _slice_replay(body: str, code: str, start: str, end: str) -> str:
+        """覆盖更长区间的录制只返回请求区间内的K线"""
+        try:
+            data = json.loads(body)
+            klines = data['data'][code]['qfqday']
+        except (ValueError, KeyError, TypeError):
+            return body
+        data['data'][code]['qfqday'] = [k for k in klines if start <= k[0] <= end]
+        return json.dumps(data, ensure_ascii=False)
+
+    def _quote(self, path: str):
+        query = unquote(path[len(QUOTE_PATH):])
+        if self.store is not None:
+            record = self.store.load(path)
+            if record is not None:
+                self._count('replayed')
+                encoding = record.get('encoding', 'gbk')
+                return record.get('status', 200), record['body'].encode(encoding), f'text/html; charset={encoding}'
+        now = datetime.now()
+        lines = [synthetic_quote(code, now) for code in query.split(',') if code]
+        return 200, '\n'.join(lines).encode('gbk'), 'text/html; charset=GBK'
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server._count('in_flight')
+                try:
+                    status, body, content_type = server._respond(self.path)
+                finally:
+                    server._count('in_flight', -1)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='本地模拟腾讯行情服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--replay', default=None, help='录制目录（[Network] record_dir）')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='随机延迟上限（秒）')
+    parser.add_argument('--rate-limit', type=float, default=None, help='每秒请求上限，超过返回 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 503 的概率')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockTencentServer(args.host, args.port, args.replay, args.latency, args.jitter,
+                               args.rate_limit, args.error_rate, args.seed).start()
+    print(f"模拟服务器已启动: {server.url}")
+    print(f"  [DataSource] tencent_kline_url = {server.kline_url}")
+    print(f"  [DataSource] tencent_quote_url = {server.quote_url}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"统计: {server.stats}")
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
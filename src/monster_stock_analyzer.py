@@ -13,17 +13,23 @@
 import pandas as pd
 import numpy as np
 import os
-import glob
 from typing import List, Dict, Optional, Callable
 from datetime import datetime, timedelta
 
-from src.utils import setup_logger, safe_read_csv
+from src.utils import setup_logger, safe_read_csv, Config, load_stock_data
+from src.data_store import list_stock_files, stock_code_from_path
+from src.market_panel import MarketPanel, open_panel, iter_stock_frames
+from src.results_db import ResultsDB
+from src.history_log import StockHistoryLog
 from src.volume_analyzer import get_stock_name
 
 
 class MonsterStockAnalyzer:
     """妖股筛选分析器"""
 
+    # 回看窗口之外额外读取的历史条数（MA60 与 60 日高点）
+    HISTORY_PADDING = 60
+
     # A股涨跌停幅度
     LIMIT_UP_PCT = 9.8    # 涨停判定阈值(%)，略低于10%留余量
     LIMIT_UP_PCT_ST = 4.8  # ST股涨停判定阈值(%)
@@ -43,6 +49,7 @@ class MonsterStockAnalyzer:
         self.max_results = 0            # 最大输出数量，0=不限制
         self.output_mode = 'all'        # 输出模式: all/new_only
 
+        self.config = config
         if config:
             self._load_config(config)
 
@@ -70,90 +77,27 @@ class MonsterStockAnalyzer:
         """获取历史记录文件路径"""
         return os.path.join(results_dir, 'monster_stock_history.csv')
 
-    def _load_history(self, results_dir: str) -> set:
+    def _update_history(self, results_dir: str, current_df: pd.DataFrame) -> np.ndarray:
         """
-        加载历史妖股记录
+        对照历史记录标记首次入选的股票，并把它们追加到历史日志
 
-        Returns:
-            历史入选的股票代码集合
-        """
-        history_file = self._get_history_file(results_dir)
-        if not os.path.exists(history_file):
-            return set()
-
-        try:
-            df = pd.read_csv(history_file, dtype={'stock_code': str})
-            if 'stock_code' in df.columns:
-                return set(df['stock_code'].astype(str).tolist())
-        except Exception as e:
-            self.logger.warning(f"加载历史记录失败: {e}")
-
-        return set()
-
-    def _save_history(self, results_dir: str, current_df: pd.DataFrame):
-        """
-        保存历史妖股记录（追加新入选的股票）
+        必须先判断再追加，否则本次入选的股票会被当作历史记录而全部过滤掉
 
         Args:
             results_dir: 结果目录
             current_df: 当前分析结果DataFrame
-        """
-        if current_df is None or current_df.empty:
-            return
-
-        history_file = self._get_history_file(results_dir)
 
+        Returns:
+            布尔数组，True 表示首次入选
+        """
+        history = StockHistoryLog(self._get_history_file(results_dir))
+        is_new = history.is_new(current_df['stock_code'])
         try:
-            # 获取当前入选的股票代码和日期
-            new_records = current_df[['stock_code', 'date']].copy()
-            new_records['first_seen'] = datetime.now().strftime('%Y-%m-%d')
-
-            # 如果历史文件存在，合并后去重
-            if os.path.exists(history_file):
-                hist_df = pd.read_csv(history_file, dtype={'stock_code': str})
-                combined = pd.concat([hist_df, new_records], ignore_index=True)
-                # 按股票代码去重，保留最早的记录
-                combined = combined.drop_duplicates(subset=['stock_code'], keep='first')
-                combined.to_csv(history_file, index=False, encoding='utf-8-sig')
-            else:
-                new_records.to_csv(history_file, index=False, encoding='utf-8-sig')
-
-            self.logger.info(f"历史记录已更新: {len(new_records)} 只新入选股票")
-
+            appended = history.append(current_df[is_new])
+            self.logger.info(f"历史记录已更新: {appended} 只新入选股票（历史共 {len(history)} 只）")
         except Exception as e:
             self.logger.warning(f"保存历史记录失败: {e}")
-
-    def _filter_new_stocks_only(self, df: pd.DataFrame, results_dir: str) -> pd.DataFrame:
-        """
-        筛选首次入选的妖股（历史上未入选过的）
-
-        Args:
-            df: 当前分析结果DataFrame
-            results_dir: 结果目录
-
-        Returns:
-            仅包含新入选股票的DataFrame
-        """
-        if df is None or df.empty:
-            return df
-
-        history_codes = self._load_history(results_dir)
-        if not history_codes:
-            self.logger.info("无历史记录，所有股票视为首次入选")
-            return df
-
-        # 筛选不在历史记录中的股票
-        current_codes = set(df['stock_code'].astype(str).tolist())
-        new_codes = current_codes - history_codes
-
-        if not new_codes:
-            self.logger.info(f"本次无新入选妖股（共分析 {len(current_codes)} 只，均已在历史记录中）")
-            return pd.DataFrame()
-
-        new_df = df[df['stock_code'].astype(str).isin(new_codes)].copy()
-        self.logger.info(f"筛选首次入选: {len(new_df)}/{len(df)} 只（历史记录共 {len(history_codes)} 只）")
-
-        return new_df
+        return is_new
 
     # ------------------------------------------------------------------
     # 技术指标计算
@@ -197,21 +141,25 @@ class MonsterStockAnalyzer:
 
     def analyze_single(self, file_path: str) -> Optional[Dict]:
         """分析单只股票，返回评分详情或None"""
+        df = load_stock_data(file_path, last_n_rows=self.history_window)
+        return self.analyze_frame(df, stock_code_from_path(file_path))
+
+    @property
+    def history_window(self) -> int:
+        """评分所需的最近交易日条数"""
+        return self.lookback_days + self.HISTORY_PADDING
+
+    def analyze_frame(self, df: Optional[pd.DataFrame], stock_code: str) -> Optional[Dict]:
+        """分析单只股票的日线数据（来自日线文件或行情面板），返回评分详情或None"""
         try:
-            df = pd.read_csv(file_path, dtype={'code': str})
             if df is None or len(df) < 30:
                 return None
 
-            df['date'] = pd.to_datetime(df['date'])
-            df = df.sort_values('date').reset_index(drop=True)
-
-            for col in ['open', 'close', 'high', 'low', 'volume']:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            df.dropna(subset=['close', 'volume'], inplace=True)
+            # 数据已按固定类型加载并按日期排序
+            df = df.dropna(subset=['close', 'volume']).reset_index(drop=True)
             if len(df) < 30:
                 return None
 
-            stock_code = os.path.basename(file_path).replace('.csv', '')
             stock_name = get_stock_name(stock_code)
 
             is_st = ('ST' in str(stock_name)) or ('*ST' in str(stock_name))
@@ -479,19 +427,22 @@ class MonsterStockAnalyzer:
     # ------------------------------------------------------------------
 
     def analyze_all(self, csv_files: List[str],
-                    progress_callback: Callable = None) -> pd.DataFrame:
+                    progress_callback: Callable = None,
+                    panel: MarketPanel = None) -> pd.DataFrame:
         """
         批量分析所有股票
 
         Args:
             csv_files: 数据文件列表
             progress_callback: 进度回调 (current, total, message)
+            panel: 行情面板，提供时忽略 csv_files 直接按面板分析
         """
         results = []
-        total = len(csv_files)
+        total = len(panel) if panel is not None else len(csv_files)
 
-        for i, fp in enumerate(csv_files):
-            result = self.analyze_single(fp)
+        frames = iter_stock_frames(csv_files, panel, last_n_rows=self.history_window)
+        for i, (stock_code, df) in enumerate(frames):
+            result = self.analyze_frame(df, stock_code)
             if result:
                 results.append(result)
 
@@ -524,15 +475,19 @@ class MonsterStockAnalyzer:
         Returns:
             (results_df, output_file_path)
         """
-        csv_files = glob.glob(os.path.join(daily_dir, '*.csv'))
+        csv_files = list_stock_files(daily_dir)
         if not csv_files:
             self.logger.warning("未找到股票数据文件")
             return pd.DataFrame(), None
 
+        panel = open_panel(self.config, daily_dir, self.logger) if isinstance(self.config, Config) else None
+        if panel is not None:
+            self.logger.info(f"使用行情面板: {len(panel)} 只股票")
+
         self.logger.info(f"开始妖股筛选: {len(csv_files)} 只股票, "
                          f"回看{self.lookback_days}天, 最低评分{self.min_score}")
 
-        results_df = self.analyze_all(csv_files, progress_callback)
+        results_df = self.analyze_all(csv_files, progress_callback, panel=panel)
 
         if results_df.empty:
             self.logger.info("未发现符合条件的妖股候选")
@@ -540,18 +495,17 @@ class MonsterStockAnalyzer:
 
         os.makedirs(results_dir, exist_ok=True)
 
-        # 保存本次所有符合条件的股票到历史记录
-        self._save_history(results_dir, results_df)
+        # 先对照历史记录标记首次入选，再把新股票追加到历史日志
+        is_new = self._update_history(results_dir, results_df)
 
         # 根据输出模式决定是否筛选
         if self.output_mode == 'new_only':
             # 仅输出首次入选的股票
-            new_stocks_df = self._filter_new_stocks_only(results_df, results_dir)
-            if new_stocks_df.empty:
+            if not is_new.any():
                 self.logger.info("本次无首次入选的妖股（所有候选已在历史记录中）")
-                return new_stocks_df, None
-            results_df = new_stocks_df
-            self.logger.info(f"筛选首次入选: {len(results_df)} 只")
+                return results_df.iloc[0:0], None
+            self.logger.info(f"筛选首次入选: {int(is_new.sum())}/{len(results_df)} 只")
+            results_df = results_df[is_new].reset_index(drop=True)
         else:
             # output_mode='all' 或其他值：输出当前交易日所有符合条件的
             self.logger.info(f"输出所有符合条件的: {len(results_df)} 只")
@@ -583,6 +537,7 @@ class MonsterStockAnalyzer:
         }
         export_df.rename(columns=rename_map, inplace=True)
         export_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+        ResultsDB.get(results_dir).record_result_file(output_file, export_df)
 
         self.logger.info(f"妖股筛选完成: {len(results_df)} 只首次入选, 已保存 {output_file}")
         return results_df, output_file
@@ -3,33 +3,35 @@
 支持多种推送方式：Server酱、企业微信、PushPlus等
 """
 
-import requests
 import json
 from typing import List, Dict, Optional, Tuple, Any
 from datetime import datetime, timedelta
 import sys
 import os
-import glob
 import pandas as pd
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.utils import setup_logger, Config
+from src.http_transport import HttpTransport, get_transport
+from src.results_db import ResultsDB, STRATEGY_FILTERED
 
 
 class NotificationService:
     """消息推送服务"""
     
-    def __init__(self, config_file: str = 'config/config.ini'):
+    def __init__(self, config_file: str = 'config/config.ini', transport: HttpTransport = None):
         """
         初始化推送服务
         
         Args:
             config_file: 配置文件路径
+            transport: 共享的 HTTP 连接池（None 时使用进程内共享的默认连接池）
         """
         self.config_file = config_file
         self.config = Config(config_file)
         self.logger = setup_logger('Notification')
+        self.transport = transport or get_transport(self.config)
         
         # 读取配置
         self.enabled = self.config.getboolean('Notification', 'enabled', fallback=False)
@@ -208,45 +210,14 @@ class NotificationService:
     
     def _get_history_results(self) -> Optional[List[Tuple[str, int]]]:
         """
-        获取最近几天的分析结果统计
+        获取最近几天的分析结果统计（查询结果库）
         
         Returns:
             [(日期, 股票数量), ...] 或 None
         """
         try:
-            # 查找最近的结果文件
-            pattern = os.path.join(self.results_dir, 'filtered_*.csv')
-            files = glob.glob(pattern)
-            
-            if not files:
-                return None
-            
-            # 按时间排序
-            files.sort(key=os.path.getmtime, reverse=True)
-            
-            # 读取最近几天的结果
-            history = []
-            for file_path in files[:self.push_history_days]:
-                try:
-                    # 从文件名提取日期
-                    filename = os.path.basename(file_path)
-                    date_str = filename.replace('filtered_', '').replace('.csv', '')
-                    
-                    # 读取文件获取股票数量
-                    df = pd.read_csv(file_path)
-                    count = len(df)
-                    
-                    # 格式化日期
-                    if len(date_str) == 8:  # YYYYMMDD
-                        formatted_date = f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:8]}"
-                    else:
-                        formatted_date = date_str
-                    
-                    history.append((formatted_date, count))
-                except Exception as e:
-                    self.logger.debug(f"读取历史文件失败 {file_path}: {e}")
-                    continue
-            
+            history = ResultsDB.get(self.results_dir).history_counts(
+                STRATEGY_FILTERED, self.push_history_days)
             return history if history else None
             
         except Exception as e:
@@ -395,30 +366,12 @@ class NotificationService:
                 if code:
                     today_codes.add(str(code).zfill(6))
             
-            # 读取昨天的结果文件
+            # 查询上一个信号日入选的股票代码
             yesterday_date = history[1][0] if len(history) > 1 else None
             if not yesterday_date:
                 return []
             
-            yesterday_file = os.path.join(self.results_dir, 
-                                         f"filtered_{yesterday_date.replace('-', '')}.csv")
-            
-            if not os.path.exists(yesterday_file):
-                return []
-            
-            # 读取昨天的股票代码
-            df = pd.read_csv(yesterday_file, dtype={'code': str, '股票代码': str})
-            
-            # 尝试找到代码列
-            code_column = None
-            if 'code' in df.columns:
-                code_column = 'code'
-            elif '股票代码' in df.columns:
-                code_column = '股票代码'
-            else:
-                return []
-            
-            yesterday_codes = set(df[code_column].astype(str).str.zfill(6))
+            yesterday_codes = ResultsDB.get(self.results_dir).codes_on(STRATEGY_FILTERED, yesterday_date)
             
             # 找出连续出现的股票
             continuous = list(today_codes & yesterday_codes)
@@ -452,7 +405,7 @@ class NotificationService:
                 'secret': self.wechat_secret
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.transport.get(url, params=params, timeout=10)
             result = response.json()
             
             if 'access_token' in result:
@@ -525,7 +478,7 @@ class NotificationService:
                         'data': template_data
                     }
                     
-                    response = requests.post(url, json=data, timeout=10)
+                    response = self.transport.post(url, json=data, timeout=10)
                     result = response.json()
                     
                     if result.get('errcode') == 0:
@@ -714,7 +667,7 @@ class NotificationService:
                 'desp': content
             }
             
-            response = requests.post(url, data=data, timeout=10)
+            response = self.transport.post(url, data=data, timeout=10)
             result = response.json()
             
             if result.get('code') == 0:
@@ -777,7 +730,7 @@ class NotificationService:
                         fail_count += 1
                         continue
                     
-                    response = requests.post(webhook, json=data, timeout=10)
+                    response = self.transport.post(webhook, json=data, timeout=10)
                     result = response.json()
                     
                     if result.get('errcode') == 0:
@@ -830,7 +783,7 @@ class NotificationService:
                 'template': 'markdown'
             }
             
-            response = requests.post(url, json=data, timeout=10)
+            response = self.transport.post(url, json=data, timeout=10)
             result = response.json()
             
             if result.get('code') == 200:
@@ -0,0 +1,385 @@
+"""
+自适应限速模块
+按数据源维护请求速率和并发数（AIMD：加性增、乘性减）：
+连续一批请求正常返回时速率加一档、并发数加一；
+超时、连接失败、HTTP 429/5xx、接口频率限制报错或连续返回空数据时，
+速率和并发数减半，并清空令牌桶中积攒的突发额度
+
+学到的速率按数据源保存到状态文件（data/rate_limits.json），下次运行从该速率开始，
+不必每次都从保守的初始值重新试探
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+
+# 正常返回多少个请求后加速一次
+DEFAULT_HEALTHY_STREAK = 20
+# 连续多少次空数据视为被限流
+DEFAULT_EMPTY_BURST = 10
+# 乘性减的系数
+DEFAULT_DECREASE_FACTOR = 0.5
+# 重试等待上限（秒）
+MAX_BACKOFF = 60.0
+
+# 接口频率限制报错中的关键字（Tushare: "抱歉，您每分钟最多访问该接口200次"）
+_THROTTLE_KEYWORDS = ('429', 'Too Many Requests', '每分钟', '最多访问', '频率', '访问次数')
+
+
+class TokenBucket:
+    """
+    令牌桶限速器（线程安全，同步与异步调用方共用）
+    每个请求预约一个令牌，令牌不足时返回需要等待的时间，等待期间不持有锁
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        Args:
+            rate: 每秒补充的令牌数（允许的请求速率）
+            capacity: 桶容量（允许的突发请求数，默认等于 rate，至少 1）
+        """
+        self.rate = max(rate, 0.01)
+        self.capacity = max(capacity if capacity is not None else rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """预约一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def set_rate(self, rate: float, drain: bool = False):
+        """
+        调整速率（桶容量随速率变化）
+
+        Args:
+            rate: 新的每秒令牌数
+            drain: 是否清空已积攒的令牌（降速时避免继续突发）
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.rate = max(rate, 0.01)
+            self.capacity = max(rate, 1.0)
+            self._tokens = min(self._tokens, 0.0 if drain else self.capacity)
+
+    def try_acquire(self) -> bool:
+        """令牌足够时取走一个并返回 True，否则不等待直接返回 False"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def acquire(self):
+        """获取一个令牌（阻塞）"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """获取一个令牌（异步等待）"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """判断异常是否说明服务端过载或限流（超时、连接失败、429/5xx、频率限制报错）"""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    try:
+        import requests
+        if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+            return True
+    except ImportError:
+        pass
+    # aiohttp.ClientResponseError.status / requests.HTTPError.response.status_code
+    status = getattr(error, 'status', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    if type(error).__name__ in ('ServerDisconnectedError', 'ClientConnectorError', 'ClientOSError'):
+        return True
+    message = str(error)
+    return any(keyword in message for keyword in _THROTTLE_KEYWORDS)
+
+
+def backoff_delay(base: float, attempt: int, cap: float = MAX_BACKOFF) -> float:
+    """
+    第 attempt 次（从 0 开始）失败后的重试等待：指数增长并加入随机抖动，
+    避免多个并发请求在同一时刻一起重试
+
+    Args:
+        base: 首次重试的基准等待（秒）
+        attempt: 已失败次数 - 1
+        cap: 等待上限（秒）
+
+    Returns:
+        等待秒数
+    """
+    return min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+
+class _Outcome:
+    """一次请求的结果标记，由调用方在 with 块内设置"""
+
+    __slots__ = ('kind',)
+
+    def __init__(self):
+        self.kind = 'ok'
+
+    def empty(self):
+        """返回了空数据（连续出现时视为被限流）"""
+        self.kind = 'empty'
+
+    def throttled(self):
+        """服务端明确拒绝（如返回限流提示）"""
+        self.kind = 'throttled'
+
+    def error(self):
+        """与限流无关的失败，不影响速率"""
+        self.kind = 'error'
+
+
+class AdaptiveRateLimiter:
+    """按服务端反馈调整速率和并发数的限速器（线程安全，同步与异步调用方共用）"""
+
+    _instances: Dict[Tuple[str, Optional[str]], 'AdaptiveRateLimiter'] = {}
+    _instances_lock = threading.Lock()
+    _state_lock = threading.Lock()
+
+    def __init__(self, name: str, rate: float, min_rate: float = None, max_rate: float = None,
+                 max_concurrency: int = 8, state_file: str = None,
+                 healthy_streak: int = DEFAULT_HEALTHY_STREAK,
+                 empty_burst: int = DEFAULT_EMPTY_BURST,
+                 decrease_factor: float = DEFAULT_DECREASE_FACTOR,
+                 logger: logging.Logger = None):
+        """
+        Args:
+            name: 数据源名称（状态文件中的键）
+            rate: 初始速率（每秒请求数，状态文件中有学到的速率时以其为准）
+            min_rate: 速率下限（默认初始速率的 1/10）
+            max_rate: 速率上限（默认初始速率的 4 倍）
+            max_concurrency: 并发数上限
+            state_file: 状态文件路径（None 时不保存）
+            healthy_streak: 正常返回多少个请求后加速一次
+            empty_burst: 连续多少次空数据视为被限流
+            decrease_factor: 降速系数
+            logger: 日志记录器
+        """
+        self.name = name
+        self.logger = logger or logging.getLogger('RateLimiter')
+        self.min_rate = min_rate if min_rate is not None else max(rate / 10, 0.05)
+        self.max_rate = max(max_rate if max_rate is not None else rate * 4, self.min_rate)
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self.state_file = state_file
+        self.healthy_streak = max(int(healthy_streak), 1)
+        self.empty_burst = max(int(empty_burst), 1)
+        self.decrease_factor = decrease_factor
+        # 每次加速的步长：速率上限与下限之差的 1/20
+        self.increase_step = max((self.max_rate - self.min_rate) / 20, 0.01)
+
+        learned = self._load_rate()
+        self.rate = self._clamp(learned if learned is not None else rate)
+        self.concurrency = self.max_concurrency
+        self._bucket = TokenBucket(self.rate)
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._streak = 0
+        self._empty_streak = 0
+        self._last_decrease = 0.0
+        self._latency: Optional[float] = None
+        self._counts = {'ok': 0, 'empty': 0, 'throttled': 0, 'error': 0}
+
+    @classmethod
+    def get(cls, name: str, state_file: str = None, **kwargs) -> 'AdaptiveRateLimiter':
+        """获取数据源共享的限速器（同一数据源、同一状态文件只创建一次）"""
+        key = (name, os.path.abspath(state_file) if state_file else None)
+        with cls._instances_lock:
+            limiter = cls._instances.get(key)
+            if limiter is None:
+                limiter = cls(name, state_file=state_file, **kwargs)
+                cls._instances[key] = limiter
+            return limiter
+
+    def _clamp(self, rate: float) -> float:
+        return min(max(rate, self.min_rate), self.max_rate)
+
+    # ------------------------------------------------------------------
+    # 请求
+    # ------------------------------------------------------------------
+
+    def acquire(self):
+        """只按当前速率等待一个令牌（不占用并发名额、不记录结果）"""
+        self._bucket.acquire()
+
+    async def acquire_async(self):
+        """异步版 acquire"""
+        await self._bucket.acquire_async()
+
+    def _try_enter(self) -> bool:
+        with self._cond:
+            if self._in_flight < self.concurrency:
+                self._in_flight += 1
+                return True
+            return False
+
+    @contextmanager
+    def request(self):
+        """
+        发起一次请求：等待并发名额和令牌，with 块结束时按结果调整速率
+
+        with 块内抛出的异常按 is_throttle_error 归类后继续向上抛出；
+        正常结束时记为成功，可通过 yield 的对象标记 empty()/throttled()/error()
+        """
+        with self._cond:
+            while self._in_flight >= self.concurrency:
+                self._cond.wait(0.1)
+            self._in_flight += 1
+        outcome = _Outcome()
+        started = None
+        try:
+            self._bucket.acquire()
+            started = time.monotonic()
+            yield outcome
+        except BaseException as e:
+            outcome.kind = 'throttled' if is_throttle_error(e) else 'error'
+            raise
+        finally:
+            self._finish(outcome.kind, started)
+
+    @asynccontextmanager
+    async def request_async(self):
+        """异步版 request"""
+        while not self._try_enter():
+            await asyncio.sleep(0.02)
+        outcome = _Outcome()
+        started = None
+        try:
+            await self._bucket.acquire_async()
+            started = time.monotonic()
+            yield outcome
+        except BaseException as e:
+            outcome.kind = 'throttled' if is_throttle_error(e) else 'error'
+            raise
+        finally:
+            self._finish(outcome.kind, started)
+
+    def _finish(self, kind: str, started: Optional[float]):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+            if started is None:
+                # 等待令牌时被取消，不计入统计
+                return
+            self._counts[kind] += 1
+            if kind in ('ok', 'empty'):
+                latency = time.monotonic() - started
+                self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+            if kind == 'ok':
+                self._empty_streak = 0
+                self._streak += 1
+                if self._streak >= self.healthy_streak:
+                    self._streak = 0
+                    self._increase()
+            elif kind == 'empty':
+                self._empty_streak += 1
+                if self._empty_streak >= self.empty_burst:
+                    self._empty_streak = 0
+                    self._decrease('连续返回空数据')
+            elif kind == 'throttled':
+                self._decrease('请求超时或被限流')
+            else:
+                self._streak = 0
+
+    def _increase(self):
+        rate = self._clamp(self.rate + self.increase_step)
+        self.concurrency = min(self.concurrency + 1, self.max_concurrency)
+        if rate != self.rate:
+            self.rate = rate
+            self._bucket.set_rate(rate)
+
+    def _decrease(self, reason: str):
+        self._streak = 0
+        now = time.monotonic()
+        # 同一批在途请求的连续失败只降速一次
+        if now - self._last_decrease < max(1.0 / self.rate, 1.0):
+            return
+        self._last_decrease = now
+        old_rate = self.rate
+        self.rate = self._clamp(self.rate * self.decrease_factor)
+        self.concurrency = max(int(self.concurrency * self.decrease_factor), 1)
+        self._bucket.set_rate(self.rate, drain=True)
+        self.logger.warning(f"{self.name} {reason}，限速 {old_rate:.2f} -> {self.rate:.2f} 次/秒，"
+                            f"并发 {self.concurrency}")
+
+    def stats(self) -> Dict:
+        """当前速率、并发数、平均延迟与各类结果计数"""
+        with self._cond:
+            return {
+                'name': self.name,
+                'rate': round(self.rate, 3),
+                'concurrency': self.concurrency,
+                'in_flight': self._in_flight,
+                'latency_ms': round(self._latency * 1000, 1) if self._latency is not None else None,
+                **dict(self._counts),
+            }
+
+    # ------------------------------------------------------------------
+    # 状态文件
+    # ------------------------------------------------------------------
+
+    def _read_state(self) -> Dict:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"读取限速状态失败 {self.state_file}: {e}")
+            return {}
+
+    def _load_rate(self) -> Optional[float]:
+        entry = self._read_state().get(self.name)
+        if isinstance(entry, dict) and isinstance(entry.get('rate'), (int, float)):
+            return float(entry['rate'])
+        return None
+
+    def save(self) -> bool:
+        """把当前速率写入状态文件（保留其他数据源的记录）"""
+        if not self.state_file:
+            return False
+        with self._state_lock:
+            state = self._read_state()
+            state[self.name] = {'rate': round(self.rate, 3),
+                                'updated_at': datetime.now().isoformat(timespec='seconds')}
+            tmp_path = self.state_file + '.tmp'
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.state_file)
+                return True
+            except OSError as e:
+                self.logger.warning(f"保存限速状态失败 {self.state_file}: {e}")
+                return False
@@ -0,0 +1,306 @@
+"""
+选股结果数据库模块
+每次筛选的结果除导出 CSV 外，同时写入 data/results/results.db (SQLite)，
+历史统计、连续入选、新增标记等查询走索引，不再遍历和解析结果 CSV
+
+表结构:
+  runs    -- 每个策略每个信号日一条: (strategy, signal_date) -> 导出文件、股票数、写入时间
+  signals -- 入选股票: (strategy, signal_date, stock_code) -> 名称、评分、完整结果行 (JSON)
+
+同一策略同一天多次运行时以最后一次为准。首次打开时导入目录中已有的结果 CSV
+"""
+
+import os
+import re
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple, Set
+
+import pandas as pd
+
+
+RESULTS_DB_FILE = 'results.db'
+
+# 策略名即结果文件名前缀
+STRATEGY_FILTERED = 'filtered'
+STRATEGY_MONSTER = 'monster_stock'
+STRATEGY_VOLUME_SURGE = 'volume_surge'
+STRATEGY_VOLUME_ANALYSIS = 'volume_analysis'
+STRATEGIES = [STRATEGY_FILTERED, STRATEGY_MONSTER, STRATEGY_VOLUME_SURGE, STRATEGY_VOLUME_ANALYSIS]
+
+# 结果文件名: <策略>_YYYYMMDD[_HHMMSS].csv
+_RESULT_FILE_RE = re.compile(r'^(%s)_(\d{8})(?:_\d{6})?\.csv$' % '|'.join(STRATEGIES))
+
+# 结果表中可能的代码/名称/评分列（英文列名与导出的中文列名）
+CODE_COLUMNS = ['stock_code', 'code', '股票代码']
+NAME_COLUMNS = ['stock_name', 'name', '股票名称']
+SCORE_COLUMNS = ['total_score', '综合评分', 'volume_ratio', '成交量倍数']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    strategy    TEXT NOT NULL,
+    signal_date TEXT NOT NULL,
+    file        TEXT,
+    count       INTEGER NOT NULL,
+    created_at  TEXT NOT NULL,
+    PRIMARY KEY (strategy, signal_date)
+);
+CREATE TABLE IF NOT EXISTS signals (
+    strategy    TEXT NOT NULL,
+    signal_date TEXT NOT NULL,
+    stock_code  TEXT NOT NULL,
+    stock_name  TEXT,
+    score       REAL,
+    data        TEXT,
+    PRIMARY KEY (strategy, signal_date, stock_code)
+);
+CREATE INDEX IF NOT EXISTS idx_signals_code ON signals (stock_code, strategy, signal_date);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_instances: Dict[str, 'ResultsDB'] = {}
+_instances_lock = threading.Lock()
+
+
+def _fmt_date(value) -> str:
+    """日期统一为 YYYY-MM-DD（支持 YYYYMMDD 字符串与日期对象）"""
+    if value is None:
+        return datetime.now().strftime('%Y-%m-%d')
+    if isinstance(value, str) and len(value) == 8 and value.isdigit():
+        return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+def _first_column(df: pd.DataFrame, candidates: List[str]) -> Optional[str]:
+    return next((c for c in candidates if c in df.columns), None)
+
+
+def _json_value(value):
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.strftime('%Y-%m-%d')
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+class ResultsDB:
+    """选股结果数据库（进程内按目录共享，每次操作使用独立连接）"""
+
+    def __init__(self, results_dir: str):
+        self.results_dir = results_dir
+        self.path = os.path.join(results_dir, RESULTS_DB_FILE)
+        self.logger = logging.getLogger('ResultsDB')
+        self._lock = threading.Lock()
+        os.makedirs(results_dir, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+        self._import_existing_files()
+
+    @classmethod
+    def get(cls, results_dir: str) -> 'ResultsDB':
+        """获取目录对应的共享结果库实例"""
+        key = os.path.abspath(results_dir)
+        with _instances_lock:
+            db = _instances.get(key)
+            if db is None:
+                db = cls(results_dir)
+                _instances[key] = db
+            return db
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def record_run(self, strategy: str, df: pd.DataFrame, signal_date=None,
+                   file: Optional[str] = None, created_at: Optional[str] = None) -> bool:
+        """
+        登记一次筛选结果（替换该策略同一信号日的旧结果）
+
+        Args:
+            strategy: 策略名（结果文件名前缀）
+            df: 结果表，英文或中文列名均可，需包含股票代码列
+            signal_date: 信号日期（默认今天）
+            file: 导出的结果文件路径
+            created_at: 写入时间（默认当前时间）
+
+        Returns:
+            是否成功
+        """
+        signal_date = _fmt_date(signal_date)
+        df = df if df is not None else pd.DataFrame()
+        code_col = _first_column(df, CODE_COLUMNS)
+        if code_col is None and not df.empty:
+            self.logger.warning(f"结果中没有股票代码列，未登记: {strategy} {signal_date}")
+            return False
+        name_col = _first_column(df, NAME_COLUMNS)
+        score_col = _first_column(df, SCORE_COLUMNS)
+
+        rows = []
+        for record in df.to_dict('records'):
+            code = str(record[code_col]).zfill(6)
+            score = _json_value(record.get(score_col)) if score_col else None
+            rows.append((
+                strategy, signal_date, code,
+                str(record[name_col]) if name_col and record.get(name_col) is not None else None,
+                float(score) if isinstance(score, (int, float)) else None,
+                json.dumps({k: _json_value(v) for k, v in record.items()}, ensure_ascii=False),
+            ))
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute('DELETE FROM signals WHERE strategy = ? AND signal_date = ?',
+                                 (strategy, signal_date))
+                    conn.executemany('INSERT OR REPLACE INTO signals VALUES (?, ?, ?, ?, ?, ?)', rows)
+                    conn.execute('INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)', (
+                        strategy, signal_date, os.path.basename(file) if file else None, len(rows),
+                        created_at or datetime.now().isoformat(timespec='seconds')))
+                return True
+            except Exception as e:
+                self.logger.error(f"登记筛选结果失败 {strategy} {signal_date}: {e}")
+                return False
+            finally:
+                conn.close()
+
+    def record_result_file(self, file: str, df: pd.DataFrame) -> bool:
+        """
+        按导出文件名 (<策略>_YYYYMMDD[_HHMMSS].csv) 登记筛选结果
+
+        Args:
+            file: 导出的结果文件路径
+            df: 导出的结果表
+
+        Returns:
+            是否成功（文件名不符合约定时返回 False）
+        """
+        match = _RESULT_FILE_RE.match(os.path.basename(file))
+        if match is None:
+            self.logger.debug(f"结果文件名不符合约定，未登记: {file}")
+            return False
+        return self.record_run(match.group(1), df, match.group(2), file)
+
+    def _import_existing_files(self):
+        """首次打开时导入结果目录中已有的结果 CSV（按修改时间顺序，同日以最新为准）"""
+        if self._query("SELECT value FROM meta WHERE key = 'imported'"):
+            return
+        files = []
+        for name in os.listdir(self.results_dir):
+            match = _RESULT_FILE_RE.match(name)
+            if match:
+                path = os.path.join(self.results_dir, name)
+                files.append((os.path.getmtime(path), path, match.group(1), match.group(2)))
+
+        imported = 0
+        for mtime, path, strategy, date_str in sorted(files):
+            try:
+                df = pd.read_csv(path, dtype={c: str for c in CODE_COLUMNS})
+            except Exception as e:
+                self.logger.debug(f"导入结果文件失败 {path}: {e}")
+                continue
+            created_at = datetime.fromtimestamp(mtime).isoformat(timespec='seconds')
+            if self.record_run(strategy, df, date_str, path, created_at):
+                imported += 1
+        if imported:
+            self.logger.info(f"已导入 {imported} 个历史结果文件到 {self.path}")
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('imported', ?)",
+                             (datetime.now().isoformat(timespec='seconds'),))
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def recent_runs(self, strategy: str, limit: Optional[int] = None,
+                    since=None) -> List[Dict]:
+        """
+        最近的筛选记录（信号日期倒序）
+
+        Args:
+            strategy: 策略名
+            limit: 最多返回条数
+            since: 只返回该日期及之后的记录
+
+        Returns:
+            [{'signal_date', 'file', 'count', 'created_at'}, ...]
+        """
+        sql = 'SELECT signal_date, file, count, created_at FROM runs WHERE strategy = ?'
+        params: tuple = (strategy,)
+        if since is not None:
+            sql += ' AND signal_date >= ?'
+            params += (_fmt_date(since),)
+        sql += ' ORDER BY signal_date DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            params += (int(limit),)
+        return [dict(zip(('signal_date', 'file', 'count', 'created_at'), row))
+                for row in self._query(sql, params)]
+
+    def history_counts(self, strategy: str, limit: int) -> List[Tuple[str, int]]:
+        """最近 limit 个信号日的入选数量 [(YYYY-MM-DD, 数量), ...]，最新在前"""
+        return [(run['signal_date'], run['count']) for run in self.recent_runs(strategy, limit)]
+
+    def previous_date(self, strategy: str, before) -> Optional[str]:
+        """早于指定日期的最近一个信号日"""
+        rows = self._query('SELECT MAX(signal_date) FROM runs WHERE strategy = ? AND signal_date < ?',
+                           (strategy, _fmt_date(before)))
+        return rows[0][0] if rows and rows[0][0] else None
+
+    def codes_on(self, strategy: str, signal_date) -> Set[str]:
+        """某信号日入选的股票代码"""
+        rows = self._query('SELECT stock_code FROM signals WHERE strategy = ? AND signal_date = ?',
+                           (strategy, _fmt_date(signal_date)))
+        return {row[0] for row in rows}
+
+    def signals(self, strategy: str, signal_date) -> pd.DataFrame:
+        """
+        某信号日的完整入选结果（与导出 CSV 的列一致）
+
+        Returns:
+            DataFrame，附加 stock_code / stock_name / score 三列
+        """
+        rows = self._query(
+            'SELECT stock_code, stock_name, score, data FROM signals '
+            'WHERE strategy = ? AND signal_date = ? ORDER BY score DESC',
+            (strategy, _fmt_date(signal_date)))
+        records = []
+        for code, name, score, data in rows:
+            record = json.loads(data) if data else {}
+            record.update({'stock_code': code, 'stock_name': name, 'score': score})
+            records.append(record)
+        return pd.DataFrame(records)
+
+    def result_file(self, run: Dict) -> Optional[str]:
+        """筛选记录对应的导出文件路径（文件已删除时返回 None）"""
+        if not run.get('file'):
+            return None
+        path = os.path.join(self.results_dir, run['file'])
+        return path if os.path.exists(path) else None
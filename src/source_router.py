@@ -0,0 +1,292 @@
+"""
+数据源路由模块
+按股票逐次选择数据源：主数据源出错或没有返回数据时依次改用备用数据源，
+一个数据源变慢或故障不再拖住整个批量下载
+
+- 熔断：数据源连续失败（抛出异常，或没有数据而其他数据源有数据）达到次数后
+  暂停作为首选一段时间（暂停时间逐次加倍），到期后再试
+- 对冲请求（可选）：主数据源的请求超过其历史延迟的指定分位数仍未返回时，
+  同时向下一个数据源发出请求，取先返回的有效结果
+- 结果统一为主数据源的数据格式：日期格式、数值类型、成交量/成交额单位
+  （AkShare、Tushare 成交量为手，Tushare 成交额为千元，腾讯、BaoStock 为股和元），
+  以及主数据源写入的列（备用数据源没有的列留空，多出的列丢弃）
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional, List, Dict, Callable, Tuple, Iterable
+
+import numpy as np
+import pandas as pd
+
+
+# 各数据源成交量、成交额的单位（以股、元计）
+VOLUME_UNITS = {'tencent': 1, 'baostock': 1, 'akshare': 100, 'tushare': 100}
+AMOUNT_UNITS = {'tencent': 1, 'baostock': 1, 'akshare': 1, 'tushare': 1000}
+COMMON_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume', 'amount']
+# 各数据源写入本地文件的列（按写入顺序）
+SOURCE_COLUMNS = {
+    'tencent': ['date', 'open', 'close', 'low', 'high', 'volume', 'amount'],
+    'baostock': COMMON_COLUMNS,
+    'akshare': ['date', 'open', 'close', 'high', 'low', 'volume', 'amount',
+                'amplitude', 'change_pct', 'change', 'turnover'],
+    'tushare': ['ts_code', 'date', 'open', 'high', 'low', 'close', 'pre_close',
+                'change', 'change_pct', 'volume', 'amount'],
+}
+
+# 连续失败多少次后熔断
+DEFAULT_FAILURE_THRESHOLD = 5
+# 首次熔断的暂停时间（秒），之后逐次加倍
+DEFAULT_COOLDOWN = 60.0
+MAX_COOLDOWN = 1800.0
+# 对冲请求需要的最少延迟样本数
+MIN_HEDGE_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+
+def normalize_frame(df: pd.DataFrame, source: str, target: str) -> pd.DataFrame:
+    """
+    将 source 返回的日线转换为 target 数据源的格式（日期 YYYY-MM-DD、数值列、成交量/成交额单位），
+    并按 target 写入的列对齐：target 有而 source 没有的列留空，source 多出的列丢弃
+
+    Args:
+        df: 数据源返回的日线
+        source: 返回数据的数据源
+        target: 本地数据所用的数据源（主数据源）
+
+    Returns:
+        转换后的 DataFrame（source 与 target 相同时原样返回）
+    """
+    if source == target or df is None or df.empty:
+        return df
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+    for col in COMMON_COLUMNS[1:]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    if 'volume' in df.columns:
+        df['volume'] = df['volume'] * VOLUME_UNITS.get(source, 1) / VOLUME_UNITS.get(target, 1)
+    if 'amount' in df.columns:
+        df['amount'] = df['amount'] * AMOUNT_UNITS.get(source, 1) / AMOUNT_UNITS.get(target, 1)
+    return df.reindex(columns=SOURCE_COLUMNS.get(target, COMMON_COLUMNS))
+
+
+class _SourceHealth:
+    """单个数据源的延迟样本与熔断状态"""
+
+    def __init__(self):
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.failures = 0
+        self.open_until = 0.0
+        self.cooldown = DEFAULT_COOLDOWN
+        self.served = 0
+
+
+class SourceRouter:
+    """按股票选择数据源，失败时切换备用数据源（线程安全）"""
+
+    def __init__(self, fallbacks: Iterable[str] = (), hedge: bool = False,
+                 hedge_percentile: float = 95, hedge_workers: int = 8,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 cooldown: float = DEFAULT_COOLDOWN, logger: logging.Logger = None):
+        """
+        Args:
+            fallbacks: 备用数据源（按优先级）
+            hedge: 是否发出对冲请求
+            hedge_percentile: 主数据源延迟超过该分位数时发出对冲请求
+            hedge_workers: 对冲请求线程数
+            failure_threshold: 连续失败多少次后熔断
+            cooldown: 首次熔断的暂停时间（秒）
+            logger: 日志记录器
+        """
+        self.fallbacks = [s for s in fallbacks if s]
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_workers = max(int(hedge_workers), 2)
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.cooldown = cooldown
+        self.logger = logger or logging.getLogger('SourceRouter')
+        self._health: Dict[str, _SourceHealth] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_health(self, source: str) -> _SourceHealth:
+        health = self._health.get(source)
+        if health is None:
+            health = self._health[source] = _SourceHealth()
+            health.cooldown = self.cooldown
+        return health
+
+    # ------------------------------------------------------------------
+    # 选择数据源
+    # ------------------------------------------------------------------
+
+    def order(self, primary: str, exclude: Iterable[str] = ()) -> List[str]:
+        """本次请求的数据源顺序：未熔断的在前，熔断中的排在最后（仍可作为最后手段）"""
+        exclude = set(exclude)
+        sources = [s for s in [primary] + self.fallbacks if s not in exclude]
+        sources = list(dict.fromkeys(sources))
+        now = time.monotonic()
+        with self._lock:
+            healthy = [s for s in sources if self._get_health(s).open_until <= now]
+        return healthy + [s for s in sources if s not in healthy]
+
+    def hedge_delay(self, source: str) -> Optional[float]:
+        """主数据源的对冲等待时间（延迟样本不足时为 None）"""
+        with self._lock:
+            samples = list(self._get_health(source).latencies)
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return None
+        return float(np.percentile(samples, self.hedge_percentile))
+
+    # ------------------------------------------------------------------
+    # 登记结果
+    # ------------------------------------------------------------------
+
+    def record_success(self, source: str, latency: float):
+        with self._lock:
+            health = self._get_health(source)
+            health.latencies.append(latency)
+            health.failures = 0
+            health.cooldown = self.cooldown
+            health.served += 1
+
+    def record_failure(self, source: str, reason: str = ''):
+        with self._lock:
+            health = self._get_health(source)
+            health.failures += 1
+            if health.failures < self.failure_threshold or health.open_until > time.monotonic():
+                return
+            health.open_until = time.monotonic() + health.cooldown
+            cooldown = health.cooldown
+            health.cooldown = min(health.cooldown * 2, MAX_COOLDOWN)
+            health.failures = 0
+        self.logger.warning(f"数据源 {source} 连续失败{('（' + reason + '）') if reason else ''}，"
+                            f"{cooldown:.0f} 秒内改用备用数据源")
+
+    def stats(self) -> Dict[str, Dict]:
+        """各数据源的成功次数、延迟分位数与熔断状态"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                source: {
+                    'served': health.served,
+                    'p50_ms': round(float(np.percentile(health.latencies, 50)) * 1000, 1)
+                    if health.latencies else None,
+                    'p95_ms': round(float(np.percentile(health.latencies, 95)) * 1000, 1)
+                    if health.latencies else None,
+                    'open': health.open_until > now,
+                }
+                for source, health in self._health.items()
+            }
+
+    # ------------------------------------------------------------------
+    # 请求
+    # ------------------------------------------------------------------
+
+    def _timed(self, fetch: Callable[[str], Optional[pd.DataFrame]], source: str):
+        """执行一次请求，返回 (DataFrame 或 None, 异常 或 None, 耗时)"""
+        start = time.monotonic()
+        try:
+            return fetch(source), None, time.monotonic() - start
+        except Exception as e:
+            return None, e, time.monotonic() - start
+
+    def fetch(self, fetch: Callable[[str], Optional[pd.DataFrame]], primary: str,
+              exclude: Iterable[str] = ()) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        """
+        依次向各数据源请求，返回第一个有数据的结果（已转换为主数据源的格式）
+
+        Args:
+            fetch: fetch(数据源名) -> DataFrame / None，出错时抛出异常
+            primary: 主数据源
+            exclude: 本次不使用的数据源
+
+        Returns:
+            (DataFrame, 数据源)；全部没有数据时返回 (空 DataFrame 或 None, None)
+
+        Raises:
+            全部数据源都抛出异常时抛出最后一个异常
+        """
+        sources = self.order(primary, exclude)
+        if not sources:
+            return None, None
+        if len(sources) == 1:
+            df, error, latency = self._timed(fetch, sources[0])
+            if error is not None:
+                raise error
+            if df is not None and not df.empty:
+                self.record_success(sources[0], latency)
+                return normalize_frame(df, sources[0], primary), sources[0]
+            return df, None
+
+        empty = []
+        last_error = None
+        result = None
+        i = 0
+        while i < len(sources):
+            source = sources[i]
+            delay = self.hedge_delay(source) if self.hedge and i + 1 < len(sources) else None
+            if delay is not None:
+                outcomes = self._hedged(fetch, source, sources[i + 1], delay)
+                i += 2
+            else:
+                outcomes = [(source, *self._timed(fetch, source))]
+                i += 1
+            for name, df, error, latency in outcomes:
+                if error is not None:
+                    last_error = error
+                    self.record_failure(name, type(error).__name__)
+                    self.logger.debug(f"数据源 {name} 请求失败: {error}")
+                elif df is not None and not df.empty:
+                    self.record_success(name, latency)
+                    if result is None:
+                        result = (normalize_frame(df, name, primary), name)
+                else:
+                    empty.append((name, df))
+            if result is not None:
+                break
+
+        if result is not None:
+            # 没有数据而其他数据源有数据：说明该数据源异常
+            for name, _ in empty:
+                self.record_failure(name, '无数据')
+            if result[1] != primary:
+                self.logger.debug(f"主数据源 {primary} 不可用，改用 {result[1]}")
+            return result
+        if empty:
+            return empty[0][1], None
+        raise last_error
+
+    def _hedged(self, fetch, primary: str, secondary: str, delay: float):
+        """先请求 primary，超过 delay 秒未返回时同时请求 secondary，返回已完成的结果"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.hedge_workers,
+                                                    thread_name_prefix='HedgedFetch')
+            executor = self._executor
+        futures = {executor.submit(self._timed, fetch, primary): primary}
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            self.logger.debug(f"数据源 {primary} 超过 {delay * 1000:.0f}ms 未返回，对冲请求 {secondary}")
+            futures[executor.submit(self._timed, fetch, secondary)] = secondary
+
+        outcomes = []
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                df, error, latency = future.result()
+                outcomes.append((futures[future], df, error, latency))
+                if error is None and df is not None and not df.empty:
+                    # 已有有效结果，较慢的请求在后台结束后丢弃
+                    return outcomes
+        return outcomes
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -6,7 +6,7 @@
 import os
 import sys
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Callable
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -15,6 +15,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.utils import setup_logger, Config, safe_read_csv, safe_write_csv, ensure_dir
 from src.data_analyzer import DataAnalyzer
+from src.data_store import find_stock_file
+from src.market_panel import open_panel
+from src.results_db import ResultsDB, STRATEGY_FILTERED
 
 
 class StockFilter:
@@ -41,6 +44,9 @@ class StockFilter:
         # 初始化分析器
         self.analyzer = DataAnalyzer(ma_period=self.ma_period)
         
+        # 行情面板（filter_all_stocks 时按配置打开）
+        self.panel = None
+        
         # 确保目录存在
         ensure_dir(self.results_dir)
         
@@ -74,19 +80,27 @@ class StockFilter:
             如果符合条件返回详细信息字典，否则返回None
         """
         try:
-            file_path = os.path.join(self.daily_dir, f"{stock_code}.csv")
-            
-            # 检查文件是否存在
-            if not os.path.exists(file_path):
-                self.logger.debug(f"股票 {stock_code} 数据文件不存在")
-                return None
-            
-            # 使用分析器检查条件
-            is_match, info = self.analyzer.analyze_from_file(
-                file_path,
-                volume_ratio_threshold=self.volume_ratio_threshold,
-                ma_period=self.ma_period
-            )
+            if self.panel is not None and stock_code in self.panel:
+                # 使用行情面板数据
+                is_match, info = self.analyzer.analyze_from_frame(
+                    self.panel.stock_frame(stock_code, last_n_rows=self.ma_period + 1),
+                    volume_ratio_threshold=self.volume_ratio_threshold,
+                    ma_period=self.ma_period
+                )
+            else:
+                file_path = find_stock_file(self.daily_dir, stock_code)
+                
+                # 检查文件是否存在
+                if file_path is None:
+                    self.logger.debug(f"股票 {stock_code} 数据文件不存在")
+                    return None
+                
+                # 使用分析器检查条件
+                is_match, info = self.analyzer.analyze_from_file(
+                    file_path,
+                    volume_ratio_threshold=self.volume_ratio_threshold,
+                    ma_period=self.ma_period
+                )
             
             if is_match and info:
                 # 添加股票代码和名称
@@ -126,6 +140,10 @@ class StockFilter:
         matched_stocks = []
         processed = 0
         
+        self.panel = open_panel(self.config, self.daily_dir, self.logger)
+        if self.panel is not None:
+            self.logger.info(f"使用行情面板: {len(self.panel)} 只股票")
+        
         self.logger.info(f"开始筛选 {total} 只股票...")
         
         def filter_single(row: pd.Series) -> Optional[Dict]:
@@ -224,9 +242,10 @@ class StockFilter:
             if '成交量倍数' in df.columns:
                 df = df.sort_values('成交量倍数', ascending=False)
             
-            # 保存文件
+            # 保存文件，同时登记到结果库供历史查询
             if safe_write_csv(df, output_file):
                 self.logger.info(f"结果已保存到: {output_file}")
+                ResultsDB.get(self.results_dir).record_result_file(output_file, df)
                 return True
             else:
                 self.logger.error("保存结果失败")
@@ -296,35 +315,19 @@ class StockFilter:
     
     def get_history_results(self, days: int = 30) -> List[str]:
         """
-        获取历史筛选结果文件列表
+        获取历史筛选结果文件列表（查询结果库，不扫描结果目录）
         
         Args:
             days: 最近几天
         
         Returns:
-            结果文件路径列表
+            结果文件路径列表（按信号日期倒序）
         """
         try:
-            if not os.path.exists(self.results_dir):
-                return []
-            
-            result_files = []
-            cutoff_date = datetime.now().timestamp() - (days * 24 * 3600)
-            
-            for filename in os.listdir(self.results_dir):
-                if not filename.startswith('filtered_') or not filename.endswith('.csv'):
-                    continue
-                
-                file_path = os.path.join(self.results_dir, filename)
-                file_time = os.path.getmtime(file_path)
-                
-                if file_time >= cutoff_date:
-                    result_files.append(file_path)
-            
-            # 按时间倒序排序
-            result_files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-            
-            return result_files
+            db = ResultsDB.get(self.results_dir)
+            since = datetime.now() - timedelta(days=days)
+            files = [db.result_file(run) for run in db.recent_runs(STRATEGY_FILTERED, since=since)]
+            return [f for f in files if f]
             
         except Exception as e:
             self.logger.error(f"获取历史结果失败: {e}")
@@ -0,0 +1,414 @@
+"""
+日线数据冷热分层存储模块
+data/daily 下的逐股文件作为"热层"，只保存最近几年的数据，支持按行追加；
+更早的年份由压实 (compact) 任务封存到 data/daily/_cold/<年份>.parquet 冷层分区，
+分区写入后不再修改（除非补充了该年的历史数据），zstd 压缩，每只股票一个行组
+
+读取时 load_stock_data 按请求的日期范围只打开有重叠的冷层分区，
+与热层数据合并后返回，调用方无需关心数据所在的层
+
+目录结构:
+  data/daily/000001.csv         -- 热层（当前年 + 前 hot_years 年）
+  data/daily/_cold/2020.parquet -- 冷层年度分区（全部股票，按代码排序）
+"""
+
+import os
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple, Iterable
+
+import pandas as pd
+
+from src.data_store import (
+    PARQUET_AVAILABLE, DAILY_FLOAT_COLUMNS, DAILY_INT_COLUMNS,
+    list_stock_files, read_stock_data, write_stock_data, normalize_daily_frame,
+    stock_code_from_path,
+)
+
+if PARQUET_AVAILABLE:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+
+COLD_DIR = '_cold'
+DEFAULT_HOT_YEARS = 1
+
+# 冷层分区的固定列（数据源没有的列写入空值，读取时去掉全空列）
+COLD_COLUMNS = ['date', 'code'] + DAILY_FLOAT_COLUMNS + DAILY_INT_COLUMNS
+
+_stores: Dict[str, 'ColdStore'] = {}
+_stores_lock = threading.Lock()
+
+
+def get_hot_years(config) -> int:
+    """从 Config 对象读取 [Download] hot_years（热层保留的完整年数）"""
+    return max(config.getint('Download', 'hot_years', fallback=DEFAULT_HOT_YEARS), 0)
+
+
+def hot_cutoff(hot_years: int = DEFAULT_HOT_YEARS, today: datetime = None) -> pd.Timestamp:
+    """热层起始日期：早于该日期的数据应封存到冷层"""
+    today = today or datetime.now()
+    return pd.Timestamp(year=today.year - hot_years, month=1, day=1)
+
+
+def _cold_schema():
+    fields = [pa.field('date', pa.timestamp('us')), pa.field('code', pa.string())]
+    fields += [pa.field(col, pa.float64()) for col in DAILY_FLOAT_COLUMNS]
+    fields += [pa.field(col, pa.int64()) for col in DAILY_INT_COLUMNS]
+    return pa.schema(fields)
+
+
+def _to_cold_table(df: pd.DataFrame, stock_code: str):
+    """按冷层固定 schema 转换单只股票数据"""
+    df = normalize_daily_frame(df).reindex(columns=COLD_COLUMNS)
+    df['code'] = stock_code
+    for col in DAILY_INT_COLUMNS:
+        df[col] = df[col].astype('Int64')
+    return pa.Table.from_pandas(df, schema=_cold_schema(), preserve_index=False)
+
+
+class ColdStore:
+    """冷层年度分区（进程内按目录共享，分区元数据按文件修改时间缓存）"""
+
+    def __init__(self, daily_dir: str):
+        self.daily_dir = daily_dir
+        self.cold_dir = os.path.join(daily_dir, COLD_DIR)
+        self.logger = logging.getLogger('ColdStore')
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        self._paths: Dict[int, str] = {}
+        # 年份 -> (分区 mtime_ns, Parquet 元数据, {股票代码: (行组列表, 最早日期, 最新日期)})
+        self._partitions: Dict[int, Tuple[int, object, Dict[str, Tuple[List[int], pd.Timestamp, pd.Timestamp]]]] = {}
+
+    @classmethod
+    def get(cls, daily_dir: str) -> 'ColdStore':
+        """获取目录对应的共享冷层实例"""
+        key = os.path.abspath(daily_dir)
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                store = cls(daily_dir)
+                _stores[key] = store
+            return store
+
+    def partition_path(self, year: int) -> str:
+        return os.path.join(self.cold_dir, f'{year}.parquet')
+
+    def _refresh(self) -> Dict[int, str]:
+        """按目录修改时间刷新分区列表"""
+        try:
+            mtime = os.stat(self.cold_dir).st_mtime_ns
+        except OSError:
+            self._dir_mtime, self._paths = None, {}
+            return self._paths
+        if mtime != self._dir_mtime:
+            paths = {}
+            for name in os.listdir(self.cold_dir):
+                stem, ext = os.path.splitext(name)
+                if ext == '.parquet' and stem.isdigit():
+                    paths[int(stem)] = os.path.join(self.cold_dir, name)
+            self._dir_mtime, self._paths = mtime, paths
+        return self._paths
+
+    def years(self) -> List[int]:
+        """已封存的年份（升序）"""
+        if not PARQUET_AVAILABLE:
+            return []
+        with self._lock:
+            return sorted(self._refresh())
+
+    def signature(self) -> Tuple:
+        """冷层状态标识，分区变化后改变（用于读取缓存的键）"""
+        with self._lock:
+            self._refresh()
+            return (self._dir_mtime,)
+
+    def _partition(self, year: int):
+        """读取并缓存分区元数据与代码索引"""
+        path = self._paths.get(year)
+        if path is None:
+            return None
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._partitions.get(year)
+        if cached is not None and cached[0] == mtime:
+            return cached
+
+        meta = pq.ParquetFile(path).metadata
+        names = meta.schema.names
+        code_idx, date_idx = names.index('code'), names.index('date')
+        index: Dict[str, Tuple[List[int], pd.Timestamp, pd.Timestamp]] = {}
+        for i in range(meta.num_row_groups):
+            rg = meta.row_group(i)
+            code_stats = rg.column(code_idx).statistics
+            date_stats = rg.column(date_idx).statistics
+            if code_stats is None or not code_stats.has_min_max or code_stats.min != code_stats.max:
+                continue
+            code = code_stats.min
+            if isinstance(code, bytes):
+                code = code.decode('utf-8')
+            lo, hi = pd.Timestamp(date_stats.min), pd.Timestamp(date_stats.max)
+            groups, first, last = index.get(code, ([], lo, hi))
+            index[code] = (groups + [i], min(first, lo), max(last, hi))
+        cached = (mtime, meta, index)
+        self._partitions[year] = cached
+        return cached
+
+    def date_range(self, stock_code: str) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        """单只股票在冷层中的 (最早日期, 最新日期)"""
+        first = last = None
+        for year in self.years():
+            with self._lock:
+                part = self._partition(year)
+            entry = part[2].get(stock_code) if part else None
+            if entry is None:
+                continue
+            first = entry[1] if first is None else min(first, entry[1])
+            last = entry[2] if last is None else max(last, entry[2])
+        return first, last
+
+    def earliest_date(self) -> Optional[pd.Timestamp]:
+        """冷层中全部股票的最早日期"""
+        for year in self.years():
+            with self._lock:
+                part = self._partition(year)
+            if part and part[2]:
+                return min(entry[1] for entry in part[2].values())
+        return None
+
+    def read_stock(self, stock_code: str, years: Iterable[int] = None) -> Optional[pd.DataFrame]:
+        """
+        读取单只股票在指定年份分区中的数据（只解码该股票的行组）
+
+        Args:
+            stock_code: 股票代码
+            years: 要读取的年份（None 表示全部分区）
+
+        Returns:
+            DataFrame（去掉全空列），冷层中无该股票时返回 None
+        """
+        frames = []
+        for year in sorted(years if years is not None else self.years()):
+            with self._lock:
+                self._refresh()
+                part = self._partition(year)
+                path = self._paths.get(year)
+            entry = part[2].get(stock_code) if part else None
+            if entry is None:
+                continue
+            # 复用缓存的元数据，避免每次解析分区文件尾部
+            table = pq.ParquetFile(path, metadata=part[1]).read_row_groups(entry[0])
+            frames.append(table.to_pandas())
+        if not frames:
+            return None
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        return df.dropna(axis=1, how='all')
+
+    def open_writer(self, year: int) -> 'PartitionWriter':
+        """打开年度分区写入器（写入临时文件，commit 后整体替换）"""
+        os.makedirs(self.cold_dir, exist_ok=True)
+        return PartitionWriter(self.partition_path(year))
+
+    def write_partition(self, year: int, frames: Iterable[Tuple[str, pd.DataFrame]]) -> int:
+        """
+        写入（替换）一个年度分区，frames 需按股票代码升序产出
+
+        Returns:
+            写入的行数
+        """
+        writer = self.open_writer(year)
+        try:
+            for code, df in frames:
+                writer.write(code, df)
+        except Exception:
+            writer.abort()
+            raise
+        writer.commit()
+        return writer.rows
+
+    def read_partition(self, year: int) -> Dict[str, pd.DataFrame]:
+        """读取整个分区，返回 {股票代码: DataFrame}"""
+        path = self.partition_path(year)
+        if not os.path.exists(path):
+            return {}
+        df = pd.read_parquet(path)
+        return {str(code): group for code, group in df.groupby('code', sort=True)}
+
+
+class PartitionWriter:
+    """年度分区写入器：每次 write 写入一只股票（一个行组），commit 时替换正式文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        self.rows = 0
+        self._writer = pq.ParquetWriter(self.tmp_path, _cold_schema(), compression='zstd')
+
+    def write(self, stock_code: str, df: pd.DataFrame):
+        if df is None or df.empty:
+            return
+        self._writer.write_table(_to_cold_table(df, stock_code))
+        self.rows += len(df)
+
+    def commit(self):
+        self._writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def cold_years_for_range(years: List[int], start_date=None, end_date=None) -> List[int]:
+    """与日期范围有重叠的冷层年份"""
+    lo = pd.Timestamp(start_date).year if start_date is not None else None
+    hi = pd.Timestamp(end_date).year if end_date is not None else None
+    return [y for y in years if (lo is None or y >= lo) and (hi is None or y <= hi)]
+
+
+def merge_cold(hot: Optional[pd.DataFrame], cold: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """合并冷层与热层数据，列以热层为准，日期重复时保留热层"""
+    if cold is None or cold.empty:
+        return hot
+    if hot is None or hot.empty or 'date' not in hot.columns:
+        return normalize_daily_frame(cold)
+    cold = cold.reindex(columns=hot.columns)
+    return normalize_daily_frame(pd.concat([cold, hot], ignore_index=True))
+
+
+def read_tiered_stock_data(file_path: str, last_n_rows: Optional[int] = None,
+                           cold_years: Optional[List[int]] = None) -> pd.DataFrame:
+    """
+    读取热层文件并按需补上冷层数据，返回按固定类型转换后的 DataFrame
+
+    Args:
+        file_path: 热层数据文件路径
+        last_n_rows: 只取最后 N 行，热层行数不足时从最近的冷层分区向前补齐
+        cold_years: 需要合并的冷层年份（None 或空表示不读冷层）
+    """
+    df = normalize_daily_frame(read_stock_data(file_path, last_n_rows=last_n_rows))
+    if not cold_years or (last_n_rows and len(df) >= last_n_rows):
+        return df
+
+    store = ColdStore.get(os.path.dirname(file_path) or '.')
+    code = stock_code_from_path(file_path)
+    if not last_n_rows:
+        return merge_cold(df, store.read_stock(code, cold_years))
+
+    frames = []
+    need = last_n_rows - len(df)
+    for year in sorted(cold_years, reverse=True):
+        part = store.read_stock(code, [year])
+        if part is None:
+            continue
+        frames.insert(0, part)
+        need -= len(part)
+        if need <= 0:
+            break
+    if not frames:
+        return df
+    cold = pd.concat(frames, ignore_index=True).dropna(axis=1, how='all')
+    return merge_cold(df, cold).tail(last_n_rows).reset_index(drop=True)
+
+
+def compact_daily_dir(daily_dir: str, hot_years: int = DEFAULT_HOT_YEARS,
+                      today: datetime = None, manifest=None,
+                      logger: logging.Logger = None) -> Dict[str, int]:
+    """
+    压实：将热层中早于 hot_cutoff 的数据封存到冷层年度分区，并从热层文件中移除
+
+    两阶段执行：先写入并替换冷层分区，再重写热层文件；中途中断时数据只会在两层重复
+    （读取时按日期去重），再次压实即可恢复
+
+    Args:
+        daily_dir: 日线数据目录
+        hot_years: 热层保留当前年之外的完整年数
+        today: 当前日期（测试用）
+        manifest: DataManifest，提供时只检查首日期早于截止日期的文件，并登记重写
+        logger: 日志记录器
+
+    Returns:
+        统计信息 {'stocks': 涉及股票数, 'rows': 封存行数, 'partitions': 写入分区数}
+    """
+    logger = logger or logging.getLogger('ColdStore')
+    stats = {'stocks': 0, 'rows': 0, 'partitions': 0}
+    if not PARQUET_AVAILABLE:
+        logger.warning("冷层存储需要 pyarrow，请安装: pip install pyarrow，跳过压实")
+        return stats
+
+    cutoff = hot_cutoff(hot_years, today)
+    cutoff_str = cutoff.strftime('%Y-%m-%d')
+    files = list_stock_files(daily_dir)
+    if manifest is not None:
+        manifest.sync()
+        candidates = []
+        for path in files:
+            first, _ = manifest.hot_date_range(path)
+            if first is not None and first < cutoff_str:
+                candidates.append(path)
+        files = candidates
+    if not files:
+        return stats
+
+    store = ColdStore.get(daily_dir)
+    existing = set(store.years())
+
+    # 第一阶段：新年份按股票代码顺序流式写入分区，已封存年份的补充数据暂存后合并重写
+    writers: Dict[int, PartitionWriter] = {}
+    backfill: Dict[int, Dict[str, pd.DataFrame]] = {}
+    moved: List[str] = []
+    try:
+        for path in files:
+            try:
+                df = normalize_daily_frame(read_stock_data(path))
+            except Exception as e:
+                logger.error(f"读取 {path} 失败，跳过压实: {e}")
+                continue
+            old = df[df['date'] < cutoff]
+            if old.empty:
+                continue
+            code = stock_code_from_path(path)
+            for year, group in old.groupby(old['date'].dt.year):
+                year = int(year)
+                if year in existing:
+                    backfill.setdefault(year, {})[code] = group
+                    continue
+                if year not in writers:
+                    writers[year] = store.open_writer(year)
+                writers[year].write(code, group)
+            moved.append(path)
+    except Exception:
+        for writer in writers.values():
+            writer.abort()
+        raise
+
+    for year, writer in sorted(writers.items()):
+        writer.commit()
+        stats['rows'] += writer.rows
+        stats['partitions'] += 1
+
+    for year, frames in sorted(backfill.items()):
+        logger.info(f"冷层分区 {year} 有补充数据 ({len(frames)} 只股票)，合并后重写")
+        merged = store.read_partition(year)
+        for code, df in frames.items():
+            merged[code] = normalize_daily_frame(pd.concat([merged.get(code), df], ignore_index=True))
+            stats['rows'] += len(df)
+        store.write_partition(year, sorted(merged.items()))
+        stats['partitions'] += 1
+
+    # 第二阶段：从热层文件中移除已封存的数据
+    for path in moved:
+        raw = read_stock_data(path)
+        dates = pd.to_datetime(raw['date'], errors='coerce')
+        hot = raw[dates >= cutoff]
+        write_stock_data(hot, path)
+        if manifest is not None:
+            manifest.record_write(path, hot)
+        stats['stocks'] += 1
+
+    if manifest is not None:
+        manifest.save()
+    logger.info(f"冷热分层压实完成: {stats['stocks']} 只股票, 封存 {stats['rows']} 行, "
+                f"写入 {stats['partitions']} 个年度分区 (热层起始 {cutoff_str})")
+    return stats
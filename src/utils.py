@@ -5,11 +5,19 @@
 
 import os
 import logging
+import threading
 import configparser
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, List
 import pandas as pd
 
+from src.data_store import (
+    read_stock_data, write_stock_data, stock_file_path, DEFAULT_STORAGE_FORMAT,
+)
+from src.data_manifest import DataManifest
+from src.tiered_store import ColdStore, cold_years_for_range, read_tiered_stock_data
+
 
 class Config:
     """配置管理类
@@ -240,45 +248,21 @@ def get_latest_signal_date(reference_date: datetime = None) -> datetime:
     return get_last_trading_day(reference_date - timedelta(days=1))
 
 
-def get_local_latest_data_date(daily_dir: str, sample_size: int = 100) -> Optional[datetime]:
+def get_local_latest_data_date(daily_dir: str) -> Optional[datetime]:
     """
-    获取本地日线数据中的最新交易日期
+    获取本地日线数据中的最新交易日期（读取数据目录清单，覆盖全部文件）
 
     Args:
         daily_dir: 日线数据目录
-        sample_size: 抽样检查的文件数量上限
 
     Returns:
         最新日期，无数据时返回 None
     """
-    import glob
-
-    csv_files = glob.glob(os.path.join(daily_dir, '*.csv'))
-    if not csv_files:
+    if not os.path.isdir(daily_dir):
         return None
-
-    latest_date = None
-    for csv_file in csv_files[:sample_size]:
-        try:
-            df = pd.read_csv(csv_file, usecols=['date'])
-            if df.empty:
-                continue
-            file_latest = pd.to_datetime(df['date'], errors='coerce').max()
-            if pd.notna(file_latest) and (latest_date is None or file_latest > latest_date):
-                latest_date = file_latest
-        except (ValueError, KeyError):
-            try:
-                df = pd.read_csv(csv_file)
-                if 'date' not in df.columns or df.empty:
-                    continue
-                file_latest = pd.to_datetime(df['date'], errors='coerce').max()
-                if pd.notna(file_latest) and (latest_date is None or file_latest > latest_date):
-                    latest_date = file_latest
-            except Exception:
-                continue
-        except Exception:
-            continue
-
+    manifest = DataManifest.get(daily_dir)
+    manifest.sync()
+    latest_date = manifest.latest_date()
     return latest_date.to_pydatetime() if latest_date is not None else None
 
 
@@ -333,7 +317,7 @@ def format_date(date_str: str, input_format: str = '%Y%m%d', output_format: str
 
 def safe_read_csv(file_path: str, **kwargs) -> Optional[pd.DataFrame]:
     """
-    安全读取CSV文件
+    安全读取CSV文件（.parquet 文件按列式格式读取）
     
     Args:
         file_path: 文件路径
@@ -347,6 +331,9 @@ def safe_read_csv(file_path: str, **kwargs) -> Optional[pd.DataFrame]:
             logging.warning(f"文件不存在: {file_path}")
             return None
         
+        if file_path.endswith('.parquet'):
+            return read_stock_data(file_path, **kwargs)
+        
         df = pd.read_csv(file_path, **kwargs)
         return df
     except Exception as e:
@@ -356,7 +343,7 @@ def safe_read_csv(file_path: str, **kwargs) -> Optional[pd.DataFrame]:
 
 def safe_write_csv(df: pd.DataFrame, file_path: str, **kwargs) -> bool:
     """
-    安全写入CSV文件
+    安全写入CSV文件（.parquet 文件按列式格式写入）
     
     Args:
         df: DataFrame
@@ -367,28 +354,98 @@ def safe_write_csv(df: pd.DataFrame, file_path: str, **kwargs) -> bool:
         是否成功
     """
     try:
-        # 确保目录存在
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        df.to_csv(file_path, index=False, encoding='utf-8-sig', **kwargs)
+        # 按扩展名选择格式，先写临时文件再替换
+        write_stock_data(df, file_path, **kwargs)
         return True
     except Exception as e:
         logging.error(f"写入CSV文件失败: {file_path}, {e}")
         return False
 
 
-def get_stock_data_path(stock_code: str, data_dir: str = 'data/daily') -> str:
+# 进程内日线数据缓存: (绝对路径, mtime_ns, size, last_n_rows, 冷层年份, 冷层状态) -> DataFrame
+STOCK_DATA_CACHE_SIZE = 512
+_stock_data_cache: 'OrderedDict[tuple, pd.DataFrame]' = OrderedDict()
+_stock_data_cache_lock = threading.Lock()
+
+
+def load_stock_data(file_path: str, last_n_rows: Optional[int] = None,
+                    start_date=None, end_date=None,
+                    use_cache: bool = True) -> Optional[pd.DataFrame]:
+    """
+    统一的日线数据加载入口（分析、回测、GUI 共用）
+
+    列类型固定: date 为 datetime64，code 为 6 位字符串，价格/金额为 float64，
+    volume 为 int64；按日期升序且无重复。已封存到冷层的年份只打开与
+    [start_date, end_date] 有重叠的分区并与热层合并。同一进程内按文件
+    (mtime, size) 缓存解析结果，文件变化后自动失效，每次返回独立副本。
+
+    Args:
+        file_path: 数据文件路径（CSV 或 Parquet）
+        last_n_rows: 只读取最后 N 行（None 表示全部历史）
+        start_date: 起始日期（含），可为字符串或日期
+        end_date: 结束日期（含）
+        use_cache: 是否使用进程内缓存
+
+    Returns:
+        DataFrame，文件不存在或读取失败时返回 None
+    """
+    try:
+        st = os.stat(file_path)
+    except (OSError, TypeError):
+        return None
+
+    cold = ColdStore.get(os.path.dirname(file_path) or '.')
+    cold_years = cold.years()
+    if last_n_rows is None:
+        cold_years = cold_years_for_range(cold_years, start_date, end_date)
+    key = (os.path.abspath(file_path), st.st_mtime_ns, st.st_size, last_n_rows,
+           tuple(cold_years), cold.signature() if cold_years else None)
+    df = None
+    if use_cache:
+        with _stock_data_cache_lock:
+            df = _stock_data_cache.get(key)
+            if df is not None:
+                _stock_data_cache.move_to_end(key)
+
+    if df is None:
+        try:
+            df = read_tiered_stock_data(file_path, last_n_rows, cold_years)
+        except Exception as e:
+            logging.error(f"读取日线数据失败: {file_path}, {e}")
+            return None
+        if use_cache:
+            with _stock_data_cache_lock:
+                _stock_data_cache[key] = df
+                while len(_stock_data_cache) > STOCK_DATA_CACHE_SIZE:
+                    _stock_data_cache.popitem(last=False)
+
+    if start_date is not None:
+        df = df[df['date'] >= pd.to_datetime(start_date)]
+    if end_date is not None:
+        df = df[df['date'] <= pd.to_datetime(end_date)]
+    return df.reset_index(drop=True)
+
+
+def clear_stock_data_cache():
+    """清空进程内日线数据缓存"""
+    with _stock_data_cache_lock:
+        _stock_data_cache.clear()
+
+
+def get_stock_data_path(stock_code: str, data_dir: str = 'data/daily',
+                        storage_format: str = DEFAULT_STORAGE_FORMAT) -> str:
     """
     获取股票数据文件路径
     
     Args:
         stock_code: 股票代码
         data_dir: 数据目录
+        storage_format: 存储格式 (csv/parquet)
     
     Returns:
         文件路径
     """
-    return os.path.join(data_dir, f"{stock_code}.csv")
+    return stock_file_path(data_dir, stock_code, storage_format)
 
 
 def format_number(num: float, precision: int = 2) -> str:
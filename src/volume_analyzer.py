@@ -5,7 +5,6 @@
 
 import pandas as pd
 import os
-import glob
 import sys
 import argparse
 from datetime import datetime
@@ -14,11 +13,17 @@ from typing import List, Dict, Optional
 # 添加父目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.utils import setup_logger, Config, ensure_dir, is_data_up_to_date
+from src.utils import setup_logger, Config, ensure_dir, is_data_up_to_date, load_stock_data
+from src.data_store import list_stock_files, stock_code_from_path
+from src.market_panel import MarketPanel, open_panel, iter_stock_frames
+from src.results_db import ResultsDB
 from src.data_downloader import DataDownloader
 from src.notification import NotificationService
 from src.email_sender import EmailSender
 
+# 检查最近N天的数据
+RECENT_DAYS = 30
+
 # 全局股票列表缓存
 _stock_list_cache = None
 
@@ -66,7 +71,8 @@ def analyze_volume_surge(csv_files: List[str], progress_callback=None,
                          volume_avg_days: int = 5,
                          volume_ratio_threshold: float = 5.0,
                          ma_period: int = 5,
-                         max_days_old: int = 2) -> pd.DataFrame:
+                         max_days_old: int = 2,
+                         panel: MarketPanel = None) -> pd.DataFrame:
     """
     分析成交量暴涨股票
     规则：当天成交量 >= 前5日平均成交量的5倍，且收盘价突破MA5日均线
@@ -78,17 +84,20 @@ def analyze_volume_surge(csv_files: List[str], progress_callback=None,
         volume_ratio_threshold: 量比阈值
         ma_period: 均线周期（默认MA5）
         max_days_old: 最多保留几天前的数据（默认2天，即当天或前一天）
+        panel: 行情面板，提供时忽略 csv_files 直接按面板分析
     
     Returns:
         分析结果DataFrame
     """
     all_results = []
     processed = 0
-    total = len(csv_files)
+    total = len(panel) if panel is not None else len(csv_files)
     
-    for file_path in csv_files:
-        results = analyze_stock_flexible(
-            file_path,
+    # 只需最近 recent_days 天及计算均线/均量所需的前置数据
+    window = RECENT_DAYS + max(ma_period, volume_avg_days)
+    for stock_code, df in iter_stock_frames(csv_files, panel, last_n_rows=window):
+        results = analyze_stock_frame(
+            df, stock_code,
             volume_avg_days=volume_avg_days,
             volume_ratio_threshold=volume_ratio_threshold,
             ma_period=ma_period,
@@ -137,7 +146,7 @@ def analyze_volume_surge(csv_files: List[str], progress_callback=None,
     return results_df
 
 
-def analyze_stock_flexible(file_path: str, recent_days: int = 30,
+def analyze_stock_flexible(file_path: str, recent_days: int = RECENT_DAYS,
                            volume_avg_days: int = 5,
                            volume_ratio_threshold: float = 5.0,
                            ma_period: int = 5) -> Optional[List[Dict]]:
@@ -157,17 +166,34 @@ def analyze_stock_flexible(file_path: str, recent_days: int = 30,
     Returns:
         符合条件的记录列表
     """
+    df = load_stock_data(file_path,
+                         last_n_rows=recent_days + max(ma_period, volume_avg_days))
+    return analyze_stock_frame(df, stock_code_from_path(file_path), recent_days,
+                               volume_avg_days, volume_ratio_threshold, ma_period)
+
+
+def analyze_stock_frame(df: Optional[pd.DataFrame], stock_code: str,
+                        recent_days: int = RECENT_DAYS,
+                        volume_avg_days: int = 5,
+                        volume_ratio_threshold: float = 5.0,
+                        ma_period: int = 5) -> Optional[List[Dict]]:
+    """
+    分析单只股票的日线数据（规则同 analyze_stock_flexible）
+    
+    Args:
+        df: 日线数据（load_stock_data 或行情面板的固定类型数据，已按日期排序）
+        stock_code: 股票代码
+    
+    Returns:
+        符合条件的记录列表
+    """
+    if df is None:
+        return None
     try:
-        df = pd.read_csv(file_path, dtype={'code': str})
-        
         min_days = max(ma_period, volume_avg_days) + 1
         if len(df) < min_days:
             return None
         
-        # 确保日期排序
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date')
-        
         # 记录最新数据日期（用于调试）
         latest_date = df['date'].max()
         
@@ -197,7 +223,6 @@ def analyze_stock_flexible(file_path: str, recent_days: int = 30,
             )
             
             if volume_ratio >= volume_ratio_threshold and ma_breakout:
-                stock_code = os.path.basename(file_path).replace('.csv', '')
                 stock_name = get_stock_name(stock_code)
                 
                 results.append({
@@ -315,8 +340,8 @@ class VolumeAnalyzer:
                 self.logger.error("请先运行数据下载或使用 --no-update 参数（需先有数据）")
                 return False
             
-            # 获取所有股票CSV文件
-            csv_files = glob.glob(os.path.join(self.daily_dir, '*.csv'))
+            # 获取所有股票数据文件（CSV 或 Parquet）
+            csv_files = list_stock_files(self.daily_dir)
             
             if not csv_files:
                 self.logger.error(f"未找到股票数据文件: {self.daily_dir}")
@@ -331,6 +356,11 @@ class VolumeAnalyzer:
             
             self.logger.info(f"找到 {len(csv_files)} 个股票数据文件")
             
+            # 行情面板可用时直接按面板分析
+            panel = open_panel(self.config, self.daily_dir, self.logger)
+            if panel is not None:
+                self.logger.info(f"使用行情面板: {len(panel)} 只股票, 最新交易日 {panel.last_date:%Y-%m-%d}")
+            
             # 执行分析（只保留最近2天的数据）
             results_df = analyze_volume_surge(
                 csv_files,
@@ -338,6 +368,7 @@ class VolumeAnalyzer:
                 volume_ratio_threshold=self.volume_ratio,
                 ma_period=self.ma_period,
                 max_days_old=2,  # 只保留最近2天的数据
+                panel=panel,
             )
             
             if results_df.empty:
@@ -358,6 +389,7 @@ class VolumeAnalyzer:
                     f"volume_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
                 )
                 results_df.to_csv(output_file, index=False, encoding='utf-8-sig')
+                ResultsDB.get(self.results_dir).record_result_file(output_file, results_df)
                 self.logger.info(f"结果已保存: {output_file}")
             
             # 步骤3: 发送通知
@@ -0,0 +1,147 @@
+"""
+后台写入队列模块
+下载线程把下载好的数据交给有界队列后立即返回继续下载，
+单个写线程按提交顺序成批执行写入并登记数据清单，网络请求与磁盘写入互相重叠
+
+- 写线程每次取出队列中已有的任务（最多 batch_size 个）作为一批：
+  before_batch 准备（如登记回滚记录）→ 依次写入 → after_batch 落盘（如 fsync 目录、删除回滚记录）
+  → 对每个任务回调 on_done(任务标识, 是否成功)。只有 after_batch 正常返回后才确认成功，
+  调用方应在 on_done 中登记完成状态，而不是在提交时
+- 队列满时提交方阻塞（背压），避免下载远快于写盘时内存无限增长；
+  同一只股票的多个写入任务按提交顺序执行
+"""
+
+import queue
+import logging
+import threading
+from typing import Callable, List, Tuple, Set
+
+
+_STOP = object()
+
+# 每批最多写入的任务数
+DEFAULT_BATCH_SIZE = 32
+
+
+class WriteBehindQueue:
+    """有界写入队列 + 单个写线程（成批写入、成批确认）"""
+
+    def __init__(self, maxsize: int = 64, logger: logging.Logger = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 before_batch: Callable[[List[str]], None] = None,
+                 after_batch: Callable[[List[str]], None] = None,
+                 on_done: Callable[[str, bool], None] = None):
+        """
+        Args:
+            maxsize: 队列容量（待写入的任务数上限）
+            logger: 日志记录器
+            batch_size: 每批最多写入的任务数
+            before_batch: 每批写入前回调 (本批任务标识)，抛出异常时本批不写入、全部记为失败
+            after_batch: 每批写入后回调 (本批任务标识)，抛出异常时本批全部记为失败
+            on_done: 每批确认后对每个任务回调 (任务标识, 是否成功)
+        """
+        self.logger = logger or logging.getLogger('WriteBehindQueue')
+        self.failed: List[str] = []
+        self.written = 0
+        self.batches = 0
+        self.batch_size = max(int(batch_size), 1)
+        self.before_batch = before_batch
+        self.after_batch = after_batch
+        self.on_done = on_done
+        self._submitted: Set[str] = set()
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=max(maxsize, 1))
+        self._thread = threading.Thread(target=self._run, name='WriteBehindQueue', daemon=True)
+        self._thread.start()
+
+    def submit(self, key: str, func: Callable[..., bool], *args) -> bool:
+        """
+        提交一个写入任务（队列满时阻塞）
+
+        Args:
+            key: 任务标识（股票代码），写入失败时记录到 failed
+            func: 写入函数，返回是否成功
+            *args: 写入函数参数
+
+        Returns:
+            True（已进入队列；写入结果由 on_done 回调）
+        """
+        with self._lock:
+            self._submitted.add(key)
+        self._queue.put((key, func, args))
+        return True
+
+    def submitted(self, key: str) -> bool:
+        """该任务标识是否提交过写入任务"""
+        with self._lock:
+            return key in self._submitted
+
+    def _next_batch(self) -> Tuple[list, bool]:
+        """阻塞取出一个任务，再取出队列中已有的任务凑成一批，返回 (本批任务, 是否收到停止信号)"""
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch: list):
+        keys = [key for key, _, _ in batch]
+        results = []
+        try:
+            if self.before_batch is not None:
+                self.before_batch(keys)
+        except Exception as e:
+            self.logger.error(f"写入批次准备失败，本批 {len(batch)} 个任务不写入: {e}")
+            results = [(key, False) for key in keys]
+        else:
+            for key, func, args in batch:
+                try:
+                    ok = func(*args)
+                except Exception as e:
+                    self.logger.error(f"写入 {key} 失败: {e}")
+                    ok = False
+                results.append((key, bool(ok)))
+            try:
+                if self.after_batch is not None:
+                    self.after_batch(keys)
+            except Exception as e:
+                self.logger.error(f"写入批次落盘失败，本批 {len(batch)} 个任务记为失败: {e}")
+                results = [(key, False) for key in keys]
+
+        self.batches += 1
+        for key, ok in results:
+            if ok:
+                self.written += 1
+            else:
+                self.failed.append(key)
+            if self.on_done is not None:
+                try:
+                    self.on_done(key, ok)
+                except Exception as e:
+                    self.logger.error(f"写入完成回调异常 {key}: {e}")
+
+    def close(self) -> List[str]:
+        """
+        等待队列中的任务全部写完并停止写线程
+
+        Returns:
+            写入失败的任务标识列表
+        """
+        self._queue.put(_STOP)
+        self._thread.join()
+        return list(self.failed)
@@ -30,7 +30,9 @@ import pandas as pd
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from backtest_strategy import StrategyBacktest
-from src.utils import ensure_dir, safe_read_csv, setup_logger
+from src.utils import ensure_dir, setup_logger
+from src.data_store import find_stock_file, list_stock_files, stock_code_from_path
+from src.market_panel import MarketPanel, iter_stock_frames
 
 
 def resolve_daily_dir(explicit: Optional[str], cwd: str) -> str:
@@ -50,7 +52,7 @@ def resolve_daily_dir(explicit: Optional[str], cwd: str) -> str:
     for d in candidates:
         if not os.path.isdir(d):
             continue
-        n = len(glob.glob(os.path.join(d, "*.csv")))
+        n = len(list_stock_files(d))
         if n > best_n:
             best_n = n
             best = d
@@ -67,36 +69,28 @@ def load_raw_stock_frames(
     end_date: Optional[str],
     min_bars: int,
     logger,
+    panel: Optional[MarketPanel] = None,
 ) -> Dict[str, pd.DataFrame]:
     start = pd.to_datetime(start_date)
     end = pd.to_datetime(end_date) if end_date else pd.to_datetime(datetime.now())
     out: Dict[str, pd.DataFrame] = {}
-    files = glob.glob(os.path.join(daily_dir, "*.csv"))
-    logger.info("读取原始日线 %s 个文件 (过滤后至少 %s 条)", len(files), min_bars)
+    files = [] if panel is not None else list_stock_files(daily_dir)
+    total = len(panel) if panel is not None else len(files)
+    logger.info("读取原始日线 %s 只股票 (过滤后至少 %s 条)", total, min_bars)
     skipped = 0
-    for i, file_path in enumerate(files):
-        code = os.path.basename(file_path).replace(".csv", "")
+    # 只读取回测区间内的数据，冷层中区间外的年度分区不会被打开
+    frames = iter_stock_frames(files, panel, start_date=start, end_date=end)
+    for i, (code, df) in enumerate(frames):
         try:
-            df = safe_read_csv(file_path, dtype={"code": str})
-            if df is None or len(df) < 10:
+            if df is None or len(df) < min_bars:
                 skipped += 1
                 continue
-            df = df.copy()
-            df["date"] = pd.to_datetime(df["date"])
-            df = df[(df["date"] >= start) & (df["date"] <= end)]
-            if len(df) < min_bars:
-                skipped += 1
-                continue
-            for col in ["open", "high", "low", "close", "volume"]:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors="coerce")
-            df = df.sort_values("date").reset_index(drop=True)
             out[code] = df
         except Exception as exc:  # noqa: BLE001
             logger.error("加载 %s 失败: %s", code, exc)
             skipped += 1
         if (i + 1) % 2000 == 0:
-            logger.info("已扫描 %s/%s, 保留 %s", i + 1, len(files), len(out))
+            logger.info("已扫描 %s/%s, 保留 %s", i + 1, total, len(out))
     logger.info("原始数据: %s 只股票可用, 跳过 %s", len(out), skipped)
     return out
 
@@ -196,12 +190,21 @@ def run_search(args: argparse.Namespace) -> None:
     max_ma = max(ma_list)
     min_bars = max_ma + 5
 
+    panel = None
+    if args.panel_dir:
+        panel = MarketPanel.open(args.panel_dir)
+        if panel is None:
+            logger.warning("行情面板不可用: %s，改为读取日线文件", args.panel_dir)
+        else:
+            logger.info("使用行情面板: %s (%s 只股票)", args.panel_dir, len(panel))
+
     raw = load_raw_stock_frames(
         daily_dir,
         args.start,
         args.end,
         min_bars,
         logger,
+        panel=panel,
     )
     if not raw:
         logger.error("没有可用的股票数据，结束")
@@ -296,7 +299,7 @@ def run_search(args: argparse.Namespace) -> None:
     )
 
     trades_df["source_csv"] = trades_df["stock_code"].apply(
-        lambda c: os.path.join(daily_dir, f"{c}.csv")
+        lambda c: find_stock_file(daily_dir, c) or os.path.join(daily_dir, f"{c}.csv")
     )
 
     trades_csv = os.path.join(out_dir, "best_strategy_trades.csv")
@@ -373,6 +376,12 @@ def run_search(args: argparse.Namespace) -> None:
 def build_arg_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(description="选股策略网格搜索 Agent (2020+ 回测)")
     p.add_argument("--data-dir", type=str, default=None, help="日线 CSV 目录 (默认自动发现)")
+    p.add_argument(
+        "--panel-dir",
+        type=str,
+        default=None,
+        help="行情面板目录 (如 ./data/panel)，指定后从内存映射面板读取而非逐个读日线文件",
+    )
     p.add_argument("--start", type=str, default="2020-01-01", help="回测开始日")
     p.add_argument("--end", type=str, default=None, help="回测结束日，默认今天")
     p.add_argument(
@@ -0,0 +1,166 @@
+"""
+前复权基准核对测试脚本
+验证增量更新多取一根与本地最新日期重叠的K线：收盘价一致的股票照常追加（不重复写入重叠的K线），
+不一致（期间除权除息、数据源已重算历史）的股票重新下载完整历史；批量下载只重新下载受影响的股票
+（离线：以本地函数代替 HTTP 请求，使用临时目录）
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.data_downloader import DataDownloader
+
+
+def fake_kline_server(closes: dict):
+    """返回模拟K线接口的请求函数及请求记录（closes: 腾讯代码 -> 收盘价，默认 10.0）"""
+    requested = []
+    lock = threading.Lock()
+
+    def get_json(url):
+        code, _, start, end = parse_qs(urlparse(url).query)['param'][0].split(',')[:4]
+        with lock:
+            requested.append((code[2:], start, end))
+        close = f"{closes.get(code, 10.0):.2f}"
+        klines = [[d.strftime('%Y-%m-%d'), close, close, close, close, '100']
+                  for d in pd.bdate_range(start, end)]
+        return {'code': 0, 'data': {code: {'qfqday': klines}}}
+
+    return get_json, requested
+
+
+def write_history(tmp: str, code: str, dates: pd.DatetimeIndex, close: float = 10.0):
+    pd.DataFrame({'date': dates.strftime('%Y-%m-%d'), 'open': close, 'close': close, 'low': close,
+                  'high': close, 'volume': 10000, 'amount': 100000}).to_csv(
+        os.path.join(tmp, 'daily', f'{code}.csv'), index=False)
+
+
+def make_downloader(tmp: str) -> DataDownloader:
+    config_file = os.path.join(tmp, 'config.ini')
+    with open(config_file, 'w', encoding='utf-8') as f:
+        f.write(f"[Paths]\ndata_dir = {tmp}\ndaily_dir = {tmp}/daily\nstocks_dir = {tmp}/stocks\n"
+                f"[DataSource]\nsource = tencent\n"
+                f"[Download]\nbuild_panel = false\nrequest_rate = 1000\nsnapshot_update = false\n"
+                f"write_queue_size = 0\nasync_fetch = true\ncheck_adjustment = true\n")
+    return DataDownloader(config_file)
+
+
+def test_update_single_stock():
+    """单只更新：重叠K线一致时追加，不一致时重新下载完整历史"""
+    tmp = tempfile.mkdtemp()
+    try:
+        downloader = make_downloader(tmp)
+        dates = pd.bdate_range(end=pd.Timestamp.now().normalize() - pd.Timedelta(days=10), periods=5)
+        write_history(tmp, '600000', dates)
+        closes = {}
+        downloader.tencent_source._get_json, requested = fake_kline_server(closes)
+
+        assert downloader.update_stock_data('600000')
+        assert requested[0][1] == dates[-1].strftime('%Y-%m-%d')
+        updated = pd.read_csv(os.path.join(tmp, 'daily', '600000.csv'))
+        assert updated['date'].is_unique and updated['date'].iloc[:5].tolist() == dates.strftime('%Y-%m-%d').tolist()
+        assert len(updated) > 5
+
+        # 除权后数据源按新基准重算历史：重叠K线收盘价变为 9.5
+        today = pd.Timestamp.now().normalize()
+        write_history(tmp, '600000', dates)
+        downloader.manifest.sync()
+        closes['sh600000'] = 9.5
+        requested.clear()
+        assert downloader.update_stock_data('600000')
+        assert requested[0][1] == dates[-1].strftime('%Y-%m-%d')
+        assert min(start for _, start, _ in requested[1:]) == dates[0].strftime('%Y-%m-%d')
+        refreshed = pd.read_csv(os.path.join(tmp, 'daily', '600000.csv'))
+        assert (refreshed['close'] == 9.5).all() and refreshed['date'].iloc[0] == dates[0].strftime('%Y-%m-%d')
+        assert refreshed['date'].iloc[-1] <= today.strftime('%Y-%m-%d')
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_overlap_tolerance_and_source():
+    """按相对误差核对重叠K线；来自备用数据源的K线不核对"""
+    tmp = tempfile.mkdtemp()
+    try:
+        downloader = make_downloader(tmp)
+        dates = pd.bdate_range('2024-01-02', periods=5)
+        write_history(tmp, '600519', dates, close=1688.88)
+        latest = dates[-1]
+
+        def fetched(close):
+            return pd.DataFrame({'date': [latest.strftime('%Y-%m-%d'), '2024-01-09'],
+                                 'open': close, 'close': close, 'low': close, 'high': close,
+                                 'volume': 100, 'amount': 100})
+
+        # 高价股相差 1 分（相对误差约 6e-6）：舍入差异，不是复权基准变化
+        df, rebased = downloader._trim_overlap('600519', fetched(1688.89), latest, 'tencent')
+        assert not rebased and df['date'].tolist() == ['2024-01-09']
+        df, rebased = downloader._trim_overlap('600519', fetched(1650.00), latest, 'tencent')
+        assert rebased
+        # 备用数据源的价格口径可能不同，不据此重新下载
+        df, rebased = downloader._trim_overlap('600519', fetched(1650.00), latest, 'akshare')
+        assert not rebased and len(df) == 1
+        df, rebased = downloader._trim_overlap('600519', fetched(1650.00), latest, None)
+        assert not rebased
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_batch_rebase_only_affected():
+    """批量下载：只有复权基准变化的股票重新下载完整历史，其余股票只请求增量区间"""
+    tmp = tempfile.mkdtemp()
+    try:
+        downloader = make_downloader(tmp)
+        dates = pd.bdate_range(end=pd.Timestamp.now().normalize() - pd.Timedelta(days=10), periods=5)
+        codes = ['600000', '600001', '000001']
+        for code in codes:
+            write_history(tmp, code, dates)
+        downloader.tencent_source._get_json, requested = fake_kline_server({'sz000001': 9.5})
+
+        success, failed = downloader.download_all_stocks(pd.DataFrame({'code': codes}))
+        assert (success, failed) == (3, 0)
+        first_starts = {}
+        for code, start, _ in requested:
+            first_starts[code] = min(first_starts.get(code, start), start)
+        # 重新下载从本地最早日期开始，只有 000001
+        assert first_starts == {'600000': dates[-1].strftime('%Y-%m-%d'),
+                                '600001': dates[-1].strftime('%Y-%m-%d'),
+                                '000001': dates[0].strftime('%Y-%m-%d')}
+
+        for code in ['600000', '600001']:
+            appended = pd.read_csv(os.path.join(tmp, 'daily', f'{code}.csv'))
+            assert appended['date'].is_unique and (appended['close'] == 10.0).all()
+        refreshed = pd.read_csv(os.path.join(tmp, 'daily', '000001.csv'))
+        assert refreshed['date'].is_unique and (refreshed['close'] == 9.5).all()
+        assert refreshed['date'].iloc[0] == dates[0].strftime('%Y-%m-%d')
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("前复权基准核对测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("单只更新", test_update_single_stock),
+                       ("相对误差与数据源", test_overlap_tolerance_and_source),
+                       ("批量下载只重新下载受影响的股票", test_batch_rebase_only_affected)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
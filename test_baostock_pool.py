@@ -0,0 +1,150 @@
+"""
+BaoStock 多进程下载测试脚本
+验证多个工作进程各自处理请求（耗时随进程数下降）、结果回到主进程、
+失败原因传回主进程、工作进程崩溃或结果无法序列化时相关股票以失败回调，
+以及线程安全版本的登录不再死锁（离线，不连接 BaoStock）
+"""
+
+import os
+import sys
+import time
+import threading
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.baostock_pool import BaoStockProcessPool
+import src.data_source_baostock_threadsafe as threadsafe
+
+
+REQUEST_SECONDS = 0.3
+
+
+def fake_init():
+    """代替 bs.login()"""
+
+
+def fake_fetch(stock_code, start_date, end_date):
+    """模拟一次耗时的 baostock 请求，返回处理该请求的进程号和请求时间"""
+    start = time.time()
+    time.sleep(REQUEST_SECONDS)
+    if stock_code == '000000':
+        return stock_code, None, 'QueryError'
+    return stock_code, pd.DataFrame({'date': [end_date], 'pid': [os.getpid()],
+                                     'start': [start], 'end': [time.time()]}), None
+
+
+def crashing_fetch(stock_code, start_date, end_date):
+    """000002 使工作进程直接退出，000003 返回无法序列化的结果"""
+    if stock_code == '000002':
+        time.sleep(0.2)
+        os._exit(1)
+    if stock_code == '000003':
+        return stock_code, threading.Lock(), None
+    return stock_code, pd.DataFrame({'date': [end_date]}), None
+
+
+def test_worker_failures():
+    """结果无法序列化只影响该股票；工作进程崩溃后受影响和未提交的股票都以失败回调，不抛出异常"""
+    tasks = [('000001', '2024-01-02', '2024-01-05'), ('000003', '2024-01-02', '2024-01-05')]
+    results, errors = {}, {}
+    pool = BaoStockProcessPool(1, initializer=fake_init, worker=crashing_fetch,
+                               on_error=errors.__setitem__)
+    finished = pool.fetch_histories(tasks, results.__setitem__)
+    assert set(finished) == {'000001', '000003'}
+    assert results['000001'] is not None and results['000003'] is None
+    assert set(errors) == {'000003'}
+
+    codes = ['000001', '000002'] + [f'6000{i:02d}' for i in range(6)]
+    results, errors = {}, {}
+    pool = BaoStockProcessPool(2, initializer=fake_init, worker=crashing_fetch,
+                               on_error=errors.__setitem__)
+    finished = pool.fetch_histories([(code, '2024-01-02', '2024-01-05') for code in codes],
+                                    results.__setitem__)
+    assert set(finished) == set(codes) == set(results)
+    assert results['000002'] is None and errors['000002'] == 'BrokenProcessPool'
+    assert all(results[code] is None for code in errors)
+
+
+def test_process_parallel():
+    """8 只股票由 4 个进程并行处理，结果和失败原因都回到主进程"""
+    codes = ['600000', '600001', '600002', '600003', '000001', '000002', '000004', '000000']
+    tasks = [(code, '2024-01-02', '2024-01-05') for code in codes]
+    results = {}
+    errors = {}
+    main_thread = threading.get_ident()
+
+    def on_result(code, df):
+        assert threading.get_ident() == main_thread
+        results[code] = df
+
+    pool = BaoStockProcessPool(4, initializer=fake_init, worker=fake_fetch,
+                               on_error=errors.__setitem__)
+    finished = pool.fetch_histories(tasks, on_result)
+
+    assert set(finished) == set(codes) and set(results) == set(codes)
+    assert results['000000'] is None and errors == {'000000': 'QueryError'}
+    frames = pd.concat([df for df in results.values() if df is not None])
+    assert frames['pid'].nunique() > 1 and os.getpid() not in set(frames['pid'])
+    # 请求在各进程中同时进行：从第一个请求开始到最后一个请求结束远少于串行的 7 × 0.3 秒
+    # （不含进程启动时间）
+    elapsed = frames['end'].max() - frames['start'].min()
+    assert elapsed < 0.7 * len(frames) * REQUEST_SECONDS, f"耗时 {elapsed:.2f} 秒"
+
+
+def test_should_stop():
+    """should_stop 返回 True 后不再提交新的股票"""
+    tasks = [(f'6000{i:02d}', '2024-01-02', '2024-01-05') for i in range(20)]
+    results = []
+    pool = BaoStockProcessPool(2, initializer=fake_init, worker=fake_fetch)
+    finished = pool.fetch_histories(tasks, lambda code, df: results.append(code),
+                                    should_stop=lambda: len(results) >= 2)
+    assert 2 <= len(finished) < len(tasks)
+
+
+def test_threadsafe_login_no_deadlock():
+    """_execute_with_lock 持有全局锁时调用 _ensure_login 不会死锁"""
+    class FakeLogin:
+        error_code = '0'
+        error_msg = ''
+
+    original_login = threadsafe.bs.login
+    threadsafe.bs.login = lambda: FakeLogin()
+    try:
+        source = threadsafe.ThreadSafeBaoStockDataSource()
+        result = []
+        worker = threading.Thread(target=lambda: result.append(source._execute_with_lock(lambda: 'ok')),
+                                  daemon=True)
+        worker.start()
+        worker.join(timeout=5)
+        assert not worker.is_alive(), '获取全局锁死锁'
+        assert result == ['ok']
+    finally:
+        threadsafe.bs.login = original_login
+        threadsafe.ThreadSafeBaoStockDataSource._global_logged_in = False
+        threadsafe.ThreadSafeBaoStockDataSource._global_login_time = None
+
+
+def main():
+    print("=" * 50)
+    print("BaoStock 多进程下载测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("多进程并行", test_process_parallel),
+                       ("停止提交", test_should_stop),
+                       ("工作进程异常", test_worker_failures),
+                       ("登录不死锁", test_threadsafe_login_no_deadlock)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
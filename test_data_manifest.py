@@ -0,0 +1,99 @@
+"""
+数据目录清单测试脚本
+验证清单登记写入/追加、与目录对账以及新鲜度查询（离线，使用临时目录）
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.data_manifest import DataManifest, MANIFEST_FILE
+from src.data_store import write_stock_data, stock_file_path, append_stock_data
+from src.utils import get_local_latest_data_date, is_data_up_to_date
+from test_data_store import make_daily_frame
+
+
+def test_record_and_query():
+    """写入与追加后清单中的日期、行数正确"""
+    tmp = tempfile.mkdtemp()
+    try:
+        manifest = DataManifest(tmp)
+        full = make_daily_frame('000001', days=40)
+        path = stock_file_path(tmp, '000001')
+
+        write_stock_data(full.head(30), path)
+        manifest.record_write(path, full.head(30))
+        entry = manifest.get_entry('000001')
+        assert entry['rows'] == 30
+        assert entry['first_date'] == full['date'].iloc[0]
+        assert entry['last_date'] == full['date'].iloc[29]
+
+        size_before = os.path.getsize(path)
+        assert append_stock_data(full.iloc[30:], path)
+        manifest.record_append(path, full.iloc[30:], size_before)
+        entry = manifest.get_entry('000001')
+        assert entry['rows'] == 40
+        assert entry['last_date'] == full['date'].iloc[-1]
+        assert entry['size'] == os.path.getsize(path)
+        assert manifest.date_range(path) == (full['date'].iloc[0], full['date'].iloc[-1])
+
+        # 已登记且未变化的文件对账时不重新扫描
+        assert manifest.sync() == 0
+        manifest.save()
+        assert os.path.exists(os.path.join(tmp, MANIFEST_FILE))
+        assert DataManifest(tmp).get_entry('000001')['rows'] == 40
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_sync_covers_all_files():
+    """对账登记外部写入的文件并移除已删除的文件，最新日期覆盖全部股票"""
+    tmp = tempfile.mkdtemp()
+    try:
+        # 第 150 只股票的数据最新，旧实现只抽样前 100 个文件会漏掉
+        for i in range(150):
+            code = f'{i:06d}'
+            days = 40 if i == 149 else 30
+            write_stock_data(make_daily_frame(code, days=days), stock_file_path(tmp, code))
+
+        expected = pd.Timestamp(make_daily_frame('000149', days=40)['date'].iloc[-1])
+        assert get_local_latest_data_date(tmp) == expected.to_pydatetime()
+
+        manifest = DataManifest.get(tmp)
+        assert len(manifest) == 150
+        os.remove(stock_file_path(tmp, '000149'))
+        assert manifest.sync() == 1
+        assert len(manifest) == 149
+
+        up_to_date, _ = is_data_up_to_date(tmp, datetime(2024, 2, 1))
+        assert up_to_date
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("数据目录清单测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("登记与查询", test_record_and_query),
+                       ("目录对账", test_sync_covers_all_files)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+日线数据存储测试脚本
+验证 CSV / Parquet 读写、目录扫描与格式迁移（离线，使用临时目录）
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.data_store import (
+    PARQUET_AVAILABLE, list_stock_files, find_stock_file, read_stock_data,
+    write_stock_data, stock_file_path, migrate_daily_dir, stock_code_from_path,
+    read_date_range, read_last_date, append_stock_data,
+)
+from src.utils import safe_read_csv, safe_write_csv, load_stock_data, clear_stock_data_cache
+
+
+def make_daily_frame(code: str, days: int = 30) -> pd.DataFrame:
+    """生成测试用日线数据"""
+    dates = pd.bdate_range('2024-01-02', periods=days)
+    close = 10 + np.arange(days) * 0.1
+    return pd.DataFrame({
+        'date': dates.strftime('%Y-%m-%d'),
+        'code': code,
+        'open': close - 0.05,
+        'high': close + 0.1,
+        'low': close - 0.1,
+        'close': close,
+        'volume': np.arange(days) * 1000 + 100000,
+        'amount': close * 100000,
+    })
+
+
+def test_csv_roundtrip():
+    """CSV 格式读写保持股票代码前导零"""
+    tmp = tempfile.mkdtemp()
+    try:
+        path = stock_file_path(tmp, '000001', 'csv')
+        write_stock_data(make_daily_frame('000001'), path)
+        df = read_stock_data(path)
+        assert df['code'].iloc[0] == '000001'
+        assert len(df) == 30
+        assert list(read_stock_data(path, columns=['date']).columns) == ['date']
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_parquet_roundtrip():
+    """Parquet 格式读写保持列类型"""
+    if not PARQUET_AVAILABLE:
+        print("  未安装 pyarrow，跳过")
+        return
+    tmp = tempfile.mkdtemp()
+    try:
+        path = stock_file_path(tmp, '600000', 'parquet')
+        assert safe_write_csv(make_daily_frame('600000'), path)
+        df = safe_read_csv(path)
+        assert df['code'].iloc[0] == '600000'
+        assert df['volume'].dtype == np.int64
+        assert df['close'].dtype == np.float64
+        assert pd.api.types.is_datetime64_any_dtype(df['date'])
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_list_and_migrate():
+    """目录扫描每只股票只返回一个文件，迁移后格式一致"""
+    if not PARQUET_AVAILABLE:
+        print("  未安装 pyarrow，跳过")
+        return
+    tmp = tempfile.mkdtemp()
+    try:
+        for code in ['000001', '000002', '600000']:
+            write_stock_data(make_daily_frame(code), stock_file_path(tmp, code, 'csv'))
+        # 非数据文件不应被扫描
+        open(os.path.join(tmp, 'readme.txt'), 'w').close()
+
+        files = list_stock_files(tmp)
+        assert [stock_code_from_path(f) for f in files] == ['000001', '000002', '600000']
+
+        converted, failed = migrate_daily_dir(tmp, 'parquet')
+        assert (converted, failed) == (3, 0)
+        files = list_stock_files(tmp)
+        assert len(files) == 3
+        assert all(f.endswith('.parquet') for f in files)
+        assert find_stock_file(tmp, '000002').endswith('000002.parquet')
+        assert find_stock_file(tmp, '999999') is None
+
+        df = read_stock_data(find_stock_file(tmp, '000001'))
+        assert len(df) == 30
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_append_and_date_range():
+    """CSV 追加只写新增行，首尾日期无需加载全部数据"""
+    tmp = tempfile.mkdtemp()
+    try:
+        full = make_daily_frame('000001', days=40)
+        path = stock_file_path(tmp, '000001', 'csv')
+        write_stock_data(full.head(30), path)
+        first, last = read_date_range(path)
+        assert first == pd.Timestamp(full['date'].iloc[0])
+        assert last == pd.Timestamp(full['date'].iloc[29])
+
+        size_before = os.path.getsize(path)
+        new_rows = full.iloc[30:].copy()
+        new_rows['date'] = pd.to_datetime(new_rows['date'])
+        assert append_stock_data(new_rows[list(reversed(new_rows.columns))], path)
+        assert os.path.getsize(path) > size_before
+
+        df = read_stock_data(path)
+        assert len(df) == 40
+        assert list(df['date']) == list(full['date'])
+        assert df['code'].iloc[-1] == '000001'
+        assert read_last_date(path) == pd.Timestamp(full['date'].iloc[-1])
+
+        # 列不一致时拒绝追加
+        assert not append_stock_data(new_rows.drop(columns=['amount']), path)
+
+        if PARQUET_AVAILABLE:
+            pq_path = stock_file_path(tmp, '000002', 'parquet')
+            write_stock_data(make_daily_frame('000002'), pq_path)
+            assert read_last_date(pq_path) == pd.Timestamp(make_daily_frame('000002')['date'].iloc[-1])
+            assert not append_stock_data(new_rows, pq_path)
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_last_n_rows():
+    """只读取最后 N 行与完整读取后取尾部一致"""
+    tmp = tempfile.mkdtemp()
+    try:
+        full = make_daily_frame('000001', days=600)
+        csv_path = stock_file_path(tmp, '000001', 'csv')
+        write_stock_data(full, csv_path)
+        for n in [1, 35, 599, 600, 1000]:
+            tail = read_stock_data(csv_path, last_n_rows=n)
+            expected = read_stock_data(csv_path).tail(n).reset_index(drop=True)
+            pd.testing.assert_frame_equal(tail, expected)
+
+        if PARQUET_AVAILABLE:
+            pq_path = stock_file_path(tmp, '000002', 'parquet')
+            write_stock_data(full, pq_path)
+            for n in [1, 90, 600, 1000]:
+                tail = read_stock_data(pq_path, last_n_rows=n)
+                expected = read_stock_data(pq_path).tail(n).reset_index(drop=True)
+                pd.testing.assert_frame_equal(tail, expected)
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_load_stock_data():
+    """统一加载入口列类型固定，缓存随文件变化失效"""
+    tmp = tempfile.mkdtemp()
+    try:
+        clear_stock_data_cache()
+        full = make_daily_frame('000001', days=40)
+        path = stock_file_path(tmp, '000001', 'csv')
+        # 乱序且含重复行，加载后应按日期升序去重
+        messy = pd.concat([full.head(30).iloc[::-1], full.head(30).tail(1)])
+        messy['code'] = 1
+        write_stock_data(messy, path)
+
+        df = load_stock_data(path)
+        assert len(df) == 30
+        assert pd.api.types.is_datetime64_any_dtype(df['date'])
+        assert df['date'].is_monotonic_increasing
+        assert df['code'].iloc[0] == '000001'
+        assert df['volume'].dtype == np.int64
+        assert df['close'].dtype == np.float64
+
+        # 返回的是副本，修改不影响缓存
+        df.loc[0, 'close'] = -1.0
+        assert load_stock_data(path)['close'].iloc[0] != -1.0
+
+        window = load_stock_data(path, start_date='2024-01-10', end_date='2024-01-19')
+        assert window['date'].min() == pd.Timestamp('2024-01-10')
+        assert window['date'].max() == pd.Timestamp('2024-01-19')
+        assert len(load_stock_data(path, last_n_rows=5)) == 5
+
+        # 追加后缓存失效
+        assert append_stock_data(full.iloc[30:], path)
+        assert len(load_stock_data(path)) == 40
+
+        assert load_stock_data(os.path.join(tmp, '999999.csv')) is None
+    finally:
+        clear_stock_data_cache()
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("日线数据存储测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("CSV读写", test_csv_roundtrip),
+                       ("Parquet读写", test_parquet_roundtrip),
+                       ("扫描与迁移", test_list_and_migrate),
+                       ("追加与日期范围", test_append_and_date_range),
+                       ("读取最后N行", test_last_n_rows),
+                       ("统一加载入口", test_load_stock_data)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+下载任务日志测试脚本
+验证任务日志的检查点、中断后从中断处继续、只重试失败的股票，
+以及批量下载被中断后再次运行不重复请求已完成的股票（离线，使用临时目录）
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.download_journal import DownloadJournal, journal_path
+from src.data_downloader import DataDownloader
+
+
+def test_journal_resume_and_retry():
+    """同一目标日期的未完成任务继续执行；失败记录错误类型和累计尝试次数"""
+    tmp = tempfile.mkdtemp()
+    try:
+        codes = ['600000', '000001', '000002', '300750']
+        journal = DownloadJournal.open(tmp, 'test', codes, '2024-01-05')
+        assert not journal.resumed and journal.to_process() == codes
+        journal.record_success('600000')
+        journal.record_failure('000001', TimeoutError('timed out'))
+        journal.checkpoint()
+
+        resumed = DownloadJournal.open(tmp, 'test', codes, '2024-01-05')
+        assert resumed.resumed
+        assert resumed.pending() == ['000002', '300750']
+        assert resumed.to_process() == ['600000', '000002', '300750']
+        resumed.record_success('000002')
+        resumed.record_success('300750')
+        resumed.checkpoint()
+
+        # 上次任务已全部处理：同一目标日期也开始新任务
+        assert not DownloadJournal.open(tmp, 'test', codes, '2024-01-05').resumed
+        with open(journal_path(tmp, 'test'), encoding='utf-8') as f:
+            assert json.load(f)['failed'] == {}
+
+        journal = DownloadJournal.open(tmp, 'test', codes, '2024-01-08')
+        journal.record_failure('000001', 'NoData')
+        journal.checkpoint()
+        retry = DownloadJournal.open(tmp, 'test', codes, '2024-01-09', retry_failed=True)
+        assert retry.resumed and retry.to_process() == ['000001']
+        retry.record_failure('000001', ConnectionError('reset'))
+        retry.checkpoint()
+        retry = DownloadJournal.open(tmp, 'test', codes, '2024-01-09', retry_failed=True)
+        assert retry._attempts['000001'] == 2
+        retry.record_failure('000001', 'NoData')
+        assert retry.failed['000001']['attempts'] == 3 and retry.failed['000001']['error'] == 'NoData'
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_download_all_resumes():
+    """批量下载中断后再次运行只请求未处理的股票，失败的股票留给 retry_failed"""
+    tmp = tempfile.mkdtemp()
+    try:
+        config_file = os.path.join(tmp, 'config.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(f"[Paths]\ndata_dir = {tmp}\ndaily_dir = {tmp}/daily\nstocks_dir = {tmp}/stocks\n"
+                    f"[DataSource]\nsource = akshare\n"
+                    f"[Download]\nmax_workers = 1\nbuild_panel = false\nwrite_queue_size = 0\n"
+                    f"snapshot_update = false\n")
+        downloader = DataDownloader(config_file)
+        end = downloader.planner.target_date()
+        codes = ['600000', '000001', '000002', '300750', '600519']
+        requested = []
+        interrupt_at = ['000002']
+
+        def download_stock_history(code, start_date=None, end_date=None):
+            requested.append(code)
+            if code in interrupt_at:
+                raise KeyboardInterrupt
+            if code == '000001':
+                return None
+            dates = pd.bdate_range(end=end, periods=5)
+            return pd.DataFrame({'date': dates.strftime('%Y-%m-%d'), 'open': 1.0, 'high': 1.0,
+                                 'low': 1.0, 'close': 1.0, 'volume': 100, 'amount': 100})
+
+        downloader.download_stock_history = download_stock_history
+        try:
+            downloader.download_all_stocks(pd.DataFrame({'code': codes}))
+            assert False, '应被中断'
+        except KeyboardInterrupt:
+            pass
+        # 中断时正在执行的任务可能已经开始，尚未开始的任务被取消
+        first_run = list(requested)
+        assert first_run[:3] == ['600000', '000001', '000002'] and '600519' not in first_run
+
+        requested.clear()
+        interrupt_at.clear()
+        success, failed = downloader.download_all_stocks(pd.DataFrame({'code': codes}))
+        # 已完成的股票按本地元数据复核不再请求，失败的 000001 跳过，被中断的 000002 重新下载
+        assert requested == [c for c in codes if c not in first_run or c == '000002']
+        assert (success, failed) == (4, 0)
+
+        requested.clear()
+        success, failed = downloader.download_all_stocks(pd.DataFrame({'code': codes}), retry_failed=True)
+        assert requested == ['000001'] and (success, failed) == (0, 1)
+        with open(journal_path(os.path.join(tmp, 'daily'), 'download_all'), encoding='utf-8') as f:
+            record = json.load(f)['failed']['000001']
+        assert record['error'] == 'NoData' and record['attempts'] == 2
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_failed_update_is_recorded():
+    """增量更新下载出错的股票记为失败（错误类型写入任务日志），不记为已完成"""
+    tmp = tempfile.mkdtemp()
+    try:
+        config_file = os.path.join(tmp, 'config.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(f"[Paths]\ndata_dir = {tmp}\ndaily_dir = {tmp}/daily\nstocks_dir = {tmp}/stocks\n"
+                    f"[DataSource]\nsource = akshare\n"
+                    f"[Download]\nmax_workers = 1\nbuild_panel = false\nwrite_queue_size = 0\n"
+                    f"snapshot_update = false\nretry_times = 1\n")
+        downloader = DataDownloader(config_file)
+        dates = pd.bdate_range(end=downloader.planner.target_date() - pd.Timedelta(days=7), periods=5)
+        pd.DataFrame({'date': dates.strftime('%Y-%m-%d'), 'open': 1.0, 'high': 1.0, 'low': 1.0,
+                      'close': 1.0, 'volume': 100, 'amount': 100}).to_csv(
+            os.path.join(tmp, 'daily', '600000.csv'), index=False)
+
+        def fetch_from_source(*args):
+            raise ConnectionError('connection reset')
+
+        downloader._fetch_from_source = fetch_from_source
+        success, failed = downloader.download_all_stocks(pd.DataFrame({'code': ['600000']}))
+        assert (success, failed) == (0, 1)
+        with open(journal_path(os.path.join(tmp, 'daily'), 'download_all'), encoding='utf-8') as f:
+            journal = json.load(f)
+        assert '600000' not in journal['completed'] and journal['failed']['600000']['error'] == 'ConnectionError'
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("下载任务日志测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("继续执行与重试", test_journal_resume_and_retry),
+                       ("批量下载中断后继续", test_download_all_resumes),
+                       ("增量更新失败记入任务日志", test_failed_update_is_recorded)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
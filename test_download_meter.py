@@ -0,0 +1,143 @@
+"""
+下载计量测试脚本
+验证多线程并发登记时计数准确、当日累计保存后重新运行时继续（跨日不累计）、
+腾讯数据源按响应实际传输的字节数计量，以及每日下载限制按计量结果生效
+（离线：使用本地模拟腾讯行情服务器和临时目录）
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.download_meter import DownloadMeter, frame_bytes
+from src.http_transport import HttpTransport
+from src.mock_tencent_server import MockTencentServer
+from src.data_source_tencent import TencentDataSource
+from src.data_downloader import DataDownloader
+
+
+def write_config(tmp: str, server: MockTencentServer, limit_mb: int = 0) -> str:
+    config_file = os.path.join(tmp, 'config.ini')
+    with open(config_file, 'w', encoding='utf-8') as f:
+        f.write(f"[Paths]\ndata_dir = {tmp}\ndaily_dir = {tmp}/daily\nstocks_dir = {tmp}/stocks\n"
+                f"[DataSource]\nsource = tencent\ntencent_kline_url = {server.kline_url}\n"
+                f"tencent_quote_url = {server.quote_url}\n"
+                f"[Download]\nbuild_panel = false\nrequest_rate = 1000\nmax_in_flight = 4\n"
+                f"snapshot_update = false\nasync_fetch = true\ndaily_download_limit_mb = {limit_mb}\n")
+    return config_file
+
+
+def test_meter_counts_and_persists():
+    """8 个线程并发登记不丢计数；当日累计保存后重新加载，昨天的记录不计入今天"""
+    tmp = tempfile.mkdtemp()
+    try:
+        state_file = os.path.join(tmp, 'download_meter.json')
+        yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        with open(state_file, 'w', encoding='utf-8') as f:
+            json.dump({yesterday: {'bytes': 10 ** 9, 'sources': {}}}, f)
+
+        meter = DownloadMeter(state_file)
+        assert meter.total_bytes == 0
+
+        def work():
+            for _ in range(1000):
+                meter.record('tencent', requests=1, nbytes=100, rows=2, latency=0.01)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = meter.stats()
+        assert stats['bytes'] == 800000 and stats['requests'] == 8000 and stats['rows'] == 16000
+        assert stats['sources']['tencent']['avg_latency_ms'] == 10.0
+        assert stats['rows_per_sec'] > 0 and stats['mb_per_sec'] > 0
+        assert meter.save()
+
+        reloaded = DownloadMeter(state_file)
+        assert reloaded.total_bytes == 800000
+        assert reloaded.stats()['sources']['tencent']['requests'] == 8000
+        reloaded.save()
+        with open(state_file, 'r', encoding='utf-8') as f:
+            assert json.load(f)[yesterday]['bytes'] == 10 ** 9
+
+        assert frame_bytes(None) == 0
+        df = pd.DataFrame({'date': ['2024-01-02'], 'close': [10.5]})
+        assert frame_bytes(df) == len('date,close\n2024-01-02,10.5\n')
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_tencent_wire_bytes():
+    """腾讯数据源登记每个K线响应的字节数、请求数和耗时"""
+    with MockTencentServer() as server:
+        transport = HttpTransport(retries=0)
+        meter = DownloadMeter()
+        source = TencentDataSource(request_rate=1000, transport=transport, kline_url=server.kline_url,
+                                   meter=meter)
+        source.get_stock_history('600000', start_date='2020-01-02', end_date='2024-03-29')
+        url = source._kline_url('sh600000', '2024-01-02', '2024-03-29')
+        body = transport.get(url).content
+        source.get_stock_history('600000', start_date='2024-01-02', end_date='2024-03-29')
+
+        stats = meter.stats()['sources']['tencent']
+        assert stats['requests'] == server.stats['kline'] - 1 > 2
+        assert stats['avg_latency_ms'] is not None
+        # 分段请求的字节数之和大于单段响应
+        assert stats['bytes'] > len(body) and meter.total_bytes == stats['bytes']
+
+
+def test_budget_survives_restart():
+    """批量下载按计量结果累计；重新运行时从当日累计继续，超过每日限制后不再发起请求"""
+    tmp = tempfile.mkdtemp()
+    try:
+        with MockTencentServer() as server:
+            codes = ['600000', '600001', '000001', '000002']
+            downloader = DataDownloader(write_config(tmp, server))
+            assert downloader.download_all_stocks(pd.DataFrame({'code': codes})) == (4, 0)
+            stats = downloader.get_download_stats()
+            assert stats['downloaded_bytes'] > 0 and stats['requests'] == server.stats['kline']
+            assert stats['rows'] == sum(len(pd.read_csv(os.path.join(tmp, 'daily', f'{c}.csv'))) for c in codes)
+            assert stats['rows_per_sec'] > 0 and stats['mb_per_sec'] > 0
+
+            # 重启后当日累计仍在；限制设为 1MB 并把累计调到超过限制，不再发起请求
+            restarted = DataDownloader(write_config(tmp, server, limit_mb=1))
+            assert restarted.downloaded_bytes == stats['downloaded_bytes']
+            restarted.downloaded_bytes = 2 * 1024 * 1024
+            requests_before = server.stats['kline']
+            success, failed = restarted.download_all_stocks(pd.DataFrame({'code': ['300750', '688001']}))
+            assert (success, failed) == (0, 2)
+            assert server.stats['kline'] == requests_before
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("下载计量测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("并发计数与保存", test_meter_counts_and_persists),
+                       ("腾讯响应字节数", test_tencent_wire_bytes),
+                       ("每日限制跨运行累计", test_budget_survives_restart)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+下载计划测试脚本
+验证计划只根据本地元数据区分已是最新、需要下载和跳过的股票，
+长期停牌的股票隔若干交易日才检查一次，以及数据已是最新时批量下载不发起任何请求
+（离线，使用临时目录）
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.data_manifest import DataManifest
+from src.download_planner import DownloadPlanner, SUSPEND_MISSES, SUSPEND_RECHECK_DAYS
+from src.data_downloader import DataDownloader
+
+
+def write_daily(daily_dir: str, code: str, end: str, periods: int = 5):
+    dates = pd.bdate_range(end=end, periods=periods).strftime('%Y-%m-%d')
+    pd.DataFrame({'date': dates, 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0,
+                  'volume': 100, 'amount': 100}).to_csv(os.path.join(daily_dir, f'{code}.csv'), index=False)
+
+
+def test_target_date_and_calendar():
+    """收盘前以上一交易日为目标；交易日历中的节假日被跳过"""
+    tmp = tempfile.mkdtemp()
+    try:
+        planner = DownloadPlanner(tmp, DataManifest.get(tmp))
+        assert planner.target_date(datetime(2024, 1, 5, 16, 0)) == pd.Timestamp('2024-01-05')
+        assert planner.target_date(datetime(2024, 1, 5, 10, 0)) == pd.Timestamp('2024-01-04')
+        assert planner.target_date(datetime(2024, 1, 7, 10, 0)) == pd.Timestamp('2024-01-05')
+
+        # 2024-02-09 至 2024-02-18 春节休市
+        calendar = [d for d in pd.bdate_range('2024-01-02', '2024-03-29')
+                    if not pd.Timestamp('2024-02-09') <= d <= pd.Timestamp('2024-02-18')]
+        planner = DownloadPlanner(tmp, DataManifest.get(tmp), calendar)
+        assert planner.target_date(datetime(2024, 2, 14, 16, 0)) == pd.Timestamp('2024-02-08')
+        assert planner.trading_days_between('2024-02-08', '2024-02-20') == 2
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_plan_and_suspension():
+    """已是最新、需要下载、未上市、已退市和长期停牌的股票分别归类"""
+    tmp = tempfile.mkdtemp()
+    try:
+        now = datetime(2024, 3, 15, 16, 0)
+        write_daily(tmp, '600000', '2024-03-15')
+        write_daily(tmp, '000001', '2024-03-12')
+        write_daily(tmp, '000002', '2024-01-31')
+        write_daily(tmp, '000003', '2023-06-30')
+        manifest = DataManifest.get(tmp)
+        manifest.sync()
+        planner = DownloadPlanner(tmp, manifest)
+
+        stock_list = pd.DataFrame({
+            'code': ['600000', '000001', '000002', '000003', '300750', '301999'],
+            'list_date': ['19991110', '19910403', '19910129', '19910129', '20210610', '20240401'],
+            'delist_date': [None, None, None, '20230703', None, None],
+        })
+        plan = planner.plan(stock_list, now=now)
+        assert plan.up_to_date == ['600000']
+        assert plan.tasks == [('000001', pd.Timestamp('2024-03-12'), '20240313'),
+                              ('000002', pd.Timestamp('2024-01-31'), '20240201'),
+                              ('300750', None, '20210610')]
+        assert plan.skipped == {'000003': '已退市', '301999': '未上市'}
+        assert '1 只已是最新，3 只需要下载，2 只跳过' in plan.summary()
+
+        # 000002 连续多个目标日期无新数据后视为停牌，同一目标日期重复请求只计一次
+        for day in pd.bdate_range(end='2024-03-15', periods=SUSPEND_MISSES):
+            planner.record_result('000002', day, False)
+            planner.record_result('000002', day, False)
+        plan = planner.plan(stock_list, now=now)
+        assert plan.skipped['000002'] == '停牌'
+
+        planner.save()
+        reloaded = DownloadPlanner(tmp, manifest)
+        recheck = pd.bdate_range('2024-03-15', periods=SUSPEND_RECHECK_DAYS + 1)[-1]
+        later = datetime(recheck.year, recheck.month, recheck.day, 16, 0)
+        assert '000002' in reloaded.plan(stock_list, now=later).fetch_codes
+        reloaded.record_result('000002', recheck, True)
+        assert '000002' in reloaded.plan(stock_list, now=now).fetch_codes
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_failed_fetch_is_not_a_miss():
+    """下载失败不登记为无新数据：连续多个目标日期请求出错后仍需要下载；请求成功但无数据才计入停牌"""
+    tmp = tempfile.mkdtemp()
+    try:
+        config_file = os.path.join(tmp, 'config.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(f"[Paths]\ndata_dir = {tmp}\ndaily_dir = {tmp}/daily\nstocks_dir = {tmp}/stocks\n"
+                    f"[DataSource]\nsource = tencent\n[Download]\nbuild_panel = false\n"
+                    f"request_rate = 1000\nwrite_queue_size = 0\n")
+        downloader = DataDownloader(config_file)
+        write_daily(os.path.join(tmp, 'daily'), '000002', '2024-01-31')
+        downloader.manifest.sync()
+        stock_list = pd.DataFrame({'code': ['000002']})
+        now = datetime(2024, 3, 15, 16, 0)
+        targets = pd.bdate_range(end='2024-03-15', periods=SUSPEND_MISSES)
+
+        def raise_error(url):
+            raise ConnectionError('connection reset')
+
+        downloader.tencent_source._get_json = raise_error
+        for day in targets:
+            assert not downloader._fetch_planned('000002', pd.Timestamp('2024-01-31'), '20240201', day)
+        assert '000002' in downloader.planner.plan(stock_list, now=now).fetch_codes
+
+        downloader.tencent_source._get_json = lambda url: {'code': 0, 'data': {'sz000002': {'qfqday': []}}}
+        for day in targets:
+            assert downloader._fetch_planned('000002', pd.Timestamp('2024-01-31'), '20240201', day)
+        assert downloader.planner.plan(stock_list, now=now).skipped == {'000002': '停牌'}
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_fresh_data_makes_no_requests():
+    """本地数据已是最新时批量下载不请求行情快照和历史数据"""
+    tmp = tempfile.mkdtemp()
+    try:
+        config_file = os.path.join(tmp, 'config.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(f"[Paths]\ndata_dir = {tmp}\ndaily_dir = {tmp}/daily\nstocks_dir = {tmp}/stocks\n"
+                    f"[DataSource]\nsource = tencent\n[Download]\nbuild_panel = false\n")
+        downloader = DataDownloader(config_file)
+        end = downloader.planner.target_date().strftime('%Y-%m-%d')
+        for code in ['600000', '000001']:
+            write_daily(os.path.join(tmp, 'daily'), code, end)
+
+        requests_made = []
+        downloader.tencent_source.get_daily_snapshot = lambda *args: requests_made.append('snapshot')
+        downloader.tencent_source._get_json = lambda url: requests_made.append(url)
+
+        success, failed = downloader.download_all_stocks(pd.DataFrame({'code': ['600000', '000001']}))
+        assert (success, failed) == (2, 0)
+        assert requests_made == []
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("下载计划测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("目标日期与交易日历", test_target_date_and_calendar),
+                       ("计划归类与停牌", test_plan_and_suspension),
+                       ("下载失败不计入停牌", test_failed_fetch_is_not_a_miss),
+                       ("数据最新时不发起请求", test_fresh_data_makes_no_requests)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+入选历史日志测试脚本
+验证历史日志只追加写入、成员索引增量更新，以及 new_only 模式只输出首次入选的股票（离线，使用临时目录）
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.history_log import StockHistoryLog
+from src.monster_stock_analyzer import MonsterStockAnalyzer
+
+
+def make_results(codes) -> pd.DataFrame:
+    return pd.DataFrame({'stock_code': codes, 'date': '2024-01-02', 'total_score': 50})
+
+
+def test_append_only_log():
+    """追加只写入新代码，不改写已有内容；索引落后时只解析新增部分"""
+    tmp = tempfile.mkdtemp()
+    try:
+        log_file = os.path.join(tmp, 'monster_stock_history.csv')
+        # 旧版本写出的历史文件（含 BOM）
+        make_results(['000001', '000002']).assign(first_seen='2024-01-01')[
+            ['stock_code', 'date', 'first_seen']].to_csv(log_file, index=False, encoding='utf-8-sig')
+
+        history = StockHistoryLog(log_file)
+        assert len(history) == 2
+        assert os.path.exists(history.index_file)
+        with open(log_file, 'rb') as f:
+            before = f.read()
+
+        assert history.append(make_results(['000002', '600000', '600000'])) == 1
+        with open(log_file, 'rb') as f:
+            after = f.read()
+        assert after.startswith(before)
+        assert after[len(before):].decode('utf-8').count('\n') == 1
+
+        # 其他进程追加的行在下次加载时从日志尾部补入索引
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write('300750,2024-01-03,2024-01-03\n')
+        reloaded = StockHistoryLog(log_file)
+        assert list(reloaded.is_new(pd.Series(['000001', '300750', '688001']))) == [False, False, True]
+        assert len(reloaded) == 4
+
+        df = pd.read_csv(log_file, dtype={'stock_code': str}, encoding='utf-8-sig')
+        assert list(df['stock_code']) == ['000001', '000002', '600000', '300750']
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_new_only_filter():
+    """new_only 先判断后登记，本次首次入选的股票不会被自己过滤掉"""
+    tmp = tempfile.mkdtemp()
+    try:
+        analyzer = MonsterStockAnalyzer()
+        first = analyzer._update_history(tmp, make_results(['000001', '000002']))
+        assert first.all()
+
+        second = analyzer._update_history(tmp, make_results(['000002', '600000']))
+        assert list(second) == [False, True]
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("入选历史日志测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("只追加日志", test_append_only_log),
+                       ("首次入选筛选", test_new_only_filter)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
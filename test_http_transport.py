@@ -0,0 +1,138 @@
+"""
+HTTP 连接池测试脚本
+验证同一主机的请求复用长连接（多线程并发时连接数不超过连接池大小）、
+5xx 响应按退避策略重试、推送的 POST 请求不重试，以及数据源通过注入的连接池发出请求
+（离线：使用本机 HTTP 服务）
+"""
+
+import os
+import sys
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.http_transport import HttpTransport
+from src.data_source_tencent import TencentDataSource
+
+
+class Handler(BaseHTTPRequestHandler):
+    """记录每个请求所用的客户端连接；/flaky 第一次返回 503"""
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+    requests = []
+    lock = threading.Lock()
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self):
+        with Handler.lock:
+            Handler.connections.add(self.client_address)
+            Handler.requests.append((self.command, self.path))
+            flaky_count = sum(1 for _, path in Handler.requests if path == '/flaky')
+        if self.path == '/flaky' and flaky_count == 1:
+            self._reply(503, {'code': -1})
+        elif self.path == '/fail':
+            self._reply(503, {'code': -1})
+        else:
+            self._reply(200, {'code': 0, 'data': {}})
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._handle()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    Handler.connections = set()
+    Handler.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def test_keep_alive():
+    """顺序请求只用一个连接；并发请求的连接数不超过连接池大小"""
+    server, base = start_server()
+    try:
+        transport = HttpTransport(pool_size=4, retries=0)
+        for _ in range(20):
+            assert transport.get(f'{base}/ok', timeout=5).json()['code'] == 0
+        assert len(Handler.connections) == 1
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: transport.get(f'{base}/ok').status_code, range(100)))
+        assert len(Handler.requests) == 120
+        assert len(Handler.connections) <= 4
+        transport.close()
+    finally:
+        server.shutdown()
+
+
+def test_retry_policy():
+    """GET 遇到 5xx 时退避重试；POST 不重试；重试用完返回最后的响应"""
+    server, base = start_server()
+    try:
+        transport = HttpTransport(retries=2, retry_backoff=0.01)
+        assert transport.get(f'{base}/flaky').status_code == 200
+        assert [path for _, path in Handler.requests].count('/flaky') == 2
+
+        assert transport.post(f'{base}/fail', json={'title': 't'}).status_code == 503
+        assert Handler.requests.count(('POST', '/fail')) == 1
+
+        assert transport.get(f'{base}/fail').status_code == 503
+        assert Handler.requests.count(('GET', '/fail')) == 3
+        transport.close()
+    finally:
+        server.shutdown()
+
+
+def test_source_uses_transport():
+    """腾讯数据源的请求经注入的连接池发出并复用连接"""
+    server, base = start_server()
+    try:
+        transport = HttpTransport(retries=0)
+        source = TencentDataSource(request_rate=1000, transport=transport)
+        for _ in range(10):
+            assert source._get_json(f'{base}/kline') == {'code': 0, 'data': {}}
+        assert len(Handler.connections) == 1
+        assert len(transport._sessions) == 1
+        transport.close()
+    finally:
+        server.shutdown()
+
+
+def main():
+    print("=" * 50)
+    print("HTTP 连接池测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("长连接复用", test_keep_alive),
+                       ("重试策略", test_retry_policy),
+                       ("数据源注入", test_source_uses_transport)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+行情面板测试脚本
+验证面板构建、内存映射读取以及分析器按面板运行的结果与按文件一致（离线，使用临时目录）
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.data_store import write_stock_data, stock_file_path, list_stock_files
+from src.market_panel import build_panel, MarketPanel
+from src.volume_analyzer import analyze_volume_surge
+
+
+def make_daily_frame(code: str, start: str, days: int, surge_at: int = None) -> pd.DataFrame:
+    """生成测试用日线数据，surge_at 指定放量突破的位置"""
+    dates = pd.bdate_range(start, periods=days)
+    close = np.full(days, 10.0)
+    volume = np.full(days, 100000)
+    if surge_at is not None:
+        close[surge_at] = 11.0
+        volume[surge_at] = 800000
+    return pd.DataFrame({
+        'date': dates.strftime('%Y-%m-%d'),
+        'code': code,
+        'open': close,
+        'high': close + 0.1,
+        'low': close - 0.1,
+        'close': close,
+        'volume': volume,
+        'amount': close * volume,
+    })
+
+
+def _make_daily_dir(tmp: str) -> str:
+    daily_dir = os.path.join(tmp, 'daily')
+    start = (pd.Timestamp.now().normalize() - pd.tseries.offsets.BDay(39)).strftime('%Y-%m-%d')
+    write_stock_data(make_daily_frame('000001', start, 40, surge_at=39),
+                     stock_file_path(daily_dir, '000001'))
+    # 晚上市 10 天的股票，面板中前段应为 NaN
+    late = (pd.Timestamp(start) + pd.tseries.offsets.BDay(10)).strftime('%Y-%m-%d')
+    write_stock_data(make_daily_frame('000002', late, 30),
+                     stock_file_path(daily_dir, '000002'))
+    return daily_dir
+
+
+def test_build_and_open():
+    """面板维度、停牌日 NaN 与单股还原"""
+    tmp = tempfile.mkdtemp()
+    try:
+        daily_dir = _make_daily_dir(tmp)
+        panel_dir = os.path.join(tmp, 'panel')
+        assert build_panel(daily_dir, panel_dir)
+
+        panel = MarketPanel.open(panel_dir)
+        assert panel is not None
+        assert len(panel) == 2
+        assert panel.fields['close'].shape == (2, 40)
+        assert isinstance(panel.fields['close'], np.memmap)
+        assert np.isnan(panel.fields['close'][1, :10]).all()
+        assert not panel.is_stale(daily_dir)
+
+        df = panel.stock_frame('000002')
+        assert len(df) == 30
+        assert df['volume'].dtype == np.int64
+        assert panel.stock_frame('999999') is None
+
+        # 重建覆盖旧面板
+        assert build_panel(daily_dir, panel_dir)
+        assert MarketPanel.open(panel_dir) is not None
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_analyzer_on_panel():
+    """成交量分析按面板与按文件结果一致"""
+    tmp = tempfile.mkdtemp()
+    try:
+        daily_dir = _make_daily_dir(tmp)
+        panel_dir = os.path.join(tmp, 'panel')
+        build_panel(daily_dir, panel_dir)
+        panel = MarketPanel.open(panel_dir)
+
+        by_file = analyze_volume_surge(list_stock_files(daily_dir), max_days_old=10)
+        by_panel = analyze_volume_surge(None, max_days_old=10, panel=panel)
+        assert list(by_file['stock_code']) == ['000001']
+        assert list(by_panel['stock_code']) == list(by_file['stock_code'])
+        assert by_panel['volume_ratio'].iloc[0] == by_file['volume_ratio'].iloc[0]
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("行情面板测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("面板构建与读取", test_build_and_open),
+                       ("按面板分析", test_analyzer_on_panel)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+本地模拟腾讯行情服务器测试脚本
+验证腾讯数据源可指向模拟服务器获取确定的模拟K线、录制模式保存原始响应并由模拟服务器回放、
+限流 (429) 和错误注入 (503) 的统计，以及批量下载经配置指向模拟服务器完成
+（离线：使用本机 HTTP 服务和临时目录）
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.http_transport import HttpTransport
+from src.http_replay import ResponseStore, RecordingTransport
+from src.mock_tencent_server import MockTencentServer
+from src.data_source_tencent import TencentDataSource
+from src.data_downloader import DataDownloader
+
+
+def test_synthetic_klines():
+    """模拟K线按股票代码确定：相同区间结果相同，分段获取与整段一致"""
+    with MockTencentServer() as server:
+        source = TencentDataSource(request_rate=1000, transport=HttpTransport(retries=0),
+                                   kline_url=server.kline_url, quote_url=server.quote_url)
+        df = source.get_stock_history('600000', start_date='2024-01-02', end_date='2024-03-29')
+        assert df is not None and len(df) == len(pd.bdate_range('2024-01-02', '2024-03-29'))
+        again = source.get_stock_history('600000', start_date='2024-02-01', end_date='2024-02-29')
+        merged = df.set_index('date').loc[again['date']]
+        assert (merged['close'].values == again['close'].values).all()
+        other = source.get_stock_history('000001', start_date='2024-01-02', end_date='2024-03-29')
+        assert not (other['close'].values == df['close'].values).all()
+        assert server.stats['kline'] == 3 and server.stats['replayed'] == 0
+
+
+def test_record_and_replay():
+    """录制模式保存K线响应；回放服务器原样返回录制内容（含覆盖更长区间的录制）"""
+    tmp = tempfile.mkdtemp()
+    try:
+        with MockTencentServer() as origin:
+            transport = RecordingTransport(HttpTransport(retries=0), ResponseStore(tmp, 'tencent'))
+            source = TencentDataSource(request_rate=1000, transport=transport, kline_url=origin.kline_url)
+            recorded = source.get_stock_history('600000', start_date='2024-01-02', end_date='2024-03-29')
+        assert os.path.exists(os.path.join(tmp, 'tencent', 'sh600000', '2024-01-02_2024-03-29.json'))
+
+        # 回放服务器使用不同的种子，但录制的股票返回录制内容
+        with MockTencentServer(replay_dir=tmp) as replay:
+            source = TencentDataSource(request_rate=1000, transport=HttpTransport(retries=0),
+                                       kline_url=replay.kline_url)
+            replayed = source.get_stock_history('600000', start_date='2024-01-02', end_date='2024-03-29')
+            part = source.get_stock_history('600000', start_date='2024-02-01', end_date='2024-02-29')
+            source.get_stock_history('000001', start_date='2024-01-02', end_date='2024-03-29')
+            assert replay.stats['replayed'] == 2 and replay.stats['kline'] == 3
+        pd.testing.assert_frame_equal(recorded, replayed)
+        assert part['date'].min() >= '2024-02-01' and part['date'].max() <= '2024-02-29'
+        assert len(part) == len(pd.bdate_range('2024-02-01', '2024-02-29'))
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_fault_injection():
+    """超过每秒请求上限返回 429，按概率注入 503，均计入统计"""
+    with MockTencentServer(rate_limit=5) as server:
+        transport = HttpTransport(retries=0)
+        statuses = [transport.get(server.quote_url + 'sh600000').status_code for _ in range(20)]
+        assert statuses.count(429) == server.stats['throttled'] > 0
+        assert statuses.count(200) >= 5
+
+    with MockTencentServer(error_rate=0.5, seed=1) as server:
+        transport = HttpTransport(retries=0)
+        statuses = [transport.get(server.quote_url + 'sh600000').status_code for _ in range(40)]
+        assert 0 < statuses.count(503) == server.stats['errors'] < 40
+
+
+def test_download_all_against_server():
+    """批量下载按配置指向模拟服务器，并发请求受 max_in_flight 限制"""
+    tmp = tempfile.mkdtemp()
+    try:
+        with MockTencentServer(latency=0.02) as server:
+            config_file = os.path.join(tmp, 'config.ini')
+            with open(config_file, 'w', encoding='utf-8') as f:
+                f.write(f"[Paths]\ndata_dir = {tmp}\ndaily_dir = {tmp}/daily\nstocks_dir = {tmp}/stocks\n"
+                        f"[DataSource]\nsource = tencent\ntencent_kline_url = {server.kline_url}\n"
+                        f"tencent_quote_url = {server.quote_url}\n"
+                        f"[Download]\nbuild_panel = false\nrequest_rate = 1000\nmax_in_flight = 4\n"
+                        f"snapshot_update = false\nasync_fetch = true\n")
+            downloader = DataDownloader(config_file)
+            codes = ['600000', '600001', '000001', '000002', '300750', '688001']
+            success, failed = downloader.download_all_stocks(pd.DataFrame({'code': codes}))
+            assert (success, failed) == (len(codes), 0)
+            assert server.stats['kline'] >= len(codes)
+            assert server.stats['max_in_flight'] <= 4
+        for code in codes:
+            df = pd.read_csv(os.path.join(tmp, 'daily', f'{code}.csv'))
+            assert df['date'].iloc[0] >= '2020-01-01' and df['date'].is_monotonic_increasing
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("本地模拟腾讯行情服务器测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("模拟K线", test_synthetic_klines),
+                       ("录制与回放", test_record_and_replay),
+                       ("限流与错误注入", test_fault_injection),
+                       ("批量下载指向模拟服务器", test_download_all_against_server)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
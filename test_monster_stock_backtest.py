@@ -263,12 +263,8 @@ class MonsterStockBacktest:
                     if len(lookback_df) < self.lookback_days:
                         continue
 
-                    # 临时保存为文件供分析器使用
-                    temp_file = f'/tmp/{stock_code}_temp.csv'
-                    lookback_df.to_csv(temp_file, index=False)
-
                     # 分析是否为妖股信号
-                    result = self.monster_analyzer.analyze_single(temp_file)
+                    result = self.monster_analyzer.analyze_frame(lookback_df, stock_code)
 
                     if result and result['total_score'] >= self.min_score:
                         signal_count += 1
@@ -320,9 +316,6 @@ class MonsterStockBacktest:
                                     f"评分:{result['total_score']}"
                                 )
 
-                    # 清理临时文件
-                    if os.path.exists(temp_file):
-                        os.remove(temp_file)
 
                 processed += 1
                 if (i + 1) % 500 == 0:
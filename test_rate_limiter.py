@@ -0,0 +1,140 @@
+"""
+自适应限速测试脚本
+验证连续正常返回时加速、超时/限流/连续空数据时减半降速，
+学到的速率按数据源保存并在下次创建时读取，以及异常归类（离线，使用临时目录）
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import shutil
+import tempfile
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.rate_limiter import AdaptiveRateLimiter, is_throttle_error, backoff_delay
+
+
+def test_aimd():
+    """正常返回一批后加速，限流时速率和并发减半，同一批失败只降速一次"""
+    limiter = AdaptiveRateLimiter('test', rate=100, min_rate=10, max_rate=200,
+                                  max_concurrency=8, healthy_streak=5)
+    for _ in range(10):
+        with limiter.request():
+            pass
+    assert limiter.rate == 100 + 2 * limiter.increase_step
+
+    for _ in range(3):
+        try:
+            with limiter.request():
+                raise requests.exceptions.Timeout('read timed out')
+        except requests.exceptions.Timeout:
+            pass
+    stats = limiter.stats()
+    assert stats['rate'] == round((100 + 2 * limiter.increase_step) / 2, 3)
+    assert stats['concurrency'] == 4 and stats['throttled'] == 3 and stats['ok'] == 10
+    assert stats['in_flight'] == 0
+
+    # 与限流无关的失败不影响速率
+    rate = limiter.rate
+    try:
+        with limiter.request():
+            raise ValueError('bad json')
+    except ValueError:
+        pass
+    assert limiter.rate == rate and limiter.stats()['error'] == 1
+
+
+def test_empty_burst_and_async():
+    """连续空数据视为限流；异步请求同样计入统计"""
+    limiter = AdaptiveRateLimiter('test', rate=100, min_rate=10, max_rate=100, empty_burst=3)
+
+    async def run():
+        for _ in range(3):
+            async with limiter.request_async() as outcome:
+                outcome.empty()
+
+    asyncio.run(run())
+    assert limiter.rate == 50
+    assert limiter.stats()['empty'] == 3
+    assert limiter.stats()['latency_ms'] is not None
+
+
+def test_persist_learned_rate():
+    """保存学到的速率，下次创建时读取（限制在上下限内），其他数据源记录保留"""
+    tmp = tempfile.mkdtemp()
+    try:
+        state_file = os.path.join(tmp, 'rate_limits.json')
+        with open(state_file, 'w', encoding='utf-8') as f:
+            json.dump({'akshare': {'rate': 1.5}}, f)
+
+        limiter = AdaptiveRateLimiter('tencent', rate=3, max_rate=12, state_file=state_file)
+        limiter.rate = 7.5
+        assert limiter.save()
+        assert AdaptiveRateLimiter('tencent', rate=3, max_rate=12, state_file=state_file).rate == 7.5
+        assert AdaptiveRateLimiter('tencent', rate=3, max_rate=5, state_file=state_file).rate == 5
+
+        with open(state_file, encoding='utf-8') as f:
+            state = json.load(f)
+        assert state['akshare'] == {'rate': 1.5} and state['tencent']['rate'] == 7.5
+        assert AdaptiveRateLimiter.get('tencent', state_file, rate=3) is \
+            AdaptiveRateLimiter.get('tencent', state_file, rate=3)
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_classify_and_backoff():
+    """超时、429/5xx、频率限制报错视为限流；重试等待指数增长且有上限"""
+    class HTTPError(Exception):
+        def __init__(self, status):
+            super().__init__(f'HTTP {status}')
+            self.status = status
+
+    assert is_throttle_error(requests.exceptions.ConnectionError('reset'))
+    assert is_throttle_error(asyncio.TimeoutError())
+    assert is_throttle_error(HTTPError(429)) and is_throttle_error(HTTPError(503))
+    assert not is_throttle_error(HTTPError(404))
+    assert is_throttle_error(Exception('抱歉，您每分钟最多访问该接口200次'))
+    assert not is_throttle_error(KeyError('data'))
+
+    assert 2.5 <= backoff_delay(5, 0) <= 5
+    assert 10 <= backoff_delay(5, 2) <= 20
+    assert backoff_delay(5, 10) <= 60
+
+
+def test_bucket_rate_change():
+    """降速时清空突发额度，下一个请求按新速率等待"""
+    limiter = AdaptiveRateLimiter('test', rate=100, min_rate=10, max_rate=100)
+    limiter._decrease('test')
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.015
+
+
+def main():
+    print("=" * 50)
+    print("自适应限速测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("加性增乘性减", test_aimd),
+                       ("连续空数据与异步请求", test_empty_burst_and_async),
+                       ("保存学到的速率", test_persist_learned_rate),
+                       ("异常归类与退避", test_classify_and_backoff),
+                       ("降速清空突发额度", test_bucket_rate_change)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+选股结果数据库测试脚本
+验证结果登记、历史结果导入以及历史统计/连续入选/新增标记查询（离线，使用临时目录）
+"""
+
+import os
+import sys
+import shutil
+import logging
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.results_db import ResultsDB, STRATEGY_FILTERED, STRATEGY_MONSTER
+
+
+def make_filtered(codes) -> pd.DataFrame:
+    """生成导出格式（中文列名）的筛选结果"""
+    return pd.DataFrame({
+        '股票代码': codes,
+        '股票名称': [f'股票{c}' for c in codes],
+        '收盘价': [10.0] * len(codes),
+        '成交量倍数': [float(i + 2) for i in range(len(codes))],
+    })
+
+
+def test_import_and_queries():
+    """首次打开导入已有结果文件，查询按信号日期而非文件修改时间"""
+    tmp = tempfile.mkdtemp()
+    try:
+        make_filtered(['000001', '000002']).to_csv(
+            os.path.join(tmp, 'filtered_20240102.csv'), index=False, encoding='utf-8-sig')
+        make_filtered(['000002', '600000', '000003']).to_csv(
+            os.path.join(tmp, 'filtered_20240103.csv'), index=False, encoding='utf-8-sig')
+        # 同一天两次运行，以最后一次为准
+        first = os.path.join(tmp, 'monster_stock_20240103_093000.csv')
+        pd.DataFrame({'股票代码': ['000001'], '综合评分': [40]}).to_csv(first, index=False)
+        second = os.path.join(tmp, 'monster_stock_20240103_150000.csv')
+        pd.DataFrame({'股票代码': ['000005', '000006'], '综合评分': [50, 60]}).to_csv(second, index=False)
+        os.utime(first, (1, 1))
+        open(os.path.join(tmp, 'monster_stock_history.csv'), 'w').close()
+
+        db = ResultsDB(tmp)
+        assert db.history_counts(STRATEGY_FILTERED, 5) == [('2024-01-03', 3), ('2024-01-02', 2)]
+        assert db.codes_on(STRATEGY_FILTERED, '20240102') == {'000001', '000002'}
+        assert db.codes_on(STRATEGY_MONSTER, '2024-01-03') == {'000005', '000006'}
+        assert db.previous_date(STRATEGY_FILTERED, '2024-01-03') == '2024-01-02'
+        assert db.previous_date(STRATEGY_FILTERED, '2024-01-02') is None
+
+        signals = db.signals(STRATEGY_MONSTER, '2024-01-03')
+        assert list(signals['stock_code']) == ['000006', '000005']
+        assert list(signals['综合评分']) == [60, 50]
+
+        # 导入只执行一次，新结果通过 record_result_file 登记
+        path = os.path.join(tmp, 'filtered_20240104.csv')
+        assert db.record_result_file(path, make_filtered(['000002']))
+        assert not db.record_result_file(os.path.join(tmp, 'other.csv'), make_filtered(['000002']))
+        runs = ResultsDB(tmp).recent_runs(STRATEGY_FILTERED)
+        assert [r['signal_date'] for r in runs] == ['2024-01-04', '2024-01-03', '2024-01-02']
+        assert db.result_file(runs[0]) is None
+        assert db.result_file(runs[1]) == os.path.join(tmp, 'filtered_20240103.csv')
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_mark_new_stocks():
+    """新增标记对比结果库中前一个信号日"""
+    from batch_analyze import mark_new_stocks
+
+    tmp = tempfile.mkdtemp()
+    try:
+        db = ResultsDB.get(tmp)
+        prev = (datetime.now() - timedelta(days=3)).strftime('%Y%m%d')
+        db.record_run(STRATEGY_MONSTER, pd.DataFrame({'股票代码': ['000001', '000002']}), prev)
+
+        current = pd.DataFrame({'stock_code': ['000002', '600000']})
+        marked = mark_new_stocks(current, tmp, logging.getLogger('test'))
+        assert list(marked['is_new']) == [False, True]
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("选股结果数据库测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("导入与查询", test_import_and_queries),
+                       ("新增标记", test_mark_new_stocks)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+数据源路由测试脚本
+验证主数据源出错或无数据时改用备用数据源并换算单位、连续失败后熔断、
+慢请求触发对冲请求，以及下载器的异步抓取对腾讯失败的股票改用备用数据源（离线，使用临时目录）
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.source_router import SourceRouter, MIN_HEDGE_SAMPLES, SOURCE_COLUMNS, normalize_frame
+from src.data_downloader import DataDownloader
+from src.data_store import find_stock_file, read_stock_data
+
+
+def make_frame(volume=10.0, amount=5.0):
+    return pd.DataFrame({'date': ['20240105'], 'open': [10.0], 'high': [10.5], 'low': [9.8],
+                         'close': [10.2], 'volume': [volume], 'amount': [amount]})
+
+
+def test_failover_and_units():
+    """主数据源出错时改用备用数据源，成交量/成交额换算为主数据源的单位"""
+    router = SourceRouter(['tushare', 'akshare'])
+    calls = []
+
+    def fetch(source):
+        calls.append(source)
+        if source == 'tencent':
+            raise ConnectionError('reset')
+        return make_frame() if source == 'tushare' else None
+
+    df, source = router.fetch(fetch, 'tencent')
+    assert source == 'tushare' and calls == ['tencent', 'tushare']
+    # Tushare 成交量为手、成交额为千元，腾讯为股和元
+    assert df['volume'].iloc[0] == 1000 and df['amount'].iloc[0] == 5000
+    assert df['date'].iloc[0] == '2024-01-05'
+
+    # 全部数据源都没有数据：返回空结果，不计为失败
+    df, source = router.fetch(lambda s: pd.DataFrame(), 'tencent')
+    assert source is None and df is not None and df.empty
+    # 全部数据源都出错：抛出最后一个异常
+    try:
+        router.fetch(lambda s: (_ for _ in ()).throw(TimeoutError(s)), 'tencent')
+        assert False, '应抛出异常'
+    except TimeoutError:
+        pass
+
+
+def test_column_projection():
+    """备用数据源的结果按主数据源写入的列对齐：缺少的列留空，多出的列丢弃"""
+    # Tushare 多出 ts_code、pre_close，缺少 AkShare 的振幅和换手率
+    tushare = make_frame().assign(ts_code='600000.SH', pre_close=10.0, change=0.2, change_pct=2.0)
+    df = normalize_frame(tushare, 'tushare', 'akshare')
+    assert list(df.columns) == SOURCE_COLUMNS['akshare']
+    assert df['amplitude'].isna().all() and df['turnover'].isna().all()
+    assert df['change_pct'].iloc[0] == 2.0 and df['volume'].iloc[0] == 10
+    df = normalize_frame(tushare, 'tushare', 'tencent')
+    assert list(df.columns) == SOURCE_COLUMNS['tencent'] and df['volume'].iloc[0] == 1000
+
+    # 经路由改用备用数据源时同样对齐
+    router = SourceRouter(['tushare'])
+    df, source = router.fetch(lambda s: tushare if s == 'tushare' else None, 'baostock')
+    assert source == 'tushare' and list(df.columns) == SOURCE_COLUMNS['baostock']
+
+
+def test_circuit_breaker():
+    """主数据源连续失败后熔断，暂停期间备用数据源排在前面，到期后恢复"""
+    router = SourceRouter(['akshare'], failure_threshold=3, cooldown=0.2)
+    calls = []
+
+    def fetch(source):
+        calls.append(source)
+        return make_frame() if source == 'akshare' else None
+
+    for _ in range(3):
+        router.fetch(fetch, 'tencent')
+    assert router.order('tencent') == ['akshare', 'tencent']
+    assert router.stats()['tencent']['open']
+    calls.clear()
+    router.fetch(fetch, 'tencent')
+    assert calls == ['akshare']
+
+    time.sleep(0.25)
+    assert router.order('tencent') == ['tencent', 'akshare']
+    router.close()
+
+
+def test_hedged_request():
+    """主数据源超过延迟分位数未返回时对冲请求备用数据源，取先返回的结果"""
+    router = SourceRouter(['baostock'], hedge=True, hedge_percentile=95)
+    for _ in range(MIN_HEDGE_SAMPLES):
+        router.record_success('tencent', 0.02)
+
+    def fetch(source):
+        if source == 'tencent':
+            time.sleep(1.0)
+            return make_frame()
+        return make_frame(volume=7)
+
+    start = time.monotonic()
+    df, source = router.fetch(fetch, 'tencent')
+    assert source == 'baostock' and df['volume'].iloc[0] == 7
+    assert time.monotonic() - start < 0.5
+    router.close()
+
+
+def test_downloader_failover():
+    """配置备用数据源后，异步抓取中腾讯没有数据的股票改用备用数据源并换算单位"""
+    tmp = tempfile.mkdtemp()
+    try:
+        config_file = os.path.join(tmp, 'config.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(f"[Paths]\ndata_dir = {tmp}\ndaily_dir = {tmp}/daily\nstocks_dir = {tmp}/stocks\n"
+                    f"[DataSource]\nsource = tencent\nfallback_sources = akshare\n"
+                    f"[Download]\nbuild_panel = false\nwrite_queue_size = 0\nsnapshot_update = false\n"
+                    f"async_fetch = true\n")
+        downloader = DataDownloader(config_file)
+        assert downloader.router.fallbacks == ['akshare']
+        fetched = []
+
+        def fetch_from_source(source, code, period, start_date, end_date, adjust):
+            fetched.append((source, code))
+            return make_frame(volume=3) if source == 'akshare' else None
+
+        def fetch_histories(tasks, on_result, should_stop=None):
+            for code, _, _ in tasks:
+                on_result(code, make_frame() if code == '600000' else None)
+            return {code for code, _, _ in tasks}
+
+        downloader._fetch_from_source = fetch_from_source
+        downloader.tencent_source.fetch_histories = fetch_histories
+        stock_list = pd.DataFrame({'code': ['600000', '000001'], 'name': ['浦发银行', '平安银行']})
+        success, fail = downloader.download_all_stocks(stock_list)
+        assert (success, fail) == (2, 0)
+        assert fetched == [('akshare', '000001')]
+        # AkShare 成交量为手，换算为腾讯的股
+        saved = read_stock_data(find_stock_file(downloader.daily_dir, '000001'))
+        assert saved['volume'].iloc[-1] == 300
+
+        # 改用备用数据源时抛出异常：该股票记为失败，其余股票照常完成
+        def raise_error(code, start_date=None, end_date=None, exclude_sources=()):
+            raise RuntimeError('fallback crashed')
+
+        downloader.download_stock_history = raise_error
+        success, fail = downloader.download_all_stocks(pd.DataFrame({'code': ['600000', '000002']}))
+        assert (success, fail) == (1, 1)
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("数据源路由测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("失败切换与单位换算", test_failover_and_units),
+                       ("备用数据源按主数据源的列对齐", test_column_projection),
+                       ("熔断与恢复", test_circuit_breaker),
+                       ("对冲请求", test_hedged_request),
+                       ("下载器改用备用数据源", test_downloader_failover)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
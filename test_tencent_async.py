@@ -0,0 +1,298 @@
+"""
+腾讯数据源异步抓取测试脚本
+验证令牌桶限速、在途请求上限、批量下载经异步抓取写入本地数据，
+按交易日历分段并发获取单只股票历史，K线数组按列解码，
+以及行情快照（腾讯行情接口 / AkShare 实时行情）批量更新当日K线
+（离线：以本地函数代替 HTTP 请求，使用临时目录）
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.data_source_tencent import TencentDataSource, TokenBucket
+from src.data_downloader import DataDownloader
+
+
+def fake_kline_server(delay: float = 0.0, list_date: str = None):
+    """返回模拟K线接口的请求函数及在途请求统计（list_date: 上市日期，之前没有K线）"""
+    stats = {'in_flight': 0, 'max_in_flight': 0, 'requests': 0}
+    lock = threading.Lock()
+
+    def get_json(url):
+        with lock:
+            stats['requests'] += 1
+            stats['in_flight'] += 1
+            stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+        try:
+            time.sleep(delay)
+            code, _, start, end = parse_qs(urlparse(url).query)['param'][0].split(',')[:4]
+            dates = pd.bdate_range(max(start, list_date or start), end)
+            klines = [[d.strftime('%Y-%m-%d'), '10.0', '10.5', '9.8', '10.8', '1200'] for d in dates]
+            return {'code': 0, 'data': {code: {'qfqday': klines}}}
+        finally:
+            with lock:
+                stats['in_flight'] -= 1
+
+    return get_json, stats
+
+
+def test_token_bucket():
+    """突发容量用完后按速率放行"""
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+    assert 0.15 <= elapsed < 0.5, elapsed
+
+
+def test_fetch_histories():
+    """异步抓取受在途上限约束，多段区间合并为一份数据"""
+    source = TencentDataSource(request_rate=1000, max_in_flight=3, timeout=5)
+    source._get_json, stats = fake_kline_server(delay=0.05)
+
+    tasks = [(f'{600000 + i}', '2024-01-01', '2024-01-31') for i in range(8)]
+    tasks.append(('000001', '2020-01-01', '2024-12-31'))
+    results = source.fetch_histories(tasks)
+
+    assert set(results) == {code for code, _, _ in tasks}
+    assert len(results['600000']) == len(pd.bdate_range('2024-01-01', '2024-01-31'))
+    full = results['000001']
+    assert len(full) == len(pd.bdate_range('2020-01-01', '2024-12-31'))
+    assert full['date'].is_monotonic_increasing and not full['date'].duplicated().any()
+    assert full['volume'].iloc[0] == 120000
+    assert stats['requests'] == 8 + 3
+    assert stats['max_in_flight'] <= 3
+
+
+def test_chunked_history():
+    """单只股票的各段按交易日历切分并发请求；区间中途上市的股票不会因某段数据少而提前结束"""
+    calendar = pd.bdate_range('2019-01-01', '2025-12-31')
+    calendar = calendar[calendar.dayofyear % 7 != 0]
+    ranges = TencentDataSource._chunk_ranges('2020-01-01', '2024-12-31', calendar)
+    assert ranges[0][0] == '2020-01-01' and ranges[-1][1] == '2024-12-31'
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert pd.Timestamp(start) - pd.Timestamp(end) == pd.Timedelta(days=1)
+    for start, end in ranges:
+        assert ((calendar >= start) & (calendar <= end)).sum() <= 500
+
+    source = TencentDataSource(request_rate=1000, max_in_flight=4, timeout=5)
+    source._get_json, stats = fake_kline_server(delay=0.3, list_date='2023-06-01')
+    start = time.monotonic()
+    df = source.get_stock_history('600000', '2020-01-01', '2024-12-31')
+    elapsed = time.monotonic() - start
+    # 2023-06 上市：第二段只有几个月数据（旧实现在此提前结束），第三段仍需请求
+    assert stats['requests'] == 3 and stats['max_in_flight'] == 3
+    assert len(df) == len(pd.bdate_range('2023-06-01', '2024-12-31'))
+    assert elapsed < 2 * 0.3, elapsed
+
+
+def test_decode_klines():
+    """K线数组按列解码：丢弃不完整的行、截掉分红信息、按日期排序，成交量换算为股"""
+    klines = [['2024-01-04', '10.20', '10.40', '10.10', '10.50', '1500.000'],
+              ['2024-01-02', '10.00', '10.10', '9.90', '10.20', '1200'],
+              ['2024-01-03', '10.10', '10.20'],
+              ['2024-01-05', '10.40', '10.30', '10.20', '10.60', '900', {'nd': '2023', 'fh_sh': '1.5'}]]
+    df = TencentDataSource._decode_klines(klines)
+    assert list(df.columns) == ['date', 'open', 'close', 'low', 'high', 'volume', 'amount']
+    assert df['date'].tolist() == ['2024-01-02', '2024-01-04', '2024-01-05']
+    assert df['close'].tolist() == [10.1, 10.4, 10.3] and df['high'].tolist() == [10.2, 10.5, 10.6]
+    assert df['volume'].tolist() == [120000, 150000, 90000]
+    assert df['amount'].tolist() == [int(120000 * 10.05), int(150000 * 10.3), int(90000 * 10.35)]
+    assert str(df['volume'].dtype) == 'int64' and str(df['open'].dtype) == 'float64'
+    assert TencentDataSource._decode_klines([['2024-01-02', '10.0']]) is None
+
+
+def test_download_all_async():
+    """批量下载驱动异步抓取：增量追加与完整下载都写入本地"""
+    tmp = tempfile.mkdtemp()
+    try:
+        config_file = os.path.join(tmp, 'config.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(f"[Paths]\ndata_dir = {tmp}\ndaily_dir = {tmp}/daily\nstocks_dir = {tmp}/stocks\n"
+                    f"[DataSource]\nsource = tencent\n"
+                    f"[Download]\nbuild_panel = false\nrequest_rate = 1000\nmax_in_flight = 4\n"
+                    f"snapshot_update = false\nasync_fetch = true\n")
+        downloader = DataDownloader(config_file)
+        downloader.tencent_source._get_json, _ = fake_kline_server()
+
+        existing = pd.DataFrame({'date': pd.bdate_range(end=pd.Timestamp.now().normalize() - pd.Timedelta(days=10),
+                                                          periods=5).strftime('%Y-%m-%d'),
+                                 'open': 1.0, 'close': 1.0, 'low': 1.0, 'high': 1.0,
+                                 'volume': 100, 'amount': 100})
+        existing.to_csv(os.path.join(tmp, 'daily', '000001.csv'), index=False)
+
+        progress = []
+        success, failed = downloader.download_all_stocks(
+            pd.DataFrame({'code': ['000001', '600000']}),
+            callback=lambda current, total, code, ok: progress.append((current, code, ok)))
+        assert (success, failed) == (2, 0)
+        assert sorted(c for c, _, _ in progress) == [1, 2]
+
+        updated = pd.read_csv(os.path.join(tmp, 'daily', '000001.csv'))
+        assert updated['date'].iloc[:5].tolist() == existing['date'].tolist()
+        assert len(updated) > 5 and updated['date'].is_monotonic_increasing
+        full = pd.read_csv(os.path.join(tmp, 'daily', '600000.csv'))
+        assert full['date'].iloc[0] >= '2020-01-01'
+    finally:
+        shutil.rmtree(tmp)
+
+
+def quote_line(code: str, time_str: str, volume: int = 12345) -> str:
+    fields = [''] * 50
+    fields[:8] = ['1', '名称', code, '10.50', '10.00', '10.10', str(volume), '0']
+    fields[30] = time_str
+    fields[33], fields[34], fields[37] = '10.80', '9.90', '1296.5'
+    return f'v_{"sh" if code.startswith("6") else "sz"}{code}="{"~".join(fields)}";'
+
+
+def test_parse_snapshot():
+    """收盘后的行情解析为当日K线，停牌和盘中快照被跳过"""
+    text = '\n'.join([quote_line('600000', '20240105150003'),
+                      quote_line('000001', '20240105150003', volume=0),
+                      quote_line('300750', '20240105142959'),
+                      'v_pv_none_match="1";'])
+    records = TencentDataSource._parse_snapshot(text)
+    assert len(records) == 1
+    bar = records[0]
+    assert bar['code'] == '600000' and bar['date'] == '2024-01-05'
+    assert (bar['open'], bar['close'], bar['high'], bar['low']) == (10.1, 10.5, 10.8, 9.9)
+    assert bar['volume'] == 1234500 and bar['amount'] == 12965000
+
+
+def test_snapshot_update():
+    """上一交易日已是最新的股票追加快照，缺多日或无数据的股票逐只下载"""
+    tmp = tempfile.mkdtemp()
+    try:
+        config_file = os.path.join(tmp, 'config.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(f"[Paths]\ndata_dir = {tmp}\ndaily_dir = {tmp}/daily\nstocks_dir = {tmp}/stocks\n"
+                    f"[DataSource]\nsource = tencent\n"
+                    f"[Download]\nbuild_panel = false\nrequest_rate = 1000\nsnapshot_update = true\n")
+        downloader = DataDownloader(config_file)
+        downloader.tencent_source._get_json, stats = fake_kline_server()
+
+        today = pd.Timestamp.now().normalize()
+        snapshot_date = pd.bdate_range(end=today, periods=1)[0]
+        previous = pd.bdate_range(end=snapshot_date - pd.Timedelta(days=1), periods=5)
+        for code, dates in [('600000', previous), ('000001', previous[:-2])]:
+            pd.DataFrame({'date': dates.strftime('%Y-%m-%d'), 'open': 10.0, 'close': 10.0, 'low': 10.0,
+                          'high': 10.0, 'volume': 100, 'amount': 100}).to_csv(
+                os.path.join(tmp, 'daily', f'{code}.csv'), index=False)
+
+        stamp = snapshot_date.strftime('%Y%m%d') + '150003'
+        snapshot_text = '\n'.join(quote_line(code, stamp) for code in ['600000', '000001', '300750'])
+        requested = []
+
+        def get_daily_snapshot(codes, batch_size):
+            requested.append(list(codes))
+            return pd.DataFrame(TencentDataSource._parse_snapshot(snapshot_text))
+
+        downloader.tencent_source.get_daily_snapshot = get_daily_snapshot
+        success, failed = downloader.download_all_stocks(pd.DataFrame({'code': ['600000', '000001', '300750']}))
+        assert (success, failed) == (3, 0)
+        assert requested == [['600000', '000001', '300750']]
+        # 只有缺数据的 000001（2 个交易日）和无数据的 300750 走K线接口
+        full_chunks = TencentDataSource._chunk_ranges('2020-01-01', today.strftime('%Y-%m-%d'))
+        assert stats['requests'] == 1 + len(full_chunks)
+
+        appended = pd.read_csv(os.path.join(tmp, 'daily', '600000.csv'))
+        assert len(appended) == 6
+        assert appended['date'].iloc[-1] == snapshot_date.strftime('%Y-%m-%d')
+        assert appended['volume'].iloc[-1] == 1234500
+        gap_filled = pd.read_csv(os.path.join(tmp, 'daily', '000001.csv'))
+        assert gap_filled['date'].iloc[-1] == snapshot_date.strftime('%Y-%m-%d')
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_akshare_spot_snapshot():
+    """AkShare 实时行情转为当日K线追加；昨收与本地收盘价不一致的股票逐只下载，多数不一致时整份快照不用"""
+    tmp = tempfile.mkdtemp()
+    try:
+        config_file = os.path.join(tmp, 'config.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(f"[Paths]\ndata_dir = {tmp}\ndaily_dir = {tmp}/daily\nstocks_dir = {tmp}/stocks\n"
+                    f"[DataSource]\nsource = akshare\n"
+                    f"[Download]\nbuild_panel = false\nwrite_queue_size = 0\nsnapshot_update = true\n")
+        downloader = DataDownloader(config_file)
+
+        snapshot_date = pd.Timestamp('2024-01-05')
+        dates = pd.bdate_range(end='2024-01-04', periods=3).strftime('%Y-%m-%d')
+        hist_columns = ['date', 'open', 'close', 'high', 'low', 'volume', 'amount',
+                        'amplitude', 'change_pct', 'change', 'turnover']
+        for code, close in [('600000', 10.0), ('000002', 8.0), ('000003', 10.0)]:
+            df = pd.DataFrame({c: 1.0 for c in hist_columns[1:]}, index=range(3))
+            df.insert(0, 'date', dates)
+            df['close'] = close
+            df[hist_columns].to_csv(os.path.join(tmp, 'daily', f'{code}.csv'), index=False)
+
+        spot = pd.DataFrame({
+            '序号': [1, 2, 3, 4], '代码': ['600000', '000002', '000003', '000004'], '名称': ['甲', '乙', '丙', '丁'],
+            '最新价': [10.5, 10.5, 10.5, 10.5], '涨跌幅': 5.0, '涨跌额': 0.5, '成交量': [1200, 1200, 0, 1200],
+            '成交额': 1260000.0, '振幅': 6.0, '最高': 10.8, '最低': 9.9, '今开': 10.1, '昨收': 10.0,
+            '量比': 1.0, '换手率': 0.8,
+        })
+        downloader._get_akshare_snapshot = lambda: DataDownloader._spot_to_daily(spot, snapshot_date)
+        downloaded = []
+
+        def download_stock_history(code, start_date=None, end_date=None):
+            downloaded.append(code)
+            return None
+
+        downloader.download_stock_history = download_stock_history
+        success, failed = downloader.download_all_stocks(
+            pd.DataFrame({'code': ['600000', '000002', '000003', '000004']}))
+        # 000002 昨收不一致（除权），000003 停牌，000004 本地无数据
+        assert sorted(downloaded) == ['000002', '000003', '000004']
+        appended = pd.read_csv(os.path.join(tmp, 'daily', '600000.csv'))
+        assert list(appended.columns) == hist_columns
+        assert appended['date'].iloc[-1] == '2024-01-05' and len(appended) == 4
+        assert appended['volume'].iloc[-1] == 1200 and appended['turnover'].iloc[-1] == 0.8
+
+        # 节假日拿到的是上一交易日的行情：昨收普遍对不上，整份快照不用
+        spot['昨收'] = 9.0
+        downloaded.clear()
+        snapshot_date = pd.Timestamp('2024-01-08')
+        downloader.download_all_stocks(pd.DataFrame({'code': ['600000', '000002']}))
+        assert sorted(downloaded) == ['000002', '600000']
+        assert len(pd.read_csv(os.path.join(tmp, 'daily', '600000.csv'))) == 4
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("腾讯数据源异步抓取测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("令牌桶限速", test_token_bucket),
+                       ("异步批量抓取", test_fetch_histories),
+                       ("分段并发获取", test_chunked_history),
+                       ("K线按列解码", test_decode_klines),
+                       ("批量下载异步抓取", test_download_all_async),
+                       ("行情快照解析", test_parse_snapshot),
+                       ("行情快照更新", test_snapshot_update),
+                       ("AkShare 行情快照", test_akshare_spot_snapshot)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+冷热分层存储测试脚本
+验证压实后热层只保留最近年份、按日期范围只打开重叠分区，以及读取结果与压实前一致（离线，使用临时目录）
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.data_store import PARQUET_AVAILABLE, write_stock_data, stock_file_path, read_stock_data
+from src.data_manifest import DataManifest
+from src.tiered_store import ColdStore, compact_daily_dir
+from src.utils import load_stock_data, clear_stock_data_cache
+
+TODAY = datetime(2024, 3, 1)
+
+
+def make_history(code: str, start: str = '2021-01-04', end: str = '2024-02-29') -> pd.DataFrame:
+    """生成跨多个年份的日线数据"""
+    dates = pd.bdate_range(start, end)
+    close = 10 + np.arange(len(dates)) * 0.01
+    return pd.DataFrame({
+        'date': dates.strftime('%Y-%m-%d'),
+        'code': code,
+        'open': close,
+        'high': close + 0.1,
+        'low': close - 0.1,
+        'close': close,
+        'volume': np.arange(len(dates)) + 100000,
+        'amount': close * 100000,
+    })
+
+
+def test_compact_and_read():
+    """压实后热层只保留最近年份，完整读取与压实前一致"""
+    if not PARQUET_AVAILABLE:
+        print("  未安装 pyarrow，跳过")
+        return
+    tmp = tempfile.mkdtemp()
+    try:
+        clear_stock_data_cache()
+        for code in ['000001', '600000']:
+            write_stock_data(make_history(code), stock_file_path(tmp, code))
+        # 2022 年已退市的股票，压实后热层为空
+        write_stock_data(make_history('000003', end='2022-06-30'), stock_file_path(tmp, '000003'))
+        before = load_stock_data(stock_file_path(tmp, '000001'))
+
+        manifest = DataManifest.get(tmp)
+        stats = compact_daily_dir(tmp, hot_years=1, today=TODAY, manifest=manifest)
+        assert stats['stocks'] == 3
+        assert ColdStore.get(tmp).years() == [2021, 2022]
+
+        hot = read_stock_data(stock_file_path(tmp, '000001'))
+        assert hot['date'].iloc[0] == '2023-01-02'
+        assert len(read_stock_data(stock_file_path(tmp, '000003'))) == 0
+
+        after = load_stock_data(stock_file_path(tmp, '000001'))
+        pd.testing.assert_frame_equal(after, before)
+        assert len(load_stock_data(stock_file_path(tmp, '000003'))) > 0
+
+        # 清单的日期范围包含冷层
+        assert manifest.date_range(stock_file_path(tmp, '000001'))[0] == '2021-01-04'
+        assert manifest.earliest_date() == pd.Timestamp('2021-01-04')
+
+        # 没有过期数据时压实不做任何写入
+        assert compact_daily_dir(tmp, hot_years=1, today=TODAY, manifest=manifest)['stocks'] == 0
+    finally:
+        clear_stock_data_cache()
+        shutil.rmtree(tmp)
+
+
+def test_range_reads_only_overlapping_partitions():
+    """按日期范围读取只打开重叠的冷层分区，最后 N 行跨层补齐"""
+    if not PARQUET_AVAILABLE:
+        print("  未安装 pyarrow，跳过")
+        return
+    tmp = tempfile.mkdtemp()
+    try:
+        clear_stock_data_cache()
+        full = make_history('000001')
+        path = stock_file_path(tmp, '000001')
+        write_stock_data(full, path)
+        compact_daily_dir(tmp, hot_years=1, today=TODAY)
+        store = ColdStore.get(tmp)
+
+        with mock.patch.object(store, 'read_stock', wraps=store.read_stock) as read_stock:
+            df = load_stock_data(path, start_date='2023-06-01', end_date='2023-06-30')
+            assert read_stock.call_count == 0
+            assert df['date'].min() == pd.Timestamp('2023-06-01')
+
+            df = load_stock_data(path, start_date='2022-12-01', end_date='2023-01-31')
+            assert [c.args[1] for c in read_stock.call_args_list] == [[2022]]
+            assert df['date'].min() == pd.Timestamp('2022-12-01')
+            assert df['date'].max() == pd.Timestamp('2023-01-31')
+
+        tail = load_stock_data(path, last_n_rows=500)
+        expected = load_stock_data(path).tail(500).reset_index(drop=True)
+        pd.testing.assert_frame_equal(tail, expected)
+        assert tail['date'].iloc[0].year == 2022
+
+        # 补充历史（与已封存的 2021 年部分重叠）后再次压实，重叠年份合并进原分区
+        backfill = make_history('000001', start='2020-06-01', end='2021-01-29')
+        write_stock_data(pd.concat([backfill, read_stock_data(path)]), path)
+        compact_daily_dir(tmp, hot_years=1, today=TODAY)
+        assert store.years() == [2020, 2021, 2022]
+        merged = load_stock_data(path)
+        assert len(merged) == len(set(backfill['date']) | set(full['date']))
+        assert merged['date'].is_unique
+    finally:
+        clear_stock_data_cache()
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("冷热分层存储测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("压实与完整读取", test_compact_and_read),
+                       ("按日期范围读取", test_range_reads_only_overlapping_partitions)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Tushare 按交易日同步测试脚本
+验证全市场截面换算为前复权后按股票追加、复权基准变化的股票重新下载，
+以及无数据股票按调用次数选择回补方式（离线：以本地对象模拟 Tushare 接口，使用临时目录）
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.data_source_tushare import TushareDataSource
+from src.rate_limiter import AdaptiveRateLimiter
+from src.data_downloader import DataDownloader
+
+
+class FakePro:
+    """模拟 trade_cal / daily / adj_factor 接口：收盘价 = 10 + 交易日序号 × 0.1（不复权）"""
+
+    def __init__(self, dates, codes, adj_changes=None):
+        self.dates = list(dates)
+        self.codes = list(codes)
+        self.adj_changes = adj_changes or {}  # {code: (除权日, 新复权因子)}
+        self.calls = []
+
+    def _ts_code(self, code):
+        return f"{code}.{'SH' if code.startswith('6') else 'SZ'}"
+
+    def adj(self, code, trade_date):
+        change = self.adj_changes.get(code)
+        return change[1] if change and trade_date >= change[0] else 1.0
+
+    def trade_cal(self, exchange, start_date, end_date):
+        self.calls.append(('trade_cal', start_date))
+        dates = [d for d in self.dates if start_date <= d <= end_date]
+        return pd.DataFrame({'exchange': exchange, 'cal_date': dates, 'is_open': 1})
+
+    def daily(self, trade_date):
+        self.calls.append(('daily', trade_date))
+        if trade_date not in self.dates:
+            return pd.DataFrame()
+        close = 10 + self.dates.index(trade_date) * 0.1
+        return pd.DataFrame({
+            'ts_code': [self._ts_code(c) for c in self.codes], 'trade_date': trade_date,
+            'open': close, 'high': close + 0.5, 'low': close - 0.5, 'close': close, 'pre_close': close - 0.1,
+            'change': 0.1, 'pct_chg': 1.0, 'vol': 1000.0, 'amount': 1050.0,
+        })
+
+    def adj_factor(self, trade_date):
+        self.calls.append(('adj_factor', trade_date))
+        if trade_date not in self.dates:
+            return pd.DataFrame(columns=['ts_code', 'trade_date', 'adj_factor'])
+        return pd.DataFrame({'ts_code': [self._ts_code(c) for c in self.codes], 'trade_date': trade_date,
+                             'adj_factor': [self.adj(c, trade_date) for c in self.codes]})
+
+
+def make_downloader(tmp, pro):
+    config_file = os.path.join(tmp, 'config.ini')
+    with open(config_file, 'w', encoding='utf-8') as f:
+        f.write(f"[Paths]\ndata_dir = {tmp}\ndaily_dir = {tmp}/daily\nstocks_dir = {tmp}/stocks\n"
+                f"[DataSource]\nsource = akshare\n[Download]\nbuild_panel = false\ndate_major_sync = true\n")
+    downloader = DataDownloader(config_file)
+    source = TushareDataSource.__new__(TushareDataSource)
+    source.pro, source.logger = pro, downloader.logger
+    source.limiter = AdaptiveRateLimiter('tushare', rate=1000)
+    downloader.data_source, downloader.tushare_source = 'tushare', source
+
+    downloaded = []
+
+    def download_stock_history(code, start_date=None, end_date=None):
+        downloaded.append((code, start_date))
+        return None
+
+    downloader.download_stock_history = download_stock_history
+    return downloader, downloaded
+
+
+def write_local(tmp, code, dates):
+    pd.DataFrame({'ts_code': code, 'date': pd.to_datetime(dates).strftime('%Y-%m-%d'),
+                  'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'pre_close': 1.0,
+                  'change': 0.0, 'change_pct': 0.0, 'volume': 1.0, 'amount': 1.0}).to_csv(
+        os.path.join(tmp, 'daily', f'{code}.csv'), index=False)
+
+
+def test_daily_update():
+    """日常更新：每个交易日一次 daily，复权基准变化的股票重新下载，个别新股逐只下载"""
+    tmp = tempfile.mkdtemp()
+    try:
+        dates = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=30).strftime('%Y%m%d').tolist()
+        pro = FakePro(dates, ['000001', '600000', '300750'], adj_changes={'600000': (dates[-1], 1.25)})
+        downloader, downloaded = make_downloader(tmp, pro)
+        for code in ['000001', '600000']:
+            write_local(tmp, code, dates[:-3])
+
+        downloader.download_all_stocks(pd.DataFrame({'code': ['000001', '600000', '300750']}))
+
+        assert [c for c in pro.calls if c[0] == 'daily'] == [('daily', d) for d in dates[-3:]]
+        # 基准日和本地最新日的复权因子各一次，其余交易日各一次，基准日的截面复用已获取的复权因子
+        assert sorted(d for name, d in pro.calls if name == 'adj_factor') == dates[-4:]
+        assert len(pro.calls) == 1 + 3 + 4
+        # 600000 期间除权：重新下载完整历史；300750 无数据：逐只下载
+        assert sorted(code for code, _ in downloaded) == ['300750', '600000']
+        assert dict(downloaded)['600000'] == dates[0]
+
+        df = pd.read_csv(os.path.join(tmp, 'daily', '000001.csv'), dtype={'ts_code': str})
+        assert len(df) == 30
+        assert df['date'].iloc[-1] == pd.Timestamp(dates[-1]).strftime('%Y-%m-%d')
+        assert abs(df['close'].iloc[-1] - (10 + 29 * 0.1)) < 1e-9
+        assert len(pd.read_csv(os.path.join(tmp, 'daily', '600000.csv'))) == 27
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_backfill_new_stocks():
+    """多只新股按交易日回补，区间内除权前的价格按最后一天的复权因子前复权"""
+    tmp = tempfile.mkdtemp()
+    try:
+        dates = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=3).strftime('%Y%m%d').tolist()
+        codes = ['000001', '000002', '600000', '600001']
+        pro = FakePro(dates, codes, adj_changes={'600000': (dates[-1], 1.1)})
+        downloader, downloaded = make_downloader(tmp, pro)
+
+        remaining, done = downloader.sync_date_major(pd.DataFrame({'code': codes}), start_date=dates[0])
+        assert remaining.empty and done == 4 and not downloaded
+
+        df = pd.read_csv(os.path.join(tmp, 'daily', '600000.csv'))
+        assert len(df) == 3
+        assert list(df['close']) == [round(10 / 1.1, 2), round(10.1 / 1.1, 2), 10.2]
+        assert list(pd.read_csv(os.path.join(tmp, 'daily', '000001.csv'))['close']) == [10.0, 10.1, 10.2]
+        assert downloader.manifest.get_entry('600001') is not None
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("Tushare 按交易日同步测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("日常更新", test_daily_update),
+                       ("新股按交易日回补", test_backfill_new_stocks)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+后台写入队列测试脚本
+验证写入任务按顺序成批执行、每批落盘后才确认、失败会被汇报、数据文件原子替换、
+中断批次的原地追加可以回滚，以及批量下载在返回前写完全部数据并在落盘后登记任务日志
+（离线，使用临时目录）
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.write_queue import WriteBehindQueue
+from src.data_store import write_stock_data, append_stock_data, BatchWriteLog
+from src.download_journal import journal_path
+from src.data_downloader import DataDownloader
+
+
+def make_daily(start: str, periods: int) -> pd.DataFrame:
+    dates = pd.bdate_range(start, periods=periods)
+    return pd.DataFrame({
+        'date': dates, 'open': 10.0, 'high': 11.0, 'low': 9.0, 'close': 10.5,
+        'volume': 1000, 'amount': 10500.0,
+    })
+
+
+def test_queue_order_and_failures():
+    """任务按提交顺序由同一线程执行，失败的任务标识在 close 时返回"""
+    done = []
+    threads = set()
+
+    def work(key, ok):
+        threads.add(threading.get_ident())
+        done.append(key)
+        if ok == 'raise':
+            raise IOError('disk full')
+        return ok
+
+    writer = WriteBehindQueue(maxsize=2)
+    for i in range(10):
+        writer.submit(f'{i:06d}', work, f'{i:06d}', 'raise' if i == 3 else i != 7)
+    failed = writer.close()
+
+    assert done == [f'{i:06d}' for i in range(10)]
+    assert len(threads) == 1 and threading.get_ident() not in threads
+    assert failed == ['000003', '000007']
+    assert writer.written == 8
+
+
+def test_batches_and_acknowledgement():
+    """队列中已有的任务成批写入；每批 after_batch 之后才确认，准备或落盘失败时整批记为失败"""
+    events = []
+    started, release = threading.Event(), threading.Event()
+
+    def work(key):
+        if key == 'first':
+            started.set()
+            release.wait(5)
+        events.append(('write', key))
+        return True
+
+    def before_batch(keys):
+        events.append(('before', list(keys)))
+        if 'bad' in keys:
+            raise OSError('no space left')
+
+    writer = WriteBehindQueue(maxsize=10, batch_size=3, before_batch=before_batch,
+                              after_batch=lambda keys: events.append(('after', list(keys))),
+                              on_done=lambda key, ok: events.append(('done', key, ok)))
+    writer.submit('first', work, 'first')
+    assert started.wait(5)
+    for key in ['a', 'b', 'c', 'd']:
+        writer.submit(key, work, key)
+    release.set()
+    assert writer.submitted('a') and not writer.submitted('bad')
+    writer.submit('bad', work, 'bad')
+    failed = writer.close()
+
+    assert events[:4] == [('before', ['first']), ('write', 'first'), ('after', ['first']),
+                          ('done', 'first', True)]
+    # 写线程被阻塞期间进入队列的任务按 batch_size 成批写入，确认都在本批落盘之后
+    assert events[4:12] == [('before', ['a', 'b', 'c']), ('write', 'a'), ('write', 'b'), ('write', 'c'),
+                            ('after', ['a', 'b', 'c']), ('done', 'a', True), ('done', 'b', True),
+                            ('done', 'c', True)]
+    assert ('write', 'bad') not in events and ('done', 'bad', False) in events
+    assert failed == ['bad'] or failed == ['d', 'bad']
+    assert writer.written == 6 - len(failed)
+
+
+def test_batch_rollback():
+    """批次确认前中断：原地追加截断回原长度，已整体替换的文件保留新版本；确认后删除回滚记录"""
+    tmp = tempfile.mkdtemp()
+    try:
+        appended = os.path.join(tmp, '000001.csv')
+        replaced = os.path.join(tmp, '000002.csv')
+        for path in (appended, replaced):
+            write_stock_data(make_daily('2024-01-02', 5), path)
+        with open(appended, 'rb') as f:
+            before = f.read()
+        log_path = os.path.join(tmp, '_write_batch.json')
+
+        log = BatchWriteLog(log_path)
+        log.begin([appended, replaced, os.path.join(tmp, '300750.csv')])
+        with open(log_path, encoding='utf-8') as f:
+            assert len(json.load(f)) == 2
+        assert append_stock_data(make_daily('2024-01-09', 2), appended, sync=True)
+        write_stock_data(make_daily('2024-01-02', 8), replaced, sync=True)
+        # 模拟进程在确认前退出：下次启动时回滚
+        assert BatchWriteLog(log_path).recover() == [os.path.abspath(appended)]
+        with open(appended, 'rb') as f:
+            assert f.read() == before
+        assert len(pd.read_csv(replaced)) == 8
+        assert not os.path.exists(log_path)
+
+        log.begin([appended])
+        assert append_stock_data(make_daily('2024-01-09', 2), appended, sync=True)
+        log.commit([tmp])
+        assert not os.path.exists(log_path) and log.recover() == []
+        assert len(pd.read_csv(appended)) == 7
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_atomic_write():
+    """写入失败时保留原文件且不留下临时文件；追加失败时截断回原长度"""
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, '000001.csv')
+        write_stock_data(make_daily('2024-01-02', 5), path)
+        with open(path, 'rb') as f:
+            before = f.read()
+
+        class Broken(pd.DataFrame):
+            def to_csv(self, path_or_buf=None, *args, **kwargs):
+                with open(path_or_buf, 'w') as f:
+                    f.write('date,open\n2024-')
+                raise IOError('disk full')
+
+        try:
+            write_stock_data(Broken(make_daily('2024-01-02', 3)), path)
+            assert False, '应抛出异常'
+        except IOError:
+            pass
+        with open(path, 'rb') as f:
+            assert f.read() == before
+        assert os.listdir(tmp) == ['000001.csv']
+
+        assert append_stock_data(make_daily('2024-01-09', 2), path)
+        assert len(pd.read_csv(path)) == 7
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_download_all_writes_behind():
+    """批量下载时写入在后台线程完成，返回前全部落盘并登记清单"""
+    tmp = tempfile.mkdtemp()
+    try:
+        config_file = os.path.join(tmp, 'config.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(f"[Paths]\ndata_dir = {tmp}\ndaily_dir = {tmp}/daily\nstocks_dir = {tmp}/stocks\n"
+                    f"[DataSource]\nsource = akshare\n"
+                    f"[Download]\nmax_workers = 4\nbuild_panel = false\nwrite_queue_size = 2\n"
+                    f"snapshot_update = false\n")
+        downloader = DataDownloader(config_file)
+
+        # 已有数据的股票走追加路径，其余走完整下载
+        write_stock_data(make_daily('2024-01-02', 5), os.path.join(tmp, 'daily', '000001.csv'))
+        writer_threads = set()
+        save = downloader._save_stock_data
+
+        def tracked_save(stock_code, df, *args):
+            writer_threads.add(threading.current_thread().name)
+            return save(stock_code, df, *args)
+
+        downloader._save_stock_data = tracked_save
+        downloader.download_stock_history = lambda code, start_date=None, end_date=None: \
+            make_daily(max(pd.Timestamp(start_date), pd.Timestamp('2024-01-02')), 5)
+
+        codes = ['000001', '000002', '600000', '300750']
+        success, failed = downloader.download_all_stocks(pd.DataFrame({'code': codes}))
+        assert (success, failed) == (4, 0)
+        assert writer_threads == {'WriteBehindQueue'}
+        assert downloader._write_queue is None
+
+        assert len(pd.read_csv(os.path.join(tmp, 'daily', '000001.csv'))) == 10
+        for code in codes[1:]:
+            assert len(pd.read_csv(os.path.join(tmp, 'daily', f'{code}.csv'))) == 5
+            assert downloader.manifest.get_entry(code) is not None
+        # 写线程在各批落盘后登记任务日志，回滚记录已删除
+        with open(journal_path(os.path.join(tmp, 'daily'), 'download_all'), encoding='utf-8') as f:
+            assert sorted(json.load(f)['completed']) == sorted(codes)
+        assert not os.path.exists(os.path.join(tmp, 'daily', '_write_batch.json'))
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 50)
+    print("后台写入队列测试")
+    print("=" * 50)
+
+    all_passed = True
+    for name, func in [("写入顺序与失败汇报", test_queue_order_and_failures),
+                       ("成批写入与确认", test_batches_and_acknowledgement),
+                       ("中断批次回滚", test_batch_rollback),
+                       ("原子写入", test_atomic_write),
+                       ("批量下载后台写入", test_download_all_writes_behind)]:
+        try:
+            func()
+            print(f"[OK] {name}")
+        except AssertionError as e:
+            print(f"[FAIL] {name}: {e}")
+            all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())